@@ -1,16 +1,24 @@
 import os
 from qgis.PyQt.QtWidgets import QAction, QMenu, QMessageBox
 from qgis.PyQt.QtGui import QIcon
+from qgis.core import QgsApplication
+from qgis import processing
 
 # Import all module classes
 from .modules.project_setup import ProjectSetupWizard
-from .modules.data_management import ImportDataDialog, DataQualityDashboard, AnonymizeDataTool
-from .modules.outbreak_investigation import AddRecordTool, FieldTracingTool, CaseDefinitionDialog
-from .modules.analysis_reporting import EpiCurveDialog, LISAAnalysisDialog, CreateReportMap
+from .modules.data_management import ImportDataDialog, DataQualityDashboard, AnonymizeDataTool, FieldMergeDialog
+from .modules.outbreak_investigation import (AddRecordTool, BatchEntryPanel, FieldTracingTool, TraceNetworkDialog,
+                                             MovementImportDialog, CaseDefinitionDialog)
+from .modules.analysis_reporting import (EpiCurveDialog, RtEstimationDialog, LISAAnalysisDialog, HotspotAnalysisDialog,
+                                         KernelDensityDialog, SpaceTimeScanDialog, SpreadSimulationDialog,
+                                         CreateReportMap)
 from .modules.one_health_coordination import MCM_OT_Wizard, JRA_OT_Wizard, SIS_OT_Wizard
-from .modules.surveillance_economics import SurveillanceDesigner, SURVCosTDialog, OutCosTDialog, EconomicParametersDialog
+from .modules.surveillance_economics import (SurveillanceDesigner, SampleSizeCalculatorDialog, SURVCosTDialog,
+                                             OutCosTDialog, SystemSensitivityDialog, PortfolioDialog,
+                                             EconomicParametersDialog)
 from .modules.help import HelpDialog
 from .modules.training import run_tutorial
+from .providers.processing_provider import EADSTProcessingProvider
 
 class EADSTPlugin:
     def __init__(self, iface):
@@ -21,9 +29,17 @@ class EADSTPlugin:
         self.toolbar = self.iface.addToolBar("EADST Toolbar")
         self.toolbar.setObjectName("EADSTToolbar")
         self.help_dialog = None
+        self.batch_entry_panel = None
+        self.processing_provider = None
+
+    def initProcessing(self):
+        """Register the EADST algorithms, so they can also run from qgis_process."""
+        self.processing_provider = EADSTProcessingProvider()
+        QgsApplication.processingRegistry().addProvider(self.processing_provider)
 
     def initGui(self):
         """Create all menus and toolbar actions for EADST v2.0."""
+        self.initProcessing()
         self.eadst_menu = QMenu(self.menu, self.iface.mainWindow().menuBar())
         self.iface.mainWindow().menuBar().insertMenu(self.iface.pluginMenu().actions()[0], self.eadst_menu)
 
@@ -41,20 +57,36 @@ class EADSTPlugin:
         self.add_action(setup_menu, "New Investigation Project...", self.run_new_investigation, 'icons/new_project.svg', is_toolbar=True)
         self.add_action(data_mgmt_menu, "Import Standardized Data...", self.run_import_data, 'icons/import_data.svg')
         self.add_action(data_mgmt_menu, "Data Quality Dashboard...", self.run_quality_dashboard, 'icons/quality_dashboard.svg')
+        self.add_action(data_mgmt_menu, "Merge Field Team GeoPackages...", self.run_merge_field_data)
         self.add_action(investigation_menu, "Add Outbreak Record...", self.run_add_record, 'icons/add_record.svg', is_toolbar=True)
+        self.add_action(investigation_menu, "Batch Record Entry...", self.run_batch_entry)
         self.add_action(investigation_menu, "Field Tracing Tool", self.run_field_tracing, 'icons/field_tracing.svg', is_toolbar=True)
+        self.add_action(investigation_menu, "Import Movement Records...", self.run_import_movements)
+        self.add_action(investigation_menu, "Trace Network Analysis...", self.run_trace_network)
         self.add_action(investigation_menu, "Define Outbreak Case...", self.run_define_case, 'icons/define_case.svg')
         self.add_action(analysis_menu, "Epidemic Curve...", self.run_epi_curve, 'icons/epi_curve.svg')
+        self.add_action(analysis_menu, "Reproduction Number (Rt)...", self.run_rt_estimation)
         self.add_action(analysis_menu, "LISA Cluster Map...", self.run_lisa_analysis, 'icons/lisa_analysis.svg')
+        self.add_action(analysis_menu, "Hotspot Analysis (Gi*, Join Counts, Moran's I)...", self.run_hotspot_analysis)
+        self.add_action(analysis_menu, "Hotspot Map (Kernel Density)...", self.run_kernel_density)
+        self.add_action(analysis_menu, "Space-Time Cluster Scan...", self.run_space_time_scan)
+        self.add_action(analysis_menu, "Outbreak Spread Simulation (SEIR)...", self.run_spread_simulation)
         analysis_menu.addSeparator()
         self.add_action(analysis_menu, "Create Report Map...", self.run_create_report_map, 'icons/create_map.svg')
+        self.add_action(analysis_menu, "Export Map Pack (Regions & Zones)...", self.run_export_map_pack)
+        self.add_action(analysis_menu, "Build Situation Report...", self.run_sitrep)
+        self.add_action(analysis_menu, "Early-Warning Detection...", self.run_aberration)
         self.add_action(one_health_menu, "MCM OT: Coordination Mechanism Wizard...", self.run_mcm_wizard)
         self.add_action(one_health_menu, "JRA OT: Joint Risk Assessment Wizard...", self.run_jra_wizard)
         self.add_action(one_health_menu, "SIS OT: Surveillance & Info Sharing Wizard...", self.run_sis_wizard)
         self.add_action(planning_menu, "Surveillance Scheme Designer...", self.run_surveillance_designer)
+        self.add_action(planning_menu, "Sample Size Calculator...", self.run_sample_size)
+        self.add_action(planning_menu, "Risk-Based Sampling Frame...", self.run_sampling_frame)
+        self.add_action(planning_menu, "Surveillance System Sensitivity (Scenario Trees)...", self.run_system_sensitivity)
         planning_menu.addSeparator()
         self.add_action(planning_menu, "SURVCosT: Surveillance Program Costing...", self.run_survcost)
         self.add_action(planning_menu, "OutCosT: Outbreak Impact Assessment...", self.run_outcost)
+        self.add_action(planning_menu, "Surveillance Portfolio Optimiser...", self.run_portfolio)
         self.add_action(planning_menu, "Economic Parameter Database...", self.run_edit_eco_params)
         tutorial_menu = training_menu.addMenu("Interactive Learning Modules")
         self.add_action(tutorial_menu, "Tutorial: Investigating an Outbreak", lambda: run_tutorial(self.iface, "Outbreak Investigation"))
@@ -77,25 +109,48 @@ class EADSTPlugin:
         for action in self.actions:
             self.toolbar.removeAction(action)
         del self.toolbar
+        if self.processing_provider:
+            QgsApplication.processingRegistry().removeProvider(self.processing_provider)
     
     # --- Callback Function Stubs ---
     def run_new_investigation(self): ProjectSetupWizard(self.iface.mainWindow()).exec_()
     def run_import_data(self): ImportDataDialog(self.iface.mainWindow()).exec_()
     def run_quality_dashboard(self): DataQualityDashboard(self.iface.mainWindow()).exec_()
     def run_anonymize_data(self): AnonymizeDataTool(self.iface.mainWindow()).exec_()
+    def run_merge_field_data(self): FieldMergeDialog(self.iface, self.iface.mainWindow()).exec_()
     def run_add_record(self): self.add_record_tool = AddRecordTool(self.iface); self.iface.mapCanvas().setMapTool(self.add_record_tool)
+    def run_batch_entry(self):
+        # An open panel is brought forward rather than replaced, so its pending records are kept
+        if self.batch_entry_panel is None or not self.batch_entry_panel.isVisible():
+            self.batch_entry_panel = BatchEntryPanel(self.iface, self.iface.mainWindow())
+        self.batch_entry_panel.show()
+        self.batch_entry_panel.raise_()
     def run_field_tracing(self): self.field_trace_tool = FieldTracingTool(self.iface); self.field_trace_tool.start_tracing()
-    def run_define_case(self): CaseDefinitionDialog(self.iface.mainWindow()).exec_()
+    def run_import_movements(self): MovementImportDialog(self.iface, self.iface.mainWindow()).exec_()
+    def run_trace_network(self): TraceNetworkDialog(self.iface, self.iface.mainWindow()).exec_()
+    def run_define_case(self): CaseDefinitionDialog(self.iface, self.iface.mainWindow()).exec_()
     def run_epi_curve(self): EpiCurveDialog(self.iface.mainWindow()).exec_()
-    def run_lisa_analysis(self): LISAAnalysisDialog(self.iface.mainWindow()).exec_()
+    def run_rt_estimation(self): self.rt_dialog = RtEstimationDialog(self.iface, self.iface.mainWindow()); self.rt_dialog.show()
+    def run_lisa_analysis(self): LISAAnalysisDialog(self.iface, self.iface.mainWindow()).exec_()
+    def run_hotspot_analysis(self): HotspotAnalysisDialog(self.iface, self.iface.mainWindow()).exec_()
+    def run_kernel_density(self): KernelDensityDialog(self.iface, self.iface.mainWindow()).exec_()
+    def run_space_time_scan(self): SpaceTimeScanDialog(self.iface, self.iface.mainWindow()).exec_()
+    def run_spread_simulation(self): SpreadSimulationDialog(self.iface, self.iface.mainWindow()).exec_()
     def run_create_report_map(self): CreateReportMap(self.iface).show()
+    def run_export_map_pack(self): self.map_pack_exporter = CreateReportMap(self.iface); self.map_pack_exporter.export_map_pack()
+    def run_sitrep(self): processing.execAlgorithmDialog('eadst:sitrep')
+    def run_aberration(self): processing.execAlgorithmDialog('eadst:aberration')
     def run_mcm_wizard(self): MCM_OT_Wizard(self.iface.mainWindow()).exec_()
     def run_jra_wizard(self): JRA_OT_Wizard(self.iface.mainWindow()).exec_()
     def run_sis_wizard(self): SIS_OT_Wizard(self.iface.mainWindow()).exec_()
-    def run_surveillance_designer(self): SurveillanceDesigner(self.iface.mainWindow()).exec_()
-    def run_survcost(self): SURVCosTDialog(self.iface.mainWindow()).exec_()
-    def run_outcost(self): OutCosTDialog(self.iface.mainWindow()).exec_()
-    def run_edit_eco_params(self): EconomicParametersDialog(self.iface.mainWindow()).exec_()
+    def run_surveillance_designer(self): SurveillanceDesigner(self.iface, self.iface.mainWindow()).exec_()
+    def run_sample_size(self): SampleSizeCalculatorDialog(self.iface, self.iface.mainWindow()).exec_()
+    def run_sampling_frame(self): processing.execAlgorithmDialog('eadst:sampling_frame')
+    def run_system_sensitivity(self): SystemSensitivityDialog(self.iface, self.iface.mainWindow()).exec_()
+    def run_survcost(self): SURVCosTDialog(self.iface, self.iface.mainWindow()).exec_()
+    def run_outcost(self): OutCosTDialog(self.iface, self.iface.mainWindow()).exec_()
+    def run_portfolio(self): PortfolioDialog(self.iface, self.iface.mainWindow()).exec_()
+    def run_edit_eco_params(self): EconomicParametersDialog(self.iface, self.iface.mainWindow()).exec_()
     def run_help(self):
         if self.help_dialog is None:
             self.help_dialog = HelpDialog(self.iface.mainWindow())
@@ -18,12 +18,15 @@ import math
 import pandas as pd
 from qgis.PyQt.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, 
                                  QPushButton, QDialogButtonBox, QFileDialog, QTableWidget, 
-                                 QTableWidgetItem, QHeaderView, QDoubleSpinBox, QProgressBar)
+                                 QTableWidgetItem, QHeaderView, QDoubleSpinBox, QProgressBar,
+                                 QListWidget, QCheckBox, QApplication, QAbstractItemView)
+from qgis.PyQt.QtCore import Qt
 from qgis.PyQt.QtGui import QColor
 from qgis.core import (QgsProject, QgsVectorLayer, QgsField, QgsFeature, QgsGeometry, 
                        QgsPointXY, QgsWkbTypes, Qgis)
 from PyQt5.QtCore import QVariant
 from .utils import show_message, validate_row, find_or_create_layer
+from ..providers.merge_provider import MERGE_KEYS, merge_team_files, resolve_conflict
 
 class ImportDataDialog(QDialog):
     """A wizard-like dialog to import and validate tabular data from a CSV file."""
@@ -166,6 +169,117 @@ class ImportDataDialog(QDialog):
         self.accept()
 
 
+class FieldMergeDialog(QDialog):
+    """Merges the GeoPackages of offline field teams into the master layers and lists conflicts."""
+    def __init__(self, iface, parent=None):
+        super(FieldMergeDialog, self).__init__(parent)
+        self.iface = iface
+        self.setWindowTitle("Merge Field Team GeoPackages")
+        self.setMinimumSize(800, 600)
+        self.conflicts = []
+
+        # UI Elements
+        self.btn_add_files = QPushButton("1. Add Team GeoPackages...")
+        self.btn_clear_files = QPushButton("Clear")
+        self.file_list = QListWidget()
+        self.layer_checks = {name: QCheckBox(name) for name in MERGE_KEYS}
+        self.btn_merge = QPushButton("2. Merge into Master Layers")
+        self.results_label = QLabel("Status: Add the team files to merge.")
+        self.conflict_table = QTableWidget(0, 4)
+        self.conflict_table.setHorizontalHeaderLabels(["Layer", "Record", "Team File", "Reason"])
+        self.conflict_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.conflict_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.conflict_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.btn_resolve = QPushButton("Use Selected Version")
+        self.btn_resolve.setEnabled(False)
+
+        # Layout
+        file_buttons = QHBoxLayout()
+        file_buttons.addWidget(self.btn_add_files)
+        file_buttons.addWidget(self.btn_clear_files)
+        layer_row = QHBoxLayout()
+        layer_row.addWidget(QLabel("Layers:"))
+        for name, check in self.layer_checks.items():
+            check.setChecked(bool(QgsProject.instance().mapLayersByName(name)))
+            layer_row.addWidget(check)
+
+        layout = QVBoxLayout()
+        layout.addLayout(file_buttons)
+        layout.addWidget(self.file_list)
+        layout.addLayout(layer_row)
+        layout.addWidget(self.btn_merge)
+        layout.addWidget(self.results_label)
+        layout.addWidget(QLabel("3. Review conflicts (choose the version to keep):"))
+        layout.addWidget(self.conflict_table)
+        layout.addWidget(self.btn_resolve)
+        self.setLayout(layout)
+
+        # Connections
+        self.btn_add_files.clicked.connect(self.add_files)
+        self.btn_clear_files.clicked.connect(self.file_list.clear)
+        self.btn_merge.clicked.connect(self.merge)
+        self.btn_resolve.clicked.connect(self.resolve_selected)
+
+    def add_files(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "Select Team GeoPackages", "", "GeoPackage (*.gpkg)")
+        existing = {self.file_list.item(i).text() for i in range(self.file_list.count())}
+        self.file_list.addItems([path for path in paths if path not in existing])
+
+    def merge(self):
+        paths = [self.file_list.item(i).text() for i in range(self.file_list.count())]
+        if not paths:
+            show_message(self.iface, "Add at least one team GeoPackage.", level=Qgis.Warning)
+            return
+
+        summary, self.conflicts = [], []
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            for name, check in self.layer_checks.items():
+                layers = QgsProject.instance().mapLayersByName(name)
+                if not check.isChecked() or not layers:
+                    continue
+                result = merge_team_files(layers[0], paths, feedback=self.results_label.setText)
+                if result is None:
+                    show_message(self.iface, f"Merging '{name}' failed. See the Python console for details.",
+                                 level=Qgis.Critical)
+                    continue
+                summary.append(f"{name}: {result['inserted']} added, {result['updated']} updated, "
+                               f"{len(result['conflicts'])} conflict(s)")
+                if result['missing']:
+                    summary.append(f"{name} not found in {len(result['missing'])} file(s)")
+                for i in range(len(result['conflicts'])):
+                    self.conflicts.append((layers[0], result['conflicts'].iloc[[i]]))
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        self.results_label.setText("Merge complete. " + "; ".join(summary) if summary else "Nothing was merged.")
+        self.fill_conflicts()
+
+    def fill_conflicts(self):
+        self.conflict_table.setRowCount(len(self.conflicts))
+        for row, (layer, version) in enumerate(self.conflicts):
+            record = " / ".join(str(version.iloc[0][name]) for name in MERGE_KEYS[layer.name()])
+            values = [layer.name(), record, os.path.basename(version.iloc[0]['file']), version.iloc[0]['reason']]
+            for col, value in enumerate(values):
+                self.conflict_table.setItem(row, col, QTableWidgetItem(value))
+        self.btn_resolve.setEnabled(bool(self.conflicts))
+
+    def resolve_selected(self):
+        row = self.conflict_table.currentRow()
+        if row < 0:
+            return
+        layer, version = self.conflicts[row]
+        if not resolve_conflict(layer, version):
+            show_message(self.iface, "The selected version could not be applied.", level=Qgis.Critical)
+            return
+        # The other teams' versions of the same record are settled as well
+        key = version.index[0]
+        self.conflicts = [(lyr, ver) for lyr, ver in self.conflicts if not (lyr is layer and ver.index[0] == key)]
+        self.fill_conflicts()
+        show_message(self.iface, f"Kept the version from '{os.path.basename(version.iloc[0]['file'])}'.",
+                     level=Qgis.Success)
+
+
 class DataQualityDashboard(QDialog):
     # ... (Implementation as defined in previous response) ...
     pass
@@ -10,13 +10,41 @@ class SurveillanceEconomicsDialog(QDialog):
 
 # eadst_plugin/modules/surveillance_economics.py
 
+import os
 import json
+import functools
+import numpy as np
+from qgis.PyQt.QtCore import Qt, QVariant
 from qgis.PyQt.QtWidgets import (QDialog, QWizard, QWizardPage, QVBoxLayout, QFormLayout, 
                                  QLabel, QLineEdit, QTextEdit, QDialogButtonBox, QFileDialog, 
                                  QDoubleSpinBox, QTableWidget, QTableWidgetItem, 
-                                 QHeaderView, QPushButton, QTabWidget, QWidget)
-from qgis.core import Qgis, QgsProject
-from .utils import show_message, get_economic_parameters, save_economic_parameters
+                                 QHeaderView, QPushButton, QTabWidget, QWidget, QSpinBox,
+                                 QListWidget, QListWidgetItem, QComboBox, QHBoxLayout, QCheckBox,
+                                 QApplication)
+from qgis.core import (Qgis, QgsProject, QgsMapLayer, QgsWkbTypes, QgsVectorLayer, QgsField, QgsFeature,
+                       QgsGeometry, QgsPointXY)
+from qgis import processing
+from .utils import show_message, get_economic_parameters, save_economic_parameters, ECONOMIC_PARAMETERS
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from ..providers.survcost_provider import COST_COMPONENTS, TEST_KEYWORDS, cost_scheme, load_scheme, scheme_quantities
+from ..providers.sensitivity_provider import SensitivityEngine, scheme_cost_model
+from ..providers.outcost_provider import IMPACT_COMPONENTS, OutbreakImpact, impact_parameter_names
+from ..providers.sample_size_provider import (freedom_sample_size, two_stage_sample_size, freedom_table,
+                                              prevalence_sample_size)
+from ..providers.scenario_tree_provider import (TREE_PROBABILITIES, PROBABILITY_LABELS, default_tree, evaluate_system,
+                                                periods_to_confidence, as_range)
+from ..providers.portfolio_provider import (OBJECTIVES, COST_BASES, CostCurves, candidates, optimise,
+                                             portfolio_summary, budget_frontier)
+from ..providers.density_provider import ANALYSIS_CRS
+from ..providers.logistics_provider import (DISTANCE_METHODS, DEFAULT_DETOUR_FACTOR, layer_locations, distances_for,
+                                            plan_routes, route_quantities)
+
+def cost_ranges():
+    """Ranges of the economic parameters of surveillance costs (outbreak impact parameters are not drawn)."""
+    ranges = get_economic_parameters(with_ranges=True)
+    impact_names = set(impact_parameter_names(ranges))
+    return {name: values for name, values in ranges.items() if name not in impact_names}
 
 # --- Helper Class for Wizard Pages ---
 class WizardPage(QWizardPage):
@@ -25,11 +53,13 @@ class WizardPage(QWizardPage):
         super(WizardPage, self).__init__(parent)
         self.setTitle(title)
         self.setSubTitle(subtitle)
+        self.widgets = {}
         layout = QFormLayout()
         for field_name, prompt_text in prompts:
             widget = QTextEdit()
             self.registerField(f"{field_name}*", widget, "plainText")
             layout.addRow(QLabel(prompt_text), widget)
+            self.widgets[field_name] = widget
         self.setLayout(layout)
 
 # --- Main Tools ---
@@ -49,12 +79,36 @@ class SurveillanceDesigner(QWizard):
             ("number_units", "7. Number of Units:"), ("frequency", "8. Frequency & Duration:"),
             ("data_recording", "9. Data Recording:")
         ]
-        page = WizardPage("Surveillance Scheme Details", "Complete all 9 elements for the surveillance plan.", prompts)
-        self.addPage(page)
+        self.page = WizardPage("Surveillance Scheme Details", "Complete all 9 elements for the surveillance plan.", prompts)
+        self.addPage(self.page)
+
+        # Structured sample sizes from the calculator, saved with the scheme for SURVCosT
+        self.quantities = {}
+        calculator_button = QPushButton("Sample Size Calculator...")
+        calculator_button.clicked.connect(self.open_calculator)
+        frame_button = QPushButton("Build Sampling Frame...")
+        frame_button.clicked.connect(self.open_sampling_frame)
+        # Rows after the inserted ones shift down, so the later element goes first
+        field_names = [field_name for field_name, _ in prompts]
+        self.page.layout().insertRow(field_names.index("number_units") + 1, QLabel(""), calculator_button)
+        self.page.layout().insertRow(field_names.index("unit_selection") + 1, QLabel(""), frame_button)
+
+    def open_calculator(self):
+        dialog = SampleSizeCalculatorDialog(self.iface, self)
+        if dialog.exec_() and dialog.design:
+            self.page.widgets["number_units"].setPlainText(dialog.design['text'])
+            self.quantities = dialog.design['quantities']
+
+    def open_sampling_frame(self):
+        results = processing.execAlgorithmDialog('eadst:sampling_frame')
+        if results and results.get('DESCRIPTION'):
+            self.page.widgets["unit_selection"].setPlainText(results['DESCRIPTION'])
 
     def accept(self):
         """Saves the collected wizard data to a JSON file."""
         scheme_data = {field.replace('*',''): self.field(field) for field in self.fieldNames()}
+        if self.quantities:
+            scheme_data['quantities'] = self.quantities
         filePath, _ = QFileDialog.getSaveFileName(self, "Save Surveillance Scheme", "", "EADST Scheme Files (*.eadss.json)")
         if filePath:
             try:
@@ -65,60 +119,1396 @@ class SurveillanceDesigner(QWizard):
                 show_message(self.iface, f"Failed to save scheme file: {e}", level=Qgis.Critical)
         super(SurveillanceDesigner, self).accept()
 
+class SampleSizeCalculatorDialog(QDialog):
+    """
+    Sample sizes for freedom from disease (one or two stages) and for
+    prevalence estimation, recalculated as the inputs change. "Use in
+    Scheme" hands the design back to the Surveillance Designer.
+    """
+    TABLE_POPULATIONS = [100, 500, 1000, 5000, 10000, None]
+    TABLE_PREVALENCES = [0.01, 0.02, 0.05, 0.10, 0.20]
+
+    def __init__(self, iface, parent=None):
+        super(SampleSizeCalculatorDialog, self).__init__(parent)
+        self.iface = iface
+        self.design = None
+        self.setWindowTitle("Surveillance Sample Size Calculator")
+        self.setMinimumSize(650, 550)
+
+        # Test and confidence settings shared by every design
+        self.se_spin = self.percent_spin(100.0)
+        self.sp_spin = self.percent_spin(100.0)
+        self.confidence_spin = self.percent_spin(95.0)
+        self.min_specificity_spin = self.percent_spin(95.0)
+        common = QFormLayout()
+        common.addRow("Test Sensitivity (%):", self.se_spin)
+        common.addRow("Test Specificity (%):", self.sp_spin)
+        common.addRow("Confidence (%):", self.confidence_spin)
+        common.addRow("Minimum Population Specificity (%):", self.min_specificity_spin)
+
+        self.tabs = QTabWidget()
+
+        freedom_tab = QWidget()
+        self.population_spin = self.count_spin(0)
+        self.prevalence_spin = self.percent_spin(2.0)
+        self.freedom_table = QTableWidget(len(self.TABLE_PREVALENCES), len(self.TABLE_POPULATIONS))
+        self.freedom_table.setHorizontalHeaderLabels([f"{population:,}" if population else "Infinite"
+                                                      for population in self.TABLE_POPULATIONS])
+        self.freedom_table.setVerticalHeaderLabels([f"{100 * prevalence:g}%" for prevalence in self.TABLE_PREVALENCES])
+        self.freedom_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        freedom_form = QFormLayout(freedom_tab)
+        freedom_form.addRow("Population Size (0 = Infinite):", self.population_spin)
+        freedom_form.addRow("Design Prevalence (%):", self.prevalence_spin)
+        freedom_form.addRow(QLabel("Sample sizes by design prevalence (rows) and population size (columns):"))
+        freedom_form.addRow(self.freedom_table)
+        self.tabs.addTab(freedom_tab, "Freedom from Disease")
+
+        two_stage_tab = QWidget()
+        self.herds_spin = self.count_spin(0)
+        self.herd_size_spin = self.count_spin(50)
+        self.herd_prevalence_spin = self.percent_spin(2.0)
+        self.animal_prevalence_spin = self.percent_spin(20.0)
+        self.herd_sensitivity_spin = self.percent_spin(95.0)
+        self.optimise_check = QCheckBox("Choose the herd sensitivity that minimises cost")
+        self.cost_herd_spin = QDoubleSpinBox()
+        self.cost_herd_spin.setRange(0, 1e6)
+        self.cost_herd_spin.setValue(60.0)
+        self.cost_animal_spin = QDoubleSpinBox()
+        self.cost_animal_spin.setRange(0, 1e6)
+        self.cost_animal_spin.setValue(6.0)
+        two_stage_form = QFormLayout(two_stage_tab)
+        two_stage_form.addRow("Number of Herds (0 = Infinite):", self.herds_spin)
+        two_stage_form.addRow("Animals per Herd:", self.herd_size_spin)
+        two_stage_form.addRow("Herd Design Prevalence (%):", self.herd_prevalence_spin)
+        two_stage_form.addRow("Within-Herd Design Prevalence (%):", self.animal_prevalence_spin)
+        two_stage_form.addRow("Target Herd Sensitivity (%):", self.herd_sensitivity_spin)
+        two_stage_form.addRow(self.optimise_check)
+        two_stage_form.addRow("Cost per Herd Visited (USD):", self.cost_herd_spin)
+        two_stage_form.addRow("Cost per Animal Tested (USD):", self.cost_animal_spin)
+        self.tabs.addTab(two_stage_tab, "Two-Stage Freedom (Herds and Animals)")
+
+        prevalence_tab = QWidget()
+        self.expected_spin = self.percent_spin(20.0)
+        self.precision_spin = self.percent_spin(5.0)
+        self.prevalence_population_spin = self.count_spin(0)
+        self.cluster_spin = self.count_spin(1)
+        self.cluster_spin.setMinimum(1)
+        self.icc_spin = QDoubleSpinBox()
+        self.icc_spin.setRange(0, 1)
+        self.icc_spin.setDecimals(3)
+        self.icc_spin.setSingleStep(0.01)
+        prevalence_form = QFormLayout(prevalence_tab)
+        prevalence_form.addRow("Expected Prevalence (%):", self.expected_spin)
+        prevalence_form.addRow("Precision (+/- %):", self.precision_spin)
+        prevalence_form.addRow("Population Size (0 = Infinite):", self.prevalence_population_spin)
+        prevalence_form.addRow("Animals per Cluster:", self.cluster_spin)
+        prevalence_form.addRow("Intra-Cluster Correlation:", self.icc_spin)
+        self.tabs.addTab(prevalence_tab, "Prevalence Estimation")
+
+        self.result_label = QLabel()
+        self.result_label.setWordWrap(True)
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Cancel)
+        self.use_button = self.button_box.addButton("Use in Scheme", QDialogButtonBox.AcceptRole)
+
+        layout = QVBoxLayout()
+        layout.addLayout(common)
+        layout.addWidget(self.tabs)
+        layout.addWidget(self.result_label)
+        layout.addWidget(self.button_box)
+        self.setLayout(layout)
+
+        for spin in [self.se_spin, self.sp_spin, self.confidence_spin, self.min_specificity_spin,
+                     self.population_spin, self.prevalence_spin, self.herds_spin, self.herd_size_spin,
+                     self.herd_prevalence_spin, self.animal_prevalence_spin, self.herd_sensitivity_spin,
+                     self.cost_herd_spin, self.cost_animal_spin, self.expected_spin, self.precision_spin,
+                     self.prevalence_population_spin, self.cluster_spin, self.icc_spin]:
+            spin.valueChanged.connect(self.recalculate)
+        self.optimise_check.toggled.connect(self.recalculate)
+        self.tabs.currentChanged.connect(self.recalculate)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+        self.recalculate()
+
+    def percent_spin(self, value):
+        spin = QDoubleSpinBox()
+        spin.setRange(0.01, 100.0)
+        spin.setDecimals(2)
+        spin.setValue(value)
+        return spin
+
+    def count_spin(self, value):
+        spin = QSpinBox()
+        spin.setRange(0, 10000000)
+        spin.setValue(value)
+        return spin
+
+    def common_inputs(self):
+        return (self.se_spin.value() / 100.0, self.sp_spin.value() / 100.0,
+                self.confidence_spin.value() / 100.0, self.min_specificity_spin.value() / 100.0)
+
+    def recalculate(self):
+        """Recomputes the design of the current tab; repeated inputs come from the provider's cache."""
+        se, sp, confidence, min_specificity = self.common_inputs()
+        self.design = None
+        try:
+            if self.tabs.currentIndex() == 0:
+                self.calculate_freedom(se, sp, confidence, min_specificity)
+            elif self.tabs.currentIndex() == 1:
+                self.calculate_two_stage(se, sp, confidence, min_specificity)
+            else:
+                self.calculate_prevalence(se, sp, confidence)
+        except Exception as e:
+            self.result_label.setText(f"Calculation failed: {e}")
+        self.use_button.setEnabled(self.design is not None)
+
+    def calculate_freedom(self, se, sp, confidence, min_specificity):
+        population = self.population_spin.value() or None
+        prevalence = self.prevalence_spin.value() / 100.0
+        result = freedom_sample_size(population, prevalence, se, sp, confidence, min_specificity)
+        if result is None:
+            self.result_label.setText("No sample size reaches the required confidence and specificity.")
+        else:
+            cutpoint = f", reading up to {result['cutpoint']} reactor(s) as free" if result['cutpoint'] else ""
+            self.result_label.setText(
+                f"Test <b>{result['n']:,}</b> units{cutpoint}. Population sensitivity "
+                f"{100 * result['sensitivity']:.1f}%, population specificity {100 * result['specificity']:.1f}% "
+                f"({result['method']}).")
+            self.design = {'text': f"{result['n']} units, 1 sample per unit (freedom from disease at "
+                                   f"{100 * prevalence:g}% design prevalence, {100 * confidence:g}% confidence, "
+                                   f"cut-point {result['cutpoint']})",
+                           'quantities': {'units': result['n'], 'samples_per_unit': 1}}
+
+        table = freedom_table(self.TABLE_POPULATIONS, self.TABLE_PREVALENCES, se, sp, confidence, min_specificity)
+        for row, prevalence in enumerate(self.TABLE_PREVALENCES):
+            for column, population in enumerate(self.TABLE_POPULATIONS):
+                n = table[(population, prevalence)]
+                self.freedom_table.setItem(row, column, QTableWidgetItem("-" if n is None else f"{n:,}"))
+
+    def calculate_two_stage(self, se, sp, confidence, min_specificity):
+        optimise = self.optimise_check.isChecked()
+        self.herd_sensitivity_spin.setEnabled(not optimise)
+        self.cost_herd_spin.setEnabled(optimise)
+        self.cost_animal_spin.setEnabled(optimise)
+        result = two_stage_sample_size(
+            self.herds_spin.value() or None, self.herd_size_spin.value(), self.herd_prevalence_spin.value() / 100.0,
+            self.animal_prevalence_spin.value() / 100.0, se, sp, confidence,
+            self.herd_sensitivity_spin.value() / 100.0, min_specificity,
+            self.cost_herd_spin.value() if optimise else None, self.cost_animal_spin.value() if optimise else None)
+        if result is None:
+            self.result_label.setText("No design reaches the required confidence and specificity.")
+            return
+        self.result_label.setText(
+            f"Sample <b>{result['herds']:,}</b> herds and <b>{result['animals_per_herd']}</b> animals per herd "
+            f"({result['total_animals']:,} animals), reading a herd as positive above {result['cutpoint']} "
+            f"reactor(s). Herd sensitivity {100 * result['herd_sensitivity']:.1f}%, herd specificity "
+            f"{100 * result['herd_specificity']:.1f}%; system sensitivity {100 * result['sensitivity']:.1f}%, "
+            f"system specificity {100 * result['specificity']:.1f}%.")
+        self.design = {'text': f"{result['herds']} herds, {result['animals_per_herd']} animals per herd "
+                               f"(two-stage freedom from disease, {100 * confidence:g}% confidence)",
+                       'quantities': {'units': result['herds'], 'samples_per_unit': result['animals_per_herd']}}
+
+    def calculate_prevalence(self, se, sp, confidence):
+        cluster_size = self.cluster_spin.value()
+        result = prevalence_sample_size(self.expected_spin.value() / 100.0, self.precision_spin.value() / 100.0,
+                                        confidence, self.prevalence_population_spin.value() or None, se, sp,
+                                        cluster_size, self.icc_spin.value())
+        if result is None:
+            self.result_label.setText("The test cannot estimate prevalence (sensitivity + specificity must exceed 100%).")
+            return
+        self.result_label.setText(
+            f"Sample <b>{result['n']:,}</b> animals in {result['clusters']:,} clusters of {cluster_size} "
+            f"(design effect {result['design_effect']:.2f}).")
+        self.design = {'text': f"{result['clusters']} units, {cluster_size} animals per unit (prevalence of "
+                               f"{self.expected_spin.value():g}% +/- {self.precision_spin.value():g}%, "
+                               f"{100 * confidence:g}% confidence)",
+                       'quantities': {'units': result['clusters'], 'samples_per_unit': cluster_size}}
+
 class SURVCosTDialog(QDialog):
-    """Dialog to calculate the cost of a surveillance scheme."""
+    """Dialog to calculate the cost of a surveillance scheme, with Monte Carlo uncertainty."""
     def __init__(self, iface, parent=None):
         super(SURVCosTDialog, self).__init__(parent)
         self.iface = iface
+        self.scheme = None
+        self.logistics = {}
         self.setWindowTitle("SURVCosT - Surveillance Program Costing")
-        self.setMinimumSize(500, 300)
+        self.setMinimumSize(650, 500)
 
         self.load_button = QPushButton("Load Surveillance Scheme (.eadss.json)...")
+        self.scheme_label = QLabel("No scheme loaded.")
+
+        self.units_spin = QSpinBox()
+        self.units_spin.setRange(0, 1000000)
+        self.samples_spin = QSpinBox()
+        self.samples_spin.setRange(1, 100000)
+        self.rounds_spin = QDoubleSpinBox()
+        self.rounds_spin.setRange(1, 1000)
+        self.rounds_spin.setDecimals(0)
+        self.tests_list = QListWidget()
+        self.tests_list.setMaximumHeight(110)
+        for name in TEST_KEYWORDS:
+            item = QListWidgetItem(ECONOMIC_PARAMETERS[name][0])
+            item.setData(Qt.UserRole, name)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Unchecked)
+            self.tests_list.addItem(item)
+        self.draws_spin = QSpinBox()
+        self.draws_spin.setRange(1000, 1000000)
+        self.draws_spin.setSingleStep(10000)
+        self.draws_spin.setValue(100000)
+        self.seed_spin = QSpinBox()
+        self.seed_spin.setRange(0, 2**31 - 1)
+        self.seed_spin.setValue(12345)
+
+        form = QFormLayout()
+        form.addRow("Units Sampled per Round:", self.units_spin)
+        form.addRow("Samples per Unit:", self.samples_spin)
+        form.addRow("Sampling Rounds:", self.rounds_spin)
+        form.addRow("Laboratory Tests:", self.tests_list)
+        form.addRow("Monte Carlo Draws:", self.draws_spin)
+        form.addRow("Random Seed:", self.seed_spin)
+
+        self.logistics_button = QPushButton("Plan Field Logistics...")
+        self.logistics_button.setEnabled(False)
+        self.logistics_label = QLabel("Travel: per-unit assumptions (km and units per team day).")
+        logistics_row = QHBoxLayout()
+        logistics_row.addWidget(self.logistics_label, 1)
+        logistics_row.addWidget(self.logistics_button)
+        form.addRow("Field Logistics:", logistics_row)
+
+        self.calculate_button = QPushButton("Calculate Cost")
+        self.calculate_button.setEnabled(False)
+        self.sensitivity_button = QPushButton("Sensitivity Analysis...")
+        self.sensitivity_button.setEnabled(False)
         self.result_table = QTableWidget()
-        self.result_table.setColumnCount(2)
-        self.result_table.setHorizontalHeaderLabels(["Cost Component", "Estimated Cost (USD)"])
+        self.result_table.setColumnCount(5)
+        self.result_table.setHorizontalHeaderLabels(["Cost Component", "Mean (USD)", "5th Percentile",
+                                                     "Median", "95th Percentile"])
+        self.result_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
 
         layout = QVBoxLayout()
         layout.addWidget(self.load_button)
+        layout.addWidget(self.scheme_label)
+        layout.addLayout(form)
+        layout.addWidget(self.calculate_button)
         layout.addWidget(self.result_table)
+        layout.addWidget(self.sensitivity_button)
         self.setLayout(layout)
 
-        self.load_button.clicked.connect(self.calculate_cost)
+        self.load_button.clicked.connect(self.load_scheme)
+        self.calculate_button.clicked.connect(self.calculate_cost)
+        self.sensitivity_button.clicked.connect(self.open_sensitivity)
+        self.logistics_button.clicked.connect(self.open_logistics)
 
-    def calculate_cost(self):
+    def load_scheme(self):
         filePath, _ = QFileDialog.getOpenFileName(self, "Load Surveillance Scheme", "", "EADST Scheme Files (*.eadss.json)")
         if not filePath: return
-        
-        try:
-            with open(filePath, 'r') as f:
-                scheme_data = json.load(f)
-            
-            # This is a mock calculation. A real implementation would parse the scheme_data
-            # to get sample sizes, duration, etc.
-            params = get_economic_parameters()
-            personnel_cost = 10 * params.get('staff_daily_rate', 40.0) # 10 staff days
-            logistics_cost = 500 * params.get('cost_per_km', 0.50) # 500 km travel
-            lab_cost = 200 * params.get('cost_elisa_test', 5.0) # 200 ELISA tests
-            total_cost = personnel_cost + logistics_cost + lab_cost
-
-            self.result_table.setRowCount(4)
-            self.result_table.setItem(0, 0, QTableWidgetItem("Personnel Costs"))
-            self.result_table.setItem(0, 1, QTableWidgetItem(f"{personnel_cost:,.2f}"))
-            self.result_table.setItem(1, 0, QTableWidgetItem("Logistics Costs"))
-            self.result_table.setItem(1, 1, QTableWidgetItem(f"{logistics_cost:,.2f}"))
-            self.result_table.setItem(2, 0, QTableWidgetItem("Laboratory Costs"))
-            self.result_table.setItem(2, 1, QTableWidgetItem(f"{lab_cost:,.2f}"))
-            self.result_table.setItem(3, 0, QTableWidgetItem("Total Estimated Cost"))
-            self.result_table.setItem(3, 1, QTableWidgetItem(f"{total_cost:,.2f}"))
-            self.result_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
 
+        try:
+            self.scheme = load_scheme(filePath)
         except Exception as e:
             show_message(self.iface, f"Could not process scheme file: {e}", level=Qgis.Critical)
+            return
+        quantities = scheme_quantities(self.scheme)
+        self.units_spin.setValue(int(quantities['units']))
+        self.samples_spin.setValue(int(quantities['samples_per_unit']))
+        self.rounds_spin.setValue(quantities['rounds'])
+        for row in range(self.tests_list.count()):
+            item = self.tests_list.item(row)
+            item.setCheckState(Qt.Checked if item.data(Qt.UserRole) in quantities['tests'] else Qt.Unchecked)
+        self.scheme_label.setText(f"Scheme: {os.path.basename(filePath)} (quantities read from the scheme; adjust if needed)")
+        self.set_logistics({})
+        self.calculate_button.setEnabled(True)
+        self.sensitivity_button.setEnabled(True)
+        self.logistics_button.setEnabled(True)
+        self.calculate_cost()
+
+    def quantities(self):
+        """The scheme quantities as currently set in the dialog."""
+        quantities = scheme_quantities(self.scheme)
+        quantities.update({
+            'units': self.units_spin.value(),
+            'samples_per_unit': self.samples_spin.value(),
+            'rounds': self.rounds_spin.value(),
+            'tests': [self.tests_list.item(row).data(Qt.UserRole) for row in range(self.tests_list.count())
+                      if self.tests_list.item(row).checkState() == Qt.Checked],
+        })
+        quantities.update(self.logistics)
+        return quantities
+
+    def set_logistics(self, logistics):
+        """Uses the km and team days of a route plan (empty for the per-unit assumptions)."""
+        self.logistics = logistics
+        if logistics:
+            self.logistics_label.setText(f"Travel: {logistics['km_per_round']:,.0f} km and "
+                                         f"{logistics['team_days_per_round']:,.0f} team days per round (route plan).")
+        else:
+            self.logistics_label.setText("Travel: per-unit assumptions (km and units per team day).")
+
+    def open_logistics(self):
+        dialog = LogisticsDialog(self.iface, parent=self)
+        if dialog.exec_() and dialog.plan is not None:
+            self.units_spin.setValue(dialog.plan['units'])
+            self.set_logistics(route_quantities(dialog.plan['trips']))
+            self.calculate_cost()
+
+    def calculate_cost(self):
+        _, summary = cost_scheme(self.scheme, cost_ranges(), self.quantities(),
+                                 n_draws=self.draws_spin.value(), seed=self.seed_spin.value())
+        if summary is None:
+            show_message(self.iface, "Costing failed. Check the log for details.", level=Qgis.Critical)
+            return
+
+        self.result_table.setRowCount(len(summary))
+        for row, (component, values) in enumerate(summary.iterrows()):
+            label = "Total Estimated Cost" if component == 'Total' else f"{component} Costs"
+            self.result_table.setItem(row, 0, QTableWidgetItem(label))
+            for column, name in enumerate(['Mean', 'P5', 'P50', 'P95'], start=1):
+                self.result_table.setItem(row, column, QTableWidgetItem(f"{values[name]:,.2f}"))
+
+    def open_sensitivity(self):
+        model = functools.partial(scheme_cost_model, self.quantities())
+        SensitivityDialog(self.iface, model, COST_COMPONENTS, "SURVCosT", list(cost_ranges()), parent=self).exec_()
+
+class LogisticsDialog(QDialog):
+    """
+    Dialog to plan the field trips of a sampling round: every site (e.g. the
+    units of a sampling frame) is assigned to its nearest depot (veterinary
+    office or laboratory) and visited on day trips, whose km and number give
+    the travel of SURVCosT.
+    """
+    def __init__(self, iface, parent=None):
+        super(LogisticsDialog, self).__init__(parent)
+        self.iface = iface
+        self.plan = None
+        self.setWindowTitle("Field Logistics - Route Planning")
+        self.setMinimumSize(750, 600)
+
+        self.sites_combo = QComboBox()
+        self.depots_combo = QComboBox()
+        self.road_combo = QComboBox()
+        for layer in self.iface.mapCanvas().layers():
+            if layer.type() != QgsMapLayer.VectorLayer:
+                continue
+            geometry = layer.geometryType()
+            if geometry in (QgsWkbTypes.PointGeometry, QgsWkbTypes.PolygonGeometry):
+                self.sites_combo.addItem(layer.name(), layer)
+            if geometry == QgsWkbTypes.PointGeometry:
+                self.depots_combo.addItem(layer.name(), layer)
+            elif geometry == QgsWkbTypes.LineGeometry:
+                self.road_combo.addItem(layer.name(), layer)
+        self.sites_name_combo = QComboBox()
+        self.depots_name_combo = QComboBox()
+        self.method_combo = QComboBox()
+        self.method_combo.addItems(DISTANCE_METHODS)
+        self.method_combo.setCurrentText('Projected (EPSG:20137)')
+        self.detour_spin = QDoubleSpinBox()
+        self.detour_spin.setRange(1.0, 3.0)
+        self.detour_spin.setSingleStep(0.05)
+        self.detour_spin.setValue(DEFAULT_DETOUR_FACTOR)
+        self.per_day_spin = QSpinBox()
+        self.per_day_spin.setRange(1, 50)
+        self.per_day_spin.setValue(max(1, int(round(get_economic_parameters()['units_per_team_day']))))
+        self.max_km_spin = QSpinBox()
+        self.max_km_spin.setRange(0, 2000)
+        self.max_km_spin.setSingleStep(50)
+        self.max_km_spin.setSpecialValueText("No limit")
+        self.routes_check = QCheckBox("Add the trips to the map")
+        self.routes_check.setChecked(True)
+
+        form = QFormLayout()
+        form.addRow("Sampling Sites:", self.sites_combo)
+        form.addRow("Site Name Field:", self.sites_name_combo)
+        form.addRow("Depots (Offices, Labs):", self.depots_combo)
+        form.addRow("Depot Name Field:", self.depots_name_combo)
+        form.addRow("Distance Method:", self.method_combo)
+        form.addRow("Road Network Layer:", self.road_combo)
+        form.addRow("Detour Factor:", self.detour_spin)
+        form.addRow("Sites per Team Day:", self.per_day_spin)
+        form.addRow("Max km per Team Day:", self.max_km_spin)
+        form.addRow("", self.routes_check)
+
+        self.plan_button = QPushButton("Plan Routes")
+        self.summary_label = QLabel("")
+        self.summary_label.setWordWrap(True)
+        self.depot_table = QTableWidget()
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.button_box.button(QDialogButtonBox.Ok).setText("Use in Costing")
+        self.button_box.button(QDialogButtonBox.Ok).setEnabled(False)
+
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addWidget(self.plan_button)
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.depot_table, 1)
+        layout.addWidget(self.button_box)
+        self.setLayout(layout)
+
+        self.sites_combo.currentIndexChanged.connect(
+            lambda: self.update_name_fields(self.sites_combo, self.sites_name_combo))
+        self.depots_combo.currentIndexChanged.connect(
+            lambda: self.update_name_fields(self.depots_combo, self.depots_name_combo))
+        self.method_combo.currentIndexChanged.connect(self.update_method)
+        self.update_name_fields(self.sites_combo, self.sites_name_combo)
+        self.update_name_fields(self.depots_combo, self.depots_name_combo)
+        self.update_method()
+        self.plan_button.clicked.connect(self.plan_routes)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+
+    def update_name_fields(self, layer_combo, field_combo):
+        field_combo.clear()
+        field_combo.addItem("(Feature ID)", None)
+        layer = layer_combo.currentData()
+        if layer:
+            for field in layer.fields():
+                field_combo.addItem(field.name(), field.name())
+
+    def update_method(self):
+        road = self.method_combo.currentText() == 'Road network'
+        self.road_combo.setEnabled(road)
+        # Straight-line distances are scaled to road km; on a network it only applies to sites off the roads
+        self.detour_spin.setToolTip("Road km per straight-line km" + (" for sites off the network" if road else ""))
+
+    def plan_routes(self):
+        sites_layer, depots_layer = self.sites_combo.currentData(), self.depots_combo.currentData()
+        method = self.method_combo.currentText()
+        if not sites_layer or not depots_layer:
+            show_message(self.iface, "A sampling site layer and a depot point layer must be selected.", level=Qgis.Warning)
+            return
+        if method == 'Road network' and not self.road_combo.currentData():
+            show_message(self.iface, "Select a line layer of roads for the road network method.", level=Qgis.Warning)
+            return
+
+        trips = None
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            sites = layer_locations(sites_layer, self.sites_name_combo.currentData())
+            depots = layer_locations(depots_layer, self.depots_name_combo.currentData())
+            if sites.empty or depots.empty:
+                show_message(self.iface, "The site and depot layers must both have features.", level=Qgis.Warning)
+                return
+            distances = distances_for(method, self.detour_spin.value(), self.road_combo.currentData())
+            trips, assigned = plan_routes(depots, sites, distances, self.per_day_spin.value(),
+                                          self.max_km_spin.value() or None)
+        except Exception as e:
+            show_message(self.iface, f"Route planning failed: {e}", level=Qgis.Critical)
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if trips is None:
+            show_message(self.iface, "Route planning failed. See the Python console for details.", level=Qgis.Critical)
+            return
+        self.plan = {'units': len(sites), 'trips': trips, 'sites': assigned}
+        self.show_plan(trips, distances.n_computed)
+        if self.routes_check.isChecked():
+            self.create_routes_layer(trips)
+        self.button_box.button(QDialogButtonBox.Ok).setEnabled(True)
+
+    def show_plan(self, trips, n_computed):
+        quantities = route_quantities(trips)
+        self.summary_label.setText(
+            f"{trips['n_sites'].sum()} sites visited on {len(trips)} team days ({quantities['km_per_round']:,.0f} km) "
+            f"per round from {trips['depot'].nunique()} depots. Distances computed for {n_computed} new locations; "
+            f"the others were read from the cache.")
+        per_depot = trips.groupby('depot').agg(Sites=('n_sites', 'sum'), Trips=('trip', 'count'), Km=('km', 'sum'),
+                                               Longest=('km', 'max')).sort_values('Km', ascending=False)
+        headers = ["Depot", "Sites", "Team Days", "Total km", "Longest Trip (km)"]
+        self.depot_table.setRowCount(len(per_depot))
+        self.depot_table.setColumnCount(len(headers))
+        self.depot_table.setHorizontalHeaderLabels(headers)
+        for row, (depot, values) in enumerate(per_depot.iterrows()):
+            items = [str(depot), f"{values['Sites']:,.0f}", f"{values['Trips']:,.0f}", f"{values['Km']:,.1f}",
+                     f"{values['Longest']:,.1f}"]
+            for column, text in enumerate(items):
+                self.depot_table.setItem(row, column, QTableWidgetItem(text))
+        self.depot_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+    def create_routes_layer(self, trips):
+        """Adds the day trips, as lines through their stops (in EPSG:20137), to a new memory layer."""
+        layer = QgsVectorLayer(f"LineString?crs={ANALYSIS_CRS}", "Field_Trips", "memory")
+        provider = layer.dataProvider()
+        provider.addAttributes([
+            QgsField("Depot", QVariant.String), QgsField("Trip", QVariant.Int), QgsField("N_Sites", QVariant.Int),
+            QgsField("Km", QVariant.Double), QgsField("Sites", QVariant.String)
+        ])
+        layer.updateFields()
+
+        features = []
+        for row in trips.itertuples():
+            feat = QgsFeature(layer.fields())
+            feat.setGeometry(QgsGeometry.fromPolylineXY([QgsPointXY(x, y) for x, y in row.path]))
+            feat.setAttributes([str(row.depot), int(row.trip), int(row.n_sites), float(row.km), row.sites])
+            features.append(feat)
+        provider.addFeatures(features)
+        layer.updateExtents()
+        QgsProject.instance().addMapLayer(layer)
+
+class SensitivityDialog(QDialog):
+    """
+    One-way, two-way and tornado sensitivity of an economic model (a
+    scheme's cost or an outbreak's impact) to the economic parameters.
+    Sweep ranges default to the parameter database and can be changed here
+    without saving them.
+
+    :param model_factory: Function of an output component returning a
+        model for SensitivityEngine.
+    :param components: Output components to choose from.
+    :param title: Name of the tool, for the window title.
+    :param parameters: Parameters that can be swept (all by default).
+    """
+    ANALYSES = ["Tornado", "One-Way", "Two-Way (Heat Map)"]
+
+    def __init__(self, iface, model_factory, components, title, parameters=None, parent=None):
+        super(SensitivityDialog, self).__init__(parent)
+        self.iface = iface
+        self.model_factory = model_factory
+        self.engines = {}
+        self.setWindowTitle(f"{title} - Sensitivity Analysis")
+        self.setMinimumSize(1000, 650)
+
+        ranges = get_economic_parameters(with_ranges=True)
+        self.base = {name: values[0] for name, values in ranges.items()}
+        # Only parameters with a range are swept
+        self.swept = sorted(name for name, (_, low, high) in ranges.items()
+                            if high > low and (parameters is None or name in parameters))
+
+        self.range_table = QTableWidget(len(self.swept), 3)
+        self.range_table.setHorizontalHeaderLabels(["Parameter", "Low", "High"])
+        self.range_widgets = {}
+        for row, name in enumerate(self.swept):
+            self.range_table.setItem(row, 0, QTableWidgetItem(ECONOMIC_PARAMETERS.get(name, (name,))[0]))
+            spin_boxes = []
+            for column, value in enumerate(ranges[name][1:], start=1):
+                spin_box = QDoubleSpinBox()
+                spin_box.setDecimals(2)
+                spin_box.setMaximum(1e12)
+                spin_box.setValue(value)
+                self.range_table.setCellWidget(row, column, spin_box)
+                spin_boxes.append(spin_box)
+            self.range_widgets[name] = spin_boxes
+        self.range_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        self.analysis_combo = QComboBox()
+        self.analysis_combo.addItems(self.ANALYSES)
+        self.output_combo = QComboBox()
+        self.output_combo.addItems(components)
+        self.output_combo.setCurrentText('Total')
+        self.param_x_combo = QComboBox()
+        self.param_y_combo = QComboBox()
+        for combo in (self.param_x_combo, self.param_y_combo):
+            for name in self.swept:
+                combo.addItem(ECONOMIC_PARAMETERS.get(name, (name,))[0], name)
+        if len(self.swept) > 1:
+            self.param_y_combo.setCurrentIndex(1)
+        self.points_spin = QSpinBox()
+        self.points_spin.setRange(3, 500)
+        self.points_spin.setValue(50)
+
+        form = QFormLayout()
+        form.addRow("Analysis:", self.analysis_combo)
+        form.addRow("Output Component:", self.output_combo)
+        form.addRow("Parameter (X):", self.param_x_combo)
+        form.addRow("Parameter (Y):", self.param_y_combo)
+        form.addRow("Points per Parameter:", self.points_spin)
+        self.plot_button = QPushButton("Plot")
+
+        self.figure = Figure(figsize=(7, 5))
+        self.canvas = FigureCanvasQTAgg(self.figure)
+
+        controls = QVBoxLayout()
+        controls.addWidget(self.range_table)
+        controls.addLayout(form)
+        controls.addWidget(self.plot_button)
+        main_layout = QHBoxLayout()
+        main_layout.addLayout(controls, 2)
+        main_layout.addWidget(self.canvas, 3)
+        self.setLayout(main_layout)
+
+        self.plot_button.clicked.connect(self.plot)
+        self.analysis_combo.currentIndexChanged.connect(self.plot)
+        self.output_combo.currentIndexChanged.connect(self.plot)
+        self.plot()
+
+    def engine(self):
+        """The sweep engine of the selected output component (each keeps its own cache)."""
+        component = self.output_combo.currentText()
+        if component not in self.engines:
+            self.engines[component] = SensitivityEngine(self.model_factory(component), self.base)
+        return self.engines[component]
+
+    def sweep_range(self, name):
+        low, high = (spin_box.value() for spin_box in self.range_widgets[name])
+        return np.linspace(low, high, self.points_spin.value())
+
+    def label(self, name):
+        return ECONOMIC_PARAMETERS.get(name, (name,))[0]
+
+    def plot(self):
+        if not self.swept:
+            return
+        engine = self.engine()
+        component = self.output_combo.currentText()
+        analysis = self.analysis_combo.currentText()
+        name_x, name_y = self.param_x_combo.currentData(), self.param_y_combo.currentData()
+        base_output = engine.base_output()
+
+        self.figure.clear()
+        ax = self.figure.add_subplot(111)
+        if analysis == "Tornado":
+            ranges = {name: tuple(spin_box.value() for spin_box in self.range_widgets[name]) for name in self.swept}
+            tornado = engine.tornado(ranges)
+            # Parameters the output does not depend on (e.g. tests the scheme does not use) are left out
+            tornado = tornado[tornado['swing'] > 0].iloc[::-1]
+            positions = np.arange(len(tornado))
+            ax.barh(positions, tornado['output_low'] - base_output, left=base_output, color='#2c7bb6', label='Low value')
+            ax.barh(positions, tornado['output_high'] - base_output, left=base_output, color='#d7191c', label='High value')
+            ax.axvline(base_output, color='black', linewidth=1)
+            ax.set_yticks(positions)
+            ax.set_yticklabels([self.label(name) for name in tornado.index], fontsize=8)
+            ax.set_xlabel(f"{component} (USD)")
+            ax.tick_params(axis='x', labelrotation=30)
+            ax.legend(loc='lower right')
+        elif analysis == "One-Way":
+            sweep = engine.one_way(name_x, self.sweep_range(name_x))
+            ax.plot(sweep['value'], sweep['output'], color='#d7191c')
+            ax.axvline(self.base[name_x], color='grey', linestyle='--', linewidth=1)
+            ax.axhline(base_output, color='grey', linestyle='--', linewidth=1)
+            ax.set_xlabel(self.label(name_x))
+            ax.set_ylabel(f"{component} (USD)")
+        else:
+            if name_x == name_y:
+                show_message(self.iface, "Choose two different parameters for a two-way analysis.", level=Qgis.Warning)
+                return
+            grid = engine.two_way(name_x, self.sweep_range(name_x), name_y, self.sweep_range(name_y))
+            mesh = ax.pcolormesh(grid.columns, grid.index, grid.to_numpy(), shading='auto', cmap='YlOrRd')
+            ax.plot(self.base[name_x], self.base[name_y], marker='+', color='black', markersize=12)
+            self.figure.colorbar(mesh, ax=ax, label=f"{component} (USD)")
+            ax.set_xlabel(self.label(name_x))
+            ax.set_ylabel(self.label(name_y))
+        ax.set_title(f"{analysis}: {component}")
+        self.figure.tight_layout()
+        self.canvas.draw()
 
 class OutCosTDialog(QDialog):
-    # ... (Implementation as defined in previous response) ...
-    # This remains a good placeholder structure.
-    pass
+    """
+    Dialog to assess the economic impact of the outbreaks of a layer, per
+    outbreak, admin unit and species, with Monte Carlo uncertainty of the
+    national total.
+    """
+    LEVELS = ["Woredas", "Zones", "Regions", "Species", "Outbreaks"]
+    LABELS = {'Control': "Control Costs", 'Total': "Total Impact"}
+
+    def __init__(self, iface, parent=None):
+        super(OutCosTDialog, self).__init__(parent)
+        self.iface = iface
+        self.impact = None
+        self.params = None
+        self.setWindowTitle("OutCosT - Outbreak Impact Assessment")
+        self.setMinimumSize(900, 700)
+
+        self.layer_combo = QComboBox()
+        for layer in self.iface.mapCanvas().layers():
+            if layer.type() == QgsMapLayer.VectorLayer and layer.geometryType() == QgsWkbTypes.PointGeometry:
+                self.layer_combo.addItem(layer.name(), layer)
+        self.date_field_combo = QComboBox()
+        self.level_combo = QComboBox()
+        self.level_combo.addItems(self.LEVELS)
+        self.draws_spin = QSpinBox()
+        self.draws_spin.setRange(1000, 1000000)
+        self.draws_spin.setSingleStep(10000)
+        self.draws_spin.setValue(100000)
+        self.seed_spin = QSpinBox()
+        self.seed_spin.setRange(0, 2**31 - 1)
+        self.seed_spin.setValue(12345)
+
+        form = QFormLayout()
+        form.addRow("Outbreak Layer:", self.layer_combo)
+        form.addRow("Date Field:", self.date_field_combo)
+        form.addRow("Monte Carlo Draws:", self.draws_spin)
+        form.addRow("Random Seed:", self.seed_spin)
+
+        self.calculate_button = QPushButton("Calculate Impact")
+        self.national_table = QTableWidget()
+        self.national_table.setColumnCount(5)
+        self.national_table.setHorizontalHeaderLabels(["Impact Component", "Mean (USD)", "5th Percentile",
+                                                       "Median", "95th Percentile"])
+        self.national_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.level_table = QTableWidget()
+        self.sensitivity_button = QPushButton("Sensitivity Analysis...")
+        self.export_button = QPushButton("Export Table...")
+        for button in (self.sensitivity_button, self.export_button):
+            button.setEnabled(False)
+
+        level_row = QHBoxLayout()
+        level_row.addWidget(QLabel("Show Impact by:"))
+        level_row.addWidget(self.level_combo, 1)
+        level_row.addWidget(self.export_button)
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addWidget(self.calculate_button)
+        layout.addWidget(QLabel("National impact:"))
+        layout.addWidget(self.national_table, 1)
+        layout.addLayout(level_row)
+        layout.addWidget(self.level_table, 2)
+        layout.addWidget(self.sensitivity_button)
+        self.setLayout(layout)
+
+        self.layer_combo.currentIndexChanged.connect(self.update_fields)
+        self.update_fields()
+        self.calculate_button.clicked.connect(self.calculate_impact)
+        self.level_combo.currentIndexChanged.connect(self.show_level)
+        self.sensitivity_button.clicked.connect(self.open_sensitivity)
+        self.export_button.clicked.connect(self.export_table)
+
+    def update_fields(self):
+        self.date_field_combo.clear()
+        layer = self.layer_combo.currentData()
+        if layer:
+            for field in layer.fields():
+                if field.isDate() or field.isDateTime():
+                    self.date_field_combo.addItem(field.name())
+        self.impact = None
+
+    def calculate_impact(self):
+        layer = self.layer_combo.currentData()
+        date_field = self.date_field_combo.currentText()
+        if not layer or not date_field:
+            show_message(self.iface, "An outbreak point layer and a date field must be selected.", level=Qgis.Warning)
+            return
+        if self.impact is None or self.impact.date_field != date_field:
+            self.impact = OutbreakImpact(layer, date_field)
+
+        summary = None
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            n_outbreaks = self.impact.load()
+            if n_outbreaks:
+                ranges = get_economic_parameters(with_ranges=True)
+                self.params = {name: values[0] for name, values in ranges.items()}
+                summary = self.impact.national_uncertainty(ranges, self.draws_spin.value(), self.seed_spin.value())
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if n_outbreaks is None or (n_outbreaks and summary is None):
+            show_message(self.iface, "Impact assessment failed. See the Python console for details.", level=Qgis.Critical)
+            return
+        if n_outbreaks == 0:
+            show_message(self.iface, "No dated outbreak records found in the layer.", level=Qgis.Warning)
+            return
+
+        self.national_table.setRowCount(len(summary))
+        for row, (component, values) in enumerate(summary.iterrows()):
+            label = self.LABELS.get(component, f"{component} Losses")
+            self.national_table.setItem(row, 0, QTableWidgetItem(label))
+            for column, name in enumerate(['Mean', 'P5', 'P50', 'P95'], start=1):
+                self.national_table.setItem(row, column, QTableWidgetItem(f"{values[name]:,.0f}"))
+        self.show_level()
+        self.sensitivity_button.setEnabled(True)
+        self.export_button.setEnabled(True)
+
+    def level_table_data(self):
+        """Impact at the selected level for the most likely parameter values (cached by the provider)."""
+        level = self.level_combo.currentText()
+        if level == "Outbreaks":
+            return self.impact.outbreak_impact(self.params)
+        return self.impact.impact(self.params, level).reset_index()
+
+    def show_level(self):
+        if self.params is None:
+            return
+        table = self.level_table_data()
+        self.level_table.clear()
+        self.level_table.setRowCount(len(table))
+        self.level_table.setColumnCount(len(table.columns))
+        self.level_table.setHorizontalHeaderLabels([str(column).replace('_', ' ') for column in table.columns])
+        for column, name in enumerate(table.columns):
+            values = table[name].to_numpy()
+            is_number = name in IMPACT_COMPONENTS or name in ('Outbreaks', 'Cases', 'Pop_At_Risk')
+            for row, value in enumerate(values):
+                text = f"{value:,.0f}" if is_number else str(value)
+                self.level_table.setItem(row, column, QTableWidgetItem(text))
+        self.level_table.resizeColumnsToContents()
+
+    def open_sensitivity(self):
+        names = impact_parameter_names(self.params)
+        SensitivityDialog(self.iface, self.impact.model, IMPACT_COMPONENTS, "OutCosT", names, parent=self).exec_()
+
+    def export_table(self):
+        level = self.level_combo.currentText()
+        filePath, _ = QFileDialog.getSaveFileName(self, "Export Outbreak Impact", f"outbreak_impact_{level.lower()}.csv",
+                                                  "CSV Files (*.csv)")
+        if not filePath: return
+        try:
+            self.level_table_data().to_csv(filePath, index=False)
+            show_message(self.iface, f"Impact table saved to {filePath}", level=Qgis.Success)
+        except Exception as e:
+            show_message(self.iface, f"Failed to save impact table: {e}", level=Qgis.Critical)
+
+class SystemSensitivityDialog(QDialog):
+    """
+    Dialog to evaluate the sensitivity of a surveillance system made of one
+    or more components (schemes), each described by a scenario tree, and
+    the probability of freedom it demonstrates over time. Trees can be saved
+    back to their scheme files.
+    """
+    GROUP_HEADERS = ["Risk Group", "Relative Risk", "Proportion of Population", "Units Sampled",
+                     "Units in Group (0 = large)"]
+    SYSTEM_INPUTS = [('prior', "Prior probability of freedom", [0.5, 0.5, 0.5]),
+                     ('p_introduction', "Probability of introduction per period", [0.01, 0.01, 0.01])]
+
+    def __init__(self, iface, parent=None):
+        super(SystemSensitivityDialog, self).__init__(parent)
+        self.iface = iface
+        self.components = {}
+        self.paths = {}
+        self.current = None
+        self.result = None
+        self.setWindowTitle("Surveillance System Sensitivity (Scenario Trees)")
+        self.setMinimumSize(1100, 750)
+
+        self.component_list = QListWidget()
+        self.add_schemes_button = QPushButton("Add Schemes (.eadss.json)...")
+        self.add_component_button = QPushButton("Add Component")
+        self.remove_component_button = QPushButton("Remove Component")
+
+        self.probability_table = QTableWidget(0, 4)
+        self.probability_table.setHorizontalHeaderLabels(["Input", "Most Likely", "Minimum", "Maximum"])
+        self.probability_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.add_step_button = QPushButton("Add Detection Step")
+        self.remove_step_button = QPushButton("Remove Step")
+        self.animals_spin = QSpinBox()
+        self.animals_spin.setRange(1, 100000)
+        self.interval_spin = QSpinBox()
+        self.interval_spin.setRange(1, 120)
+        self.group_table = QTableWidget(0, len(self.GROUP_HEADERS))
+        self.group_table.setHorizontalHeaderLabels(self.GROUP_HEADERS)
+        self.group_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.add_group_button = QPushButton("Add Risk Group")
+        self.remove_group_button = QPushButton("Remove Risk Group")
+
+        self.system_table = QTableWidget(len(self.SYSTEM_INPUTS), 4)
+        self.system_table.setHorizontalHeaderLabels(["Input", "Most Likely", "Minimum", "Maximum"])
+        self.system_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.system_table.setMaximumHeight(90)
+        for row, (_, label, value) in enumerate(self.SYSTEM_INPUTS):
+            self.set_range_row(self.system_table, row, label, value)
+        self.periods_spin = QSpinBox()
+        self.periods_spin.setRange(1, 240)
+        self.periods_spin.setValue(12)
+        self.iterations_spin = QSpinBox()
+        self.iterations_spin.setRange(100, 1000000)
+        self.iterations_spin.setSingleStep(1000)
+        self.iterations_spin.setValue(10000)
+        self.seed_spin = QSpinBox()
+        self.seed_spin.setRange(0, 2**31 - 1)
+        self.seed_spin.setValue(12345)
+        self.target_spin = QDoubleSpinBox()
+        self.target_spin.setRange(0.5, 0.999)
+        self.target_spin.setDecimals(3)
+        self.target_spin.setSingleStep(0.01)
+        self.target_spin.setValue(0.95)
+
+        component_buttons = QHBoxLayout()
+        for button in (self.add_schemes_button, self.add_component_button, self.remove_component_button):
+            component_buttons.addWidget(button)
+        step_buttons = QHBoxLayout()
+        step_buttons.addWidget(self.add_step_button)
+        step_buttons.addWidget(self.remove_step_button)
+        group_buttons = QHBoxLayout()
+        group_buttons.addWidget(self.add_group_button)
+        group_buttons.addWidget(self.remove_group_button)
+        tree_form = QFormLayout()
+        tree_form.addRow("Animals Tested per Unit:", self.animals_spin)
+        tree_form.addRow("Periods between Rounds:", self.interval_spin)
+        system_form = QFormLayout()
+        system_form.addRow("Time Periods:", self.periods_spin)
+        system_form.addRow("Stochastic Iterations:", self.iterations_spin)
+        system_form.addRow("Random Seed:", self.seed_spin)
+        system_form.addRow("Target Probability of Freedom:", self.target_spin)
+
+        self.evaluate_button = QPushButton("Evaluate System")
+        self.save_button = QPushButton("Save Trees to Schemes")
+        self.summary_label = QLabel("")
+        self.summary_label.setWordWrap(True)
+        self.result_table = QTableWidget()
+        self.figure = Figure(figsize=(6, 4))
+        self.canvas = FigureCanvasQTAgg(self.figure)
+
+        tabs = QTabWidget()
+        tree_tab = QWidget()
+        tree_layout = QVBoxLayout()
+        tree_layout.addWidget(QLabel("Probabilities and detection steps:"))
+        tree_layout.addWidget(self.probability_table, 2)
+        tree_layout.addLayout(step_buttons)
+        tree_layout.addLayout(tree_form)
+        tree_layout.addWidget(QLabel("Risk groups:"))
+        tree_layout.addWidget(self.group_table, 1)
+        tree_layout.addLayout(group_buttons)
+        tree_tab.setLayout(tree_layout)
+        tabs.addTab(tree_tab, "Scenario Tree")
+        system_tab = QWidget()
+        system_layout = QVBoxLayout()
+        system_layout.addWidget(self.system_table)
+        system_layout.addLayout(system_form)
+        system_layout.addStretch()
+        system_tab.setLayout(system_layout)
+        tabs.addTab(system_tab, "System")
+
+        left = QVBoxLayout()
+        left.addWidget(QLabel("Surveillance components:"))
+        left.addWidget(self.component_list, 1)
+        left.addLayout(component_buttons)
+        left.addWidget(tabs, 3)
+        left.addWidget(self.evaluate_button)
+        left.addWidget(self.save_button)
+        right = QVBoxLayout()
+        right.addWidget(self.summary_label)
+        right.addWidget(self.result_table, 1)
+        right.addWidget(self.canvas, 2)
+        main_layout = QHBoxLayout()
+        main_layout.addLayout(left, 1)
+        main_layout.addLayout(right, 1)
+        self.setLayout(main_layout)
+
+        self.add_schemes_button.clicked.connect(self.add_schemes)
+        self.add_component_button.clicked.connect(lambda: self.add_component("Component", default_tree()))
+        self.remove_component_button.clicked.connect(self.remove_component)
+        self.component_list.currentTextChanged.connect(self.select_component)
+        self.add_step_button.clicked.connect(self.add_step)
+        self.remove_step_button.clicked.connect(self.remove_step)
+        self.add_group_button.clicked.connect(self.add_group)
+        self.remove_group_button.clicked.connect(
+            lambda: self.group_table.removeRow(self.group_table.currentRow()) if self.group_table.rowCount() > 1 else None)
+        self.evaluate_button.clicked.connect(self.evaluate)
+        self.save_button.clicked.connect(self.save_trees)
+        self.set_editor_enabled(False)
+
+    # --- Tree editor ---
+
+    @staticmethod
+    def set_range_row(table, row, label, value, label_editable=False):
+        item = QTableWidgetItem(label)
+        if not label_editable:
+            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+        table.setItem(row, 0, item)
+        for column, number in enumerate(as_range(value), start=1):
+            table.setItem(row, column, QTableWidgetItem(f"{number:g}"))
+
+    @staticmethod
+    def read_range_row(table, row):
+        """(most likely, minimum, maximum) of a row; raises ValueError for values outside 0-1."""
+        values = [float(table.item(row, column).text()) for column in (1, 2, 3)]
+        label = table.item(row, 0).text()
+        if not all(0.0 <= value <= 1.0 for value in values) or not values[1] <= values[0] <= values[2]:
+            raise ValueError(f"'{label}' needs probabilities with minimum <= most likely <= maximum.")
+        return values
+
+    def set_editor_enabled(self, enabled):
+        for widget in (self.probability_table, self.group_table, self.animals_spin, self.interval_spin,
+                       self.add_step_button, self.remove_step_button, self.add_group_button,
+                       self.remove_group_button, self.remove_component_button, self.evaluate_button,
+                       self.save_button):
+            widget.setEnabled(enabled)
+
+    def show_component(self, tree):
+        steps = tree.get('steps', {})
+        self.probability_table.setRowCount(len(TREE_PROBABILITIES) + len(steps))
+        for row, name in enumerate(TREE_PROBABILITIES):
+            self.set_range_row(self.probability_table, row, PROBABILITY_LABELS[name], tree[name])
+        for row, (step, value) in enumerate(steps.items(), start=len(TREE_PROBABILITIES)):
+            self.set_range_row(self.probability_table, row, step, value, label_editable=True)
+        self.animals_spin.setValue(int(tree.get('animals_per_unit', 1)))
+        self.interval_spin.setValue(int(tree.get('interval', 1)))
+        self.group_table.setRowCount(len(tree['groups']))
+        for row, group in enumerate(tree['groups']):
+            values = [group['name'], group['relative_risk'], group['proportion'], group['sampled'],
+                      group.get('population', 0)]
+            for column, value in enumerate(values):
+                self.group_table.setItem(row, column, QTableWidgetItem(f"{value:g}" if column else str(value)))
+
+    def read_component(self):
+        """The tree in the editor; raises ValueError for invalid entries."""
+        tree = {name: self.read_range_row(self.probability_table, row) for row, name in enumerate(TREE_PROBABILITIES)}
+        tree['steps'] = {self.probability_table.item(row, 0).text(): self.read_range_row(self.probability_table, row)
+                         for row in range(len(TREE_PROBABILITIES), self.probability_table.rowCount())}
+        tree['animals_per_unit'] = self.animals_spin.value()
+        tree['interval'] = self.interval_spin.value()
+        groups = []
+        for row in range(self.group_table.rowCount()):
+            cells = [self.group_table.item(row, column).text() if self.group_table.item(row, column) else ""
+                     for column in range(len(self.GROUP_HEADERS))]
+            relative_risk, proportion, sampled, population = (float(cell or 0) for cell in cells[1:])
+            if relative_risk <= 0 or proportion < 0 or sampled < 0 or population < 0:
+                raise ValueError(f"Risk group '{cells[0]}' needs a positive relative risk and non-negative counts.")
+            groups.append({'name': cells[0] or f"Group {row + 1}", 'relative_risk': relative_risk,
+                           'proportion': proportion, 'sampled': int(sampled), 'population': int(population)})
+        if not groups or sum(group['proportion'] for group in groups) <= 0:
+            raise ValueError("At least one risk group with a share of the population is needed.")
+        tree['groups'] = groups
+        return tree
+
+    def store_component(self):
+        """Keeps the edits of the current component; returns False (after a message) if they are invalid."""
+        if self.current is None:
+            return True
+        try:
+            self.components[self.current] = self.read_component()
+            return True
+        except ValueError as e:
+            show_message(self.iface, f"{self.current}: {e}", level=Qgis.Warning)
+            return False
+
+    def select_component(self, name):
+        if name == self.current:
+            return
+        if not self.store_component():
+            # Stay on the component with the invalid entry
+            self.component_list.blockSignals(True)
+            self.component_list.setCurrentItem(self.component_list.findItems(self.current, Qt.MatchExactly)[0])
+            self.component_list.blockSignals(False)
+            return
+        self.current = name if name in self.components else None
+        if self.current:
+            self.show_component(self.components[self.current])
+        self.set_editor_enabled(self.current is not None)
+
+    def add_component(self, name, tree, path=None):
+        unique, number = name, 2
+        while unique in self.components:
+            unique, number = f"{name} ({number})", number + 1
+        self.components[unique] = tree
+        if path:
+            self.paths[unique] = path
+        self.component_list.addItem(unique)
+        self.component_list.setCurrentRow(self.component_list.count() - 1)
+
+    def add_schemes(self):
+        filePaths, _ = QFileDialog.getOpenFileNames(self, "Add Surveillance Schemes", "", "EADST Scheme Files (*.eadss.json)")
+        for filePath in filePaths:
+            try:
+                scheme = load_scheme(filePath)
+            except Exception as e:
+                show_message(self.iface, f"Could not process scheme file {os.path.basename(filePath)}: {e}", level=Qgis.Critical)
+                continue
+            tree = scheme.get('scenario_tree') or default_tree(scheme_quantities(scheme))
+            self.add_component(os.path.basename(filePath).replace('.eadss.json', ''), tree, filePath)
+
+    def remove_component(self):
+        row = self.component_list.currentRow()
+        if row < 0:
+            return
+        name = self.component_list.item(row).text()
+        self.current = None
+        self.components.pop(name, None)
+        self.paths.pop(name, None)
+        self.component_list.takeItem(row)
+        self.select_component(self.component_list.currentItem().text() if self.component_list.currentItem() else "")
+
+    def add_step(self):
+        row = self.probability_table.rowCount()
+        self.probability_table.insertRow(row)
+        self.set_range_row(self.probability_table, row, f"Detection step {row - len(TREE_PROBABILITIES) + 1}",
+                           [0.9, 0.9, 0.9], label_editable=True)
+
+    def remove_step(self):
+        row = self.probability_table.currentRow()
+        if row >= len(TREE_PROBABILITIES):
+            self.probability_table.removeRow(row)
+
+    def add_group(self):
+        row = self.group_table.rowCount()
+        self.group_table.insertRow(row)
+        for column, value in enumerate([f"Group {row + 1}", "1", "0", "0", "0"]):
+            self.group_table.setItem(row, column, QTableWidgetItem(value))
+
+    # --- Evaluation ---
+
+    def evaluate(self):
+        if not self.store_component() or not self.components:
+            return
+        try:
+            prior, p_introduction = (self.read_range_row(self.system_table, row) for row in range(len(self.SYSTEM_INPUTS)))
+        except ValueError as e:
+            show_message(self.iface, str(e), level=Qgis.Warning)
+            return
+
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            self.result = evaluate_system(self.components, prior, p_introduction, self.periods_spin.value(),
+                                          self.iterations_spin.value(), self.seed_spin.value())
+        finally:
+            QApplication.restoreOverrideCursor()
+        if self.result is None:
+            show_message(self.iface, "Evaluation failed. See the Python console for details.", level=Qgis.Critical)
+            return
+        self.show_results()
+
+    def show_results(self):
+        components, periods = self.result['components'], self.result['periods']
+        headers = ["Component", "Sensitivity (Mean)", "5th Percentile", "95th Percentile", "Specificity (Mean)",
+                   "Periods between Rounds"]
+        self.result_table.setRowCount(len(components))
+        self.result_table.setColumnCount(len(headers))
+        self.result_table.setHorizontalHeaderLabels(headers)
+        for row, (name, values) in enumerate(components.iterrows()):
+            items = [name, f"{values[('Sensitivity', 'Mean')]:.3f}", f"{values[('Sensitivity', 'P5')]:.3f}",
+                     f"{values[('Sensitivity', 'P95')]:.3f}", f"{values[('Specificity', 'Mean')]:.3f}",
+                     f"{values[('Interval', '')]:.0f}"]
+            for column, text in enumerate(items):
+                self.result_table.setItem(row, column, QTableWidgetItem(text))
+        self.result_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        target = self.target_spin.value()
+        reached = periods_to_confidence(periods, target)
+        sensitivity = periods[('System Sensitivity', 'Mean')]
+        text = (f"System sensitivity per period: {sensitivity.min():.3f} to {sensitivity.max():.3f} (mean). "
+                f"Probability of freedom after {len(periods)} periods: "
+                f"{periods[('Probability of Freedom', 'Mean')].iloc[-1]:.3f} "
+                f"(5th percentile {periods[('Probability of Freedom', 'P5')].iloc[-1]:.3f}). ")
+        text += (f"The 5th percentile reaches {target:g} in period {reached}." if reached else
+                 f"The 5th percentile does not reach {target:g} within {len(periods)} periods.")
+        self.summary_label.setText(text)
+
+        self.figure.clear()
+        ax = self.figure.add_subplot(111)
+        for column, color in (('Probability of Freedom', '#1a9641'), ('System Sensitivity', '#2c7bb6')):
+            ax.fill_between(periods.index, periods[(column, 'P5')], periods[(column, 'P95')], color=color, alpha=0.2)
+            ax.plot(periods.index, periods[(column, 'Mean')], color=color, label=column)
+        ax.axhline(target, color='grey', linestyle='--', linewidth=1)
+        ax.set_ylim(0, 1.02)
+        ax.set_xlabel("Period")
+        ax.set_ylabel("Probability")
+        ax.legend(loc='lower right')
+        ax.set_title("System sensitivity and probability of freedom (mean, 5-95%)")
+        self.figure.tight_layout()
+        self.canvas.draw()
+
+    def save_trees(self):
+        """Writes the tree of every component loaded from a scheme file back into that file."""
+        if not self.store_component():
+            return
+        saved = 0
+        for name, path in self.paths.items():
+            try:
+                scheme = load_scheme(path)
+                scheme['scenario_tree'] = self.components[name]
+                with open(path, 'w') as f:
+                    json.dump(scheme, f, indent=4)
+                saved += 1
+            except Exception as e:
+                show_message(self.iface, f"Failed to save scheme file {os.path.basename(path)}: {e}", level=Qgis.Critical)
+        show_message(self.iface, f"Scenario trees saved to {saved} scheme files.", level=Qgis.Success)
+
+class PortfolioDialog(QDialog):
+    """
+    Dialog to choose, under one budget, which surveillance schemes to run
+    and at what intensity, maximising the system sensitivity (or the value)
+    of the portfolio. Cost curves of schemes already costed are reused, so
+    changing the budget, objective or values re-optimises at once.
+    """
+    def __init__(self, iface, parent=None):
+        super(PortfolioDialog, self).__init__(parent)
+        self.iface = iface
+        self.schemes = {}
+        self.curves = CostCurves()
+        self.selected = None
+        self.setWindowTitle("Surveillance Portfolio Optimiser")
+        self.setMinimumSize(1100, 700)
+
+        self.scheme_table = QTableWidget(0, 3)
+        self.scheme_table.setHorizontalHeaderLabels(["Scheme", "Units per Round", "Value (Priority Weight)"])
+        self.scheme_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.add_button = QPushButton("Add Schemes (.eadss.json)...")
+        self.remove_button = QPushButton("Remove Selected")
+
+        self.objective_combo = QComboBox()
+        self.objective_combo.addItems(OBJECTIVES)
+        self.budget_spin = QDoubleSpinBox()
+        self.budget_spin.setRange(0, 1e10)
+        self.budget_spin.setDecimals(0)
+        self.budget_spin.setSingleStep(10000)
+        self.budget_spin.setValue(100000)
+        self.budget_spin.setSuffix(" USD")
+        self.cost_basis_combo = QComboBox()
+        self.cost_basis_combo.addItems(list(COST_BASES))
+        self.draws_spin = QSpinBox()
+        self.draws_spin.setRange(1000, 1000000)
+        self.draws_spin.setSingleStep(10000)
+        self.draws_spin.setValue(10000)
+        self.iterations_spin = QSpinBox()
+        self.iterations_spin.setRange(100, 100000)
+        self.iterations_spin.setSingleStep(1000)
+        self.iterations_spin.setValue(2000)
+        self.seed_spin = QSpinBox()
+        self.seed_spin.setRange(0, 2**31 - 1)
+        self.seed_spin.setValue(12345)
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setValue(os.cpu_count() or 1)
+
+        form = QFormLayout()
+        form.addRow("Objective:", self.objective_combo)
+        form.addRow("Budget:", self.budget_spin)
+        form.addRow("Budget Applies to:", self.cost_basis_combo)
+        form.addRow("Monte Carlo Draws (Cost):", self.draws_spin)
+        form.addRow("Iterations (Sensitivity):", self.iterations_spin)
+        form.addRow("Random Seed:", self.seed_spin)
+        form.addRow("Worker Cores:", self.workers_spin)
+
+        self.optimise_button = QPushButton("Optimise Portfolio")
+        self.export_button = QPushButton("Export Portfolio...")
+        self.export_button.setEnabled(False)
+        self.summary_label = QLabel("")
+        self.summary_label.setWordWrap(True)
+        self.result_table = QTableWidget()
+        self.figure = Figure(figsize=(6, 4))
+        self.canvas = FigureCanvasQTAgg(self.figure)
+
+        scheme_buttons = QHBoxLayout()
+        scheme_buttons.addWidget(self.add_button)
+        scheme_buttons.addWidget(self.remove_button)
+        left = QVBoxLayout()
+        left.addWidget(self.scheme_table, 1)
+        left.addLayout(scheme_buttons)
+        left.addLayout(form)
+        left.addWidget(self.optimise_button)
+        right = QVBoxLayout()
+        right.addWidget(self.summary_label)
+        right.addWidget(self.result_table, 1)
+        right.addWidget(self.canvas, 1)
+        right.addWidget(self.export_button)
+        main_layout = QHBoxLayout()
+        main_layout.addLayout(left, 2)
+        main_layout.addLayout(right, 3)
+        self.setLayout(main_layout)
+
+        self.add_button.clicked.connect(self.add_schemes)
+        self.remove_button.clicked.connect(self.remove_schemes)
+        self.optimise_button.clicked.connect(self.run_optimisation)
+        self.export_button.clicked.connect(self.export_portfolio)
+
+    def add_schemes(self):
+        filePaths, _ = QFileDialog.getOpenFileNames(self, "Add Surveillance Schemes", "", "EADST Scheme Files (*.eadss.json)")
+        for filePath in filePaths:
+            try:
+                scheme = load_scheme(filePath)
+            except Exception as e:
+                show_message(self.iface, f"Could not process scheme file {os.path.basename(filePath)}: {e}", level=Qgis.Critical)
+                continue
+            name = os.path.basename(filePath).replace('.eadss.json', '')
+            unique, number = name, 2
+            while unique in self.schemes:
+                unique, number = f"{name} ({number})", number + 1
+            self.schemes[unique] = scheme
+            row = self.scheme_table.rowCount()
+            self.scheme_table.insertRow(row)
+            name_item = QTableWidgetItem(unique)
+            name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)
+            units_item = QTableWidgetItem(f"{scheme_quantities(scheme)['units']:,.0f}")
+            units_item.setFlags(units_item.flags() & ~Qt.ItemIsEditable)
+            self.scheme_table.setItem(row, 0, name_item)
+            self.scheme_table.setItem(row, 1, units_item)
+            self.scheme_table.setItem(row, 2, QTableWidgetItem("1"))
+
+    def remove_schemes(self):
+        for row in sorted({index.row() for index in self.scheme_table.selectedIndexes()}, reverse=True):
+            self.schemes.pop(self.scheme_table.item(row, 0).text(), None)
+            self.scheme_table.removeRow(row)
+
+    def values(self):
+        """Value of every scheme from the table; raises ValueError for entries that are not numbers."""
+        values = {}
+        for row in range(self.scheme_table.rowCount()):
+            name = self.scheme_table.item(row, 0).text()
+            try:
+                values[name] = float(self.scheme_table.item(row, 2).text())
+            except (AttributeError, ValueError):
+                raise ValueError(f"The value of scheme '{name}' must be a number.")
+        return values
+
+    def run_optimisation(self):
+        if not self.schemes:
+            show_message(self.iface, "Add at least one surveillance scheme.", level=Qgis.Warning)
+            return
+        try:
+            values = self.values()
+        except ValueError as e:
+            show_message(self.iface, str(e), level=Qgis.Warning)
+            return
+
+        objective = self.objective_combo.currentText()
+        cost_column = COST_BASES[self.cost_basis_combo.currentText()]
+        budget = self.budget_spin.value()
+        self.selected, frontier = None, None
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            self.curves.n_jobs = self.workers_spin.value()
+            curves = self.curves.get(self.schemes, cost_ranges(), n_draws=self.draws_spin.value(),
+                                     n_iter=self.iterations_spin.value(), seed=self.seed_spin.value())
+            if curves is not None:
+                table = candidates(curves, objective, values)
+                self.selected = optimise(table, budget, cost_column)
+                # Frontier up to every scheme at its highest intensity
+                full = table.groupby('Scheme')[cost_column].max().sum()
+                frontier = budget_frontier(table, np.linspace(0.0, max(full, budget), 41), cost_column)
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if self.selected is None:
+            show_message(self.iface, "Optimisation failed. See the Python console for details.", level=Qgis.Critical)
+            return
+        self.show_portfolio(objective, budget, cost_column, frontier)
+        self.export_button.setEnabled(True)
+
+    def show_portfolio(self, objective, budget, cost_column, frontier):
+        selected = self.selected.sort_values(['Level', 'Sensitivity'], ascending=False)
+        summary = portfolio_summary(selected)
+        text = (f"{summary['components']} of {len(selected)} schemes selected, costing {summary['cost_mean']:,.0f} USD "
+                f"(95th percentile {summary['cost_p95']:,.0f} USD) of a {budget:,.0f} USD budget. "
+                f"System sensitivity per round: {summary['system_sensitivity']:.4f}.")
+        if objective == 'Value':
+            text += f" Total value: {summary['objective']:,.2f}."
+        text += f" Cost curves computed for {self.curves.n_computed} new schemes."
+        self.summary_label.setText(text)
+
+        headers = ["Scheme", "Intensity", "Units per Round", "Mean Cost (USD)", "95th Percentile", "Sensitivity"]
+        self.result_table.setRowCount(len(selected))
+        self.result_table.setColumnCount(len(headers))
+        self.result_table.setHorizontalHeaderLabels(headers)
+        for row, (name, values) in enumerate(selected.iterrows()):
+            intensity = "Not run" if values['Level'] == 0 else f"{values['Level']:g} x"
+            items = [name, intensity, f"{values['Units']:,.0f}", f"{values['Cost_Mean']:,.0f}",
+                     f"{values['Cost_P95']:,.0f}", f"{values['Sensitivity']:.3f}"]
+            for column, item_text in enumerate(items):
+                self.result_table.setItem(row, column, QTableWidgetItem(item_text))
+        self.result_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        self.figure.clear()
+        ax = self.figure.add_subplot(111)
+        column, label = (('system_sensitivity', "System sensitivity") if objective == 'System sensitivity'
+                         else ('objective', "Total value"))
+        if frontier is not None and not frontier.empty:
+            ax.plot(frontier.index, frontier[column], color='#2c7bb6', drawstyle='steps-post', label="Best portfolio")
+        ax.axvline(budget, color='grey', linestyle='--', linewidth=1)
+        chosen = summary[column]
+        ax.plot(summary['cost_mean' if cost_column == 'Cost_Mean' else 'cost_p95'], chosen, marker='o',
+                color='#d7191c', label="Selected portfolio")
+        ax.set_xlabel(f"Budget (USD, {'mean' if cost_column == 'Cost_Mean' else '95th percentile'} cost)")
+        ax.set_ylabel(label)
+        ax.legend(loc='lower right')
+        ax.set_title(f"{label} by budget")
+        self.figure.tight_layout()
+        self.canvas.draw()
+
+    def export_portfolio(self):
+        filePath, _ = QFileDialog.getSaveFileName(self, "Export Portfolio", "surveillance_portfolio.csv", "CSV Files (*.csv)")
+        if not filePath: return
+        try:
+            self.selected.to_csv(filePath)
+            show_message(self.iface, f"Portfolio saved to {filePath}", level=Qgis.Success)
+        except Exception as e:
+            show_message(self.iface, f"Failed to save portfolio: {e}", level=Qgis.Critical)
 
 class EconomicParametersDialog(QDialog):
     """Dialog for editing and viewing economic parameters stored in the database."""
@@ -126,33 +1516,49 @@ class EconomicParametersDialog(QDialog):
         super(EconomicParametersDialog, self).__init__(parent)
         self.iface = iface
         self.setWindowTitle("Economic Parameter Database")
-        
-        self.params = get_economic_parameters()
+        self.setMinimumSize(750, 500)
+
+        self.params = get_economic_parameters(with_ranges=True)
         self.widgets = {}
-        
-        layout = QFormLayout()
-        for key, value in sorted(self.params.items()):
-            label = QLabel(f"{key.replace('_', ' ').title()}:")
-            spin_box = QDoubleSpinBox()
-            spin_box.setDecimals(2)
-            spin_box.setMaximum(1e12)
-            spin_box.setValue(value)
-            self.widgets[key] = spin_box
-            layout.addRow(label, spin_box)
-            
+
+        # Costing draws each parameter between its minimum and maximum, most often near the most likely value
+        self.table = QTableWidget(len(self.params), 5)
+        self.table.setHorizontalHeaderLabels(["Parameter", "Unit", "Most Likely", "Minimum", "Maximum"])
+        for row, (key, values) in enumerate(sorted(self.params.items())):
+            description, unit = ECONOMIC_PARAMETERS.get(key, (key.replace('_', ' ').title(), ""))[:2]
+            self.table.setItem(row, 0, QTableWidgetItem(description))
+            self.table.setItem(row, 1, QTableWidgetItem(unit))
+            spin_boxes = []
+            for column, value in enumerate(values, start=2):
+                spin_box = QDoubleSpinBox()
+                spin_box.setDecimals(2)
+                spin_box.setMaximum(1e12)
+                spin_box.setValue(value)
+                self.table.setCellWidget(row, column, spin_box)
+                spin_boxes.append(spin_box)
+            self.widgets[key] = spin_boxes
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
         buttonBox = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
         buttonBox.accepted.connect(self.save_parameters)
         buttonBox.rejected.connect(self.reject)
-        
+
         main_layout = QVBoxLayout()
-        main_layout.addLayout(layout)
+        main_layout.addWidget(self.table)
         main_layout.addWidget(buttonBox)
         self.setLayout(main_layout)
 
     def save_parameters(self):
-        updated_params = {key: widget.value() for key, widget in self.widgets.items()}
+        updated_params = {}
+        for key, spin_boxes in self.widgets.items():
+            value, low, high = (spin_box.value() for spin_box in spin_boxes)
+            if not low <= value <= high:
+                show_message(self.iface, f"The most likely value of '{key}' must lie between its minimum and maximum.",
+                             level=Qgis.Warning)
+                return
+            updated_params[key] = (value, low, high)
         if save_economic_parameters(updated_params):
             show_message(self.iface, "Economic parameters saved successfully.", level=Qgis.Success)
             self.accept()
         else:
-            show_message(self.iface, "Failed to save parameters to database.", level=Qgis.Critical)
\ No newline at end of file
+            show_message(self.iface, "Failed to save parameters to database.", level=Qgis.Critical)
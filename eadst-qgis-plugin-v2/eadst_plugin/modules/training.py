@@ -20,7 +20,7 @@ TUTORIALS = {
         "Step 1: Inspect the data. Right-click on the 'sample_outbreaks' layer in the Layers Panel and select 'Open Attribute Table'.",
         "Step 2: Let's visualize the timeline. Go to 'EADST -> Analysis & Reporting -> Descriptive Epidemiology -> Generate Epidemic Curve'.",
         "Step 3: Select the 'sample_outbreaks' layer and the 'Event_Date' field. Aggregate by 'Day' and click OK.",
-        "Step 4: Now, let's find hotspots. Go to 'EADST -> Analysis & Reporting -> Spatial Analysis -> Hotspot Map (Kernel Density)'.",
+        "Step 4: Now, let's find hotspots. Go to 'EADST -> Analysis & Reporting -> Hotspot Map (Kernel Density)'.",
         "Step 5: Use the 'sample_outbreaks' layer as input and set a Radius of 50000 meters. Run the tool.",
         "Congratulations! You have completed the basic outbreak investigation tutorial."
     ]
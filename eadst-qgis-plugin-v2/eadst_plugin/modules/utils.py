@@ -13,24 +13,223 @@ import os
 import sqlite3
 import platform
 import subprocess
-from qgis.core import Qgis, QgsProject, QgsVectorLayer, QgsField
+from qgis.core import Qgis, QgsApplication, QgsProject, QgsVectorLayer, QgsField
 from PyQt5.QtCore import QVariant
 
+# Bundled administrative boundaries: layer name -> (shapefile, name field, code field)
+ADMIN_LEVELS = {
+    "Regions": ("ETH_Admin_Level_1.shp", "ADM1_EN", "ADM1_PCODE"),
+    "Zones": ("ETH_Admin_Level_2.shp", "ADM2_EN", "ADM2_PCODE"),
+    "Woredas": ("ETH_Admin_Level_3.shp", "ADM3_EN", "ADM3_PCODE"),
+}
+
 def get_plugin_path():
     """Returns the absolute path to the plugin directory."""
     return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+def get_user_db_path():
+    """Returns the path of the user's data standard database, in the QGIS profile so it outlives plugin upgrades."""
+    return os.path.join(QgsApplication.qgisSettingsDirPath(), "eadst", "data_standard.db")
+
 def get_db_connection():
-    """Establishes and returns a connection to the data standard SQLite database."""
-    db_path = os.path.join(get_plugin_path(), "resources", "data_standard.db")
-    if not os.path.exists(db_path):
-        return None
+    """
+    Establishes and returns a connection to the user's data standard SQLite database.
+
+    On first use it is copied from the bundled data_standard.db, or built from
+    the bundled SQL script when that file is empty; the bundled files are only
+    read. If the profile cannot be written the database is built in memory.
+    """
+    bundled_path = os.path.join(get_plugin_path(), "resources", "data_standard.db")
+    script_path = os.path.join(get_plugin_path(), "resources", "data_standard.sqlite")
+    db_path = get_user_db_path()
     try:
-        return sqlite3.connect(db_path)
+        if os.path.exists(db_path) and os.path.getsize(db_path) > 0:
+            return sqlite3.connect(db_path)
+        try:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            conn = sqlite3.connect(db_path)
+        except (OSError, sqlite3.Error):
+            conn = sqlite3.connect(":memory:")
+        if os.path.exists(bundled_path) and os.path.getsize(bundled_path) > 0:
+            bundled = sqlite3.connect(f"file:{bundled_path}?mode=ro", uri=True)
+            bundled.backup(conn)
+            bundled.close()
+        elif os.path.exists(script_path):
+            with open(script_path, encoding="utf-8") as f:
+                conn.executescript(f.read())
+        else:
+            conn.close()
+            return None
+        return conn
     except sqlite3.Error as e:
         print(f"Database connection error: {e}")
         return None
 
+def get_diseases():
+    """Returns (code, name) of all diseases in the data standard, ordered by name."""
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    try:
+        return conn.execute("SELECT code, name FROM diseases ORDER BY name").fetchall()
+    except sqlite3.Error as e:
+        print(f"Database query error: {e}")
+        return []
+    finally:
+        conn.close()
+
+def get_diagnostic_methods():
+    """Returns the names of all diagnostic methods in the data standard."""
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    try:
+        return [row[0] for row in conn.execute("SELECT method FROM diagnostic_methods ORDER BY code")]
+    except sqlite3.Error as e:
+        print(f"Database query error: {e}")
+        return []
+    finally:
+        conn.close()
+
+def get_species_from_db():
+    """Returns the common names of all species in the data standard."""
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    try:
+        return [row[0] for row in conn.execute("SELECT common_name FROM species ORDER BY id")]
+    except sqlite3.Error as e:
+        print(f"Database query error: {e}")
+        return []
+    finally:
+        conn.close()
+
+# Species whose breeds are listed under another name in the species codes
+BREED_SPECIES_NAMES = {"Chicken": "Poultry"}
+
+def get_breeds_for_species(species):
+    """Returns the names of the breeds of a species in the data standard, ordered by name."""
+    conn = get_db_connection()
+    if conn is None:
+        return []
+    try:
+        rows = conn.execute("""SELECT b.name FROM breeds b JOIN species_codes c ON b.species_code = c.species_code
+                               WHERE c.species_name = ? ORDER BY b.name""",
+                            (BREED_SPECIES_NAMES.get(species, species),))
+        return [row[0] for row in rows]
+    except sqlite3.Error as e:
+        print(f"Database query error: {e}")
+        return []
+    finally:
+        conn.close()
+
+# Economic parameters: name -> (description, unit, most likely value, minimum, maximum).
+# Costing draws each parameter from a PERT distribution over its range (a fixed value when minimum == maximum).
+ECONOMIC_PARAMETERS = {
+    "staff_daily_rate": ("Staff salary per working day", "USD/day", 40.0, 30.0, 60.0),
+    "per_diem": ("Field allowance per staff day", "USD/day", 15.0, 10.0, 25.0),
+    "staff_per_team": ("Staff in a field team", "persons", 2.0, 2.0, 2.0),
+    "units_per_team_day": ("Units (herds, villages) visited per team day", "units/day", 3.0, 2.0, 5.0),
+    "km_per_unit": ("Road distance travelled per unit visited", "km", 25.0, 15.0, 40.0),
+    "cost_per_km": ("Vehicle running cost", "USD/km", 0.50, 0.35, 0.80),
+    "cost_sample_kit": ("Sampling consumables per sample", "USD/sample", 1.5, 1.0, 2.5),
+    "cost_sample_shipping": ("Cold chain and shipping per sample", "USD/sample", 0.8, 0.5, 1.5),
+    "cost_elisa_test": ("ELISA test", "USD/test", 5.0, 3.5, 8.0),
+    "cost_pcr_test": ("PCR test", "USD/test", 25.0, 15.0, 40.0),
+    "cost_rapid_test": ("Rapid (pen-side) test", "USD/test", 3.0, 2.0, 5.0),
+    "cost_culture_test": ("Culture and isolation", "USD/test", 12.0, 8.0, 20.0),
+    "cost_microscopy_test": ("Microscopy", "USD/test", 1.5, 1.0, 3.0),
+    "overhead_rate": ("Management and overhead, as a share of direct costs", "fraction", 0.10, 0.05, 0.15),
+    # Outbreak impact (OutCosT)
+    "case_fatality": ("Share of cases that die", "fraction", 0.05, 0.01, 0.20),
+    "morbidity_value_loss": ("Value lost by a recovered case (weight, fertility)", "fraction", 0.10, 0.05, 0.20),
+    "treatment_cost_per_case": ("Treatment of a case", "USD/case", 3.0, 1.5, 6.0),
+    "vaccination_cost_per_head": ("Ring vaccination, vaccine and delivery", "USD/head", 0.8, 0.5, 1.5),
+    "vaccination_coverage": ("Share of the population at risk vaccinated in response", "fraction", 0.5, 0.2, 0.8),
+    "outbreak_response_cost": ("Investigation, sampling and movement control", "USD/outbreak", 500.0, 300.0, 1000.0),
+}
+
+# Species values for outbreak impact: market value per head, and milk and draught power lost per
+# recovered case (USD). Records of other species use 'Other'.
+IMPACT_SPECIES = {
+    "Cattle": (400.0, 25.0, 20.0), "Camel": (900.0, 40.0, 25.0), "Sheep": (60.0, 0.0, 0.0),
+    "Goat": (50.0, 4.0, 0.0), "Horse": (250.0, 0.0, 20.0), "Donkey": (100.0, 0.0, 12.0),
+    "Mule": (200.0, 0.0, 18.0), "Pig": (150.0, 0.0, 0.0), "Chicken": (5.0, 0.0, 0.0),
+    "Other": (100.0, 0.0, 0.0),
+}
+
+def _species_parameters():
+    """Economic parameters of each species in IMPACT_SPECIES, e.g. animal_value_cattle."""
+    params = {}
+    for species, (value, milk, draught) in IMPACT_SPECIES.items():
+        key = species.lower()
+        params[f"animal_value_{key}"] = (f"{species}: market value per head", "USD/head", value, 0.7 * value, 1.5 * value)
+        params[f"milk_loss_{key}"] = (f"{species}: milk lost per recovered case", "USD/case", milk, 0.5 * milk, 1.5 * milk)
+        params[f"draught_loss_{key}"] = (f"{species}: draught power lost per recovered case", "USD/case",
+                                         draught, 0.5 * draught, 1.5 * draught)
+    return params
+
+ECONOMIC_PARAMETERS.update(_species_parameters())
+
+def _economic_parameters_table(conn):
+    """Creates the economic parameter table if needed and adds parameters missing from it."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS economic_parameters (
+        name TEXT PRIMARY KEY, description TEXT, unit TEXT, value REAL, low REAL, high REAL)""")
+    conn.executemany("INSERT OR IGNORE INTO economic_parameters VALUES (?, ?, ?, ?, ?, ?)",
+                     [(name,) + values for name, values in ECONOMIC_PARAMETERS.items()])
+    conn.commit()
+
+def get_economic_parameters(with_ranges=False):
+    """
+    Returns the economic parameters from the database.
+
+    :param with_ranges: If True, values are (most likely, minimum, maximum) tuples.
+
+    :returns: Dict of parameter name -> value (the defaults if the database is unavailable).
+    """
+    conn = get_db_connection()
+    if conn is None:
+        rows = [(name, value, low, high) for name, (_, _, value, low, high) in ECONOMIC_PARAMETERS.items()]
+    else:
+        try:
+            _economic_parameters_table(conn)
+            rows = conn.execute("SELECT name, value, low, high FROM economic_parameters").fetchall()
+        except sqlite3.Error as e:
+            print(f"Database query error: {e}")
+            rows = [(name, value, low, high) for name, (_, _, value, low, high) in ECONOMIC_PARAMETERS.items()]
+        finally:
+            conn.close()
+    if with_ranges:
+        return {name: (value, min(low, value), max(high, value)) for name, value, low, high in rows}
+    return {name: value for name, value, _, _ in rows}
+
+def save_economic_parameters(params):
+    """
+    Stores economic parameters.
+
+    :param params: Dict of parameter name -> value, or -> (most likely, minimum, maximum).
+
+    :returns: True on success.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    try:
+        _economic_parameters_table(conn)
+        for name, value in params.items():
+            if isinstance(value, (tuple, list)):
+                conn.execute("UPDATE economic_parameters SET value = ?, low = ?, high = ? WHERE name = ?",
+                             (value[0], value[1], value[2], name))
+            else:
+                conn.execute("UPDATE economic_parameters SET value = ? WHERE name = ?", (value, name))
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database query error: {e}")
+        return False
+    finally:
+        conn.close()
+
 def find_or_create_layer(layer_name, fields, geometry_type, crs):
     """Finds a layer by name. If not found, creates it with specified fields."""
     project = QgsProject.instance()
@@ -48,6 +247,16 @@ def find_or_create_layer(layer_name, fields, geometry_type, crs):
     project.addMapLayer(vl)
     return vl
 
+def get_admin_layer(layer_name):
+    """Returns an admin boundary layer from the project, or loads the bundled copy."""
+    layers = QgsProject.instance().mapLayersByName(layer_name)
+    if layers:
+        return layers[0]
+    file_name = ADMIN_LEVELS[layer_name][0]
+    path = os.path.join(get_plugin_path(), "resources", "base_layers", file_name)
+    layer = QgsVectorLayer(path, layer_name, "ogr")
+    return layer if layer.isValid() else None
+
 def show_message(iface, message, level=Qgis.Info, duration=5):
     """Helper to show a message in the QGIS message bar."""
     iface.messageBar().pushMessage("EADST", message, level=level, duration=duration)
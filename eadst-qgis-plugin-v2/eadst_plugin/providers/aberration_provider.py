@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+A provider for automated early-warning (aberration) detection per admin unit.
+
+Outbreak records are counted per admin unit and day or week into one
+(unit x period) matrix, and every detector is evaluated for all units at
+once with array operations over that matrix:
+
+- EARS C1, C2 and C3 (Hutwagner et al., 2003): the count compared with the
+  mean and standard deviation of the 7 preceding periods (C1), of the 7
+  periods before a 2-period guard band (C2), and the sum of the C2
+  exceedances over the last 3 periods (C3).
+- CUSUM: the one-sided cumulative sum of standardised counts, against a
+  28-period baseline before a 3-period guard band.
+- Farrington-type: the expected count and upper threshold from the same
+  season of previous years (quasi-Poisson with the 2/3-power
+  transformation of Farrington et al., 1996, without trend or
+  reweighting).
+
+Results are cached with the count matrix, so a nightly run only
+recomputes the periods from the first one whose counts changed.
+"""
+
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from scipy import stats
+from qgis.core import QgsProject
+from .sitrep_provider import SITREP_FREQUENCIES, AdminAssignment, SitrepCache, load_outbreak_records
+from ..modules.utils import ADMIN_LEVELS
+
+ALERT_METHODS = ['C1', 'C2', 'C3', 'CUSUM', 'Farrington']
+
+DEFAULT_PARAMETERS = {
+    'ears_window': 7,
+    'ears_threshold': 3.0,
+    'c3_threshold': 2.0,
+    # EARS floors the baseline standard deviation, so that a count after a run of zeros stays finite
+    'min_sd': 0.2,
+    'cusum_window': 28,
+    'cusum_lag': 3,
+    'cusum_k': 0.5,
+    'cusum_h': 4.0,
+    'farrington_years': 3,
+    'farrington_alpha': 0.05,
+    # Farrington only signals when at least this many were counted in the last 4 periods
+    'farrington_min_recent': 5,
+}
+
+# Season length and half width of the seasonal window, in periods
+FARRINGTON_SEASONS = {'D': (364, 21), 'W': (52, 3)}
+
+# --- Count matrix ---
+
+def count_matrix(records, unit_positions, n_units, date_field='Event_Date', freq='W', count='Outbreaks',
+                 start_date=None, end_date=None):
+    """
+    Counts records per admin unit and period.
+
+    :param records: DataFrame from load_outbreak_records.
+    :param unit_positions: Unit row of each record (-1 outside all units).
+    :param n_units: Number of admin units.
+    :param freq: 'D' for days or 'W' for weeks (ending on Sunday, as in the sitrep).
+    :param count: 'Outbreaks' counts records, 'Cases' sums their cases.
+
+    :returns: Tuple of (DatetimeIndex of periods, (n_units, n_periods) float array).
+    """
+    dates = records[date_field].dt.normalize()
+    if freq == 'W':
+        dates = dates + pd.to_timedelta((6 - dates.dt.dayofweek) % 7, unit='D')
+    first = pd.Timestamp(start_date) if start_date is not None else dates.min()
+    last = pd.Timestamp(end_date) if end_date is not None else dates.max()
+    periods = pd.date_range(first, last, freq='D' if freq == 'D' else 'W-SUN')
+
+    period_positions = periods.get_indexer(dates)
+    keep = (unit_positions >= 0) & (period_positions >= 0)
+    weights = records['Cases'].to_numpy(dtype=float) if count == 'Cases' else np.ones(len(records))
+    flat = unit_positions[keep] * len(periods) + period_positions[keep]
+    counts = np.bincount(flat, weights=weights[keep], minlength=n_units * len(periods))
+    return periods, counts.reshape(n_units, len(periods))
+
+# --- Detectors (all units at once; each evaluates periods start: only) ---
+
+def lagged_moments(X, window, lag, periods):
+    """
+    Mean and standard deviation of the window periods ending lag periods
+    before each of the given periods, for all units (NaN without a full window).
+    """
+    zeros = np.zeros((X.shape[0], 1))
+    C1 = np.hstack([zeros, np.cumsum(X, axis=1)])
+    C2 = np.hstack([zeros, np.cumsum(X * X, axis=1)])
+    upper = periods - lag + 1
+    lower = upper - window
+    valid = lower >= 0
+    upper, lower = np.clip(upper, 0, None), np.clip(lower, 0, None)
+    total = C1[:, upper] - C1[:, lower]
+    mean = total / window
+    var = np.maximum((C2[:, upper] - C2[:, lower] - window * mean * mean) / (window - 1), 0.0)
+    mean[:, ~valid] = np.nan
+    var[:, ~valid] = np.nan
+    return mean, np.sqrt(var)
+
+def ears(X, start=0, window=7, min_sd=0.2):
+    """
+    EARS C1, C2 and C3 statistics.
+
+    :returns: Dict of 'C1', 'C2', 'C3' -> (n_units, n_periods - start) arrays.
+    """
+    n_periods = X.shape[1]
+    # C3 also needs C2 for the two periods before start
+    first = max(start - 2, 0)
+    periods = np.arange(first, n_periods)
+    mean1, sd1 = lagged_moments(X, window, 1, periods)
+    mean2, sd2 = lagged_moments(X, window, 3, periods)
+    observed = X[:, first:]
+    c1 = (observed - mean1) / np.maximum(sd1, min_sd)
+    c2 = (observed - mean2) / np.maximum(sd2, min_sd)
+
+    exceedance = np.maximum(np.nan_to_num(c2) - 1.0, 0.0)
+    c3 = exceedance.copy()
+    c3[:, 1:] += exceedance[:, :-1]
+    c3[:, 2:] += exceedance[:, :-2]
+    c3[np.isnan(c2)] = np.nan
+    skip = start - first
+    return {'C1': c1[:, skip:], 'C2': c2[:, skip:], 'C3': c3[:, skip:]}
+
+def cusum(X, start=0, window=28, lag=3, k=0.5, min_sd=0.2, initial=None):
+    """
+    One-sided CUSUM S_t = max(0, S_t-1 + z_t - k) of counts standardised
+    against a moving baseline. Periods without a baseline add nothing.
+
+    :param initial: CUSUM of each unit in period start - 1 (zero if None).
+
+    :returns: (n_units, n_periods - start) array.
+    """
+    periods = np.arange(start, X.shape[1])
+    mean, sd = lagged_moments(X, window, lag, periods)
+    z = np.nan_to_num((X[:, start:] - mean) / np.maximum(sd, min_sd))
+    result = np.empty_like(z)
+    current = np.zeros(X.shape[0]) if initial is None else np.asarray(initial, dtype=float).copy()
+    for t in range(z.shape[1]):
+        current = np.maximum(current + z[:, t] - k, 0.0)
+        result[:, t] = current
+    return result
+
+def farrington(X, season, half_window, start=0, years=3, alpha=0.05):
+    """
+    Farrington-type expected counts and upper thresholds.
+
+    The baseline of period t is the periods t - y * season + o of the
+    previous years y = 1..years within o = -half_window..half_window. Each
+    year's window is a difference of cumulative sums, so the cost does not
+    grow with the window width. Periods with less than one year of
+    baseline are left NaN.
+
+    :returns: Tuple of (expected, threshold) (n_units, n_periods - start) arrays.
+    """
+    n_units, n_periods = X.shape
+    zeros = np.zeros((n_units, 1))
+    C1 = np.hstack([zeros, np.cumsum(X, axis=1)])
+    C2 = np.hstack([zeros, np.cumsum(X * X, axis=1)])
+    periods = np.arange(start, n_periods)
+
+    n = np.zeros(periods.size)
+    total = np.zeros((n_units, periods.size))
+    squares = np.zeros_like(total)
+    for year in range(1, years + 1):
+        centre = periods - year * season
+        upper = np.clip(centre + half_window + 1, 0, None)
+        lower = np.clip(centre - half_window, 0, None)
+        n += upper - lower
+        total += C1[:, upper] - C1[:, lower]
+        squares += C2[:, upper] - C2[:, lower]
+
+    z = stats.norm.ppf(1.0 - alpha / 2.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / n
+        var = np.maximum(squares - n * mean * mean, 0.0) / (n - 1)
+        dispersion = np.where(mean > 0, np.maximum(var / mean, 1.0), 1.0)
+        threshold = np.where(mean > 0, mean * (1.0 + 2.0 / 3.0 * z * np.sqrt(dispersion / mean)) ** 1.5, 0.0)
+    enough = n >= 2 * half_window + 1
+    return np.where(enough, mean, np.nan), np.where(enough, threshold, np.nan)
+
+def run_detectors(X, freq='W', start=0, previous=None, **parameters):
+    """
+    Evaluates all detectors for periods start: and prepends the cached
+    results of earlier periods.
+
+    :param previous: Dict of statistics for at least the first start periods.
+
+    :returns: Dict of statistic name -> (n_units, n_periods) array, with
+        'C1', 'C2', 'C3', 'CUSUM', 'Expected' and 'Threshold'.
+    """
+    p = {**DEFAULT_PARAMETERS, **parameters}
+    season, half_window = FARRINGTON_SEASONS[freq]
+    fresh = ears(X, start, p['ears_window'], p['min_sd'])
+    initial = previous['CUSUM'][:, start - 1] if previous is not None and start > 0 else None
+    fresh['CUSUM'] = cusum(X, start, p['cusum_window'], p['cusum_lag'], p['cusum_k'], p['min_sd'], initial)
+    fresh['Expected'], fresh['Threshold'] = farrington(X, season, half_window, start, p['farrington_years'],
+                                                       p['farrington_alpha'])
+    if previous is None or start == 0:
+        return fresh
+    return {name: np.hstack([previous[name][:, :start], values]) for name, values in fresh.items()}
+
+def alert_flags(X, statistics, **parameters):
+    """Boolean (n_units, n_periods) array per method in ALERT_METHODS."""
+    p = {**DEFAULT_PARAMETERS, **parameters}
+    recent = np.cumsum(X, axis=1)
+    recent[:, 4:] -= recent[:, :-4].copy()
+    with np.errstate(invalid='ignore'):
+        return {
+            'C1': statistics['C1'] > p['ears_threshold'],
+            'C2': statistics['C2'] > p['ears_threshold'],
+            'C3': statistics['C3'] > p['c3_threshold'],
+            'CUSUM': statistics['CUSUM'] > p['cusum_h'],
+            'Farrington': (X > statistics['Threshold']) & (recent >= p['farrington_min_recent']),
+        }
+
+def first_changed_period(X, periods, cached):
+    """
+    First period whose counts differ from the cached run, or 0 when the
+    cached results cannot be reused.
+    """
+    if cached is None:
+        return 0
+    old_X, old_periods = cached['counts'], cached['periods']
+    if old_X.shape[0] != X.shape[0] or len(old_periods) > len(periods) or \
+            len(old_periods) == 0 or old_periods[0] != periods[0]:
+        return 0
+    differs = (old_X != X[:, :old_X.shape[1]]).any(axis=0)
+    return int(np.argmax(differs)) if differs.any() else old_X.shape[1]
+
+# --- Running detection on a layer ---
+
+def default_cache_dir():
+    """'.eadst_cache' next to the project file, or in the temp folder for unsaved projects."""
+    home = QgsProject.instance().homePath() or tempfile.gettempdir()
+    return os.path.join(home, '.eadst_cache')
+
+def detect_aberrations(layer, admin_level='Woredas', frequency='Week', count='Outbreaks', date_field='Event_Date',
+                       start_date=None, end_date=None, report_periods=1, cache_dir=None, feedback=None,
+                       **parameters):
+    """
+    Runs all detectors for every unit of an admin level.
+
+    :param layer: Outbreak point QgsVectorLayer.
+    :param admin_level: One of utils.ADMIN_LEVELS.
+    :param frequency: 'Day' or 'Week'.
+    :param count: 'Outbreaks' (number of records) or 'Cases'.
+    :param date_field: Field holding the event date.
+    :param start_date: Optional first date of the history. Defaults to the
+        earliest record.
+    :param end_date: Last date evaluated. Defaults to today, so that units
+        falling silent are evaluated too.
+    :param report_periods: Number of most recent periods reported.
+    :param cache_dir: Folder for cached results (see default_cache_dir).
+    :param feedback: Optional QgsProcessingFeedback for progress messages.
+
+    Remaining keyword arguments override DEFAULT_PARAMETERS.
+
+    :returns: Tuple of (DataFrame with one row per unit and reported period:
+        position (row of the unit in the admin layer), fid, code, name,
+        period, count, the statistics, one boolean column per method,
+        'Alerts' (names of the signalling methods) and 'N_Alerts'; number of
+        periods recomputed), or (None, None) on failure.
+    """
+    log = feedback.pushInfo if feedback else print
+    try:
+        freq = SITREP_FREQUENCIES[frequency]
+        if freq not in FARRINGTON_SEASONS:
+            print(f"Aberration provider: unsupported frequency '{frequency}'.")
+            return None, None
+        end_date = pd.Timestamp(end_date) if end_date is not None else pd.Timestamp.today().normalize()
+
+        cache = SitrepCache(cache_dir or default_cache_dir())
+        settings = {**DEFAULT_PARAMETERS, **parameters}
+        key = SitrepCache.key('aberration', layer.source(), admin_level, freq, count, date_field,
+                              start_date, settings)
+        cached = cache.get('aberration', key)
+
+        assignment = AdminAssignment(admin_level)
+        if cached is not None:
+            assignment.unit_of_location = cached['unit_of_location']
+        admin_gdf = assignment.load()
+        records = load_outbreak_records(layer, date_field, start_date, end_date)
+        if records.empty:
+            print("Aberration provider: no dated outbreak records found.")
+            return None, None
+
+        periods, X = count_matrix(records, assignment.unit_positions(records), len(admin_gdf), date_field, freq,
+                                  count, start_date, end_date)
+        start = first_changed_period(X, periods, cached)
+        statistics = run_detectors(X, freq, start, cached['statistics'] if start else None, **parameters)
+        log(f"Aberration detection: {len(admin_gdf)} units x {len(periods)} periods, "
+            f"{len(periods) - start} recomputed.")
+        cache.put('aberration', key, {'periods': periods, 'counts': X, 'statistics': statistics,
+                                      'unit_of_location': assignment.unit_of_location})
+
+        flags = alert_flags(X, statistics, **parameters)
+        reported = slice(max(len(periods) - report_periods, 0), len(periods))
+        n_units, n_reported = X.shape[0], len(periods[reported])
+        _, name_field, code_field = ADMIN_LEVELS[admin_level]
+        alerts = pd.DataFrame({
+            'position': np.repeat(np.arange(n_units), n_reported),
+            'fid': np.repeat(admin_gdf.index.to_numpy(), n_reported),
+            'code': np.repeat(admin_gdf[code_field].astype(str).to_numpy(), n_reported),
+            'name': np.repeat(admin_gdf[name_field].astype(str).to_numpy(), n_reported),
+            'period': np.tile(periods[reported].to_numpy(), n_units),
+            'count': X[:, reported].ravel(),
+        })
+        for name, values in statistics.items():
+            alerts[name] = values[:, reported].ravel()
+        for method in ALERT_METHODS:
+            alerts[f'Alert_{method}'] = flags[method][:, reported].ravel()
+        signalled = alerts[[f'Alert_{method}' for method in ALERT_METHODS]].to_numpy()
+        alerts['N_Alerts'] = signalled.sum(axis=1)
+        alerts['Alerts'] = [', '.join(m for m, on in zip(ALERT_METHODS, row) if on) for row in signalled]
+        return alerts, len(periods) - start
+
+    except Exception as e:
+        print(f"An error occurred in aberration provider: {e}")
+        return None, None
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+A case-definition engine that classifies outbreak records in bulk.
+
+A case definition belongs to one disease and lists criteria (clinical
+signs, laboratory results, epidemiological links, time and place windows)
+for each case level. Criteria common to all levels are stored under the
+level 'All'. A definition is compiled either into one QgsExpression per
+level, which the data provider can evaluate itself (as SQL for GeoPackage
+or PostGIS layers), or, when a criterion cannot be expressed that way
+(e.g. an epidemiological link through Trace_Links), into vectorised
+pandas predicates over the attribute table.
+
+Example definition:
+    {"disease_code": "01.01.01.04", "disease": "Anthrax", "criteria": [
+        {"level": "All", "field": "Species", "op": "in", "value": ["Cattle", "Sheep"]},
+        {"level": "Suspect", "field": "Notes", "op": "contains_any", "value": ["sudden death", "bleeding"]},
+        {"level": "Probable", "op": "epi_link", "value": "Confirmed", "depth": 1},
+        {"level": "Confirmed", "field": "Lab_Result", "op": "=", "value": "Positive"}]}
+"""
+
+import re
+import json
+import numpy as np
+import pandas as pd
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import QgsExpression, QgsFeatureRequest, QgsField, QgsProject, NULL
+from .trace_network import trace_network
+
+# Levels from most to least certain; a record gets the first level it meets
+CASE_LEVELS = ["Confirmed", "Probable", "Suspect"]
+NOT_A_CASE = "Not a case"
+
+OPERATORS = ["=", "!=", ">", ">=", "<", "<=", "in", "not in", "contains", "contains_any",
+             "between", "is_null", "not_null", "epi_link"]
+
+# --- Storage (definitions are saved with the QGIS project) ---
+
+def load_case_definitions():
+    """Returns the case definitions saved in the current project, keyed by disease code."""
+    text, found = QgsProject.instance().readEntry("EADST", "case_definitions", "{}")
+    return json.loads(text) if found else {}
+
+def save_case_definition(definition):
+    """Stores one disease's case definition in the current project."""
+    definitions = load_case_definitions()
+    definitions[definition["disease_code"]] = definition
+    return QgsProject.instance().writeEntry("EADST", "case_definitions", json.dumps(definitions))
+
+# --- Compilation to QgsExpression ---
+
+def _literal(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return QgsExpression.quotedValue(str(value))
+
+def _contains(column, text):
+    """
+    Case-insensitive substring test. LIKE lets providers run it as SQL, but
+    treats % and _ as wildcards, so text holding them is matched with strpos.
+    """
+    text = str(text).lower()
+    if "%" in text or "_" in text:
+        return f"strpos(lower({column}), {QgsExpression.quotedValue(text)}) > 0"
+    return f"lower({column}) LIKE {QgsExpression.quotedValue('%' + text + '%')}"
+
+def criterion_expression(criterion):
+    """Compiles one criterion to a QgsExpression string, or None if it cannot be expressed."""
+    op, value = criterion["op"], criterion.get("value")
+    if op == "epi_link":
+        return None
+    column = QgsExpression.quotedColumnRef(criterion["field"])
+    if op == "is_null":
+        return f"{column} IS NULL"
+    if op == "not_null":
+        return f"{column} IS NOT NULL"
+    if op in ("in", "not in"):
+        keyword = "IN" if op == "in" else "NOT IN"
+        return f"{column} {keyword} ({', '.join(_literal(v) for v in value)})"
+    if op == "contains":
+        return _contains(column, value)
+    if op == "contains_any":
+        return "(" + " OR ".join(_contains(column, v) for v in value) + ")"
+    if op == "between":
+        return f"({column} >= {_literal(value[0])} AND {column} <= {_literal(value[1])})"
+    return f"{column} {'<>' if op == '!=' else op} {_literal(value)}"
+
+def compile_expressions(definition):
+    """
+    Compiles a definition to one filter expression per case level.
+
+    :returns: Dict of level -> expression string, or None if any criterion
+        has to be evaluated in pandas.
+    """
+    criteria = definition.get("criteria", [])
+    compiled = [(c["level"], criterion_expression(c)) for c in criteria]
+    if any(expression is None for _, expression in compiled):
+        return None
+    common = [expression for level, expression in compiled if level == "All"]
+    expressions = {}
+    for level in CASE_LEVELS:
+        parts = common + [expression for lvl, expression in compiled if lvl == level]
+        # A level without criteria of its own never matches
+        if len(parts) > len(common):
+            expressions[level] = " AND ".join(f"({part})" for part in parts)
+    return expressions
+
+def classification_expression(definition):
+    """A single CASE expression giving the level of a record (e.g. for a virtual field)."""
+    expressions = compile_expressions(definition)
+    if expressions is None:
+        return None
+    whens = " ".join(f"WHEN {expression} THEN {QgsExpression.quotedValue(level)}"
+                     for level, expression in expressions.items())
+    return f"CASE {whens} ELSE {QgsExpression.quotedValue(NOT_A_CASE)} END"
+
+# --- Compilation to pandas predicates ---
+
+def _coerce(series, value):
+    """Converts a criterion value to the type of the column it is compared with."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.Timestamp(value)
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.to_numeric(value)
+    return value
+
+def criterion_mask(df, criterion, masks=None, links=None):
+    """
+    Evaluates one criterion for all rows at once.
+
+    :param df: DataFrame of the attribute table.
+    :param criterion: Criterion dict.
+    :param masks: Dict of level -> boolean mask of levels already evaluated
+        (used by 'epi_link').
+    :param links: Tuple (sparse symmetric adjacency matrix, row position of
+        each record in it, or -1) for 'epi_link'.
+
+    :returns: Boolean numpy array.
+    """
+    op, value = criterion["op"], criterion.get("value")
+    if op == "epi_link":
+        if links is None or masks is None or value not in masks:
+            return np.zeros(len(df), dtype=bool)
+        matrix, positions = links
+        on_network = positions >= 0
+        linked = np.zeros(matrix.shape[0])
+        linked[positions[masks[value] & on_network]] = 1.0
+        reached = np.zeros(matrix.shape[0], dtype=bool)
+        for _ in range(int(criterion.get("depth", 1))):
+            linked = matrix @ linked
+            reached |= linked > 0
+        return on_network & reached[np.where(on_network, positions, 0)]
+
+    series = df[criterion["field"]]
+    if op == "is_null":
+        return series.isna().to_numpy()
+    if op == "not_null":
+        return series.notna().to_numpy()
+    if op in ("in", "not in"):
+        result = series.isin([_coerce(series, v) for v in value])
+        return (result if op == "in" else ~result & series.notna()).to_numpy()
+    if op in ("contains", "contains_any"):
+        words = [value] if op == "contains" else value
+        pattern = "|".join(re.escape(str(word)) for word in words)
+        return series.astype("string").str.contains(pattern, case=False, regex=True).fillna(False).to_numpy(dtype=bool)
+    if op == "between":
+        return series.between(_coerce(series, value[0]), _coerce(series, value[1])).to_numpy()
+    comparisons = {"=": "eq", "!=": "ne", ">": "gt", ">=": "ge", "<": "lt", "<=": "le"}
+    result = getattr(series, comparisons[op])(_coerce(series, value))
+    return (result & series.notna()).to_numpy()
+
+def classify_frame(df, definition, links=None):
+    """
+    Classifies every row of a DataFrame with vectorised predicates.
+
+    :returns: numpy array of level names (or NOT_A_CASE).
+    """
+    criteria = definition.get("criteria", [])
+    common = np.ones(len(df), dtype=bool)
+    for criterion in criteria:
+        if criterion["level"] == "All":
+            common &= criterion_mask(df, criterion)
+
+    masks, conditions = {}, []
+    for level in CASE_LEVELS:
+        own = [c for c in criteria if c["level"] == level]
+        mask = common.copy() if own else np.zeros(len(df), dtype=bool)
+        for criterion in own:
+            mask &= criterion_mask(df, criterion, masks, links)
+        # Earlier (more certain) levels take precedence
+        masks[level] = mask
+        conditions.append(mask)
+    return np.select(conditions, CASE_LEVELS, default=NOT_A_CASE)
+
+# --- Running a definition on a layer ---
+
+def referenced_fields(definition):
+    return sorted({c["field"] for c in definition.get("criteria", []) if c.get("field")})
+
+def _trace_links(layer, event_ids):
+    """Symmetric adjacency of the Trace_Links network and each record's position in it."""
+    links = QgsProject.instance().mapLayersByName("Trace_Links")
+    if not links:
+        return None
+    matrix, ids = trace_network(links[0]).matrix()
+    position = pd.Index(ids).get_indexer(event_ids)
+    return (matrix + matrix.T).tocsr(), position
+
+def classify_layer(layer, definition, output_field="Case_Class"):
+    """
+    Classifies all records of a layer and writes the level to output_field.
+
+    Definitions that compile to expressions are evaluated by the data
+    provider, which only returns the matching feature ids. Others are
+    evaluated in pandas on the referenced columns only.
+
+    :param layer: The QgsVectorLayer to classify (e.g. Outbreak_Points).
+    :param definition: Case definition dict.
+    :param output_field: Field receiving the case level.
+
+    :returns: Dict of level -> number of records, or None on failure.
+    """
+    try:
+        provider = layer.dataProvider()
+        if layer.fields().indexOf(output_field) == -1:
+            provider.addAttributes([QgsField(output_field, QVariant.String)])
+            layer.updateFields()
+        field_index = layer.fields().indexOf(output_field)
+
+        expressions = compile_expressions(definition)
+        if expressions is not None:
+            all_ids = [feat.id() for feat in layer.getFeatures(
+                QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry).setNoAttributes())]
+            levels = pd.Series(NOT_A_CASE, index=all_ids, dtype=object)
+            assigned = set()
+            for level, expression in expressions.items():
+                request = QgsFeatureRequest().setFilterExpression(expression)
+                request.setFlags(QgsFeatureRequest.NoGeometry).setNoAttributes()
+                ids = [feat.id() for feat in layer.getFeatures(request) if feat.id() not in assigned]
+                levels.loc[ids] = level
+                assigned.update(ids)
+        else:
+            columns = referenced_fields(definition)
+            needs_links = any(c["op"] == "epi_link" for c in definition.get("criteria", []))
+            if needs_links and "Event_ID" not in columns:
+                columns.append("Event_ID")
+            request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+            request.setSubsetOfAttributes(columns, layer.fields())
+            # Ids are read in the same pass as the values: providers do not guarantee the same order twice
+            ids, rows = [], []
+            for feat in layer.getFeatures(request):
+                ids.append(feat.id())
+                rows.append([None if feat[name] == NULL else feat[name] for name in columns])
+            df = pd.DataFrame(rows, columns=columns, index=ids)
+            for name in columns:
+                field = layer.fields().field(name)
+                if field.isDateOrTime():
+                    df[name] = pd.to_datetime(df[name].map(lambda v: v.toPyDateTime() if hasattr(v, 'toPyDateTime') else v),
+                                              errors='coerce')
+                elif field.isNumeric():
+                    df[name] = pd.to_numeric(df[name], errors='coerce')
+            links = _trace_links(layer, df["Event_ID"].astype(str)) if needs_links else None
+            levels = pd.Series(classify_frame(df, definition, links), index=ids, dtype=object)
+
+        changes = {int(fid): {field_index: level} for fid, level in levels.items()}
+        if not provider.changeAttributeValues(changes):
+            print(f"Case definition provider could not write results to layer '{layer.name()}'.")
+            return None
+        layer.triggerRepaint()
+        return levels.value_counts().to_dict()
+
+    except Exception as e:
+        print(f"An error occurred in case definition provider: {e}")
+        return None
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""A provider for kernel density (hotspot) surfaces from outbreak points."""
+
+import numpy as np
+from scipy.signal import fftconvolve
+from qgis.core import (QgsCoordinateReferenceSystem, QgsCoordinateTransform, QgsFeatureRequest,
+                       QgsProject, NULL)
+
+# Projected CRS used for all distance based work (Adindan / UTM zone 37N)
+ANALYSIS_CRS = "EPSG:20137"
+
+def quartic_kernel(radius, cell_size):
+    """
+    Returns a quartic (biweight) kernel stencil, as used by the QGIS heatmap.
+
+    The stencil is normalised so that a point of weight 1 contributes a
+    density that integrates to 1 per square kilometre.
+    """
+    half = int(np.ceil(radius / cell_size))
+    offsets = np.arange(-half, half + 1) * cell_size
+    dx, dy = np.meshgrid(offsets, offsets)
+    d2 = (dx ** 2 + dy ** 2) / radius ** 2
+    kernel = np.where(d2 < 1, (1 - d2) ** 2, 0.0)
+    return kernel / (kernel.sum() * cell_size ** 2) * 1e6
+
+def bin_points(x, y, weights, xmin, ymax, cell_size, n_cols, n_rows):
+    """Sums point weights onto a grid whose first row is the northern edge."""
+    counts, _, _ = np.histogram2d(ymax - y, x - xmin, bins=(n_rows, n_cols),
+                                  range=((0, n_rows * cell_size), (0, n_cols * cell_size)),
+                                  weights=weights)
+    return counts
+
+def kernel_density_grid(x, y, weights=None, radius=50000, cell_size=None, extent=None,
+                        adaptive=False, sensitivity=0.5, bandwidth_classes=8):
+    """
+    Computes a kernel density surface by binning points and convolving via FFT.
+
+    Instead of evaluating the kernel for every point and cell, the points are
+    summed onto the grid and the grid is convolved with the kernel once, so
+    the cost depends on the grid size rather than on the number of points.
+
+    :param x: Array of projected x coordinates (metres).
+    :param y: Array of projected y coordinates (metres).
+    :param weights: Optional array of point weights (e.g. number of cases).
+    :param radius: Kernel radius (bandwidth) in metres.
+    :param cell_size: Output cell size in metres. Defaults to radius / 25.
+    :param extent: Optional (xmin, ymin, xmax, ymax). Defaults to the point
+        extent padded by the radius.
+    :param adaptive: If True, use Abramson's adaptive bandwidth, which narrows
+        the kernel where points are dense and widens it where they are sparse.
+    :param sensitivity: Abramson's alpha (0.5 is the square-root law).
+    :param bandwidth_classes: Number of bandwidth classes the adaptive
+        bandwidths are grouped into, each needing one convolution.
+
+    :returns: Tuple of (2-D density array, (xmin, ymax, cell_size)).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    weights = np.ones_like(x) if weights is None else np.asarray(weights, dtype=float)
+    cell_size = cell_size or radius / 25.0
+
+    if extent is None:
+        pad = radius * (3 if adaptive else 1)
+        extent = (x.min() - pad, y.min() - pad, x.max() + pad, y.max() + pad)
+    xmin, ymin, xmax, ymax = extent
+    n_cols = max(1, int(np.ceil((xmax - xmin) / cell_size)))
+    n_rows = max(1, int(np.ceil((ymax - ymin) / cell_size)))
+
+    counts = bin_points(x, y, weights, xmin, ymax, cell_size, n_cols, n_rows)
+    density = fftconvolve(counts, quartic_kernel(radius, cell_size), mode='same')
+    if not adaptive:
+        return np.clip(density, 0, None), (xmin, ymax, cell_size)
+
+    # Sample the fixed-bandwidth pilot surface at each point
+    cols = np.clip(((x - xmin) / cell_size).astype(int), 0, n_cols - 1)
+    rows = np.clip(((ymax - y) / cell_size).astype(int), 0, n_rows - 1)
+    pilot = np.clip(density[rows, cols], 1e-12, None)
+    geometric_mean = np.exp(np.mean(np.log(pilot)))
+    local_radius = radius * (pilot / geometric_mean) ** -sensitivity
+    local_radius = np.clip(local_radius, radius / 3.0, radius * 3.0)
+
+    # Group points into bandwidth classes; one convolution per class
+    edges = np.quantile(np.log(local_radius), np.linspace(0, 1, bandwidth_classes + 1))
+    classes = np.clip(np.searchsorted(edges, np.log(local_radius), side='right') - 1, 0, bandwidth_classes - 1)
+    density = np.zeros((n_rows, n_cols))
+    for cls in np.unique(classes):
+        members = classes == cls
+        class_radius = float(np.median(local_radius[members]))
+        class_counts = bin_points(x[members], y[members], weights[members], xmin, ymax, cell_size, n_cols, n_rows)
+        density += fftconvolve(class_counts, quartic_kernel(class_radius, cell_size), mode='same')
+    return np.clip(density, 0, None), (xmin, ymax, cell_size)
+
+def write_geotiff(output_path, grid, geotransform, crs_wkt):
+    """Writes a density grid to a single band GeoTIFF."""
+    from osgeo import gdal
+
+    xmin, ymax, cell_size = geotransform
+    n_rows, n_cols = grid.shape
+    dataset = gdal.GetDriverByName('GTiff').Create(output_path, n_cols, n_rows, 1, gdal.GDT_Float32,
+                                                   options=['COMPRESS=DEFLATE', 'TILED=YES'])
+    dataset.SetGeoTransform((xmin, cell_size, 0, ymax, 0, -cell_size))
+    dataset.SetProjection(crs_wkt)
+    band = dataset.GetRasterBand(1)
+    band.WriteArray(grid.astype(np.float32))
+    band.SetNoDataValue(0)
+    dataset.FlushCache()
+    dataset = None
+
+def run_kernel_density_on_layer(layer, output_path, weight_field=None, radius=50000,
+                                cell_size=None, adaptive=False, selected_only=False):
+    """
+    Creates a kernel density GeoTIFF from an outbreak point layer.
+
+    Points are reprojected to EPSG:20137 so that the radius and cell size
+    are in metres regardless of the layer CRS.
+
+    :param layer: Point QgsVectorLayer (e.g. Outbreak_Points).
+    :param output_path: Path of the GeoTIFF to create.
+    :param weight_field: Optional numeric field to weight points by (e.g. 'Cases').
+    :param radius: Kernel radius in metres.
+    :param cell_size: Output cell size in metres.
+    :param adaptive: Use adaptive bandwidths (see kernel_density_grid).
+    :param selected_only: Only use the selected features.
+
+    :returns: The output path, or None on failure.
+    """
+    try:
+        target_crs = QgsCoordinateReferenceSystem(ANALYSIS_CRS)
+        transform = QgsCoordinateTransform(layer.crs(), target_crs, QgsProject.instance())
+
+        request = QgsFeatureRequest().setSubsetOfAttributes([weight_field] if weight_field else [], layer.fields())
+        features = layer.getSelectedFeatures(request) if selected_only else layer.getFeatures(request)
+        xs, ys, ws = [], [], []
+        for feat in features:
+            geom = feat.geometry()
+            if geom.isNull():
+                continue
+            geom.transform(transform)
+            # Multipoint features contribute each of their parts
+            for point in geom.asMultiPoint() if geom.isMultipart() else [geom.asPoint()]:
+                xs.append(point.x())
+                ys.append(point.y())
+                if weight_field:
+                    value = feat[weight_field]
+                    ws.append(0.0 if value == NULL else float(value))
+
+        if not xs:
+            print("Kernel density provider: the layer has no point features.")
+            return None
+
+        grid, geotransform = kernel_density_grid(np.array(xs), np.array(ys), np.array(ws) if weight_field else None,
+                                                 radius=radius, cell_size=cell_size, adaptive=adaptive)
+        write_geotiff(output_path, grid, geotransform, target_crs.toWkt())
+        return output_path
+
+    except Exception as e:
+        print(f"An error occurred in kernel density provider: {e}")
+        return None
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""A provider for building print layouts from the EADST report template."""
+
+import os
+from qgis.PyQt.QtXml import QDomDocument
+from qgis.core import QgsLayout, QgsLayoutExporter, QgsLayoutItemMap, QgsReadWriteContext
+
+# Parsed report templates, keyed by path and modification time
+_TEMPLATE_CACHE = {}
+
+def load_report_template(template_path):
+    """Returns the parsed layout template, re-reading the .qpt file only when it changes."""
+    key = (template_path, os.path.getmtime(template_path))
+    document = _TEMPLATE_CACHE.get(key)
+    if document is None:
+        document = QDomDocument()
+        with open(template_path, encoding='utf-8') as f:
+            document.setContent(f.read())
+        for stale_key in [k for k in _TEMPLATE_CACHE if k[0] == template_path]:
+            del _TEMPLATE_CACHE[stale_key]
+        _TEMPLATE_CACHE[key] = document
+    return document
+
+def build_report_layout(project, template_path):
+    """Creates a new layout for the project from the (cached) report template."""
+    layout = QgsLayout(project)
+    layout.loadFromTemplate(load_report_template(template_path), QgsReadWriteContext())
+    return layout
+
+def export_report_map_image(project, template_path, extent, output_path, dpi=150):
+    """
+    Renders the report template to an image without the layout designer.
+
+    :param project: The QgsProject whose layers are drawn.
+    :param template_path: Path of the .qpt template.
+    :param extent: QgsRectangle (in project CRS) shown by the map items.
+    :param output_path: Path of the image to write (e.g. a .png).
+    :param dpi: Output resolution.
+
+    :returns: The output path, or None on failure.
+    """
+    layout = build_report_layout(project, template_path)
+    for item in layout.items():
+        if isinstance(item, QgsLayoutItemMap):
+            item.zoomToExtent(extent)
+
+    settings = QgsLayoutExporter.ImageExportSettings()
+    settings.dpi = dpi
+    result = QgsLayoutExporter(layout).exportToImage(output_path, settings)
+    return output_path if result == QgsLayoutExporter.Success else None
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+A provider for the field logistics of surveillance plans.
+
+Travel distances between depots (veterinary offices, laboratories) and
+sampling sites are computed as matrices in one vectorised step, either as
+straight-line distances (great circle or projected, times a detour
+factor) or as shortest paths over a road network loaded from a line
+layer. Every site is assigned to its nearest depot, and the sites of each
+depot are visited on day trips planned by a nearest-neighbour tour
+improved by 2-opt and cut into trips of at most a team's daily workload
+("route first, cluster second"). The resulting km and team days per
+sampling round replace the per-unit assumptions of SURVCosT.
+
+Distances are cached per location, on disk next to the project, so when
+the site set of a plan changes only the new sites are computed.
+"""
+
+import hashlib
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from scipy import sparse
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+from .density_provider import ANALYSIS_CRS
+from .pysal_provider import layer_to_geodataframe
+from .sitrep_provider import SitrepCache
+from .aberration_provider import default_cache_dir
+
+DISTANCE_METHODS = ['Great circle (haversine)', 'Projected (EPSG:20137)', 'Road network']
+EARTH_RADIUS_KM = 6371.0088
+# Road km per straight-line km in Ethiopian highlands, for the straight-line methods
+DEFAULT_DETOUR_FACTOR = 1.4
+
+# --- Locations ---
+
+def layer_locations(layer, name_field=None):
+    """
+    Points of a layer (polygons by their representative point) in EPSG:20137.
+
+    :returns: DataFrame with name, x and y, indexed by feature id.
+    """
+    columns = [name_field] if name_field else []
+    gdf = layer_to_geodataframe(layer, columns).to_crs(ANALYSIS_CRS)
+    points = gdf.geometry.representative_point()
+    names = gdf[name_field].astype(str) if name_field else pd.Series(gdf.index.astype(str), index=gdf.index)
+    return pd.DataFrame({'name': names, 'x': points.x, 'y': points.y}, index=gdf.index)
+
+def location_keys(locations):
+    """Key of every location: its EPSG:20137 coordinates to the metre."""
+    return (locations['x'].round(0).astype(np.int64).astype(str) + ','
+            + locations['y'].round(0).astype(np.int64).astype(str)).to_numpy()
+
+# --- Distances ---
+
+def haversine_matrix(lon_a, lat_a, lon_b, lat_b):
+    """Great circle distances (km) between every point of a and every point of b (degrees)."""
+    lon_a, lat_a, lon_b, lat_b = (np.radians(np.asarray(values, dtype=float)) for values in (lon_a, lat_a, lon_b, lat_b))
+    dlat = lat_b[None, :] - lat_a[:, None]
+    dlon = lon_b[None, :] - lon_a[:, None]
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat_a)[:, None] * np.cos(lat_b)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+def projected_matrix(x_a, y_a, x_b, y_b):
+    """Planar distances (km) between every point of a and every point of b (metres)."""
+    return np.hypot(np.subtract.outer(np.asarray(x_a, dtype=float), np.asarray(x_b, dtype=float)),
+                    np.subtract.outer(np.asarray(y_a, dtype=float), np.asarray(y_b, dtype=float))) / 1000.0
+
+class RoadNetwork:
+    """
+    Road graph of a line layer: line vertices (to the metre) are nodes and
+    line segments are edges weighted by their length. Locations join the
+    graph at the nearest node, with the straight access distance added.
+    """
+    def __init__(self, layer):
+        gdf = layer_to_geodataframe(layer, []).to_crs(ANALYSIS_CRS).explode(index_parts=False)
+        gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+        coords = [np.asarray(line.coords)[:, :2] for line in gdf.geometry]
+        starts = np.vstack([c[:-1] for c in coords if len(c) > 1])
+        ends = np.vstack([c[1:] for c in coords if len(c) > 1])
+
+        vertices = np.round(np.vstack([starts, ends]))
+        self.nodes, inverse = np.unique(vertices, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        u, v = inverse[:len(starts)], inverse[len(starts):]
+        length = np.hypot(*(ends - starts).T) / 1000.0
+        # Parallel segments between the same nodes keep the shortest
+        edges = pd.DataFrame({'u': np.minimum(u, v), 'v': np.maximum(u, v), 'km': length})
+        edges = edges[edges['u'] != edges['v']].groupby(['u', 'v'], as_index=False)['km'].min()
+        n = len(self.nodes)
+        self.graph = sparse.coo_matrix((edges['km'], (edges['u'], edges['v'])), shape=(n, n)).tocsr()
+        self.tree = cKDTree(self.nodes)
+        self.digest = hashlib.sha1(self.nodes.tobytes() + edges.to_numpy().tobytes()).hexdigest()[:16]
+
+    def matrix(self, x_a, y_a, x_b, y_b):
+        """Road distances (km) from every point of a to every point of b (inf where not connected)."""
+        access_a, node_a = self.tree.query(np.column_stack([x_a, y_a]))
+        access_b, node_b = self.tree.query(np.column_stack([x_b, y_b]))
+        sources, source_of = np.unique(node_a, return_inverse=True)
+        paths = dijkstra(self.graph, directed=False, indices=sources)
+        return paths[source_of][:, node_b] + access_a[:, None] / 1000.0 + access_b[None, :] / 1000.0
+
+class TravelDistances:
+    """
+    Travel distances (km) between any locations, cached per location.
+
+    :param method: One of DISTANCE_METHODS.
+    :param detour_factor: Road km per straight-line km (straight-line
+        methods, and sites off the road network).
+    :param network: RoadNetwork for the road method.
+    :param cache_dir: Folder of the on-disk cache (None keeps it in memory only).
+    """
+    def __init__(self, method='Projected (EPSG:20137)', detour_factor=DEFAULT_DETOUR_FACTOR, network=None,
+                 cache_dir=None):
+        if method == 'Road network' and network is None:
+            raise ValueError("The road network method needs a road network layer.")
+        self.method = method
+        self.detour_factor = detour_factor
+        self.network = network
+        self.cache = SitrepCache(cache_dir) if cache_dir else None
+        # One cache entry per method, so switching methods keeps the others
+        self.cache_step = f"distances_{method.split()[0].lower()}"
+        self.cache_key = SitrepCache.key(self.cache_step, detour_factor, network.digest if network else None)
+        self.matrix = None
+        if self.cache:
+            self.matrix = self.cache.get(self.cache_step, self.cache_key)
+        if self.matrix is None:
+            self.matrix = pd.DataFrame(dtype=float)
+        self.n_computed = 0
+
+    def _compute(self, a, b):
+        if self.method == 'Road network':
+            km = self.network.matrix(a['x'], a['y'], b['x'], b['y'])
+            # Sites off the connected network fall back to straight-line distance
+            straight = projected_matrix(a['x'], a['y'], b['x'], b['y']) * self.detour_factor
+            return np.where(np.isfinite(km), km, straight)
+        if self.method == 'Great circle (haversine)':
+            lonlat_a = gpd.points_from_xy(a['x'], a['y'], crs=ANALYSIS_CRS).to_crs('EPSG:4326')
+            lonlat_b = gpd.points_from_xy(b['x'], b['y'], crs=ANALYSIS_CRS).to_crs('EPSG:4326')
+            return haversine_matrix(lonlat_a.x, lonlat_a.y, lonlat_b.x, lonlat_b.y) * self.detour_factor
+        return projected_matrix(a['x'], a['y'], b['x'], b['y']) * self.detour_factor
+
+    def between(self, locations):
+        """
+        Distance matrix (km) between the given locations, computing only the
+        rows and columns of locations not seen before.
+
+        :param locations: DataFrame with x and y in EPSG:20137.
+
+        :returns: Square array in the order of locations.
+        """
+        keys = location_keys(locations)
+        unique = pd.Series(keys).drop_duplicates()
+        new = unique[~unique.isin(self.matrix.index)]
+        if len(new):
+            coords = locations.iloc[new.index][['x', 'y']].reset_index(drop=True)
+            old_keys = self.matrix.index
+            # Rows from the new locations to all locations in one call (one shortest path search per new site)
+            old_coords = pd.DataFrame([key.split(',') for key in old_keys], columns=['x', 'y'], dtype=float)
+            rows = self._compute(coords, pd.concat([coords, old_coords], ignore_index=True))
+            to_new, to_old = rows[:, :len(new)], rows[:, len(new):]
+            np.fill_diagonal(to_new, 0.0)
+            all_keys = old_keys.append(pd.Index(new.to_numpy()))
+            matrix = self.matrix.reindex(index=all_keys, columns=all_keys)
+            matrix.loc[new.to_numpy(), new.to_numpy()] = to_new
+            if len(old_keys):
+                matrix.loc[new.to_numpy(), old_keys] = to_old
+                matrix.loc[old_keys, new.to_numpy()] = to_old.T
+            self.matrix = matrix
+            self.n_computed = len(new)
+            if self.cache:
+                self.cache.put(self.cache_step, self.cache_key, self.matrix)
+        else:
+            self.n_computed = 0
+        return self.matrix.loc[keys, keys].to_numpy()
+
+# --- Routes ---
+
+def nearest_neighbour_tour(distances, start, stops):
+    """Order of the stops, each time visiting the nearest not yet visited, from start."""
+    order, current = [], start
+    remaining = np.asarray(stops)
+    while remaining.size:
+        nearest = np.argmin(distances[current, remaining])
+        current = remaining[nearest]
+        order.append(current)
+        remaining = np.delete(remaining, nearest)
+    return np.asarray(order, dtype=np.int64)
+
+def two_opt(distances, tour, max_passes=50):
+    """
+    Improves a closed tour (first element fixed, e.g. the depot) by
+    reversing segments while that shortens it, testing all second cut
+    points of each first cut point at once.
+    """
+    tour = np.asarray(tour).copy()
+    n = tour.size
+    for _ in range(max_passes):
+        improved = False
+        for i in range(n - 2):
+            j = np.arange(i + 2, n)
+            a, b = tour[i], tour[i + 1]
+            c, d = tour[j], tour[(j + 1) % n]
+            gain = distances[a, b] + distances[c, d] - distances[a, c] - distances[b, d]
+            best = np.argmax(gain)
+            if gain[best] > 1e-9:
+                tour[i + 1:j[best] + 1] = tour[i + 1:j[best] + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return tour
+
+def split_trips(distances, depot, tour, sites_per_day, max_km_per_day=None):
+    """
+    Cuts a tour into day trips from and back to the depot, each of at most
+    sites_per_day sites and (when possible) max_km_per_day km.
+
+    :returns: List of (sites, km) per trip.
+    """
+    trips, current = [], []
+
+    def trip_km(sites):
+        path = [depot] + sites + [depot]
+        return float(sum(distances[path[k], path[k + 1]] for k in range(len(path) - 1)))
+
+    for site in tour:
+        candidate = current + [int(site)]
+        too_far = max_km_per_day and current and trip_km(candidate) > max_km_per_day
+        if len(candidate) > sites_per_day or too_far:
+            trips.append((current, trip_km(current)))
+            candidate = [int(site)]
+        current = candidate
+    if current:
+        trips.append((current, trip_km(current)))
+    return trips
+
+def plan_routes(depots, sites, distances, sites_per_day=3, max_km_per_day=None):
+    """
+    Assigns every site to its nearest depot and plans the day trips of each depot.
+
+    :param depots: DataFrame of depots (name, x, y).
+    :param sites: DataFrame of sites (name, x, y).
+    :param distances: TravelDistances.
+    :param sites_per_day: Sites a field team visits in a day.
+    :param max_km_per_day: Optional longest trip in km.
+
+    :returns: Tuple of (trips DataFrame with depot, trip, sites, n_sites, km
+        and path, the stop coordinates from and back to the depot; sites
+        DataFrame with the depot and trip of every site and the km from its
+        depot), or (None, None) on failure.
+    """
+    try:
+        locations = pd.concat([depots[['x', 'y']], sites[['x', 'y']]], ignore_index=True)
+        matrix = distances.between(locations)
+        n_depots = len(depots)
+        to_sites = matrix[:n_depots, n_depots:]
+        nearest = np.argmin(to_sites, axis=0)
+
+        trip_rows = []
+        site_depot = np.empty(len(sites), dtype=object)
+        site_trip = np.zeros(len(sites), dtype=np.int64)
+        for depot in np.unique(nearest):
+            stops = n_depots + np.flatnonzero(nearest == depot)
+            tour = nearest_neighbour_tour(matrix, depot, stops)
+            tour = two_opt(matrix, np.concatenate([[depot], tour]))[1:]
+            for number, (trip_sites, km) in enumerate(split_trips(matrix, depot, tour, sites_per_day,
+                                                                  max_km_per_day), start=1):
+                positions = np.asarray(trip_sites) - n_depots
+                site_depot[positions] = depots['name'].iloc[depot]
+                site_trip[positions] = number
+                path = locations.iloc[[depot] + list(trip_sites) + [depot]]
+                trip_rows.append({'depot': depots['name'].iloc[depot], 'trip': number,
+                                  'sites': ', '.join(sites['name'].iloc[positions].astype(str)),
+                                  'n_sites': len(positions), 'km': km,
+                                  'path': list(zip(path['x'], path['y']))})
+
+        trips = pd.DataFrame(trip_rows, columns=['depot', 'trip', 'sites', 'n_sites', 'km', 'path'])
+        assigned = sites.assign(depot=site_depot, trip=site_trip,
+                                km_from_depot=to_sites[nearest, np.arange(len(sites))])
+        return trips, assigned
+
+    except Exception as e:
+        print(f"An error occurred in logistics provider: {e}")
+        return None, None
+
+def route_quantities(trips):
+    """Quantities for SURVCosT: road km and team days of one sampling round."""
+    return {'km_per_round': float(trips['km'].sum()), 'team_days_per_round': float(len(trips))}
+
+def distances_for(method, detour_factor=DEFAULT_DETOUR_FACTOR, road_layer=None, cache_dir=None):
+    """A TravelDistances for a method, loading the road network layer if needed."""
+    network = RoadNetwork(road_layer) if method == 'Road network' else None
+    return TravelDistances(method, detour_factor, network, cache_dir or default_cache_dir())
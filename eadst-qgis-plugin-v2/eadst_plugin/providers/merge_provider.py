@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+A provider to merge field team GeoPackages back into the master layers.
+
+Every record is identified by a key (Event_ID for outbreak points, the
+source/destination/type triple for trace links) and summarised by a hash
+of its attributes and geometry. A merge is a three-way comparison per key
+between the master, each team file and the base: the hash the record had
+when the master was last merged (kept in the project). A team edit is
+applied when only that team changed the record; it is a conflict when
+several teams changed it differently, or when the master changed it too.
+Records missing from a team file are left alone (teams only add and edit).
+Only the master fields that every team file has are compared and written,
+so fields kept in the master alone (e.g. Case_Class, LISA results) are
+neither seen as edits nor overwritten.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import QgsFeature, QgsGeometry, QgsProject, NULL
+from .parallel import resolve_n_jobs
+from .pysal_provider import layer_to_geodataframe
+
+# Fields identifying a record in each mergeable layer
+MERGE_KEYS = {
+    "Outbreak_Points": ["Event_ID"],
+    "Trace_Links": ["Source_ID", "Dest_ID", "Trace_Type"],
+}
+KEY_SEPARATOR = "\x1f"
+INTEGER_TYPES = (QVariant.Int, QVariant.UInt, QVariant.LongLong, QVariant.ULongLong)
+
+# --- Normalisation and hashing ---
+
+def layer_schema(layer):
+    """Returns the master layer's fields as an ordered dict of name -> kind."""
+    schema = {}
+    for field in layer.fields():
+        if field.isDateOrTime():
+            schema[field.name()] = "datetime"
+        elif field.type() in INTEGER_TYPES:
+            schema[field.name()] = "int"
+        elif field.isNumeric():
+            schema[field.name()] = "float"
+        else:
+            schema[field.name()] = "string"
+    return schema
+
+def _to_datetime(column):
+    """Parses dates to naive timestamps at one-second resolution, whatever mix of ISO formats they come in."""
+    if not pd.api.types.is_datetime64_any_dtype(column):
+        try:
+            column = pd.to_datetime(column, errors="coerce", format="mixed")
+        except (TypeError, ValueError):
+            # pandas < 2.0 has no mixed format; parse value by value
+            column = column.map(lambda v: pd.to_datetime(v, errors="coerce"))
+            column = pd.to_datetime(column, errors="coerce", utc=any(getattr(v, "tzinfo", None) for v in column))
+    if getattr(column.dt, "tz", None) is not None:
+        column = column.dt.tz_localize(None)
+    return column.dt.floor("s")
+
+def conform_frame(df, schema):
+    """
+    Converts a frame to the master schema: missing columns become nulls,
+    extra columns are dropped and each column gets the master's type.
+    """
+    conformed = {}
+    for name, kind in schema.items():
+        column = df[name] if name in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+        if kind == "datetime":
+            conformed[name] = _to_datetime(column.map(lambda v: v.toPyDateTime() if hasattr(v, "toPyDateTime") else v))
+        elif kind == "int":
+            conformed[name] = pd.to_numeric(column, errors="coerce").round().astype("Int64")
+        elif kind == "float":
+            conformed[name] = pd.to_numeric(column, errors="coerce")
+        else:
+            conformed[name] = pd.Series([None if pd.isna(v) else str(v) for v in column], index=df.index, dtype=object)
+    return pd.DataFrame(conformed, index=df.index)
+
+def shared_schema(schema, frames, key_fields=()):
+    """
+    Restricts the master schema to the fields every frame has, plus the key
+    fields: the fields a merge compares and writes.
+    """
+    return {name: kind for name, kind in schema.items()
+            if name in key_fields or all(name in frame.columns for frame in frames)}
+
+def row_keys(df, key_fields):
+    """Returns the merge key of every row as a string Series."""
+    parts = [df[name].astype("string").fillna("") for name in key_fields]
+    key = parts[0]
+    for part in parts[1:]:
+        key = key + KEY_SEPARATOR + part
+    return key.astype(object)
+
+def row_hashes(attributes, geometry):
+    """
+    Hashes attributes and geometry of all rows at once.
+
+    Values are hashed in a canonical text form, so the same record gives the
+    same hash whether it was read from the master layer or a GeoPackage.
+    """
+    canonical = attributes.astype("string").fillna("\x00")
+    canonical["__geometry__"] = geometry.to_wkb(hex=True, output_dimension=2, byte_order=1)
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+
+def prepare_frame(gdf, schema, key_fields, crs=None):
+    """
+    Conforms a GeoDataFrame to the master schema and indexes it by merge key.
+
+    :returns: GeoDataFrame indexed by key, with the master fields, geometry
+        (in crs), a 'hash' column and the original index in 'source_index'.
+        Only the first row of a key is kept.
+    """
+    if crs is not None and gdf.crs is not None and not gdf.crs.equals(crs):
+        gdf = gdf.to_crs(crs)
+    attributes = conform_frame(pd.DataFrame(gdf.drop(columns=gdf.geometry.name)), schema)
+    prepared = gpd.GeoDataFrame(attributes, geometry=gdf.geometry.values, crs=gdf.crs)
+    prepared["hash"] = row_hashes(attributes, prepared.geometry)
+    prepared["source_index"] = gdf.index.to_numpy()
+    prepared.index = pd.Index(row_keys(attributes, key_fields), name="key")
+    prepared = prepared[prepared.index != ""]
+    return prepared[~prepared.index.duplicated()]
+
+# --- Merge planning ---
+
+def _lookup(hashes, keys):
+    """Hashes of keys (0 where missing) and whether each key was found, without a float round trip."""
+    if hashes is None or not len(hashes):
+        return np.zeros(len(keys), dtype=np.uint64), np.zeros(len(keys), dtype=bool)
+    hashes = hashes[~hashes.index.duplicated()]
+    positions = hashes.index.get_indexer(keys)
+    found = positions >= 0
+    values = hashes.to_numpy(dtype=np.uint64)[np.where(found, positions, 0)]
+    return np.where(found, values, np.uint64(0)), found
+
+def plan_merge(master, teams, base=None):
+    """
+    Decides, per key, what to do with every team's version of a record.
+
+    :param master: Series of hash per key for the master layer.
+    :param teams: Dict of team name -> Series of hash per key.
+    :param base: Optional Series of hash per key as of the last merge.
+        Keys without a base are compared with the master instead.
+
+    :returns: DataFrame with one row per (key, team) version that differs
+        from the base, with columns key, team, hash, action ('insert',
+        'update', 'skip' or 'conflict') and reason.
+    """
+    frames = [pd.DataFrame({"key": hashes.index, "team": team, "hash": hashes.to_numpy()})
+              for team, hashes in teams.items() if len(hashes)]
+    if not frames:
+        return pd.DataFrame(columns=["key", "team", "hash", "action", "reason"])
+    versions = pd.concat(frames, ignore_index=True)
+
+    master_hash, in_master = _lookup(master, versions["key"])
+    base_hash, in_base = _lookup(base, versions["key"])
+    base_hash = np.where(in_base, base_hash, master_hash)
+
+    # Versions equal to the base were not edited by the team
+    edited = ~(in_base | in_master) | (versions["hash"].to_numpy() != base_hash)
+    versions = versions[edited].copy()
+    master_hash, base_hash = master_hash[edited], base_hash[edited]
+    in_master, in_base = in_master[edited], in_base[edited]
+
+    distinct = versions.groupby("key")["hash"].transform("nunique").to_numpy()
+    master_changed = in_base & in_master & (master_hash != base_hash)
+    same_as_master = in_master & (versions["hash"].to_numpy() == master_hash)
+
+    conditions = [distinct > 1, in_base & ~in_master, same_as_master, master_changed, ~in_master]
+    versions["action"] = np.select(conditions, ["conflict", "conflict", "skip", "conflict", "insert"],
+                                   default="update")
+    versions["reason"] = np.select(conditions, ["Edited differently by several teams", "Deleted in master",
+                                                "Already in master", "Edited in master and by team", ""],
+                                   default="")
+    # Teams making the same edit need it applied only once
+    duplicate = versions.duplicated(["key", "hash"]) & versions["action"].isin(["insert", "update"])
+    versions.loc[duplicate, ["action", "reason"]] = ["skip", "Same edit as another team"]
+    return versions.reset_index(drop=True)
+
+# --- Base ledger (stored in the project) ---
+
+def load_merge_base(layer_name, fields):
+    """
+    Returns the hash per key of a layer as of its last merge. Hashes cover
+    the fields merged then, so the base is empty if those were other fields.
+    """
+    text, found = QgsProject.instance().readEntry("EADST", f"merge_base/{layer_name}", "{}")
+    ledger = json.loads(text) if found else {}
+    hashes = ledger.get("hashes", {}) if ledger.get("fields") == list(fields) else {}
+    return pd.Series({key: np.uint64(int(value, 16)) for key, value in hashes.items()}, dtype="uint64")
+
+def save_merge_base(layer_name, hashes, fields):
+    ledger = {"fields": list(fields), "hashes": {key: format(int(value), "x") for key, value in hashes.items()}}
+    QgsProject.instance().writeEntry("EADST", f"merge_base/{layer_name}", json.dumps(ledger))
+
+# --- Reading and applying ---
+
+def read_team_layer(path, layer_name):
+    """Reads one layer of a team GeoPackage, or returns None if it has no such layer."""
+    try:
+        return gpd.read_file(path, layer=layer_name)
+    except Exception:
+        return None
+
+def read_team_files(paths, layer_name, n_jobs=-1):
+    """Reads the same layer from all team GeoPackages concurrently (the reads release the GIL)."""
+    with ThreadPoolExecutor(max_workers=max(1, min(resolve_n_jobs(n_jobs), len(paths)))) as pool:
+        return dict(zip(paths, pool.map(lambda path: read_team_layer(path, layer_name), paths)))
+
+def geometry_from_wkb(wkb):
+    """A QgsGeometry decoded from WKB (fromWkb fills an existing geometry)."""
+    geom = QgsGeometry()
+    geom.fromWkb(wkb)
+    return geom
+
+def _attribute_lists(frame, schema):
+    """Attribute lists in master field order, with NULL for missing values."""
+    table = frame[list(schema)].astype(object)
+    for name, kind in schema.items():
+        if kind == "datetime":
+            table[name] = frame[name].map(lambda v: v.to_pydatetime() if pd.notna(v) else None)
+    return table.where(table.notna(), NULL).values.tolist()
+
+def apply_versions(layer, versions, master_fids):
+    """
+    Writes team versions to the master layer in two batched provider calls.
+
+    :param layer: Master QgsVectorLayer.
+    :param versions: GeoDataFrame of team rows (conformed, key-indexed) with
+        an 'action' column of 'insert' or 'update'. Only the master fields
+        among its columns are written; inserts leave the others NULL.
+    :param master_fids: Series of master feature id per key.
+
+    :returns: True on success.
+    """
+    schema = {name: kind for name, kind in layer_schema(layer).items() if name in versions.columns}
+    indices = [layer.fields().indexOf(name) for name in schema]
+    provider = layer.dataProvider()
+    inserts = versions[versions["action"] == "insert"]
+    updates = versions[versions["action"] == "update"]
+
+    if len(updates):
+        fids = master_fids.reindex(updates.index).astype(int).tolist()
+        changes = {fid: dict(zip(indices, values)) for fid, values in zip(fids, _attribute_lists(updates, schema))}
+        geometries = {fid: geometry_from_wkb(wkb) for fid, wkb in zip(fids, updates.geometry.to_wkb())}
+        if not provider.changeAttributeValues(changes) or not provider.changeGeometryValues(geometries):
+            return False
+
+    if len(inserts):
+        features = []
+        for wkb, values in zip(inserts.geometry.to_wkb(), _attribute_lists(inserts, schema)):
+            feat = QgsFeature(layer.fields())
+            feat.setGeometry(geometry_from_wkb(wkb))
+            for index, value in zip(indices, values):
+                feat.setAttribute(index, value)
+            features.append(feat)
+        success, _ = provider.addFeatures(features)
+        if not success:
+            return False
+
+    layer.updateExtents()
+    layer.triggerRepaint()
+    return True
+
+def merge_team_files(layer, paths, key_fields=None, n_jobs=-1, feedback=None):
+    """
+    Merges one layer from several team GeoPackages into the master layer.
+
+    :param layer: Master QgsVectorLayer (e.g. Outbreak_Points).
+    :param paths: List of team GeoPackage paths.
+    :param key_fields: Fields identifying a record (defaults to MERGE_KEYS).
+    :param n_jobs: Number of files read at the same time (-1 = all cores).
+    :param feedback: Optional callable receiving progress messages.
+
+    :returns: Dict with 'plan' (see plan_merge, plus a 'file' column),
+        'conflicts' (GeoDataFrame of conflicting team versions), 'inserted',
+        'updated', 'missing' (files without the layer) and 'fields' (the
+        fields compared and written), or None on failure.
+    """
+    try:
+        key_fields = key_fields or MERGE_KEYS[layer.name()]
+        report = feedback or (lambda message: None)
+
+        report(f"Reading {len(paths)} team file(s)...")
+        raw = read_team_files(paths, layer.name(), n_jobs)
+        missing = [path for path, gdf in raw.items() if gdf is None]
+        present = {path: gdf for path, gdf in raw.items() if gdf is not None}
+        schema = shared_schema(layer_schema(layer), present.values(), key_fields)
+
+        master = prepare_frame(layer_to_geodataframe(layer, list(schema)), schema, key_fields)
+        master_fids = master["source_index"]
+        crs = master.crs
+        teams = {path: prepare_frame(gdf, schema, key_fields, crs) for path, gdf in present.items()}
+
+        base = load_merge_base(layer.name(), schema)
+        plan = plan_merge(master["hash"], {path: team["hash"] for path, team in teams.items()}, base)
+        plan = plan.rename(columns={"team": "file"})
+
+        def team_rows(rows):
+            if rows.empty:
+                return gpd.GeoDataFrame(columns=list(schema) + ["geometry", "file", "action", "reason"],
+                                        geometry="geometry", crs=crs)
+            frames = [teams[path].loc[group["key"]].assign(file=path, action=group["action"].to_numpy(),
+                                                           reason=group["reason"].to_numpy())
+                      for path, group in rows.groupby("file")]
+            return gpd.GeoDataFrame(pd.concat(frames), geometry="geometry", crs=crs)
+
+        to_apply = team_rows(plan[plan["action"].isin(["insert", "update"])])
+        report(f"Applying {len(to_apply)} change(s)...")
+        if len(to_apply) and not apply_versions(layer, to_apply, master_fids):
+            print(f"Merge provider: changes could not be written to '{layer.name()}'.")
+            return None
+
+        # The merged state becomes the base, except where a conflict is still open
+        conflicts = team_rows(plan[plan["action"] == "conflict"])
+        merged = master["hash"].copy()
+        merged = pd.concat([merged[~merged.index.isin(to_apply.index)], to_apply["hash"]])
+        open_keys = conflicts.index.unique()
+        merged = merged[~merged.index.isin(open_keys)]
+        if len(open_keys):
+            merged = pd.concat([merged, base[base.index.isin(open_keys)]])
+        save_merge_base(layer.name(), merged[~merged.index.duplicated(keep="last")], schema)
+
+        return {"plan": plan, "conflicts": conflicts, "missing": missing, "fields": list(schema),
+                "inserted": int((to_apply["action"] == "insert").sum()),
+                "updated": int((to_apply["action"] == "update").sum())}
+
+    except Exception as e:
+        print(f"An error occurred in merge provider: {e}")
+        return None
+
+def resolve_conflict(layer, version):
+    """
+    Applies one team's version of a conflicting record to the master.
+
+    :param layer: Master QgsVectorLayer.
+    :param version: One-row GeoDataFrame from merge_team_files()['conflicts'].
+
+    :returns: True on success.
+    """
+    try:
+        schema = layer_schema(layer)
+        key_fields = MERGE_KEYS[layer.name()]
+        key_schema = {name: schema[name] for name in key_fields}
+        master_fids = prepare_frame(layer_to_geodataframe(layer, key_fields), key_schema, key_fields)["source_index"]
+        version = version.assign(action=np.where(version.index.isin(master_fids.index), "update", "insert"))
+        if not apply_versions(layer, version, master_fids):
+            return False
+        # The version was hashed over the fields of its merge
+        fields = [name for name in schema if name in version.columns]
+        base = load_merge_base(layer.name(), fields)
+        base.loc[version.index[0]] = np.uint64(version["hash"].iloc[0])
+        save_merge_base(layer.name(), base, fields)
+        return True
+    except Exception as e:
+        print(f"An error occurred in merge provider: {e}")
+        return None
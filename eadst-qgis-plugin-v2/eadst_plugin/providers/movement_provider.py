@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""A provider to turn animal movement records into trace links in bulk."""
+
+import numpy as np
+import pandas as pd
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (QgsCoordinateTransform, QgsFeature, QgsFeatureRequest, QgsField, QgsGeometry,
+                       QgsProject, NULL)
+from .trace_network import trace_network
+
+# Extra Trace_Links fields written for movement records
+MOVEMENT_FIELDS = {"Move_Date": QVariant.String, "Head_Count": QVariant.Int}
+
+def linestring_wkb(x0, y0, x1, y1):
+    """
+    Encodes two-point lines as WKB, for all rows at once.
+
+    :returns: List of WKB byte strings, one per line.
+    """
+    records = np.zeros(len(x0), dtype=[('order', 'u1'), ('type', '<u4'), ('count', '<u4'), ('coords', '<f8', (4,))])
+    records['order'] = 1  # little endian
+    records['type'] = 2   # LineString
+    records['count'] = 2
+    records['coords'] = np.column_stack([x0, y0, x1, y1])
+    raw, size = records.tobytes(), records.dtype.itemsize
+    return [raw[i * size:(i + 1) * size] for i in range(len(records))]
+
+def resolve_movements(movements, premises, origin_column, dest_column):
+    """
+    Looks up the origin and destination of each movement by Event_ID.
+
+    :param movements: DataFrame of movement records.
+    :param premises: DataFrame indexed by Event_ID with 'x' and 'y' columns.
+        The first premise is used if an Event_ID occurs more than once.
+    :param origin_column: Column of movements holding the origin Event_ID.
+    :param dest_column: Column of movements holding the destination Event_ID.
+
+    :returns: Tuple of (resolved movements with x0, y0, x1, y1 columns,
+        unresolved movements with an 'error' column).
+    """
+    premises = premises[~premises.index.duplicated()]
+    origin = premises.index.get_indexer(movements[origin_column].astype(str).str.strip())
+    dest = premises.index.get_indexer(movements[dest_column].astype(str).str.strip())
+
+    error = np.select([(origin < 0) & (dest < 0), origin < 0, dest < 0, origin == dest],
+                      ["Unknown origin and destination", "Unknown origin", "Unknown destination",
+                       "Origin equals destination"], default="")
+    ok = error == ""
+    resolved = movements[ok].copy()
+    resolved['x0'] = premises['x'].to_numpy()[origin[ok]]
+    resolved['y0'] = premises['y'].to_numpy()[origin[ok]]
+    resolved['x1'] = premises['x'].to_numpy()[dest[ok]]
+    resolved['y1'] = premises['y'].to_numpy()[dest[ok]]
+    unresolved = movements[~ok].copy()
+    unresolved['error'] = error[~ok]
+    return resolved, unresolved
+
+def premise_coordinates(layer, crs):
+    """Returns a DataFrame of premise coordinates in crs, indexed by Event_ID."""
+    transform = QgsCoordinateTransform(layer.crs(), crs, QgsProject.instance())
+    request = QgsFeatureRequest().setSubsetOfAttributes(['Event_ID'], layer.fields())
+    ids, xs, ys = [], [], []
+    for feat in layer.getFeatures(request):
+        event_id = feat['Event_ID']
+        if event_id == NULL or not feat.hasGeometry():
+            continue
+        point = transform.transform(feat.geometry().centroid().asPoint())
+        ids.append(str(event_id))
+        xs.append(point.x())
+        ys.append(point.y())
+    return pd.DataFrame({'x': xs, 'y': ys}, index=pd.Index(ids, name='Event_ID'))
+
+def import_movements(movements, premise_layer, trace_layer, origin_column, dest_column,
+                     date_column=None, head_column=None):
+    """
+    Writes movement records to the trace links layer in one batched call.
+
+    :param movements: DataFrame of movement (permit) records.
+    :param premise_layer: Layer with the premises (e.g. Outbreak_Points).
+    :param trace_layer: Trace_Links layer to write to.
+    :param origin_column: Column holding the origin Event_ID.
+    :param dest_column: Column holding the destination Event_ID.
+    :param date_column: Optional column holding the movement date.
+    :param head_column: Optional column holding the number of animals moved.
+
+    :returns: Tuple of (number of links added, DataFrame of unresolved
+        records), or (None, None) on failure.
+    """
+    try:
+        premises = premise_coordinates(premise_layer, trace_layer.crs())
+        resolved, unresolved = resolve_movements(movements, premises, origin_column, dest_column)
+        if resolved.empty:
+            return 0, unresolved
+
+        provider = trace_layer.dataProvider()
+        missing = [QgsField(name, field_type) for name, field_type in MOVEMENT_FIELDS.items()
+                   if trace_layer.fields().indexOf(name) == -1]
+        if missing:
+            provider.addAttributes(missing)
+            trace_layer.updateFields()
+
+        fields = trace_layer.fields()
+        columns = {'Source_ID': resolved[origin_column].astype(str).str.strip(),
+                   'Dest_ID': resolved[dest_column].astype(str).str.strip(),
+                   'Trace_Type': pd.Series('Movement', index=resolved.index)}
+        if date_column:
+            columns['Move_Date'] = pd.to_datetime(resolved[date_column], errors='coerce').dt.strftime('%Y-%m-%d')
+        if head_column:
+            columns['Head_Count'] = pd.to_numeric(resolved[head_column], errors='coerce')
+        # Attribute lists in layer field order, with NULL for anything not supplied
+        table = pd.DataFrame(columns).reindex(columns=fields.names())
+        rows = table.astype(object).where(table.notna(), NULL).values.tolist()
+
+        features = []
+        for wkb, attributes in zip(linestring_wkb(resolved['x0'], resolved['y0'], resolved['x1'], resolved['y1']), rows):
+            feat = QgsFeature(fields)
+            geom = QgsGeometry()
+            geom.fromWkb(wkb)
+            feat.setGeometry(geom)
+            feat.setAttributes(attributes)
+            features.append(feat)
+
+        # Built before the write, so a first load does not read the new links as well
+        network = trace_network(trace_layer)
+        success, added = provider.addFeatures(features)
+        if not success:
+            print("Movement provider: the trace links could not be written.")
+            return None, None
+        network.on_provider_features_added(added)
+        trace_layer.updateExtents()
+        return len(added), unresolved
+
+    except Exception as e:
+        print(f"An error occurred in movement provider: {e}")
+        return None, None
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+A provider for OutCosT, the assessment of outbreak impact.
+
+The losses of an outbreak follow from its cases and population at risk
+and the economic parameters of its species: deaths (cases x case
+fatality) lose the value of the animal, recovered cases part of it plus
+milk and draught power, and the response costs an investigation per
+outbreak, treatment per case and vaccination of part of the population
+at risk. The model is evaluated on arrays of outbreaks, or of strata such
+as woreda and species, and of parameter values (draws or sweeps) at once.
+As it is linear in the counts, admin-level rollups only need the counts
+summed per unit and species, which are kept between runs. The model
+functions are free of QGIS imports, so they can also run in worker
+processes (see sensitivity_provider).
+"""
+
+import functools
+import numpy as np
+import pandas as pd
+from .survcost_provider import sample_parameters, summarise_costs
+
+IMPACT_COMPONENTS = ['Mortality', 'Morbidity', 'Milk', 'Draught', 'Control', 'Total']
+COUNT_COLUMNS = ['Outbreaks', 'Cases', 'Pop_At_Risk']
+IMPACT_PARAMETERS = ['case_fatality', 'morbidity_value_loss', 'treatment_cost_per_case',
+                     'vaccination_cost_per_head', 'vaccination_coverage', 'outbreak_response_cost']
+SPECIES_PARAMETERS = ['animal_value', 'milk_loss', 'draught_loss']
+# Species without parameters of their own
+OTHER_SPECIES = 'other'
+
+# --- Impact model ---
+
+def species_keys(params):
+    """Species with parameters of their own, e.g. 'cattle' for animal_value_cattle."""
+    prefix = f'{SPECIES_PARAMETERS[0]}_'
+    return sorted(name[len(prefix):] for name in params if name.startswith(prefix))
+
+def impact_parameter_names(names):
+    """The economic parameters among names that the impact model uses."""
+    prefixes = tuple(f'{item}_' for item in SPECIES_PARAMETERS)
+    return [name for name in names if name in IMPACT_PARAMETERS or name.startswith(prefixes)]
+
+def species_codes(species, keys):
+    """
+    Position in keys of the species of every record, matched in any case
+    and in the plural ('Goats'); species without parameters count as 'other'.
+    """
+    names = pd.Series(np.asarray(species, dtype=object)).fillna('').astype(str).str.strip().str.lower()
+    lookup = pd.Series(np.arange(len(keys)), index=keys)
+    codes = names.map(lookup).fillna(names.str.replace(r's$', '', regex=True).map(lookup))
+    return codes.fillna(lookup[OTHER_SPECIES]).astype(np.int64).to_numpy()
+
+def impact_components(counts, species, params):
+    """
+    Impact of each component for every row of counts.
+
+    :param counts: Dict or DataFrame of Outbreaks, Cases and Pop_At_Risk,
+        one value per outbreak or stratum.
+    :param species: Species code of each row (see species_codes).
+    :param params: Dict of economic parameter values, or of arrays of
+        values (draws or sweeps) broadcast against each other.
+
+    :returns: Dict of component (IMPACT_COMPONENTS) -> impact in USD, of
+        shape (rows,) for point values or (rows,) + the parameter shape.
+    """
+    keys = species_keys(params)
+    shape = np.broadcast_shapes(*(np.shape(value) for value in params.values()))
+    # Rows on the first axis, parameter values on the others
+    rows = (slice(None),) + (None,) * len(shape)
+
+    def count(name):
+        return np.asarray(counts[name], dtype=float)[rows]
+
+    def by_species(item):
+        table = np.stack([np.broadcast_to(np.asarray(params[f'{item}_{key}'], dtype=float), shape) for key in keys])
+        return table[species]
+
+    cases = count('Cases')
+    deaths = cases * params['case_fatality']
+    recovered = cases - deaths
+    value = by_species('animal_value')
+    impact = {
+        'Mortality': deaths * value,
+        'Morbidity': recovered * value * params['morbidity_value_loss'],
+        'Milk': recovered * by_species('milk_loss'),
+        'Draught': recovered * by_species('draught_loss'),
+        'Control': (count('Outbreaks') * params['outbreak_response_cost'] + cases * params['treatment_cost_per_case']
+                    + count('Pop_At_Risk') * params['vaccination_coverage'] * params['vaccination_cost_per_head']),
+    }
+    impact['Total'] = sum(impact[name] for name in IMPACT_COMPONENTS[:-1])
+    return impact
+
+def total_impact(counts, species, params, component='Total'):
+    """Impact of one component summed over all rows, for each parameter combination."""
+    codes = species_codes(species, species_keys(params))
+    return impact_components(counts, codes, params)[component].sum(axis=0)
+
+def impact_model(counts, species, component='Total'):
+    """A picklable model of the total impact of the given counts, for SensitivityEngine."""
+    counts = {name: np.asarray(counts[name], dtype=float) for name in COUNT_COLUMNS}
+    return functools.partial(total_impact, counts, np.asarray(species, dtype=object), component=component)
+
+# --- Outbreak layers ---
+
+class OutbreakImpact:
+    """
+    Impact of the outbreaks of a layer, per outbreak, admin unit and species.
+
+    Outbreaks are joined to woredas once per load (and the woreda of every
+    location is remembered between loads); the counts per unit and species
+    of every level are kept, so a change of parameters only re-evaluates
+    the model on those rows, and tables already computed for a parameter
+    set are returned from memory.
+    """
+    LEVELS = ['Woredas', 'Zones', 'Regions', 'Species', 'National']
+
+    def __init__(self, layer, date_field='Event_Date'):
+        self.layer = layer
+        self.date_field = date_field
+        self.assignment = None
+        self.records = None
+        self.strata = {}
+        self.tables = {}
+
+    def load(self, start_date=None, end_date=None):
+        """
+        Reads the outbreaks and counts them per admin unit and species.
+
+        :returns: Number of outbreaks read, or None on failure.
+        """
+        try:
+            # Imported here so the model functions above stay free of QGIS
+            from ..modules.utils import ADMIN_LEVELS
+            from .sitrep_provider import AdminAssignment, load_outbreak_records
+
+            records = load_outbreak_records(self.layer, self.date_field, start_date, end_date)
+            if records.empty:
+                return 0
+            if self.assignment is None:
+                self.assignment = AdminAssignment('Woredas', [ADMIN_LEVELS[level][1] for level in ('Zones', 'Regions')])
+            positions = self.assignment.unit_positions(records)
+            for level in ('Woredas', 'Zones', 'Regions'):
+                names = self.assignment.admin_gdf[ADMIN_LEVELS[level][1]].to_numpy()
+                records[level] = np.where(positions >= 0, names[np.maximum(positions, 0)], 'Unknown')
+            records['National'] = 'Ethiopia'
+            records['Species'] = records['Species'].fillna('').astype(str).str.strip() if 'Species' in records else ''
+            records['Outbreaks'] = 1
+
+            self.records = records
+            self.strata = {level: records.groupby(list(dict.fromkeys([level, 'Species'])))[COUNT_COLUMNS].sum()
+                           for level in self.LEVELS}
+            self.tables = {}
+            return len(records)
+
+        except Exception as e:
+            print(f"An error occurred in OutCosT provider: {e}")
+            return None
+
+    @staticmethod
+    def _key(params):
+        return tuple(sorted(params.items()))
+
+    def impact(self, params, level='Woredas'):
+        """
+        Impact rolled up to a level.
+
+        :param params: Dict of economic parameter values.
+        :param level: One of LEVELS.
+
+        :returns: DataFrame indexed by unit with Outbreaks, Cases,
+            Pop_At_Risk and one column per component, largest total first.
+        """
+        key = (level, self._key(params))
+        if key not in self.tables:
+            strata = self.strata[level]
+            codes = species_codes(strata.index.get_level_values('Species'), species_keys(params))
+            impact = pd.DataFrame(impact_components(strata, codes, params), index=strata.index)
+            table = strata.join(impact).groupby(level=level).sum()
+            self.tables[key] = table.sort_values('Total', ascending=False)
+        return self.tables[key]
+
+    def outbreak_impact(self, params):
+        """Impact of every outbreak, as a DataFrame of its record fields and one column per component."""
+        key = ('Outbreaks', self._key(params))
+        if key not in self.tables:
+            codes = species_codes(self.records['Species'], species_keys(params))
+            impact = pd.DataFrame(impact_components(self.records, codes, params), index=self.records.index)
+            columns = [name for name in ('Event_ID', self.date_field, 'Species', 'Woredas', 'Zones', 'Regions')
+                       if name in self.records]
+            self.tables[key] = self.records[columns + COUNT_COLUMNS].join(impact)
+        return self.tables[key]
+
+    def national_uncertainty(self, ranges, n_draws=100000, seed=None):
+        """
+        Monte Carlo national impact, drawing every parameter from its range
+        (see survcost_provider.sample_parameters). Only the counts per
+        species enter the model, so the draws cost the same for any number
+        of outbreaks.
+
+        :returns: DataFrame of Mean, SD, P5, P50 and P95 per component, or
+            None on failure.
+        """
+        try:
+            strata = self.strata['Species']
+            ranges = {name: ranges[name] for name in impact_parameter_names(ranges)}
+            params = sample_parameters(ranges, n_draws, np.random.default_rng(seed))
+            codes = species_codes(strata.index.get_level_values('Species'), species_keys(params))
+            impact = impact_components(strata, codes, params)
+            totals = {name: values.sum(axis=0) for name, values in impact.items()}
+            return summarise_costs(totals, n_draws, components=IMPACT_COMPONENTS)
+
+        except Exception as e:
+            print(f"An error occurred in OutCosT provider: {e}")
+            return None
+
+    def model(self, component='Total'):
+        """Model of the national impact over the parameters, for SensitivityEngine."""
+        strata = self.strata['Species']
+        return impact_model(strata, strata.index.get_level_values('Species'), component)
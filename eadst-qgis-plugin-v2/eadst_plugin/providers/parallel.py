@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Helpers to spread independent chunks of numerical work across processes."""
+
+import os
+import sys
+import multiprocessing
+import multiprocessing.spawn
+from concurrent.futures import ProcessPoolExecutor
+
+def resolve_n_jobs(n_jobs):
+    """Turns an n_jobs argument (-1 for all cores) into a worker count."""
+    cpu_count = os.cpu_count() or 1
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max(1, cpu_count + 1 + n_jobs)
+    return min(n_jobs, cpu_count)
+
+def split_range(n, n_chunks):
+    """Splits range(n) into at most n_chunks contiguous (start, stop) pairs."""
+    n_chunks = max(1, min(n_chunks, n))
+    bounds = [round(i * n / n_chunks) for i in range(n_chunks + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(n_chunks) if bounds[i] < bounds[i + 1]]
+
+def _python_executable():
+    """
+    Returns the Python interpreter to use for worker processes.
+
+    Inside QGIS, sys.executable points at the QGIS binary rather than at
+    Python, so spawning it would start a second copy of QGIS.
+    """
+    executable = sys.executable
+    if os.path.basename(executable).lower().startswith('python'):
+        return executable
+    for candidate in (os.path.join(sys.exec_prefix, 'pythonw.exe'),
+                      os.path.join(sys.exec_prefix, 'python.exe'),
+                      os.path.join(sys.exec_prefix, 'bin', 'python3')):
+        if os.path.exists(candidate):
+            return candidate
+    return executable
+
+def map_chunks(func, tasks, n_jobs=1):
+    """
+    Applies func to each task, in worker processes when n_jobs > 1.
+
+    :param func: A module-level (picklable) function.
+    :param tasks: List of argument tuples, one per call.
+    :param n_jobs: Number of worker processes (-1 uses all cores).
+
+    :returns: List of results, in the same order as tasks.
+    """
+    n_workers = min(resolve_n_jobs(n_jobs), len(tasks))
+    if n_workers <= 1:
+        return [func(*task) for task in tasks]
+
+    context = multiprocessing.get_context('spawn')
+    # The executable is process-wide state: restore it so other plugins using multiprocessing are unaffected
+    previous = multiprocessing.spawn.get_executable()
+    context.set_executable(_python_executable())
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+            return list(pool.map(func, *zip(*tasks)))
+    finally:
+        context.set_executable(previous)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+A provider for budget-constrained portfolios of surveillance schemes.
+
+Every scheme is a candidate component that can be dropped or run at one
+of several intensities (multiples of its units sampled per round). For
+each intensity its cost is taken from the SURVCosT model (Monte Carlo
+mean and 95th percentile, all intensities on the same draws) and its
+sensitivity from its scenario tree (see scenario_tree_provider). These
+cost curves are computed per scheme on one shared set of parameter draws
+(common random numbers, so schemes are compared on the same footing), in
+worker processes when many are new, and kept by scheme content, so adding
+schemes or changing the budget never re-costs the others.
+
+The portfolio picks one intensity per scheme (a multiple-choice knapsack)
+maximising either the system sensitivity, which is additive as
+-log(1 - CSe) for independent components, or the total value (priority
+weight x component sensitivity), under the budget. The portfolio of a
+budget is solved exactly by integer linear programming (scipy's HiGHS
+MILP solver); the best portfolio of every budget up to it (the efficient
+frontier) comes from one dynamic programming pass over a fine budget
+grid. The functions are free of QGIS imports.
+"""
+
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import milp, LinearConstraint, Bounds
+from .parallel import map_chunks, resolve_n_jobs, split_range
+from .survcost_provider import scheme_quantities, sample_parameters, cost_components
+from .scenario_tree_provider import default_tree, component_sensitivity
+
+# Multiples of a scheme's units sampled per round (0 drops the scheme)
+INTENSITY_LEVELS = (0.0, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0)
+OBJECTIVES = ['System sensitivity', 'Value']
+COST_BASES = {'Mean cost': 'Cost_Mean', '95th percentile cost': 'Cost_P95'}
+CURVE_COLUMNS = ['Level', 'Units', 'Cost_Mean', 'Cost_P95', 'Sensitivity']
+
+# --- Cost curves ---
+
+def scheme_tree(scheme):
+    """The scenario tree of a scheme, or a default one from its quantities."""
+    return scheme.get('scenario_tree') or default_tree(scheme_quantities(scheme))
+
+def scheme_curve(scheme, params, levels=INTENSITY_LEVELS, n_iter=2000, seed=0):
+    """
+    Cost and sensitivity of a scheme at every intensity.
+
+    Units, and the km and team days of a route plan, scale with the
+    intensity; so do the units sampled in every risk group of the tree.
+
+    :param scheme: Scheme dict (see survcost_provider.load_scheme).
+    :param params: Economic parameter draws (see survcost_provider.sample_parameters).
+    :param levels: Intensities, as multiples of the scheme's units.
+    :param n_iter: Stochastic iterations of the sensitivity.
+
+    :returns: DataFrame of Level, Units, Cost_Mean, Cost_P95 and Sensitivity.
+    """
+    levels = np.asarray(levels, dtype=float)
+    n_draws = max((np.size(value) for value in params.values()), default=1)
+    quantities = dict(scheme_quantities(scheme))
+    units = np.round(quantities['units'] * levels)
+    # Levels on the first axis, draws on the second
+    quantities['units'] = units[:, None]
+    for name in ('km_per_round', 'team_days_per_round'):
+        if quantities.get(name) is not None:
+            quantities[name] = quantities[name] * levels[:, None]
+    cost = np.broadcast_to(cost_components(quantities, params)['Total'], (levels.size, n_draws))
+    # All intensities on the same iterations of the tree
+    sensitivity, _ = component_sensitivity(scheme_tree(scheme), n_iter, np.random.default_rng(seed), scale=levels)
+
+    return pd.DataFrame({'Level': levels, 'Units': units, 'Cost_Mean': cost.mean(axis=1),
+                         'Cost_P95': np.percentile(cost, 95, axis=1), 'Sensitivity': sensitivity.mean(axis=1)},
+                        columns=CURVE_COLUMNS)
+
+def _curve_chunk(schemes, params, levels, n_iter, seed):
+    return [scheme_curve(scheme, params, levels, n_iter, seed) for scheme in schemes]
+
+class CostCurves:
+    """
+    Cost curves of schemes, kept by scheme content and costing settings.
+
+    :param n_jobs: Number of worker processes when many curves are new (-1 uses all cores).
+    """
+    # Fewer new schemes than this are costed in this process, as starting workers costs more
+    MIN_PARALLEL = 8
+
+    def __init__(self, n_jobs=-1):
+        self.n_jobs = n_jobs
+        self.curves = {}
+        self.n_computed = 0
+
+    @staticmethod
+    def key(scheme, ranges, levels, n_draws, n_iter, seed):
+        text = json.dumps([scheme, ranges, list(levels), n_draws, n_iter, seed], sort_keys=True, default=str)
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def get(self, schemes, ranges, levels=INTENSITY_LEVELS, n_draws=10000, n_iter=2000, seed=0):
+        """
+        Curves of the given schemes, computing only those not seen before.
+
+        :param schemes: Dict of scheme name -> scheme dict.
+
+        :returns: Dict of scheme name -> curve DataFrame (see scheme_curve),
+            or None on failure.
+        """
+        try:
+            keys = {name: self.key(scheme, ranges, levels, n_draws, n_iter, seed) for name, scheme in schemes.items()}
+            missing = list(dict.fromkeys(keys[name] for name in schemes if keys[name] not in self.curves))
+            if missing:
+                by_key = {keys[name]: schemes[name] for name in schemes}
+                params = sample_parameters(ranges, n_draws, np.random.default_rng(seed))
+                # One chunk of schemes per worker, so the draws are sent to each worker once
+                n_jobs = self.n_jobs if len(missing) >= self.MIN_PARALLEL else 1
+                chunks = split_range(len(missing), resolve_n_jobs(n_jobs))
+                tasks = [([by_key[key] for key in missing[start:stop]], params, tuple(levels), n_iter, seed)
+                         for start, stop in chunks]
+                for (start, stop), curves in zip(chunks, map_chunks(_curve_chunk, tasks, n_jobs)):
+                    self.curves.update(zip(missing[start:stop], curves))
+            self.n_computed = len(missing)
+            return {name: self.curves[keys[name]] for name in schemes}
+
+        except Exception as e:
+            print(f"An error occurred in portfolio provider: {e}")
+            return None
+
+# --- Optimisation ---
+
+def candidates(curves, objective='System sensitivity', values=None):
+    """
+    One row per scheme and intensity, with the additive weight the portfolio maximises.
+
+    :param curves: Dict of scheme name -> curve.
+    :param objective: One of OBJECTIVES.
+    :param values: Dict of scheme name -> value (priority weight) for the 'Value' objective.
+    """
+    table = pd.concat(curves, names=['Scheme', 'Row']).reset_index(level='Row', drop=True).reset_index()
+    if objective == 'System sensitivity':
+        table['Weight'] = -np.log1p(-np.minimum(table['Sensitivity'], 1.0 - 1e-12))
+    else:
+        values = values or {}
+        table['Weight'] = table['Scheme'].map(lambda name: float(values.get(name, 1.0))) * table['Sensitivity']
+    return table
+
+def optimise(table, budget, cost_column='Cost_Mean', time_limit=10.0):
+    """
+    Best intensity of every scheme within the budget.
+
+    :param table: Candidates (see candidates); every scheme needs a zero-cost level.
+    :param budget: Budget in USD.
+    :param cost_column: Cost_Mean or Cost_P95 (a budget met with 95% confidence).
+    :param time_limit: Seconds after which the best portfolio found so far is returned.
+
+    :returns: The chosen row of every scheme, or None if the problem cannot
+        be solved (e.g. no zero-cost level).
+    """
+    schemes, scheme_of = np.unique(table['Scheme'].to_numpy(), return_inverse=True)
+    n = len(table)
+    # One level per scheme, and the total cost within the budget
+    choice = sparse.csr_matrix((np.ones(n), (scheme_of, np.arange(n))), shape=(schemes.size, n))
+    constraints = [LinearConstraint(choice, 1, 1),
+                   LinearConstraint(table[cost_column].to_numpy(dtype=float)[None, :], -np.inf, budget)]
+    result = milp(-table['Weight'].to_numpy(dtype=float), constraints=constraints, integrality=np.ones(n),
+                  bounds=Bounds(0, 1), options={'time_limit': time_limit})
+    if result.x is None:
+        return None
+    return table.iloc[np.flatnonzero(result.x > 0.5)].set_index('Scheme')
+
+def portfolio_summary(selected, objective='System sensitivity'):
+    """Cost and objective of a portfolio: mean and 95th percentile cost, system sensitivity and value."""
+    return {'cost_mean': float(selected['Cost_Mean'].sum()), 'cost_p95': float(selected['Cost_P95'].sum()),
+            'system_sensitivity': float(1.0 - np.prod(1.0 - selected['Sensitivity'])),
+            'objective': float(selected['Weight'].sum()),
+            'components': int((selected['Level'] > 0).sum())}
+
+def budget_frontier(table, budgets, cost_column='Cost_Mean', steps=20000):
+    """
+    Best portfolio for each budget (the efficient frontier).
+
+    Dynamic programming over a grid of steps + 1 budgets up to the largest
+    one: after each scheme, the best weight of every budget on the grid is
+    the best over its levels of the weight of the schemes before it with
+    the budget left. Costs are rounded up to the grid, so every portfolio
+    keeps to its budget and falls short of the optimum by at most one grid
+    step per scheme selected.
+
+    :returns: DataFrame indexed by budget with cost_mean, cost_p95,
+        system_sensitivity, objective and components.
+    """
+    budgets = np.asarray(budgets, dtype=float)
+    grid = max(budgets.max(), 1e-9) / steps
+    # Row positions of the levels of every scheme
+    schemes = list(table.groupby('Scheme', sort=False).indices.values())
+    all_costs = np.ceil(table[cost_column].to_numpy(dtype=float) / grid - 1e-9).astype(np.int64)
+    weights = table['Weight'].to_numpy(dtype=float)
+
+    best = np.zeros(steps + 1)
+    choices = np.zeros((len(schemes), steps + 1), dtype=np.int64)
+    for i, positions in enumerate(schemes):
+        options = np.full((positions.size, steps + 1), -np.inf)
+        for j, position in enumerate(positions):
+            c = all_costs[position]
+            if c <= steps:
+                options[j, c:] = best[:steps + 1 - c] + weights[position]
+        choices[i] = positions[options.argmax(axis=0)]
+        best = options.max(axis=0)
+
+    rows = {}
+    for budget in budgets:
+        left = int(np.floor(budget / grid + 1e-9))
+        if not np.isfinite(best[left]):
+            continue
+        picked = []
+        for i in range(len(schemes) - 1, -1, -1):
+            picked.append(choices[i, left])
+            left -= all_costs[picked[-1]]
+        rows[float(budget)] = portfolio_summary(table.iloc[picked])
+    frontier = pd.DataFrame.from_dict(rows, orient='index')
+    frontier.index.name = 'Budget'
+    return frontier
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""A cached nearest-feature index for premise (outbreak point) layers."""
+
+from qgis.core import (QgsCoordinateTransform, QgsFeature, QgsFeatureRequest, QgsPointXY,
+                       QgsProject, QgsSpatialIndex)
+
+# One index per layer id, for the lifetime of the layer
+_INDEXES = {}
+
+class PremiseIndex:
+    """
+    Spatial index over a point layer, kept in sync with edits to the layer.
+
+    The index is built once in the layer CRS and then updated feature by
+    feature from the layer's edit signals, so picking is a nearest-neighbour
+    query on the R-tree instead of a scan over every feature. Only the query
+    point is reprojected, never the layer.
+    """
+    def __init__(self, layer):
+        self.layer = layer
+        self.index = None
+        self.indexed_count = 0
+        self.transforms = {}
+
+        layer.featureAdded.connect(self.on_feature_added)
+        layer.featureDeleted.connect(self.on_feature_deleted)
+        layer.geometryChanged.connect(self.on_geometry_changed)
+        # Committing replaces temporary feature ids, so rebuild on the next query
+        layer.afterCommitChanges.connect(self.invalidate)
+        layer.afterRollBack.connect(self.invalidate)
+        layer.willBeDeleted.connect(lambda layer_id=layer.id(): _INDEXES.pop(layer_id, None))
+
+    def invalidate(self):
+        self.index = None
+
+    def ensure_index(self):
+        """Returns the index, (re)building it when it is missing or out of date."""
+        # Features written straight to the data provider do not emit edit signals,
+        # so a changed feature count also triggers a rebuild
+        if self.index is None or self.indexed_count != self.layer.featureCount():
+            request = QgsFeatureRequest().setNoAttributes()
+            self.index = QgsSpatialIndex(self.layer.getFeatures(request), None,
+                                         QgsSpatialIndex.FlagStoreFeatureGeometries)
+            self.indexed_count = self.layer.featureCount()
+        return self.index
+
+    def on_feature_added(self, fid):
+        if self.index is None:
+            return
+        feat = self.layer.getFeature(fid)
+        if feat.hasGeometry():
+            self.index.addFeature(feat)
+        self.indexed_count += 1
+
+    def on_feature_deleted(self, fid):
+        if self.index is None:
+            return
+        self.remove_from_index(fid)
+        self.indexed_count -= 1
+
+    def on_geometry_changed(self, fid, geometry):
+        if self.index is None:
+            return
+        self.remove_from_index(fid)
+        feat = QgsFeature(fid)
+        feat.setGeometry(geometry)
+        self.index.addFeature(feat)
+
+    def remove_from_index(self, fid):
+        # The stored geometry gives the bounding box the feature was indexed under
+        geometry = self.index.geometry(fid)
+        if geometry and not geometry.isNull():
+            feat = QgsFeature(fid)
+            feat.setGeometry(geometry)
+            self.index.deleteFeature(feat)
+
+    def transform_from(self, crs):
+        """Returns the (cached) transform from crs to the layer CRS."""
+        transform = self.transforms.get(crs.authid())
+        if transform is None:
+            transform = QgsCoordinateTransform(crs, self.layer.crs(), QgsProject.instance())
+            self.transforms[crs.authid()] = transform
+        return transform
+
+    def nearest(self, point, crs, tolerance=0):
+        """
+        Returns the feature nearest to a point, or None.
+
+        :param point: QgsPointXY, e.g. a map canvas click.
+        :param crs: QgsCoordinateReferenceSystem of the point.
+        :param tolerance: Optional search radius in units of crs (0 for no limit).
+
+        :returns: The nearest QgsFeature, or None if none lies within the tolerance.
+        """
+        index = self.ensure_index()
+        transform = self.transform_from(crs)
+        layer_point = transform.transform(point)
+        max_distance = 0
+        if tolerance:
+            edge = transform.transform(QgsPointXY(point.x() + tolerance, point.y()))
+            max_distance = layer_point.distance(edge)
+
+        ids = index.nearestNeighbor(layer_point, 1, max_distance)
+        return self.layer.getFeature(ids[0]) if ids else None
+
+def premise_index(layer):
+    """Returns the cached PremiseIndex of a layer, creating it on first use."""
+    index = _INDEXES.get(layer.id())
+    if index is None:
+        index = _INDEXES[layer.id()] = PremiseIndex(layer)
+    return index
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""Processing provider exposing the EADST headless workflows to the Processing toolbox and qgis_process."""
+
+import os
+from qgis.PyQt.QtCore import QDate, QVariant
+from qgis.PyQt.QtGui import QIcon
+from qgis.core import (QgsFeature, QgsFeatureRequest, QgsFeatureSink, QgsField, QgsFields,
+                       QgsProcessingAlgorithm, QgsProcessingException, QgsProcessingParameterBoolean,
+                       QgsProcessingParameterDateTime, QgsProcessingParameterEnum,
+                       QgsProcessingParameterFeatureSink, QgsProcessingParameterFolderDestination,
+                       QgsProcessingParameterNumber, QgsProcessingParameterVectorLayer,
+                       QgsProcessingOutputFile, QgsProcessingOutputNumber, QgsProcessingOutputString,
+                       QgsProcessingParameterField, QgsProcessingProvider, QgsProcessing)
+from .sitrep_provider import SITREP_FREQUENCIES, build_sitrep
+from .aberration_provider import detect_aberrations
+from .sampling_provider import SAMPLING_METHODS, build_frame, describe_design, draw_sample, risk_weights
+from ..modules.utils import ADMIN_LEVELS, get_admin_layer, get_plugin_path
+
+class SitrepAlgorithm(QgsProcessingAlgorithm):
+    """
+    Builds the situation report PDF for a reporting period.
+
+    Example, from a shell:
+        qgis_process run eadst:sitrep --project_path=outbreak.qgz --START_DATE=2024-01-01
+            --END_DATE=2024-01-31 --OUTPUT_FOLDER=/reports/jan
+    """
+    OUTBREAK_LAYER = 'OUTBREAK_LAYER'
+    START_DATE = 'START_DATE'
+    END_DATE = 'END_DATE'
+    ADMIN_LEVEL = 'ADMIN_LEVEL'
+    FREQUENCY = 'FREQUENCY'
+    PERMUTATIONS = 'PERMUTATIONS'
+    SEED = 'SEED'
+    OUTPUT_FOLDER = 'OUTPUT_FOLDER'
+    OUTPUT_PDF = 'OUTPUT_PDF'
+
+    ADMIN_OPTIONS = list(ADMIN_LEVELS)
+    FREQUENCY_OPTIONS = list(SITREP_FREQUENCIES)
+
+    def name(self):
+        return 'sitrep'
+
+    def displayName(self):
+        return 'Build situation report'
+
+    def group(self):
+        return 'Analysis & Reporting'
+
+    def groupId(self):
+        return 'analysis_reporting'
+
+    def shortHelpString(self):
+        return ("Builds a situation report PDF (epidemic curve, attack rates, LISA cluster map and report map) "
+                "for a reporting period. Intermediate results are cached in the output folder, so re-running "
+                "for the same period only recomputes what changed.")
+
+    def flags(self):
+        # Reads project layers and renders the print layout, which must happen on the main thread
+        return super().flags() | QgsProcessingAlgorithm.FlagNoThreading
+
+    def createInstance(self):
+        return SitrepAlgorithm()
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer(
+            self.OUTBREAK_LAYER, 'Outbreak layer', [QgsProcessing.TypeVectorPoint], defaultValue='Outbreak_Points'))
+        self.addParameter(QgsProcessingParameterDateTime(
+            self.START_DATE, 'Start date', QgsProcessingParameterDateTime.Date, optional=True))
+        self.addParameter(QgsProcessingParameterDateTime(
+            self.END_DATE, 'End date', QgsProcessingParameterDateTime.Date, optional=True))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.ADMIN_LEVEL, 'Admin level for attack rates and LISA', self.ADMIN_OPTIONS,
+            defaultValue=self.ADMIN_OPTIONS.index('Woredas')))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.FREQUENCY, 'Epidemic curve interval', self.FREQUENCY_OPTIONS,
+            defaultValue=self.FREQUENCY_OPTIONS.index('Week')))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.PERMUTATIONS, 'LISA permutations', QgsProcessingParameterNumber.Integer, 999, minValue=99))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.SEED, 'Random seed', QgsProcessingParameterNumber.Integer, 12345, minValue=0))
+        self.addParameter(QgsProcessingParameterFolderDestination(self.OUTPUT_FOLDER, 'Output folder'))
+        self.addOutput(QgsProcessingOutputFile(self.OUTPUT_PDF, 'Situation report'))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        layer = self.parameterAsVectorLayer(parameters, self.OUTBREAK_LAYER, context)
+        if layer is None:
+            raise QgsProcessingException('The outbreak layer could not be loaded.')
+        start = self.parameterAsDateTime(parameters, self.START_DATE, context)
+        end = self.parameterAsDateTime(parameters, self.END_DATE, context)
+
+        result = build_sitrep(
+            self.parameterAsString(parameters, self.OUTPUT_FOLDER, context),
+            start_date=start.date().toPyDate() if start.isValid() else None,
+            end_date=end.date().toPyDate() if end.isValid() else None,
+            outbreak_layer=layer,
+            admin_level=self.ADMIN_OPTIONS[self.parameterAsEnum(parameters, self.ADMIN_LEVEL, context)],
+            date_field='Event_Date',
+            frequency=self.FREQUENCY_OPTIONS[self.parameterAsEnum(parameters, self.FREQUENCY, context)],
+            permutations=self.parameterAsInt(parameters, self.PERMUTATIONS, context),
+            seed=self.parameterAsInt(parameters, self.SEED, context),
+            feedback=feedback)
+        if result is None:
+            raise QgsProcessingException('The situation report could not be built. See the log for details.')
+
+        feedback.pushInfo(f"Recomputed steps: {', '.join(result['recomputed']) or 'none (all cached)'}")
+        return {self.OUTPUT_FOLDER: os.path.dirname(result['pdf']), self.OUTPUT_PDF: result['pdf']}
+
+class AberrationAlgorithm(QgsProcessingAlgorithm):
+    """
+    Runs the early-warning detectors for every admin unit and writes an alert layer.
+
+    Example, from a nightly job:
+        qgis_process run eadst:aberration --project_path=outbreak.qgz --FREQUENCY=1
+            --OUTPUT=/reports/alerts.gpkg
+    """
+    OUTBREAK_LAYER = 'OUTBREAK_LAYER'
+    ADMIN_LEVEL = 'ADMIN_LEVEL'
+    FREQUENCY = 'FREQUENCY'
+    COUNT = 'COUNT'
+    END_DATE = 'END_DATE'
+    REPORT_PERIODS = 'REPORT_PERIODS'
+    ALERTS_ONLY = 'ALERTS_ONLY'
+    OUTPUT = 'OUTPUT'
+
+    ADMIN_OPTIONS = list(ADMIN_LEVELS)
+    FREQUENCY_OPTIONS = ['Day', 'Week']
+    COUNT_OPTIONS = ['Outbreaks', 'Cases']
+    STATISTICS = ['C1', 'C2', 'C3', 'CUSUM', 'Expected', 'Threshold']
+
+    def name(self):
+        return 'aberration'
+
+    def displayName(self):
+        return 'Early-warning detection (EARS, CUSUM, Farrington)'
+
+    def group(self):
+        return 'Analysis & Reporting'
+
+    def groupId(self):
+        return 'analysis_reporting'
+
+    def shortHelpString(self):
+        return ("Counts outbreaks per admin unit and day or week and runs the EARS C1-C3, CUSUM and "
+                "Farrington-type detectors for all units. The output has one polygon per unit and reported "
+                "period with the statistics and the methods that signal. Results are cached next to the "
+                "project, so a nightly run only recomputes the periods whose counts changed.")
+
+    def flags(self):
+        # Reads project layers, which must happen on the main thread
+        return super().flags() | QgsProcessingAlgorithm.FlagNoThreading
+
+    def createInstance(self):
+        return AberrationAlgorithm()
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer(
+            self.OUTBREAK_LAYER, 'Outbreak layer', [QgsProcessing.TypeVectorPoint], defaultValue='Outbreak_Points'))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.ADMIN_LEVEL, 'Admin level', self.ADMIN_OPTIONS, defaultValue=self.ADMIN_OPTIONS.index('Woredas')))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.FREQUENCY, 'Interval', self.FREQUENCY_OPTIONS, defaultValue=self.FREQUENCY_OPTIONS.index('Week')))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.COUNT, 'Count', self.COUNT_OPTIONS, defaultValue=0))
+        self.addParameter(QgsProcessingParameterDateTime(
+            self.END_DATE, 'Evaluate up to (default: today)', QgsProcessingParameterDateTime.Date, optional=True))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.REPORT_PERIODS, 'Number of recent periods reported', QgsProcessingParameterNumber.Integer, 1,
+            minValue=1))
+        self.addParameter(QgsProcessingParameterBoolean(
+            self.ALERTS_ONLY, 'Only units with an alert', defaultValue=True))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.OUTPUT, 'Aberration alerts', QgsProcessing.TypeVectorPolygon))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        layer = self.parameterAsVectorLayer(parameters, self.OUTBREAK_LAYER, context)
+        if layer is None:
+            raise QgsProcessingException('The outbreak layer could not be loaded.')
+        admin_level = self.ADMIN_OPTIONS[self.parameterAsEnum(parameters, self.ADMIN_LEVEL, context)]
+        admin_layer = get_admin_layer(admin_level)
+        if admin_layer is None:
+            raise QgsProcessingException(f"Admin layer '{admin_level}' could not be loaded.")
+        end = self.parameterAsDateTime(parameters, self.END_DATE, context)
+
+        alerts, recomputed = detect_aberrations(
+            layer, admin_level=admin_level,
+            frequency=self.FREQUENCY_OPTIONS[self.parameterAsEnum(parameters, self.FREQUENCY, context)],
+            count=self.COUNT_OPTIONS[self.parameterAsEnum(parameters, self.COUNT, context)],
+            end_date=end.date().toPyDate() if end.isValid() else None,
+            report_periods=self.parameterAsInt(parameters, self.REPORT_PERIODS, context),
+            feedback=feedback)
+        if alerts is None:
+            raise QgsProcessingException('Aberration detection failed. See the log for details.')
+        if self.parameterAsBool(parameters, self.ALERTS_ONLY, context):
+            alerts = alerts[alerts['N_Alerts'] > 0]
+
+        fields = QgsFields()
+        fields.append(QgsField('PCODE', QVariant.String))
+        fields.append(QgsField('Name', QVariant.String))
+        fields.append(QgsField('Period', QVariant.Date))
+        fields.append(QgsField('Count', QVariant.Double))
+        for name in self.STATISTICS:
+            fields.append(QgsField(name, QVariant.Double))
+        fields.append(QgsField('Alerts', QVariant.String))
+        fields.append(QgsField('N_Alerts', QVariant.Int))
+        sink, dest_id = self.parameterAsSink(parameters, self.OUTPUT, context, fields,
+                                             admin_layer.wkbType(), admin_layer.crs())
+        if sink is None:
+            raise QgsProcessingException('The output layer could not be created.')
+
+        request = QgsFeatureRequest().setFilterFids([int(fid) for fid in alerts['fid'].unique()]).setNoAttributes()
+        geometries = {feat.id(): feat.geometry() for feat in admin_layer.getFeatures(request)}
+        features = []
+        for _, row in alerts.iterrows():
+            feat = QgsFeature(fields)
+            feat.setGeometry(geometries.get(int(row['fid'])))
+            period = row['period']
+            feat.setAttributes([row['code'], row['name'], QDate(period.year, period.month, period.day),
+                                float(row['count'])]
+                               + [None if row[name] != row[name] else float(row[name]) for name in self.STATISTICS]
+                               + [row['Alerts'], int(row['N_Alerts'])])
+            features.append(feat)
+        sink.addFeatures(features, QgsFeatureSink.FastInsert)
+
+        feedback.pushInfo(f"{int((alerts['N_Alerts'] > 0).sum())} alerts; {recomputed} periods recomputed.")
+        return {self.OUTPUT: dest_id}
+
+class SamplingFrameAlgorithm(QgsProcessingAlgorithm):
+    """
+    Builds a risk-weighted sampling frame of admin units and selects the
+    units of a survey.
+
+    Example:
+        qgis_process run eadst:sampling_frame --project_path=outbreak.qgz --SAMPLE_SIZE=150
+            --METHOD=2 --SEED=2024 --OUTPUT=/surveys/ppr_sero_units.gpkg
+    """
+    ADMIN_LEVEL = 'ADMIN_LEVEL'
+    STRATA_LEVEL = 'STRATA_LEVEL'
+    METHOD = 'METHOD'
+    SAMPLE_SIZE = 'SAMPLE_SIZE'
+    OUTBREAK_LAYER = 'OUTBREAK_LAYER'
+    HISTORY_START = 'HISTORY_START'
+    OUTBREAK_WEIGHT = 'OUTBREAK_WEIGHT'
+    LIVESTOCK_LAYER = 'LIVESTOCK_LAYER'
+    LIVESTOCK_FIELD = 'LIVESTOCK_FIELD'
+    DENSITY_WEIGHT = 'DENSITY_WEIGHT'
+    SEED = 'SEED'
+    OUTPUT = 'OUTPUT'
+    DESCRIPTION = 'DESCRIPTION'
+    N_SELECTED = 'N_SELECTED'
+
+    ADMIN_OPTIONS = list(ADMIN_LEVELS)
+    STRATA_OPTIONS = ['None'] + list(ADMIN_LEVELS)
+    ATTRIBUTES = [('Code', QVariant.String), ('Name', QVariant.String), ('Stratum', QVariant.String),
+                  ('Area_km2', QVariant.Double), ('Outbreaks', QVariant.Int), ('Livestock', QVariant.Double),
+                  ('Density', QVariant.Double), ('Risk_Weight', QVariant.Double), ('Incl_Prob', QVariant.Double),
+                  ('Design_Weight', QVariant.Double), ('Selection_Order', QVariant.Int)]
+
+    def name(self):
+        return 'sampling_frame'
+
+    def displayName(self):
+        return 'Risk-based sampling frame and unit selection'
+
+    def group(self):
+        return 'Surveillance & Economics'
+
+    def groupId(self):
+        return 'surveillance_economics'
+
+    def shortHelpString(self):
+        return ("Builds a frame of the units of an admin level, optionally weighted by outbreak history and "
+                "livestock density, and selects units by stratified random, PPS or spatially balanced "
+                "(GRTS-style) sampling. The output has one polygon per selected unit with its risk covariates, "
+                "inclusion probability and design weight. The same seed always gives the same selection.")
+
+    def flags(self):
+        # Reads project layers, which must happen on the main thread
+        return super().flags() | QgsProcessingAlgorithm.FlagNoThreading
+
+    def createInstance(self):
+        return SamplingFrameAlgorithm()
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterEnum(
+            self.ADMIN_LEVEL, 'Sampling units', self.ADMIN_OPTIONS, defaultValue=self.ADMIN_OPTIONS.index('Woredas')))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.STRATA_LEVEL, 'Strata (stratified random sampling)', self.STRATA_OPTIONS,
+            defaultValue=self.STRATA_OPTIONS.index('Regions')))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.METHOD, 'Sampling method', SAMPLING_METHODS,
+            defaultValue=SAMPLING_METHODS.index('Spatially balanced (GRTS)')))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.SAMPLE_SIZE, 'Number of units to select', QgsProcessingParameterNumber.Integer, 100, minValue=1))
+        self.addParameter(QgsProcessingParameterVectorLayer(
+            self.OUTBREAK_LAYER, 'Outbreak history layer', [QgsProcessing.TypeVectorPoint], optional=True))
+        self.addParameter(QgsProcessingParameterDateTime(
+            self.HISTORY_START, 'Outbreak history since', QgsProcessingParameterDateTime.Date, optional=True))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.OUTBREAK_WEIGHT, 'Weight of outbreak history', QgsProcessingParameterNumber.Double, 1.0, minValue=0))
+        self.addParameter(QgsProcessingParameterVectorLayer(
+            self.LIVESTOCK_LAYER, 'Livestock population layer', [QgsProcessing.TypeVector], optional=True))
+        self.addParameter(QgsProcessingParameterField(
+            self.LIVESTOCK_FIELD, 'Livestock head count field', parentLayerParameterName=self.LIVESTOCK_LAYER,
+            type=QgsProcessingParameterField.Numeric, optional=True))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.DENSITY_WEIGHT, 'Weight of livestock density', QgsProcessingParameterNumber.Double, 1.0, minValue=0))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.SEED, 'Random seed', QgsProcessingParameterNumber.Integer, 12345, minValue=0))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.OUTPUT, 'Selected units', QgsProcessing.TypeVectorPolygon))
+        self.addOutput(QgsProcessingOutputString(self.DESCRIPTION, 'Design description'))
+        self.addOutput(QgsProcessingOutputNumber(self.N_SELECTED, 'Number of units selected'))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        admin_level = self.ADMIN_OPTIONS[self.parameterAsEnum(parameters, self.ADMIN_LEVEL, context)]
+        strata_level = self.STRATA_OPTIONS[self.parameterAsEnum(parameters, self.STRATA_LEVEL, context)]
+        strata_level = None if strata_level == 'None' else strata_level
+        method = SAMPLING_METHODS[self.parameterAsEnum(parameters, self.METHOD, context)]
+        if strata_level and self.ADMIN_OPTIONS.index(strata_level) >= self.ADMIN_OPTIONS.index(admin_level):
+            raise QgsProcessingException('Strata must be a coarser admin level than the sampling units.')
+        admin_layer = get_admin_layer(admin_level)
+        if admin_layer is None:
+            raise QgsProcessingException(f"Admin layer '{admin_level}' could not be loaded.")
+
+        start = self.parameterAsDateTime(parameters, self.HISTORY_START, context)
+        livestock_fields = self.parameterAsFields(parameters, self.LIVESTOCK_FIELD, context)
+        frame = build_frame(admin_level, strata_level,
+                            outbreak_layer=self.parameterAsVectorLayer(parameters, self.OUTBREAK_LAYER, context),
+                            start_date=start.date().toPyDate() if start.isValid() else None,
+                            livestock_layer=self.parameterAsVectorLayer(parameters, self.LIVESTOCK_LAYER, context),
+                            livestock_field=livestock_fields[0] if livestock_fields else None)
+        if frame is None:
+            raise QgsProcessingException('The sampling frame could not be built. See the log for details.')
+
+        outbreak_weight = self.parameterAsDouble(parameters, self.OUTBREAK_WEIGHT, context)
+        density_weight = self.parameterAsDouble(parameters, self.DENSITY_WEIGHT, context)
+        seed = self.parameterAsInt(parameters, self.SEED, context)
+        weights = risk_weights(frame, outbreak_weight, density_weight)
+        sample = draw_sample(frame, self.parameterAsInt(parameters, self.SAMPLE_SIZE, context), method, weights,
+                             'Stratum' if strata_level else None, seed)
+
+        fields = QgsFields()
+        for name, field_type in self.ATTRIBUTES:
+            fields.append(QgsField(name, field_type))
+        sink, dest_id = self.parameterAsSink(parameters, self.OUTPUT, context, fields,
+                                             admin_layer.wkbType(), admin_layer.crs())
+        if sink is None:
+            raise QgsProcessingException('The output layer could not be created.')
+
+        request = QgsFeatureRequest().setFilterFids([int(fid) for fid in sample.index]).setNoAttributes()
+        geometries = {feat.id(): feat.geometry() for feat in admin_layer.getFeatures(request)}
+        features = []
+        for fid, row in sample.iterrows():
+            feat = QgsFeature(fields)
+            feat.setGeometry(geometries.get(int(fid)))
+            feat.setAttributes([str(row['Code']), str(row['Name']), str(row['Stratum']), float(row['Area_km2']),
+                                int(row['Outbreaks']), float(row['Livestock']), float(row['Density']),
+                                float(row['Risk_Weight']), float(row['Incl_Prob']), float(row['Design_Weight']),
+                                int(row['Selection_Order'])])
+            features.append(feat)
+        sink.addFeatures(features, QgsFeatureSink.FastInsert)
+
+        description = describe_design(frame, sample, admin_level, method, strata_level, outbreak_weight,
+                                      density_weight, seed)
+        feedback.pushInfo(description)
+        return {self.OUTPUT: dest_id, self.DESCRIPTION: description, self.N_SELECTED: len(sample)}
+
+class EADSTProcessingProvider(QgsProcessingProvider):
+    """Registers the EADST algorithms under the 'eadst' provider id."""
+    def loadAlgorithms(self):
+        self.addAlgorithm(SitrepAlgorithm())
+        self.addAlgorithm(AberrationAlgorithm())
+        self.addAlgorithm(SamplingFrameAlgorithm())
+
+    def id(self):
+        return 'eadst'
+
+    def name(self):
+        return 'EADST'
+
+    def icon(self):
+        return QIcon(os.path.join(get_plugin_path(), 'icons', 'eadst_icon.svg'))
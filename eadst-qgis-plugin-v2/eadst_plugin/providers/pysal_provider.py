@@ -1,36 +1,512 @@
 # -*- coding: utf-8 -*-
 """A provider/wrapper for PySAL spatial analysis functions."""
 
+import hashlib
+import numpy as np
+import pandas as pd
 import geopandas as gpd
+from scipy import sparse, stats
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import NULL, QgsFeatureRequest, QgsField
 from libpysal.weights import Queen
 from esda.moran import Moran_Local
+from .crand import conditional_randomization, fold_counts, local_moran_pvalues
 
-def run_lisa_analysis(geopackage_path, layer_name, attribute_column):
+# LISA quadrant codes as used by esda (1 HH, 2 LH, 3 LL, 4 HL)
+LISA_QUADRANTS = {1: "High-High", 2: "Low-High", 3: "Low-Low", 4: "High-Low"}
+
+# Weights are expensive to build for national layers, so they are kept
+# for the lifetime of the session, keyed by a hash of the geometries
+_WEIGHTS_CACHE = {}
+_WEIGHTS_CACHE_SIZE = 8
+
+def build_weights(gdf):
+    """
+    Returns row-standardised Queen contiguity weights for a GeoDataFrame.
+
+    Weights are cached, so repeated analyses on the same set of
+    geometries (e.g. several attributes or time windows) build them once.
+    """
+    digest = hashlib.sha1(b"".join(gdf.geometry.to_wkb())).hexdigest()
+    weights = _WEIGHTS_CACHE.get(digest)
+    if weights is None:
+        weights = Queen.from_dataframe(gdf)
+        weights.transform = 'r'
+        if len(_WEIGHTS_CACHE) >= _WEIGHTS_CACHE_SIZE:
+            _WEIGHTS_CACHE.pop(next(iter(_WEIGHTS_CACHE)))
+        _WEIGHTS_CACHE[digest] = weights
+    return weights
+
+def label_clusters(q, p_values, alpha=0.05):
+    """Returns cluster labels, with non-significant units marked as such."""
+    labels = np.array([LISA_QUADRANTS.get(int(code), "") for code in q], dtype=object)
+    labels[np.asarray(p_values) >= alpha] = "Not Significant"
+    return labels
+
+def local_moran_analytical(y, weights):
+    """
+    Local Moran's I with analytical (normal approximation) inference.
+
+    Uses the conditional randomisation moments of Sokal et al. (1998),
+    which is orders of magnitude faster than permutation inference and
+    intended for quick previews.
+
+    :param y: 1-D array of attribute values.
+    :param weights: Row-standardised libpysal weights object.
+
+    :returns: Tuple of (Is, q, z_norm, p_norm) arrays.
+    """
+    y = np.asarray(y, dtype=float)
+    n = y.shape[0]
+    z = y - y.mean()
+    m2 = (z * z).sum() / n
+    W = weights.sparse.tocsr()
+    lag = W @ z
+    Is = (n - 1) * z * lag / (z * z).sum()
+
+    wi = np.asarray(W.sum(axis=1)).ravel()
+    wi2 = np.asarray(W.multiply(W).sum(axis=1)).ravel()
+    expectation = -(z ** 2 * wi) / ((n - 1) * m2)
+    variance = ((z / m2) ** 2 * (n / (n - 2.0))
+                * (wi2 - wi ** 2 / (n - 1)) * (m2 - z ** 2 / (n - 1)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # The moments are for Sokal's I_i = z_i * lag_i / m2, which differs
+        # from esda's Is only by the constant (n - 1) / n
+        z_norm = (z * lag / m2 - expectation) / np.sqrt(variance)
+    z_norm = np.nan_to_num(z_norm)
+    p_norm = stats.norm.sf(np.abs(z_norm))
+
+    # Quadrants follow the esda convention so both paths can share a renderer
+    q = np.where(z > 0, np.where(lag > 0, 1, 4), np.where(lag > 0, 2, 3))
+    return Is, q, z_norm, p_norm
+
+def layer_to_geodataframe(layer, attribute_columns):
+    """
+    Builds a GeoDataFrame directly from a live QgsVectorLayer.
+
+    Only the requested attributes and the geometries (as WKB) are fetched,
+    and the geometries are decoded in one vectorised call, so no temporary
+    file is written and unused columns are never read.
+
+    :param layer: The source QgsVectorLayer.
+    :param attribute_columns: List of field names to fetch.
+
+    :returns: GeoDataFrame indexed by feature id.
+    """
+    if isinstance(attribute_columns, str):
+        attribute_columns = [attribute_columns]
+    request = QgsFeatureRequest().setSubsetOfAttributes(attribute_columns, layer.fields())
+
+    fids, wkbs = [], []
+    values = {name: [] for name in attribute_columns}
+    for feat in layer.getFeatures(request):
+        fids.append(feat.id())
+        wkbs.append(bytes(feat.geometry().asWkb()))
+        for name in attribute_columns:
+            value = feat[name]
+            values[name].append(None if value == NULL else value)
+
+    geometry = gpd.GeoSeries.from_wkb(np.array(wkbs, dtype=object), index=fids,
+                                      crs=layer.crs().toWkt() or None)
+    return gpd.GeoDataFrame(values, index=pd.Index(fids, name='fid'), geometry=geometry)
+
+def write_results_to_layer(layer, gdf, columns):
+    """
+    Writes result columns back to the layer they were computed from.
+
+    Missing fields are created, and all values are written with a single
+    batched provider call keyed by the feature ids of ``gdf``.
+
+    :param layer: The QgsVectorLayer the GeoDataFrame was built from.
+    :param gdf: GeoDataFrame indexed by feature id (see layer_to_geodataframe).
+    :param columns: Result columns to write.
+
+    :returns: True on success.
+    """
+    provider = layer.dataProvider()
+    new_fields = []
+    for name in columns:
+        if layer.fields().indexOf(name) == -1:
+            if pd.api.types.is_integer_dtype(gdf[name]):
+                new_fields.append(QgsField(name, QVariant.Int))
+            elif pd.api.types.is_float_dtype(gdf[name]):
+                new_fields.append(QgsField(name, QVariant.Double))
+            else:
+                new_fields.append(QgsField(name, QVariant.String))
+    if new_fields:
+        if not provider.addAttributes(new_fields):
+            return False
+        layer.updateFields()
+
+    field_indices = [layer.fields().indexOf(name) for name in columns]
+    # Convert to native Python types once, as the provider does not accept numpy scalars
+    records = gdf[columns].astype(object).values.tolist()
+    changes = {int(fid): dict(zip(field_indices, record)) for fid, record in zip(gdf.index, records)}
+    if not provider.changeAttributeValues(changes):
+        return False
+    layer.triggerRepaint()
+    return True
+
+def lisa_from_geodataframe(gdf, attribute_column, permutations=999, seed=None,
+                           n_jobs=1, inference='permutation'):
+    """
+    Runs a LISA analysis on a GeoDataFrame and appends the results to it.
+
+    See run_lisa_analysis for a description of the parameters.
+
+    :returns: The GeoDataFrame with LISA results appended.
+    """
+    # Create spatial weights
+    weights = build_weights(gdf)
+    y = gdf[attribute_column].astype(float).values
+
+    if inference == 'analytical':
+        Is, q, z_norm, p_norm = local_moran_analytical(y, weights)
+        gdf['lisa_i'] = Is
+        gdf['lisa_q'] = q
+        gdf['lisa_z'] = z_norm
+        gdf['lisa_p_norm'] = p_norm
+        gdf['lisa_cluster'] = label_clusters(q, p_norm)
+        return gdf
+
+    # Calculate Local Moran's I
+    lisa = Moran_Local(y, weights, permutations=permutations, seed=seed,
+                       n_jobs=n_jobs, keep_simulations=False)
+
+    # Append results to the GeoDataFrame
+    gdf['lisa_i'] = lisa.Is
+    gdf['lisa_q'] = lisa.q
+    gdf['lisa_p_sim'] = lisa.p_sim
+    gdf['lisa_cluster'] = label_clusters(lisa.q, lisa.p_sim)
+
+    return gdf
+
+def run_lisa_analysis(geopackage_path, layer_name, attribute_column,
+                      permutations=999, seed=None, n_jobs=1, inference='permutation'):
     """
     Runs a LISA analysis on a given layer and attribute.
 
     :param geopackage_path: Path to the GeoPackage file.
     :param layer_name: Name of the layer within the GeoPackage.
     :param attribute_column: The column to analyze.
-    
+    :param permutations: Number of conditional randomisation permutations.
+    :param seed: Random seed, so that a run can be reproduced exactly.
+    :param n_jobs: Number of worker cores for the permutation test
+        (-1 uses all available cores).
+    :param inference: 'permutation' for pseudo p-values, or 'analytical'
+        for a fast normal-approximation preview.
+
     :returns: GeoDataFrame with LISA results appended.
     """
     try:
         gdf = gpd.read_file(geopackage_path, layer=layer_name)
-        
-        # Create spatial weights
-        weights = Queen.from_dataframe(gdf)
-        weights.transform = 'r'
+        return lisa_from_geodataframe(gdf, attribute_column, permutations, seed, n_jobs, inference)
+
+    except Exception as e:
+        print(f"An error occurred in PySAL provider: {e}")
+        return None
+
+def run_lisa_on_layer(layer, attribute_column, permutations=999, seed=None,
+                      n_jobs=1, inference='permutation', write_back=True):
+    """
+    Runs a LISA analysis on a live QgsVectorLayer without a file round-trip.
+
+    :param layer: The QgsVectorLayer to analyse.
+    :param attribute_column: The column to analyze.
+    :param write_back: If True, the LISA results are added as new fields
+        on the same layer.
+
+    See run_lisa_analysis for the remaining parameters.
 
-        # Calculate Local Moran's I
-        lisa = Moran_Local(gdf[attribute_column], weights)
-        
-        # Append results to the GeoDataFrame
-        gdf['lisa_q'] = lisa.q
-        gdf['lisa_p_sim'] = lisa.p_sim
-        
+    :returns: GeoDataFrame with LISA results appended.
+    """
+    try:
+        gdf = layer_to_geodataframe(layer, [attribute_column])
+        gdf = lisa_from_geodataframe(gdf, attribute_column, permutations, seed, n_jobs, inference)
+        if write_back:
+            result_columns = [col for col in gdf.columns if col.startswith('lisa_')]
+            if not write_results_to_layer(layer, gdf, result_columns):
+                print(f"PySAL provider could not write results to layer '{layer.name()}'.")
         return gdf
 
     except Exception as e:
         print(f"An error occurred in PySAL provider: {e}")
-        return None
\ No newline at end of file
+        return None
+
+# --- Batch space-time LISA ---
+
+def build_space_time_matrix(records, unit_column, date_column, attributes,
+                            freq='W', periods=None, units=None, aggfunc='sum'):
+    """
+    Aggregates long-format records into a units x (attribute, window) table.
+
+    :param records: DataFrame with one row per record (e.g. outbreak reports
+        joined to woredas).
+    :param unit_column: Column holding the admin unit identifier.
+    :param date_column: Column holding the event date.
+    :param attributes: List of value columns to aggregate.
+    :param freq: Pandas period frequency of the time windows ('D', 'W', 'M').
+    :param periods: If given, only the most recent number of windows is kept.
+    :param units: Optional index of all units, so that units without records
+        are included with zero values.
+    :param aggfunc: Aggregation applied within each unit and window.
+
+    :returns: DataFrame indexed by unit, with (attribute, window) columns
+        for every calendar window from the first record to the last, so
+        consecutive columns are consecutive windows even when some have no
+        records.
+    """
+    df = records[[unit_column, date_column] + list(attributes)].copy()
+    df['window'] = pd.to_datetime(df[date_column]).dt.to_period(freq)
+    windows = df['window'].dropna()
+    calendar = pd.period_range(windows.min(), windows.max(), freq=windows.min().freq) if len(windows) else None
+    if periods and calendar is not None:
+        calendar = calendar[-periods:]
+        df = df[df['window'].isin(calendar)]
+
+    matrix = df.pivot_table(index=unit_column, columns='window', values=list(attributes),
+                            aggfunc=aggfunc, fill_value=0)
+    if calendar is not None:
+        matrix = matrix.reindex(columns=pd.MultiIndex.from_product([list(attributes), calendar],
+                                                                   names=matrix.columns.names), fill_value=0)
+    if units is not None:
+        matrix = matrix.reindex(units, fill_value=0)
+    return matrix.sort_index(axis=1)
+
+def run_batch_lisa(gdf, matrix, permutations=999, seed=None, n_jobs=1, alpha=0.05):
+    """
+    Runs Local Moran's I for many attributes and time windows at once.
+
+    The spatial weights are built once, all columns are standardised
+    together, and the permutation tests for every column run in a single
+    parallel conditional randomisation pass.
+
+    :param gdf: GeoDataFrame of the analysis units.
+    :param matrix: DataFrame aligned with gdf.index, one column per analysis.
+        Columns may be (attribute, window) pairs as returned by
+        build_space_time_matrix, or plain attribute names.
+    :param permutations: Number of conditional randomisation permutations.
+    :param seed: Random seed, so that a run can be reproduced exactly.
+    :param n_jobs: Number of worker processes (-1 uses all cores).
+    :param alpha: Significance level used for the cluster labels.
+
+    :returns: Long-format DataFrame with one row per unit, attribute and window.
+    """
+    try:
+        weights = build_weights(gdf)
+        W = weights.sparse.tocsr()
+        Y = matrix.reindex(gdf.index).fillna(0).to_numpy(dtype=float)
+        n, m = Y.shape
+
+        # Standardise every column at once; constant columns become all-zero
+        std = Y.std(axis=0)
+        Z = np.divide(Y - Y.mean(axis=0), std, out=np.zeros_like(Y), where=std > 0)
+        lag = W @ Z
+        Is = (n - 1) * Z * lag / n
+        q = np.where(Z > 0, np.where(lag > 0, 1, 4), np.where(lag > 0, 2, 3))
+        q[Z == 0] = 0
+
+        p_sim = local_moran_pvalues(Z, W, permutations, seed, n_jobs)
+
+        if isinstance(matrix.columns, pd.MultiIndex):
+            attribute_labels = matrix.columns.get_level_values(0)
+            window_labels = matrix.columns.get_level_values(1).astype(str)
+        else:
+            attribute_labels = matrix.columns
+            window_labels = pd.Index([None] * m)
+
+        return pd.DataFrame({
+            'unit': np.tile(gdf.index.to_numpy(), m),
+            'attribute': np.repeat(np.asarray(attribute_labels), n),
+            'window': np.repeat(np.asarray(window_labels), n),
+            'value': Y.T.ravel(),
+            'lisa_i': Is.T.ravel(),
+            'lisa_q': q.T.ravel(),
+            'lisa_p_sim': p_sim.T.ravel(),
+            'lisa_cluster': label_clusters(q.T.ravel(), p_sim.T.ravel(), alpha)
+        })
+
+    except Exception as e:
+        print(f"An error occurred in PySAL provider: {e}")
+        return None
+
+def cluster_transitions(results):
+    """
+    Summarises how units move between LISA clusters from one window to the next.
+
+    :param results: Long-format output of run_batch_lisa.
+
+    :returns: DataFrame with the count and row probability of each
+        (attribute, from_cluster, to_cluster) transition.
+    """
+    ordered = results.sort_values(['attribute', 'unit', 'window'])
+    ordered = ordered.assign(to_cluster=ordered.groupby(['attribute', 'unit'])['lisa_cluster'].shift(-1))
+    ordered = ordered.dropna(subset=['to_cluster'])
+
+    transitions = (ordered.groupby(['attribute', 'lisa_cluster', 'to_cluster'])
+                   .size().rename('count').reset_index()
+                   .rename(columns={'lisa_cluster': 'from_cluster'}))
+    totals = transitions.groupby(['attribute', 'from_cluster'])['count'].transform('sum')
+    transitions['probability'] = transitions['count'] / totals
+    return transitions
+
+# --- Multi-statistic hotspot engine ---
+
+HOTSPOT_STATISTICS = ('moran_local', 'g_local', 'g_star_local', 'join_counts_local',
+                      'moran_global', 'join_counts_global')
+
+def label_hotspots(z_scores, p_values, alpha=0.05):
+    """Returns 'Hot Spot'/'Cold Spot' labels for significant units."""
+    labels = np.where(np.asarray(z_scores) > 0, "Hot Spot", "Cold Spot").astype(object)
+    labels[np.asarray(p_values) >= alpha] = "Not Significant"
+    return labels
+
+def _getis_ord_z(x, W, star):
+    """Analytical z-scores of Getis-Ord G (star=False) or G* (star=True)."""
+    n = x.shape[0]
+    if star:
+        # G* counts the unit itself as one of its neighbours
+        binary = W.copy()
+        binary.data[:] = 1.0
+        binary = binary + sparse.identity(n, format='csr')
+        W = sparse.diags(1.0 / np.asarray(binary.sum(axis=1)).ravel()) @ binary
+        lag = W @ x
+        x_bar = np.full(n, x.mean())
+        s = np.full(n, x.std())
+        n_eff = n
+    else:
+        lag = W @ x
+        x_bar = (x.sum() - x) / (n - 1)
+        s = np.sqrt(np.maximum((np.sum(x ** 2) - x ** 2) / (n - 1) - x_bar ** 2, 0))
+        n_eff = n - 1
+    wi = np.asarray(W.sum(axis=1)).ravel()
+    s1i = np.asarray(W.multiply(W).sum(axis=1)).ravel()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (lag - x_bar * wi) / (s * np.sqrt((n_eff * s1i - wi ** 2) / (n_eff - 1)))
+    return np.nan_to_num(z), lag
+
+def run_hotspot_statistics(gdf, attribute_column, statistics=HOTSPOT_STATISTICS,
+                           permutations=999, seed=None, n_jobs=1, alpha=0.05,
+                           binary_threshold=0):
+    """
+    Computes several hotspot statistics with one weights matrix and one pass.
+
+    The weights are the cached Queen contiguity weights and the attribute is
+    standardised once. All local permutation tests, and the global ones,
+    share a single parallel randomisation run: under conditional
+    randomisation the simulated Getis-Ord G/G* values and local join counts
+    are all ordered by the same simulated spatial lag that Local Moran's I
+    uses, so they need no separate runs.
+
+    :param gdf: GeoDataFrame of the analysis units (regions, zones or woredas).
+    :param attribute_column: The column to analyze.
+    :param statistics: Subset of HOTSPOT_STATISTICS to report.
+    :param permutations: Number of permutations.
+    :param seed: Random seed, so that a run can be reproduced exactly.
+    :param n_jobs: Number of worker processes (-1 uses all cores).
+    :param alpha: Significance level used for the labels.
+    :param binary_threshold: Units with values above this are 'events' for
+        the join count statistics (e.g. woredas with any cases).
+
+    :returns: Tuple of (GeoDataFrame with local results appended,
+        dict of global results).
+    """
+    try:
+        weights = build_weights(gdf)
+        W = weights.sparse.tocsr()
+        x = gdf[attribute_column].astype(float).values
+        n = x.shape[0]
+        std = x.std()
+        z = (x - x.mean()) / std if std > 0 else np.zeros(n)
+        b = (x > binary_threshold).astype(float)
+        cardinality = np.diff(W.indptr).astype(float)
+        islands = cardinality == 0
+
+        wants_global = any(stat in statistics for stat in ('moran_global', 'join_counts_global'))
+        Z = np.column_stack([z, b])
+        row_scale = np.column_stack([np.ones(n), cardinality]) if wants_global else None
+        counts = conditional_randomization(Z, W, permutations, seed, n_jobs, row_scale)
+        larger_moran, larger_lag = counts['larger_moran'], counts['larger_lag']
+
+        lag = W @ z
+        if 'moran_local' in statistics:
+            q = np.where(z > 0, np.where(lag > 0, 1, 4), np.where(lag > 0, 2, 3))
+            p_sim = fold_counts(larger_moran[:, 0], permutations)
+            p_sim[islands | (z == 0)] = 1.0
+            gdf['lisa_i'] = (n - 1) * z * lag / n
+            gdf['lisa_q'] = q
+            gdf['lisa_p_sim'] = p_sim
+            gdf['lisa_cluster'] = label_clusters(q, p_sim, alpha)
+
+        # G and G* share their permutation distribution, only the statistic differs
+        g_p_sim = fold_counts(larger_lag[:, 0], permutations)
+        g_p_sim[islands] = 1.0
+        for stat, prefix, star in (('g_local', 'gi', False), ('g_star_local', 'gistar', True)):
+            if stat in statistics:
+                g_z, g_lag = _getis_ord_z(x, W, star)
+                denominator = x.sum() if star else x.sum() - x
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    gdf[f'{prefix}_g'] = np.nan_to_num(g_lag / denominator)
+                gdf[f'{prefix}_z'] = g_z
+                gdf[f'{prefix}_p_sim'] = g_p_sim
+                gdf[f'{prefix}_hotspot'] = label_hotspots(g_z, g_p_sim, alpha)
+
+        if 'join_counts_local' in statistics:
+            binary_lag = (W @ b) * cardinality
+            jc_p_sim = (larger_lag[:, 1] + 1.0) / (permutations + 1.0)
+            jc_p_sim[(b == 0) | islands] = np.nan
+            gdf['ljc_bb'] = b * np.round(binary_lag)
+            gdf['ljc_p_sim'] = jc_p_sim
+
+        global_results = {}
+        if wants_global:
+            sims = counts['global_sims']
+            s0 = cardinality[~islands].size
+            if 'moran_global' in statistics:
+                observed = (z * lag).sum()
+                larger = (sims[:, 0] >= observed).sum()
+                global_results['moran_global'] = {
+                    'I': observed / s0,
+                    'EI': -1.0 / (n - 1),
+                    'p_sim': fold_counts(larger, permutations),
+                }
+            if 'join_counts_global' in statistics:
+                observed_bb = 0.5 * (cardinality * b * (W @ b)).sum()
+                larger = (0.5 * sims[:, 1] >= observed_bb - 1e-9).sum()
+                global_results['join_counts_global'] = {
+                    'bb': observed_bb,
+                    'mean_bb_sim': 0.5 * sims[:, 1].mean(),
+                    'p_sim': (larger + 1.0) / (permutations + 1.0),
+                }
+
+        return gdf, global_results
+
+    except Exception as e:
+        print(f"An error occurred in PySAL provider: {e}")
+        return None, {}
+
+def run_hotspot_statistics_on_layer(layer, attribute_column, write_back=True, **kwargs):
+    """
+    Runs run_hotspot_statistics on a live QgsVectorLayer.
+
+    :param layer: The QgsVectorLayer to analyse.
+    :param attribute_column: The column to analyze.
+    :param write_back: If True, the local results are added as new fields
+        on the same layer.
+
+    Remaining keyword arguments are passed to run_hotspot_statistics.
+
+    :returns: Tuple of (GeoDataFrame, dict of global results).
+    """
+    try:
+        gdf = layer_to_geodataframe(layer, [attribute_column])
+    except Exception as e:
+        print(f"An error occurred in PySAL provider: {e}")
+        return None, {}
+
+    gdf, global_results = run_hotspot_statistics(gdf, attribute_column, **kwargs)
+    if gdf is not None and write_back:
+        result_columns = [col for col in gdf.columns if col not in (attribute_column, 'geometry')]
+        if not write_results_to_layer(layer, gdf, result_columns):
+            print(f"PySAL provider could not write results to layer '{layer.name()}'.")
+    return gdf, global_results
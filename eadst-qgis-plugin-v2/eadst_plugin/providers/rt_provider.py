@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+A provider for the time-varying reproduction number Rt (Cori et al., 2013).
+
+Rt over a sliding window of tau days ending on day t has a gamma posterior
+with shape a + (cases in the window) and rate 1/b + (total infectiousness
+in the window), where the infectiousness of a day is the incidence of the
+preceding days weighted by the serial interval distribution. All windows
+of all strata (e.g. regions) are computed together as array operations.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from .sitrep_provider import AdminAssignment, load_outbreak_records
+
+# Cori et al. advise against estimates before this many cases have been seen
+MIN_CUMULATIVE_CASES = 12
+
+def discretised_serial_interval(mean, sd, max_days=None):
+    """
+    Discretised gamma serial interval distribution.
+
+    :param mean: Mean serial interval in days.
+    :param sd: Standard deviation in days.
+    :param max_days: Longest serial interval considered. Defaults to the
+        99.9% quantile.
+
+    :returns: Array w with w[s] the probability of a serial interval of s
+        days (w[0] = 0), summing to one.
+    """
+    shape, scale = (mean / sd) ** 2, sd ** 2 / mean
+    max_days = max_days or int(np.ceil(stats.gamma.ppf(0.999, shape, scale=scale)))
+    edges = np.arange(max_days + 1) + 0.5
+    w = np.diff(np.concatenate([[0.0], stats.gamma.cdf(edges, shape, scale=scale)]))
+    w[0] = 0.0
+    return w / w.sum()
+
+def daily_incidence(records, date_field='Event_Date', strata_column=None, cases_column='Cases'):
+    """
+    Cases per day and stratum, including days without cases.
+
+    :returns: DataFrame indexed by day with one column per stratum ('All'
+        when not stratified).
+    """
+    if records.empty:
+        return pd.DataFrame(dtype=float)
+    days = records[date_field].dt.normalize()
+    strata = records[strata_column] if strata_column else pd.Series('All', index=records.index)
+    table = records[cases_column].groupby([days, strata]).sum().unstack(fill_value=0)
+    full_range = pd.date_range(table.index.min(), table.index.max(), freq='D')
+    return table.reindex(full_range, fill_value=0).astype(float)
+
+def estimate_rt(incidence, serial_interval, window=7, prior_mean=5.0, prior_sd=5.0,
+                quantiles=(0.025, 0.5, 0.975)):
+    """
+    Sliding-window Rt for every day and stratum at once.
+
+    :param incidence: DataFrame of daily cases (see daily_incidence).
+    :param serial_interval: Array from discretised_serial_interval.
+    :param window: Window length in days.
+    :param prior_mean: Mean of the gamma prior on Rt.
+    :param prior_sd: Standard deviation of the gamma prior on Rt.
+    :param quantiles: Posterior quantiles to report.
+
+    :returns: Long DataFrame with one row per window end and stratum:
+        date, stratum, cases (in the window), mean, sd, one column per
+        quantile (e.g. 'q0.025'), p_above_1 (posterior probability that
+        the outbreak is growing) and 'reliable'. Windows without any
+        infectiousness from earlier cases have no estimate (NaN).
+    """
+    I = incidence.to_numpy(dtype=float)
+    n_days, n_strata = I.shape
+    w = np.asarray(serial_interval, dtype=float)
+
+    # Total infectiousness of each day: sum over s of I[t - s] * w[s]
+    infectiousness = np.zeros_like(I)
+    for s in range(1, min(w.size, n_days)):
+        infectiousness[s:] += w[s] * I[:-s]
+
+    def window_sums(values):
+        cumulative = np.vstack([np.zeros((1, n_strata)), np.cumsum(values, axis=0)])
+        sums = cumulative[window:] - cumulative[:-window]
+        return np.vstack([np.full((window - 1, n_strata), np.nan), sums])[:n_days]
+
+    cases, pressure = window_sums(I), window_sums(infectiousness)
+    prior_shape = (prior_mean / prior_sd) ** 2
+    prior_scale = prior_sd ** 2 / prior_mean
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shape = prior_shape + cases
+        scale = np.where(pressure > 0, 1.0 / (1.0 / prior_scale + pressure), np.nan)
+
+    result = {
+        'date': np.repeat(incidence.index.to_numpy(), n_strata),
+        'stratum': np.tile(incidence.columns.astype(str).to_numpy(), n_days),
+        'cases': cases.ravel(),
+        'mean': (shape * scale).ravel(),
+        'sd': (np.sqrt(shape) * scale).ravel(),
+    }
+    for q in quantiles:
+        result[f'q{q}'] = stats.gamma.ppf(q, shape, scale=scale).ravel()
+    result['p_above_1'] = stats.gamma.sf(1.0, shape, scale=scale).ravel()
+    # Cases seen before the window starts
+    seen = np.vstack([np.zeros((window, n_strata)), np.cumsum(I, axis=0)[:-window]])[:n_days]
+    result['reliable'] = (seen >= MIN_CUMULATIVE_CASES).ravel()
+    return pd.DataFrame(result)
+
+class RtEstimator:
+    """
+    Estimates Rt for an outbreak layer, optionally per admin unit.
+
+    The admin unit of each outbreak location is remembered between runs, so
+    when new records arrive only their locations are joined to the admin
+    boundaries before the (fast) array computation is repeated.
+    """
+    def __init__(self, layer, date_field='Event_Date', admin_level=None):
+        self.layer = layer
+        self.date_field = date_field
+        self.admin_level = admin_level
+        self.assignment = AdminAssignment(admin_level) if admin_level else None
+
+    def estimate(self, si_mean, si_sd, window=7, start_date=None, end_date=None, **kwargs):
+        """
+        Estimates Rt from the current layer contents.
+
+        :returns: Tuple of (incidence DataFrame, Rt DataFrame as returned by
+            estimate_rt), or (None, None) on failure.
+        """
+        try:
+            records = load_outbreak_records(self.layer, self.date_field, start_date, end_date)
+            if records.empty:
+                print("Rt provider: no dated outbreak records found.")
+                return None, None
+            strata_column = None
+            if self.admin_level:
+                records['Stratum'] = self.assignment.unit_names(records)
+                strata_column = 'Stratum'
+            incidence = daily_incidence(records, self.date_field, strata_column)
+            serial_interval = discretised_serial_interval(si_mean, si_sd)
+            return incidence, estimate_rt(incidence, serial_interval, window, **kwargs)
+
+        except Exception as e:
+            print(f"An error occurred in Rt provider: {e}")
+            return None, None
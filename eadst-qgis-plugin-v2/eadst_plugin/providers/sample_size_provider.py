@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+A provider for surveillance sample sizes.
+
+Freedom from disease: the number of units to test so that, if disease
+were present at the design prevalence, more than a cut-point of reactors
+would be found with the required confidence (population sensitivity).
+Finite populations use the hypergeometric distribution of diseased units
+in the sample, infinite ones the binomial. With an imperfect test
+specificity the cut-point is raised until the probability of a false
+alarm in a free population is acceptable (as in FreeCalc). Two-stage
+designs first size the sample per cluster (e.g. herd) to reach a cluster
+sensitivity and then treat clusters as the units of a second freedom
+calculation.
+
+Prevalence estimation: the normal approximation, corrected for test
+accuracy (Humphry et al., 2004), finite populations and clustering.
+
+Every calculation is memoised, so tables over populations and design
+prevalences, and live recalculation while inputs are edited, only ever
+compute a combination once.
+"""
+
+import functools
+import numpy as np
+from scipy import special, stats
+
+# --- Freedom from disease ---
+
+def diseased_units(population, prevalence):
+    """Number of diseased units at the design prevalence (at least one)."""
+    return max(1, int(round(population * prevalence)))
+
+def _log_choose(n, k):
+    return special.gammaln(n + 1.0) - special.gammaln(k + 1.0) - special.gammaln(n - k + 1.0)
+
+def _binom_pmf(k, n, p):
+    """P(X = k) for X ~ Binomial(n, p), zero outside 0..n."""
+    inside = (k >= 0) & (k <= n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_p = _log_choose(n, k) + special.xlogy(k, p) + special.xlog1py(n - k, -p)
+    return np.where(inside, np.exp(np.where(inside, log_p, 0.0)), 0.0)
+
+def _binom_cdf(k, n, p):
+    """P(X <= k) for X ~ Binomial(n, p); special.bdtr itself is undefined for k >= n."""
+    n = np.asarray(n, dtype=np.int64)
+    return np.where(k >= n, 1.0, special.bdtr(np.minimum(k, np.maximum(n - 1, 0)), np.maximum(n, 1), p))
+
+def _binom_sf(k, n, p):
+    """P(X > k) for X ~ Binomial(n, p)."""
+    n = np.asarray(n, dtype=np.int64)
+    return np.where(k >= n, 0.0, special.bdtrc(k, np.maximum(n, k + 1), p))
+
+def population_sensitivity(n, population, prevalence, se=1.0, sp=1.0, cutpoint=0):
+    """
+    Probability of more than cutpoint reactors among n tested units when
+    disease is present at the design prevalence.
+
+    The distributions are evaluated in closed form (log binomial
+    coefficients and incomplete beta functions) rather than through
+    scipy.stats, as the sample size searches call this many times.
+
+    :param n: Sample size (scalar or array).
+    :param population: Number of units, or None for an infinite population.
+    :param prevalence: Design prevalence (proportion).
+    :param se: Test sensitivity.
+    :param sp: Test specificity.
+    :param cutpoint: Largest number of reactors still read as free.
+    """
+    n = np.asarray(n, dtype=float)
+    if population is None:
+        apparent = prevalence * se + (1.0 - prevalence) * (1.0 - sp)
+        return _binom_sf(cutpoint, n, apparent)
+
+    diseased = diseased_units(population, prevalence)
+    flat = np.atleast_1d(n)[:, None]
+    # Diseased units in the sample: y = 0..min(n, diseased), one row per sample size
+    y = np.arange(min(int(flat.max()), diseased) + 1, dtype=float)[None, :]
+    possible = (y <= flat) & (flat - y <= population - diseased)
+    with np.errstate(invalid='ignore'):
+        log_p_y = _log_choose(diseased, y) + _log_choose(population - diseased, flat - y) - _log_choose(population, flat)
+    p_y = np.where(possible, np.exp(np.where(possible, log_p_y, 0.0)), 0.0)
+
+    # j reactors among the diseased sampled and at most cutpoint - j among the healthy ones (last axis);
+    # the healthy side is a running sum of probabilities, cheaper than incomplete beta functions
+    j = np.arange(cutpoint + 1, dtype=float)
+    p_j = _binom_pmf(j, y[..., None], se)
+    healthy_cdf = np.cumsum(_binom_pmf(j, np.maximum(flat - y, 0.0)[..., None], 1.0 - sp), axis=2)
+    p_free = (p_j * healthy_cdf[..., ::-1]).sum(axis=2)
+    result = 1.0 - (p_y * p_free).sum(axis=1)
+    return result.reshape(n.shape) if n.ndim else float(result[0])
+
+def population_specificity(n, sp=1.0, cutpoint=0):
+    """Probability that a free population gives at most cutpoint reactors among n tested units."""
+    return _binom_cdf(cutpoint, n, 1.0 - sp)
+
+def _first_true(condition, low, high):
+    """Smallest n in low..high meeting a condition that, once met, stays met (None if never)."""
+    if low > high or not condition(high):
+        return None
+    while low < high:
+        middle = (low + high) // 2
+        if condition(middle):
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+@functools.lru_cache(maxsize=65536)
+def freedom_sample_size(population, prevalence, se=1.0, sp=1.0, confidence=0.95, min_specificity=0.95,
+                        max_n=100000):
+    """
+    Sample size to demonstrate freedom from disease.
+
+    For each cut-point in turn, the sample is limited to the sizes that
+    keep the population specificity at min_specificity, and the smallest
+    of those reaching the confidence is taken. The cut-point is raised
+    until that limit covers every possible sample size.
+
+    :param population: Number of units, or None for an infinite population.
+    :param prevalence: Design prevalence (proportion).
+    :param se: Test sensitivity.
+    :param sp: Test specificity.
+    :param confidence: Required population sensitivity.
+    :param min_specificity: Required population specificity (only
+        relevant when sp < 1).
+    :param max_n: Largest sample size considered for infinite populations.
+
+    :returns: Dict with n, cutpoint (largest number of reactors read as
+        free), sensitivity, specificity and method, or None if no sample
+        size reaches the requirements.
+    """
+    upper = population if population is not None else max_n
+    cutpoint = 0
+    while True:
+        # Population specificity falls with n: the largest n still specific enough for this cut-point
+        too_many = _first_true(lambda m: population_specificity(m, sp, cutpoint) < min_specificity, 1, upper)
+        limit = upper if too_many is None else too_many - 1
+        # Sensitivity grows with n, so the cut-point is feasible only if it is reached at the limit
+        if limit >= 1 and population_sensitivity(limit, population, prevalence, se, sp, cutpoint) >= confidence:
+            n = _first_true(lambda m: population_sensitivity(m, population, prevalence, se, sp, cutpoint) >= confidence,
+                            1, limit)
+            return {'n': int(n), 'cutpoint': cutpoint,
+                    'sensitivity': float(population_sensitivity(n, population, prevalence, se, sp, cutpoint)),
+                    'specificity': float(population_specificity(n, sp, cutpoint)),
+                    'method': 'binomial' if population is None else 'hypergeometric'}
+        if limit >= upper:
+            return None
+        cutpoint += 1
+
+@functools.lru_cache(maxsize=4096)
+def two_stage_sample_size(herds, herd_size, herd_prevalence, animal_prevalence, se=1.0, sp=1.0, confidence=0.95,
+                          herd_sensitivity=0.95, min_specificity=0.95, cost_per_herd=None, cost_per_animal=None):
+    """
+    Two-stage freedom design: herds (or villages) in the first stage and
+    animals within each selected herd in the second.
+
+    Animals per herd are chosen to reach herd_sensitivity within a herd of
+    herd_size animals at the within-herd design prevalence; herds are then
+    sized with that herd-level sensitivity and specificity. When both
+    costs are given, the herd sensitivity target is instead chosen to
+    minimise cost_per_herd * herds + cost_per_animal * animals.
+
+    :param herds: Number of herds in the population, or None if infinite.
+    :param min_specificity: Required specificity of each stage.
+
+    :returns: Dict with herds, animals_per_herd, total_animals, cutpoint
+        (reactors per herd read as free), herd_sensitivity,
+        herd_specificity, sensitivity and specificity (of the whole
+        system), or None if the requirements cannot be met.
+    """
+    targets = [herd_sensitivity]
+    if cost_per_herd is not None and cost_per_animal is not None:
+        targets = list(np.round(np.arange(0.50, 0.995, 0.01), 2))
+
+    best, seen = None, set()
+    for target in targets:
+        within = freedom_sample_size(herd_size, animal_prevalence, se, sp, float(target), min_specificity)
+        # Neighbouring targets often give the same within-herd design
+        if within is None or (within['n'], within['cutpoint']) in seen:
+            continue
+        seen.add((within['n'], within['cutpoint']))
+        between = freedom_sample_size(herds, herd_prevalence, within['sensitivity'], within['specificity'],
+                                      confidence, min_specificity)
+        if between is None:
+            continue
+        design = {'herds': between['n'], 'animals_per_herd': within['n'],
+                  'total_animals': between['n'] * within['n'], 'cutpoint': within['cutpoint'],
+                  'herd_cutpoint': between['cutpoint'],
+                  'herd_sensitivity': within['sensitivity'], 'herd_specificity': within['specificity'],
+                  'sensitivity': between['sensitivity'], 'specificity': between['specificity']}
+        cost = (cost_per_herd * design['herds'] + cost_per_animal * design['total_animals']
+                if cost_per_herd is not None and cost_per_animal is not None else 0.0)
+        if best is None or cost < best[0]:
+            best = (cost, design)
+    return best[1] if best else None
+
+def freedom_table(populations, prevalences, se=1.0, sp=1.0, confidence=0.95, min_specificity=0.95):
+    """
+    Freedom sample sizes for every population size and design prevalence.
+
+    :returns: Dict of (population, prevalence) -> sample size (None if not reachable).
+    """
+    table = {}
+    for population in populations:
+        for prevalence in prevalences:
+            design = freedom_sample_size(population, float(prevalence), float(se), float(sp),
+                                         float(confidence), float(min_specificity))
+            table[(population, prevalence)] = design['n'] if design else None
+    return table
+
+# --- Prevalence estimation ---
+
+@functools.lru_cache(maxsize=65536)
+def prevalence_sample_size(expected_prevalence, precision, confidence=0.95, population=None, se=1.0, sp=1.0,
+                           cluster_size=1, icc=0.0):
+    """
+    Sample size to estimate a prevalence within +/- precision.
+
+    :param expected_prevalence: Expected true prevalence.
+    :param precision: Absolute precision (half width of the confidence interval).
+    :param population: Number of units, or None for an infinite population.
+    :param se: Test sensitivity.
+    :param sp: Test specificity.
+    :param cluster_size: Units sampled per cluster (1 for simple random sampling).
+    :param icc: Intra-cluster correlation of infection.
+
+    :returns: Dict with n, clusters and design_effect, or None if the test
+        cannot tell infected from uninfected units (se + sp <= 1).
+    """
+    youden = se + sp - 1.0
+    if youden <= 0:
+        return None
+    z = stats.norm.ppf(1.0 - (1.0 - confidence) / 2.0)
+    apparent = expected_prevalence * se + (1.0 - expected_prevalence) * (1.0 - sp)
+    n = z ** 2 * apparent * (1.0 - apparent) / (precision ** 2 * youden ** 2)
+    design_effect = 1.0 + (cluster_size - 1) * icc
+    n *= design_effect
+    if population is not None:
+        n = n / (1.0 + (n - 1.0) / population)
+    n = int(np.ceil(n))
+    return {'n': n, 'clusters': int(np.ceil(n / cluster_size)), 'design_effect': design_effect}
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+A provider for risk-based sampling frames and the selection of
+surveillance units.
+
+A frame lists the units of an admin level (e.g. woredas) with their
+centroid, area and risk covariates: outbreak history and livestock
+density. Units are drawn with seeded, vectorised designs:
+
+- Stratified random: the sample is allocated to strata (e.g. regions) in
+  proportion to their total risk weight and drawn with equal probability
+  within each stratum.
+- PPS: probability proportional to the risk weight, by systematic
+  sampling of the frame in random order.
+- Spatially balanced (GRTS-style): the same systematic PPS along a
+  randomised hierarchical (quadtree) ordering of the unit centroids, so
+  the sample spreads evenly over space (Stevens & Olsen, 2004).
+
+Every selected unit carries its inclusion probability and design weight
+for the analysis of the survey.
+"""
+
+import numpy as np
+import pandas as pd
+from .density_provider import ANALYSIS_CRS
+from .pysal_provider import layer_to_geodataframe
+from .sitrep_provider import AdminAssignment, load_outbreak_records
+from ..modules.utils import ADMIN_LEVELS
+
+SAMPLING_METHODS = ['Stratified random', 'PPS', 'Spatially balanced (GRTS)']
+METHOD_DESCRIPTIONS = {
+    'Stratified random': "stratified random sampling",
+    'PPS': "sampling with probability proportional to risk (PPS)",
+    'Spatially balanced (GRTS)': "spatially balanced (GRTS-style) sampling",
+}
+# Depth of the GRTS quadtree: 4^16 cells separate any two unit centroids in practice
+QUADTREE_LEVELS = 16
+
+# --- Designs ---
+
+def risk_weights(frame, outbreak_weight=0.0, density_weight=0.0):
+    """
+    Relative risk weight of every unit: 1 + a * outbreaks / mean outbreaks
+    + b * density / mean density, so that a = b = 0 gives equal weights.
+    """
+    weights = np.ones(len(frame))
+    for column, factor in (('Outbreaks', outbreak_weight), ('Density', density_weight)):
+        mean = frame[column].mean() if column in frame else 0.0
+        if factor and mean > 0:
+            weights += factor * frame[column].to_numpy(dtype=float) / mean
+    return weights
+
+def inclusion_probabilities(weights, n):
+    """
+    Inclusion probabilities proportional to the weights for a sample of n;
+    units whose probability would exceed one are taken with certainty and
+    the remaining sample is spread over the others.
+    """
+    weights = np.asarray(weights, dtype=float)
+    n = min(int(n), weights.size)
+    certain = np.zeros(weights.size, dtype=bool)
+    pi = np.zeros(weights.size)
+    while True:
+        rest = ~certain
+        total = weights[rest].sum()
+        pi[rest] = (n - certain.sum()) * weights[rest] / total if total > 0 else 0.0
+        new = rest & (pi >= 1.0)
+        if not new.any():
+            break
+        certain |= new
+    pi[certain] = 1.0
+    return pi
+
+def systematic_sample(pi, order, rng):
+    """Units hit by equally spaced points, from a random start, along the cumulative probabilities in order."""
+    cumulative = np.cumsum(pi[order])
+    points = rng.random() + np.arange(int(round(pi.sum())))
+    positions = np.minimum(np.searchsorted(cumulative, points, side='right'), order.size - 1)
+    return order[positions]
+
+def grts_order(x, y, rng, levels=QUADTREE_LEVELS):
+    """
+    Randomised hierarchical order of points: the quadrants of every
+    quadtree cell are visited in a random order of their own, level by
+    level, and points in the same finest cell in random order.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    size = 2 ** levels
+
+    def to_grid(values):
+        span = values.max() - values.min()
+        scaled = (values - values.min()) / span * (size - 1) if span > 0 else np.zeros_like(values)
+        return scaled.astype(np.int64)
+
+    gx, gy = to_grid(x), to_grid(y)
+    address = np.zeros(x.size, dtype=np.int64)
+    for level in range(levels - 1, -1, -1):
+        quadrant = 2 * ((gx >> level) & 1) + ((gy >> level) & 1)
+        # One random permutation of the four quadrants per occupied parent cell
+        parents, parent_of = np.unique(address, return_inverse=True)
+        permutations = rng.permuted(np.tile(np.arange(4), (parents.size, 1)), axis=1)
+        address = address * 4 + permutations[parent_of, quadrant]
+    return np.lexsort((rng.random(x.size), address))
+
+def allocate(totals, sizes, n):
+    """
+    Sample size of each stratum in proportion to its total weight (largest
+    remainders), never more than the units of the stratum.
+    """
+    totals, sizes = np.asarray(totals, dtype=float), np.asarray(sizes, dtype=np.int64)
+    n = min(int(n), int(sizes.sum()))
+    # Strata whose share exceeds their size are taken whole, and the rest shared again
+    full = np.zeros(sizes.size, dtype=bool)
+    while True:
+        share = np.where(full, 0.0, totals)
+        share = (n - sizes[full].sum()) * share / share.sum() if share.sum() > 0 else share
+        over = ~full & (share > sizes)
+        if not over.any():
+            break
+        full |= over
+    allocation = np.where(full, sizes, np.floor(share)).astype(np.int64)
+    remainder = np.where(full, -1.0, share - allocation)
+    allocation[np.argsort(-remainder, kind='stable')[:n - allocation.sum()]] += 1
+    return allocation
+
+def draw_sample(frame, n, method='PPS', weights=None, strata_column=None, seed=None):
+    """
+    Draws n units from a frame.
+
+    :param frame: DataFrame of units with 'x' and 'y' centroids (and the
+        strata column for stratified sampling).
+    :param n: Sample size.
+    :param method: One of SAMPLING_METHODS.
+    :param weights: Risk weight of every unit (equal weights if None).
+    :param strata_column: Column of the strata for stratified sampling
+        (one stratum if None).
+    :param seed: Random seed, so that a selection can be reproduced exactly.
+
+    :returns: The selected rows of the frame, in selection order, with
+        Risk_Weight, Incl_Prob, Design_Weight and Selection_Order.
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.ones(len(frame)) if weights is None else np.asarray(weights, dtype=float)
+    n = min(int(n), len(frame))
+
+    if method == 'Stratified random':
+        strata = frame[strata_column].fillna('Unknown').to_numpy() if strata_column else np.zeros(len(frame))
+        labels, stratum = np.unique(strata, return_inverse=True)
+        sizes = np.bincount(stratum, minlength=labels.size)
+        allocation = allocate(np.bincount(stratum, weights, minlength=labels.size), sizes, n)
+        # Equal probability within strata: a random rank per unit, the first n_h of every stratum
+        order = np.lexsort((rng.random(len(frame)), stratum))
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        rank = np.empty(len(frame), dtype=np.int64)
+        rank[order] = np.arange(len(frame)) - starts[stratum[order]]
+        selected = order[rank[order] < allocation[stratum[order]]]
+        selected = selected[rng.permutation(selected.size)]
+        pi = (allocation / np.maximum(sizes, 1))[stratum]
+    else:
+        pi = inclusion_probabilities(weights, n)
+        if method == 'PPS':
+            order = rng.permutation(len(frame))
+        elif method == 'Spatially balanced (GRTS)':
+            order = grts_order(frame['x'], frame['y'], rng)
+        else:
+            raise ValueError(f"Unknown sampling method '{method}'.")
+        selected = systematic_sample(pi, order, rng)
+
+    sample = frame.iloc[selected].copy()
+    sample['Risk_Weight'] = weights[selected]
+    sample['Incl_Prob'] = pi[selected]
+    sample['Design_Weight'] = 1.0 / pi[selected]
+    sample['Selection_Order'] = np.arange(1, selected.size + 1)
+    return sample
+
+# --- Frames ---
+
+def build_frame(admin_level='Woredas', strata_level=None, outbreak_layer=None, date_field='Event_Date',
+                start_date=None, livestock_layer=None, livestock_field=None):
+    """
+    Builds a sampling frame from the admin base layers.
+
+    :param admin_level: Admin level of the units (see ADMIN_LEVELS).
+    :param strata_level: Optional coarser admin level whose name, read from
+        the unit attributes, becomes the 'Stratum' column.
+    :param outbreak_layer: Optional outbreak point layer; the outbreaks of
+        every unit (since start_date) become the 'Outbreaks' column.
+    :param livestock_layer: Optional point or polygon layer (e.g. census
+        villages) with a head count in livestock_field; counts are summed
+        per unit (polygons by their representative point) into
+        'Livestock' and 'Density' (head per km2).
+
+    :returns: DataFrame indexed by the admin feature id with Code, Name,
+        Stratum, x, y (EPSG:20137 centroids), Area_km2, Outbreaks,
+        Livestock and Density, or None on failure.
+    """
+    try:
+        _, name_field, code_field = ADMIN_LEVELS[admin_level]
+        strata_field = ADMIN_LEVELS[strata_level][1] if strata_level else None
+        assignment = AdminAssignment(admin_level, [strata_field] if strata_field else [])
+        admin_gdf = assignment.load()
+
+        centroids = admin_gdf.geometry.centroid
+        frame = pd.DataFrame({
+            'Code': admin_gdf[code_field], 'Name': admin_gdf[name_field],
+            'Stratum': admin_gdf[strata_field] if strata_field else 'All',
+            'x': centroids.x, 'y': centroids.y, 'Area_km2': admin_gdf.geometry.area / 1e6,
+        }, index=admin_gdf.index)
+
+        frame['Outbreaks'] = 0
+        if outbreak_layer is not None:
+            records = load_outbreak_records(outbreak_layer, date_field, start_date)
+            if not records.empty:
+                positions = assignment.unit_positions(records)
+                frame['Outbreaks'] = np.bincount(positions[positions >= 0], minlength=len(frame))
+
+        frame['Livestock'] = 0.0
+        if livestock_layer is not None and livestock_field:
+            livestock = layer_to_geodataframe(livestock_layer, [livestock_field]).to_crs(ANALYSIS_CRS)
+            livestock = livestock[livestock.geometry.notna() & ~livestock.geometry.is_empty]
+            points = livestock.geometry.representative_point()
+            heads = pd.to_numeric(livestock[livestock_field], errors='coerce').fillna(0).to_numpy(dtype=float)
+            positions = assignment.unit_positions(pd.DataFrame({'x': points.x.to_numpy(), 'y': points.y.to_numpy()}))
+            inside = positions >= 0
+            frame['Livestock'] = np.bincount(positions[inside], weights=heads[inside], minlength=len(frame))
+        frame['Density'] = np.where(frame['Area_km2'] > 0, frame['Livestock'] / frame['Area_km2'], 0.0)
+        return frame
+
+    except Exception as e:
+        print(f"An error occurred in sampling provider: {e}")
+        return None
+
+def describe_design(frame, sample, admin_level, method, strata_level=None, outbreak_weight=0.0, density_weight=0.0,
+                    seed=None):
+    """A one-paragraph description of a selection, for the 'Unit Selection' element of a scheme."""
+    risk = [text for text, factor in (("outbreak history", outbreak_weight), ("livestock density", density_weight))
+            if factor]
+    text = f"{len(sample)} of {len(frame)} {admin_level.lower()} selected by {METHOD_DESCRIPTIONS[method]}"
+    text += f" within {strata_level.lower()}" if method == 'Stratified random' and strata_level else ""
+    text += f", weighted by {' and '.join(risk)}" if risk else ""
+    return text + f" (random seed {seed}; inclusion probabilities and design weights recorded per unit)."
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Cylinder scan kernels for the space-time permutation scan statistic.
+
+These are free of QGIS imports, so that the Monte Carlo replications can be
+executed in worker processes.
+"""
+
+import numpy as np
+from scipy.special import xlogy
+
+# Centres are processed in blocks to bound the size of the (centre, neighbour, time) arrays:
+# at most CENTRE_BLOCK_SIZE centres, and fewer when a block would exceed MAX_BLOCK_ELEMENTS
+# values (16 MB per array), so memory stays flat with many neighbours or time units
+CENTRE_BLOCK_SIZE = 128
+MAX_BLOCK_ELEMENTS = 2 ** 21
+
+def poisson_llr(observed, expected, total):
+    """Kulldorff's log likelihood ratio, zero unless observed exceeds expected."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        llr = xlogy(observed, observed / expected) + (total - observed) * np.log1p((expected - observed) / (total - expected))
+    return np.where(observed > expected, np.nan_to_num(llr), 0.0)
+
+def _cylinder_windows(X, neighbours, valid, cylinder_totals, time_totals, total, max_window):
+    """
+    Yields (block, length, observed, expected, valid) for every block of centres and window length.
+
+    A cylinder is a centre plus its k nearest locations (the precomputed,
+    distance-sorted neighbour list), over a window of consecutive time
+    units. Under the space-time permutation null the expected count of a
+    cylinder only depends on the location and time margins, which do not
+    change between replications.
+    """
+    n_locations, n_times = X.shape
+    time_prefix = np.concatenate([[0.0], np.cumsum(time_totals)])
+    block_size = int(np.clip(MAX_BLOCK_ELEMENTS // (neighbours.shape[1] * (n_times + 1)), 1, CENTRE_BLOCK_SIZE))
+    for block_start in range(0, n_locations, block_size):
+        block = slice(block_start, min(block_start + block_size, n_locations))
+        if not valid[block].any():
+            continue
+        # Cases of each growing cylinder over time, then prefix sums over time
+        cumulative = np.cumsum(X[neighbours[block]], axis=1)
+        prefix = np.concatenate([np.zeros(cumulative.shape[:2] + (1,)), np.cumsum(cumulative, axis=2)], axis=2)
+        block_totals = cylinder_totals[block]
+        block_valid = valid[block][:, :, None]
+
+        for length in range(1, min(max_window, n_times) + 1):
+            observed = prefix[:, :, length:] - prefix[:, :, :-length]
+            expected = block_totals[:, :, None] * ((time_prefix[length:] - time_prefix[:-length]) / total)[None, None, :]
+            yield block, length, observed, expected, block_valid
+
+def scan_max_llr(X, neighbours, valid, cylinder_totals, time_totals, total, max_window):
+    """
+    Maximum LLR over all cylinders, evaluating only those that could exceed the best so far.
+
+    The LLR is at most C log(C/E) <= C (C - E) / E, so cylinders whose bound
+    does not reach the current maximum are skipped without computing logs.
+    """
+    best = 0.0
+    for _, _, observed, expected, block_valid in _cylinder_windows(X, neighbours, valid, cylinder_totals,
+                                                                   time_totals, total, max_window):
+        candidates = (observed > expected) & block_valid & (observed * (observed - expected) > best * expected)
+        if candidates.any():
+            best = max(best, poisson_llr(observed[candidates], expected[candidates], total).max())
+    return best
+
+def scan_cylinders(X, neighbours, valid, cylinder_totals, time_totals, total, max_window):
+    """
+    Evaluates every cylinder and returns the best one per centre.
+
+    :param X: (L, T) array of case counts per location and time unit.
+    :param neighbours: (L, K) distance-sorted neighbour ids, the centre first.
+    :param valid: (L, K) mask of cylinders within the size limits.
+    :param cylinder_totals: (L, K) total cases of each cylinder over all time.
+    :param time_totals: (T,) total cases per time unit.
+    :param total: Total number of cases.
+    :param max_window: Maximum window length in time units.
+
+    :returns: Tuple of per-centre arrays (llr, k, start, length, observed, expected).
+    """
+    n_locations = X.shape[0]
+    best = np.zeros(n_locations)
+    best_k = np.zeros(n_locations, dtype=np.int64)
+    best_start = np.zeros(n_locations, dtype=np.int64)
+    best_length = np.zeros(n_locations, dtype=np.int64)
+    best_observed = np.zeros(n_locations)
+    best_expected = np.zeros(n_locations)
+
+    for block, length, observed, expected, block_valid in _cylinder_windows(X, neighbours, valid, cylinder_totals,
+                                                                            time_totals, total, max_window):
+        llr = np.where(block_valid, poisson_llr(observed, expected, total), 0.0)
+        flat = llr.reshape(llr.shape[0], -1)
+        arg = flat.argmax(axis=1)
+        value = flat[np.arange(flat.shape[0]), arg]
+        improved = value > best[block]
+        if not improved.any():
+            continue
+        rows = np.flatnonzero(improved)
+        k, start = np.unravel_index(arg[rows], llr.shape[1:])
+        centres = rows + block.start
+        best[centres] = value[rows]
+        best_k[centres] = k
+        best_start[centres] = start
+        best_length[centres] = length
+        best_observed[centres] = observed[rows, k, start]
+        best_expected[centres] = expected[rows, k, start]
+
+    return best, best_k, best_start, best_length, best_observed, best_expected
+
+def permuted_counts(location_index, time_index, n_locations, n_times, rng):
+    """Randomly reassigns case times to case locations, keeping both margins."""
+    shuffled = rng.permutation(time_index)
+    return np.bincount(location_index * n_times + shuffled,
+                       minlength=n_locations * n_times).reshape(n_locations, n_times).astype(float)
+
+def replicate_max_llr(location_index, time_index, n_locations, n_times, neighbours, valid,
+                      cylinder_totals, time_totals, total, max_window, seed, rep_start, rep_stop):
+    """Maximum LLR of Monte Carlo replications rep_start:rep_stop."""
+    maxima = np.empty(rep_stop - rep_start)
+    for row, rep in enumerate(range(rep_start, rep_stop)):
+        # One stream per replication keeps results independent of chunking
+        rng = np.random.default_rng([seed, rep])
+        X = permuted_counts(location_index, time_index, n_locations, n_times, rng)
+        maxima[row] = scan_max_llr(X, neighbours, valid, cylinder_totals, time_totals, total, max_window)
+    return maxima
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""A provider for the space-time permutation scan statistic (Kulldorff et al., 2005)."""
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from qgis.core import (QgsCoordinateReferenceSystem, QgsCoordinateTransform, QgsFeatureRequest,
+                       QgsGeometry, QgsPointXY, QgsProject, QgsSpatialIndex, NULL)
+from .parallel import map_chunks, resolve_n_jobs, split_range
+from .scan_kernels import scan_cylinders, replicate_max_llr
+from .density_provider import ANALYSIS_CRS
+
+# Each replication evaluates locations x neighbours x time units x window lengths cylinders.
+# On one core, 1,000 woreda locations over 104 weeks (50 neighbours, 13-week windows) take
+# about 1.2 s per replication, and 2,000 locations with 100 neighbours about 5 s, so scans of
+# individual points are limited in both: beyond that, scan polygon locations (e.g. woredas)
+MAX_POINT_NEIGHBOURS = 100
+MAX_POINT_LOCATIONS = 1000
+
+def space_time_permutation_scan(coords, location_index, time_index, n_times, max_neighbours=50,
+                                max_radius=None, max_case_fraction=0.5, max_window=None,
+                                replications=999, seed=None, n_jobs=1, max_clusters=10):
+    """
+    Detects space-time clusters using only case data (no population at risk).
+
+    :param coords: (L, 2) array of projected location coordinates (metres).
+    :param location_index: (C,) location id of each individual case.
+    :param time_index: (C,) time unit (e.g. week number) of each case.
+    :param n_times: Number of time units in the study period.
+    :param max_neighbours: Largest number of locations in a cylinder. Run
+        time and memory grow with it, times the locations, time units and
+        window lengths.
+    :param max_radius: Optional largest cylinder radius in metres.
+    :param max_case_fraction: Largest share of all cases in a cylinder.
+    :param max_window: Longest window in time units. Defaults to half the
+        study period.
+    :param replications: Number of Monte Carlo replications.
+    :param seed: Random seed, so that a run can be reproduced exactly.
+    :param n_jobs: Number of worker processes (-1 uses all cores).
+    :param max_clusters: Maximum number of non-overlapping clusters reported.
+
+    :returns: Tuple of (DataFrame of clusters ordered by LLR, list of arrays
+        with the member location ids of each cluster).
+    """
+    coords = np.asarray(coords, dtype=float)
+    location_index = np.asarray(location_index, dtype=np.int64)
+    time_index = np.asarray(time_index, dtype=np.int64)
+    n_locations = coords.shape[0]
+    total = float(location_index.size)
+    max_window = max_window or max(1, n_times // 2)
+
+    # Precomputed, distance-sorted neighbour lists define every candidate cylinder
+    k = min(max_neighbours, n_locations)
+    distances, neighbours = cKDTree(coords).query(coords, k=k)
+    distances = distances.reshape(n_locations, k)
+    neighbours = neighbours.reshape(n_locations, k)
+
+    location_totals = np.bincount(location_index, minlength=n_locations).astype(float)
+    time_totals = np.bincount(time_index, minlength=n_times).astype(float)
+    cylinder_totals = np.cumsum(location_totals[neighbours], axis=1)
+    valid = cylinder_totals <= max_case_fraction * total
+    if max_radius:
+        valid &= distances <= max_radius
+    # Cylinders only grow with k, so neighbours past the largest valid one are never evaluated
+    k = int(np.flatnonzero(valid.any(axis=0)).max()) + 1 if valid.any() else 1
+    distances, neighbours = distances[:, :k], neighbours[:, :k]
+    cylinder_totals, valid = cylinder_totals[:, :k], valid[:, :k]
+
+    X = np.bincount(location_index * n_times + time_index,
+                    minlength=n_locations * n_times).reshape(n_locations, n_times).astype(float)
+    llr, best_k, start, length, observed, expected = scan_cylinders(
+        X, neighbours, valid, cylinder_totals, time_totals, total, max_window)
+
+    # Monte Carlo replications, split across worker processes
+    seed = seed if seed is not None else int(np.random.default_rng().integers(2**31))
+    tasks = [(location_index, time_index, n_locations, n_times, neighbours, valid,
+              cylinder_totals, time_totals, total, max_window, seed, rep_start, rep_stop)
+             for rep_start, rep_stop in split_range(replications, resolve_n_jobs(n_jobs))]
+    maxima = np.concatenate(map_chunks(replicate_max_llr, tasks, n_jobs))
+
+    # Report the most likely cluster and secondary clusters without geographical overlap
+    rows, members, used = [], [], np.zeros(n_locations, dtype=bool)
+    for centre in np.argsort(-llr):
+        if llr[centre] <= 0 or len(rows) >= max_clusters:
+            break
+        member_ids = neighbours[centre, :best_k[centre] + 1]
+        if used[member_ids].any():
+            continue
+        used[member_ids] = True
+        members.append(member_ids)
+        rows.append({
+            'cluster_id': len(rows) + 1,
+            'centre': int(centre),
+            'x': coords[centre, 0],
+            'y': coords[centre, 1],
+            'radius': float(distances[centre, best_k[centre]]),
+            'n_locations': int(member_ids.size),
+            'start': int(start[centre]),
+            'end': int(start[centre] + length[centre] - 1),
+            'observed': int(observed[centre]),
+            'expected': float(expected[centre]),
+            'obs_exp': float(observed[centre] / expected[centre]),
+            'llr': float(llr[centre]),
+            'p_value': (1.0 + (maxima >= llr[centre]).sum()) / (replications + 1.0),
+        })
+    return pd.DataFrame(rows), members
+
+def run_scan_on_layer(layer, date_field, case_field=None, location_layer=None, time_unit_days=7,
+                      **kwargs):
+    """
+    Runs the space-time permutation scan on an outbreak point layer.
+
+    :param layer: Point QgsVectorLayer (e.g. Outbreak_Points).
+    :param date_field: Field holding the event date.
+    :param case_field: Optional field with the number of cases per record.
+        Each record counts as one case if omitted.
+    :param location_layer: Optional polygon layer (e.g. woredas). Cases are then
+        assigned to the polygon they fall in, and cylinders are built over
+        polygon centroids instead of individual points.
+    :param time_unit_days: Length of a time unit in days (7 = weekly).
+
+    Remaining keyword arguments are passed to space_time_permutation_scan.
+    Individual points are scanned only up to MAX_POINT_LOCATIONS distinct
+    locations, with max_neighbours capped at MAX_POINT_NEIGHBOURS; for more
+    points, scan polygon locations or longer time units instead.
+
+    :returns: Tuple of (DataFrame of clusters with start/end dates, list of
+        member arrays, list of location labels), or (None, None, None) on failure.
+    """
+    try:
+        target_crs = QgsCoordinateReferenceSystem(ANALYSIS_CRS)
+        transform = QgsCoordinateTransform(layer.crs(), target_crs, QgsProject.instance())
+        attributes = [date_field] + ([case_field] if case_field else [])
+        request = QgsFeatureRequest().setSubsetOfAttributes(attributes, layer.fields())
+
+        points, dates, cases = [], [], []
+        for feat in layer.getFeatures(request):
+            date_value = feat[date_field]
+            if feat.geometry().isNull() or date_value == NULL or not date_value:
+                continue
+            geom = feat.geometry()
+            geom.transform(transform)
+            point = geom.asPoint() if not geom.isMultipart() else geom.asMultiPoint()[0]
+            points.append((point.x(), point.y()))
+            dates.append(date_value.toPyDateTime() if hasattr(date_value, 'toPyDateTime') else date_value.toPyDate())
+            case_value = feat[case_field] if case_field else 1
+            cases.append(0 if case_value == NULL else int(case_value))
+
+        if not points:
+            print("Scan provider: no dated point features found.")
+            return None, None, None
+
+        points = np.array(points)
+        if location_layer is not None:
+            coords, point_location, labels = _assign_to_polygons(points, location_layer, target_crs)
+            keep = point_location >= 0
+        else:
+            if kwargs.get('max_neighbours', 50) > MAX_POINT_NEIGHBOURS:
+                print(f"Scan provider: clusters around individual points are limited to "
+                      f"{MAX_POINT_NEIGHBOURS} locations.")
+                kwargs['max_neighbours'] = MAX_POINT_NEIGHBOURS
+            coords, point_location = np.unique(np.round(points, 0), axis=0, return_inverse=True)
+            if len(coords) > MAX_POINT_LOCATIONS:
+                print(f"Scan provider: {len(coords)} distinct point locations exceed the limit of "
+                      f"{MAX_POINT_LOCATIONS} for individual points; scan polygon locations (e.g. woredas) instead.")
+                return None, None, None
+            point_location = point_location.ravel()
+            labels = [f"{x:.0f},{y:.0f}" for x, y in coords]
+            keep = np.ones(len(points), dtype=bool)
+
+        dates = pd.to_datetime(pd.Series(dates))
+        study_start = dates.min().normalize()
+        time_index = ((dates - study_start).dt.days // time_unit_days).to_numpy()
+        n_times = int(time_index.max()) + 1
+
+        counts = np.array(cases)[keep]
+        location_index = np.repeat(point_location[keep], counts)
+        time_index = np.repeat(time_index[keep], counts)
+
+        clusters, members = space_time_permutation_scan(coords, location_index, time_index, n_times, **kwargs)
+        if not clusters.empty:
+            clusters['start_date'] = study_start + pd.to_timedelta(clusters['start'] * time_unit_days, unit='D')
+            clusters['end_date'] = study_start + pd.to_timedelta((clusters['end'] + 1) * time_unit_days - 1, unit='D')
+        return clusters, members, labels
+
+    except Exception as e:
+        print(f"An error occurred in scan provider: {e}")
+        return None, None, None
+
+def _assign_to_polygons(points, location_layer, target_crs):
+    """Returns polygon centroids, the polygon index of each point (-1 if none) and polygon labels."""
+    transform = QgsCoordinateTransform(location_layer.crs(), target_crs, QgsProject.instance())
+    geometries, centroids, labels = [], [], []
+    for feat in location_layer.getFeatures():
+        geom = feat.geometry()
+        geom.transform(transform)
+        geometries.append(geom)
+        centroid = geom.centroid().asPoint()
+        centroids.append((centroid.x(), centroid.y()))
+        labels.append(str(feat.id()))
+
+    index = QgsSpatialIndex()
+    for i, geom in enumerate(geometries):
+        index.addFeature(i, geom.boundingBox())
+
+    point_location = np.full(len(points), -1, dtype=np.int64)
+    for p, (x, y) in enumerate(points):
+        point_geom = QgsGeometry.fromPointXY(QgsPointXY(x, y))
+        for candidate in index.intersects(point_geom.boundingBox()):
+            if geometries[candidate].contains(point_geom):
+                point_location[p] = candidate
+                break
+    return np.array(centroids), point_location, labels
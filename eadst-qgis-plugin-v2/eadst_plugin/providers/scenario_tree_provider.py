@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+A provider for the sensitivity of surveillance systems by scenario trees
+(Martin, Cameron & Greiner, 2007).
+
+Each surveillance component (a scheme) has its own tree, kept with the
+scheme under 'scenario_tree':
+
+- risk groups: population strata with a relative risk of infection, their
+  proportion of the population and the units sampled (and, for finite
+  strata, the units in the stratum);
+- the design prevalences between units and within infected units;
+- detection steps: the probabilities that an infected animal is, e.g.,
+  presented, sampled and submitted, which multiply the test sensitivity;
+- the test sensitivity and specificity, and the specificity of the
+  follow-up of reactors.
+
+Every probability may be a value or a (most likely, minimum, maximum)
+range, drawn from a PERT distribution for each stochastic iteration. All
+iterations of a component are evaluated at once; the system sensitivity
+of every time period follows from those of the components active in it
+in one matrix product, and the probability of freedom is updated period
+by period with the chance of introduction in between. Component results
+are memoised by tree, so editing one component of a national system only
+re-evaluates that one. The functions are free of QGIS imports.
+"""
+
+import json
+import zlib
+import functools
+import numpy as np
+import pandas as pd
+from .survcost_provider import sample_parameters, summarise_costs
+
+TREE_PROBABILITIES = ['unit_prevalence', 'animal_prevalence', 'test_se', 'test_sp', 'follow_up_sp']
+PROBABILITY_LABELS = {
+    'unit_prevalence': "Design prevalence (units)",
+    'animal_prevalence': "Design prevalence (within unit)",
+    'test_se': "Test sensitivity",
+    'test_sp': "Test specificity",
+    'follow_up_sp': "Specificity of reactor follow-up",
+}
+# Typical (most likely, minimum, maximum) sensitivity and specificity of the tests costed by SURVCosT
+TEST_ACCURACY = {
+    'cost_elisa_test': ((0.94, 0.90, 0.98), (0.99, 0.98, 1.00)),
+    'cost_pcr_test': ((0.97, 0.93, 0.99), (0.995, 0.99, 1.00)),
+    'cost_rapid_test': ((0.85, 0.75, 0.92), (0.97, 0.94, 0.99)),
+    'cost_culture_test': ((0.70, 0.50, 0.85), (1.00, 1.00, 1.00)),
+    'cost_microscopy_test': ((0.60, 0.45, 0.75), (0.98, 0.95, 1.00)),
+}
+RESULT_COLUMNS = ['Mean', 'P5', 'P50', 'P95']
+
+def default_tree(quantities=None):
+    """
+    A one-group scenario tree for a scheme, sampling its units and animals
+    per unit with its first test (see survcost_provider.scheme_quantities).
+    """
+    quantities = quantities or {}
+    tests = [name for name in quantities.get('tests', []) if name in TEST_ACCURACY]
+    se, sp = TEST_ACCURACY[tests[0]] if tests else ((0.95, 0.95, 0.95), (1.0, 1.0, 1.0))
+    return {
+        'unit_prevalence': [0.02, 0.02, 0.02],
+        'animal_prevalence': [0.10, 0.10, 0.10],
+        'animals_per_unit': int(quantities.get('samples_per_unit', 1) or 1),
+        'test_se': list(se), 'test_sp': list(sp), 'follow_up_sp': [1.0, 1.0, 1.0],
+        'steps': {},
+        'groups': [{'name': 'All', 'relative_risk': 1.0, 'proportion': 1.0,
+                    'sampled': int(quantities.get('units', 0) or 0), 'population': 0}],
+        'interval': 1,
+    }
+
+def as_range(value):
+    """A probability as a (most likely, minimum, maximum) tuple."""
+    if np.ndim(value) == 0:
+        return (float(value),) * 3
+    mode, low, high = (float(item) for item in value)
+    return mode, low, high
+
+def draw_probabilities(tree, n_iter, rng):
+    """Draws every probability of a tree: a dict of name -> (n_iter,) array or value, and the product of the steps."""
+    ranges = {name: as_range(tree[name]) for name in TREE_PROBABILITIES}
+    ranges.update({f'step_{i}': as_range(value) for i, value in enumerate(tree.get('steps', {}).values())})
+    draws = sample_parameters(ranges, n_iter, rng)
+    steps = [draws.pop(f'step_{i}') for i in range(len(tree.get('steps', {})))]
+    draws['detection'] = np.prod(np.broadcast_arrays(1.0, *steps), axis=0) if steps else 1.0
+    return draws
+
+def unit_sensitivity(animal_prevalence, animals, detection):
+    """Probability that an infected unit gives at least one reactor among its tested animals."""
+    return 1.0 - (1.0 - animal_prevalence * detection) ** max(int(animals), 1)
+
+def component_sensitivity(tree, n_iter=10000, rng=None, scale=1.0):
+    """
+    Sensitivity and specificity of one component for every iteration.
+
+    Risk groups are weighted by their adjusted risk (relative risk over the
+    population average), giving each an effective probability of infection
+    of unit_prevalence x adjusted risk. Groups with a population size use
+    the finite-population approximation 1 - (1 - SeU n/N)^(EPI N), others
+    the binomial 1 - (1 - EPI SeU)^n.
+
+    :param tree: Scenario tree of the component (see default_tree).
+    :param n_iter: Number of stochastic iterations.
+    :param rng: numpy Generator.
+    :param scale: Multiple of the units sampled in every group, or an array
+        of multiples evaluated on the same draws (e.g. intensities of a
+        scheme, see portfolio_provider).
+
+    :returns: Tuple of (sensitivity, specificity), arrays of scale's shape + (n_iter,).
+    """
+    rng = rng or np.random.default_rng()
+    draws = draw_probabilities(tree, n_iter, rng)
+    groups = pd.DataFrame(tree['groups'])
+    relative_risk = groups['relative_risk'].to_numpy(dtype=float)
+    proportion = groups['proportion'].to_numpy(dtype=float)
+    proportion = proportion / proportion.sum() if proportion.sum() > 0 else np.full(len(groups), 1.0 / len(groups))
+    scale = np.asarray(scale, dtype=float)
+    sampled = np.round(np.multiply.outer(scale, groups['sampled'].to_numpy(dtype=float)))[..., None]
+    population = groups.get('population', pd.Series(0, index=groups.index)).fillna(0).to_numpy(dtype=float)[:, None]
+
+    # Groups on the second last axis, iterations on the last
+    adjusted_risk = relative_risk / (relative_risk * proportion).sum()
+    epi = np.minimum(np.multiply.outer(adjusted_risk, np.broadcast_to(draws['unit_prevalence'], (n_iter,))), 1.0)
+    se_unit = np.broadcast_to(unit_sensitivity(draws['animal_prevalence'], tree.get('animals_per_unit', 1),
+                                               draws['test_se'] * draws['detection']), (n_iter,))[None, :]
+    finite = population > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        missed_finite = (1.0 - se_unit * np.minimum(sampled / np.where(finite, population, 1.0), 1.0)) \
+            ** (epi * population)
+    missed = np.where(finite, missed_finite, (1.0 - epi * se_unit) ** sampled)
+    sensitivity = 1.0 - missed.prod(axis=-2)
+
+    # A free population raises no alarm if every reactor is cleared on follow-up
+    sp_animal = 1.0 - (1.0 - draws['test_sp']) * (1.0 - draws['follow_up_sp'])
+    tested = max(int(tree.get('animals_per_unit', 1)), 1) * sampled.sum(axis=(-2, -1))
+    specificity = np.broadcast_to(sp_animal ** np.asarray(tested)[..., None], scale.shape + (n_iter,))
+    return sensitivity, specificity
+
+@functools.lru_cache(maxsize=1024)
+def _component_result(tree_json, n_iter, seed):
+    # Each tree gets its own random stream, so a component keeps its draws when others change
+    rng = np.random.default_rng([seed, zlib.crc32(tree_json.encode())])
+    return component_sensitivity(json.loads(tree_json), n_iter, rng)
+
+def cached_component_sensitivity(tree, n_iter=10000, seed=0):
+    """component_sensitivity, memoised by tree, iterations and seed."""
+    return _component_result(json.dumps(tree, sort_keys=True), int(n_iter), int(seed))
+
+def system_sensitivity(sensitivities, intervals, periods):
+    """
+    Sensitivity of the system in every period, from components assumed
+    independent: 1 - prod(1 - CSe) over the components active in a period.
+
+    :param sensitivities: Array of (components, iterations).
+    :param intervals: Periods between the rounds of each component (1 = every period).
+    :param periods: Number of time periods.
+
+    :returns: Array of (periods, iterations).
+    """
+    intervals = np.maximum(np.asarray(intervals, dtype=np.int64), 1)
+    active = (np.arange(periods)[:, None] % intervals[None, :]) == 0
+    log_missed = np.log1p(-np.minimum(np.asarray(sensitivities, dtype=float), 1.0 - 1e-15))
+    return 1.0 - np.exp(active.astype(float) @ log_missed)
+
+def probability_of_freedom(sensitivity, prior, p_introduction):
+    """
+    Posterior probability of freedom after each period: negative results
+    raise it by 1 / (1 - SSe (1 - prior)), and the chance of introduction
+    lowers the prior of the next period.
+
+    :param sensitivity: System sensitivity, (periods, iterations).
+    :param prior: Prior probability of freedom (value or iterations).
+    :param p_introduction: Probability of introduction per period.
+
+    :returns: Array of (periods, iterations).
+    """
+    freedom = np.empty_like(sensitivity)
+    prior = np.broadcast_to(prior, sensitivity.shape[1:]).astype(float)
+    for period in range(sensitivity.shape[0]):
+        freedom[period] = prior / (1.0 - sensitivity[period] * (1.0 - prior))
+        prior = freedom[period] * (1.0 - p_introduction)
+    return freedom
+
+def evaluate_system(components, prior=0.5, p_introduction=0.01, periods=12, n_iter=10000, seed=0):
+    """
+    Stochastic evaluation of a surveillance system.
+
+    :param components: Dict of component name -> scenario tree.
+    :param prior: Prior probability of freedom, value or range.
+    :param p_introduction: Probability of introduction per period, value or range.
+    :param periods: Number of time periods.
+    :param n_iter: Number of stochastic iterations.
+    :param seed: Random seed, so that a run can be reproduced exactly.
+
+    :returns: Dict with 'components' (Sensitivity and Specificity Mean, P5,
+        P50 and P95 per component), 'periods' (system sensitivity and
+        probability of freedom per period) and 'freedom' (the iterations of
+        the probability of freedom), or None on failure.
+    """
+    try:
+        names = list(components)
+        results = [cached_component_sensitivity(components[name], n_iter, seed) for name in names]
+        sensitivities = np.vstack([se for se, _ in results])
+        specificities = np.vstack([sp for _, sp in results])
+
+        rng = np.random.default_rng([seed, len(names)])
+        system = sample_parameters({'prior': as_range(prior), 'p_introduction': as_range(p_introduction)},
+                                   n_iter, rng)
+        sse = system_sensitivity(sensitivities, [components[name].get('interval', 1) for name in names], periods)
+        freedom = probability_of_freedom(sse, system['prior'], system['p_introduction'])
+
+        def summary(values, labels):
+            table = summarise_costs(dict(zip(labels, values)), n_iter, components=labels)
+            return table[RESULT_COLUMNS]
+
+        component_table = pd.concat({'Sensitivity': summary(sensitivities, names),
+                                     'Specificity': summary(specificities, names)}, axis=1)
+        component_table['Interval'] = [components[name].get('interval', 1) for name in names]
+        period_labels = list(range(1, periods + 1))
+        period_table = pd.concat({'System Sensitivity': summary(sse, period_labels),
+                                  'Probability of Freedom': summary(freedom, period_labels)}, axis=1)
+        period_table.index.name = 'Period'
+        return {'components': component_table, 'periods': period_table, 'freedom': freedom}
+
+    except Exception as e:
+        print(f"An error occurred in scenario tree provider: {e}")
+        return None
+
+def periods_to_confidence(period_table, target=0.95, column='P5'):
+    """First period whose probability of freedom (by default its 5th percentile) reaches the target, or None."""
+    reached = period_table[('Probability of Freedom', column)] >= target
+    return int(reached.idxmax()) if reached.any() else None
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+A provider for one-way, two-way and tornado sensitivity sweeps of the
+economic models over the economic parameters.
+
+A model is a module-level function of a dict of parameter arrays (e.g.
+survcost_provider.cost_components through scheme_cost), so that every
+combination of a sweep is evaluated in one vectorised call, or in chunks
+across worker processes. Results are cached by parameter vector, so
+re-plotting a tornado or heat map after moving one range only evaluates
+the combinations that were not seen before.
+"""
+
+import functools
+import numpy as np
+import pandas as pd
+from .parallel import map_chunks, resolve_n_jobs, split_range
+from .survcost_provider import cost_components
+
+def scheme_cost(quantities, params, component='Total'):
+    """SURVCosT model: cost of one component of a scheme for each parameter combination."""
+    return cost_components(quantities, params)[component]
+
+def scheme_cost_model(quantities, component='Total'):
+    """A picklable model of the cost of a scheme, for SensitivityEngine."""
+    return functools.partial(scheme_cost, quantities, component=component)
+
+def _evaluate_chunk(model, columns):
+    return np.asarray(model(columns), dtype=float)
+
+class SensitivityEngine:
+    """
+    Evaluates a model over many parameter combinations, with a cache keyed
+    by the full parameter vector of each combination.
+
+    :param model: Function of a dict of parameter arrays returning an array
+        of outputs (module-level or a functools.partial, so it can be sent
+        to worker processes).
+    :param base: Dict of parameter name -> base (most likely) value.
+    :param n_jobs: Number of worker processes for large batches (-1 uses all cores).
+    """
+    # Batches smaller than this per worker are evaluated in this process
+    MIN_CHUNK = 50000
+
+    def __init__(self, model, base, n_jobs=1):
+        self.model = model
+        self.base = {name: float(value) for name, value in base.items()}
+        self.names = sorted(self.base)
+        self.n_jobs = n_jobs
+        self.cache = {}
+
+    def evaluate(self, combinations):
+        """
+        Model output for each combination.
+
+        :param combinations: DataFrame with one column per varied parameter;
+            the other parameters keep their base value.
+
+        :returns: Array of outputs, one per row.
+        """
+        full = pd.DataFrame({name: combinations[name].to_numpy(dtype=float) if name in combinations
+                             else np.full(len(combinations), self.base[name]) for name in self.names})
+        keys = pd.util.hash_pandas_object(full, index=False).to_numpy()
+        cached = np.full(len(keys), np.nan)
+        if self.cache:
+            cached = pd.Series(self.cache, dtype=float).reindex(keys).to_numpy(copy=True)
+        missing = np.flatnonzero(np.isnan(cached))
+        if missing.size:
+            todo = full.iloc[missing]
+            n_chunks = min(resolve_n_jobs(self.n_jobs), max(1, missing.size // self.MIN_CHUNK))
+            tasks = [(self.model, {name: todo[name].to_numpy()[start:stop] for name in self.names})
+                     for start, stop in split_range(missing.size, n_chunks)]
+            values = np.concatenate([np.broadcast_to(result, (stop - start,)) for result, (start, stop)
+                                     in zip(map_chunks(_evaluate_chunk, tasks, self.n_jobs),
+                                            split_range(missing.size, n_chunks))])
+            cached[missing] = values
+            self.cache.update(zip(keys[missing].tolist(), values.tolist()))
+        return cached
+
+    def base_output(self):
+        return float(self.evaluate(pd.DataFrame(index=[0]))[0])
+
+    def one_way(self, name, values):
+        """Output over a range of one parameter. Returns a DataFrame of value and output."""
+        values = np.asarray(values, dtype=float)
+        return pd.DataFrame({'value': values, 'output': self.evaluate(pd.DataFrame({name: values}))})
+
+    def two_way(self, name_x, values_x, name_y, values_y):
+        """Output over a grid of two parameters, as a DataFrame indexed by values_y with columns values_x."""
+        grid_x, grid_y = np.meshgrid(np.asarray(values_x, dtype=float), np.asarray(values_y, dtype=float))
+        output = self.evaluate(pd.DataFrame({name_x: grid_x.ravel(), name_y: grid_y.ravel()}))
+        return pd.DataFrame(output.reshape(grid_x.shape), index=grid_y[:, 0], columns=grid_x[0])
+
+    def tornado(self, ranges):
+        """
+        Output with each parameter in turn at the ends of its range.
+
+        :param ranges: Dict of name -> (low, high).
+
+        :returns: DataFrame indexed by parameter with low, high, output_low,
+            output_high and swing, largest swing first.
+        """
+        names = list(ranges)
+        lows = np.array([ranges[name][0] for name in names], dtype=float)
+        highs = np.array([ranges[name][1] for name in names], dtype=float)
+        # One combination per parameter and end, every other parameter at its base value
+        combinations = pd.DataFrame({name: np.full(2 * len(names), self.base[name]) for name in names})
+        for i, name in enumerate(names):
+            combinations.loc[2 * i, name] = lows[i]
+            combinations.loc[2 * i + 1, name] = highs[i]
+        output = self.evaluate(combinations).reshape(-1, 2)
+        result = pd.DataFrame({'low': lows, 'high': highs, 'output_low': output[:, 0], 'output_high': output[:, 1]},
+                              index=pd.Index(names, name='parameter'))
+        result['swing'] = (result['output_high'] - result['output_low']).abs()
+        return result.sort_values('swing', ascending=False)
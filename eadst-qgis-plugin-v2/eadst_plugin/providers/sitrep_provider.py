@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+A headless situation report (sitrep) pipeline.
+
+Every step runs without dialogs, so a sitrep can be built from the QGIS
+Python console, a scheduled script or qgis_process (see the
+'eadst:sitrep' algorithm in processing_provider). Intermediate results
+are cached on disk, keyed by a hash of their inputs, so that a nightly
+rebuild only recomputes the steps whose inputs changed since the last run:
+the admin unit of every location is joined once, the tables are keyed by
+the counts per period, species and unit, and the LISA by the totals per
+unit, so new or edited records only recompute what they change.
+"""
+
+import os
+import glob
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from matplotlib.figure import Figure
+from matplotlib.image import imread
+from matplotlib.backends.backend_pdf import PdfPages
+from qgis.core import (QgsCoordinateReferenceSystem, QgsCoordinateTransform, QgsFeatureRequest,
+                       QgsProject, QgsRectangle, NULL)
+from .density_provider import ANALYSIS_CRS
+from .layout_provider import export_report_map_image
+from .pysal_provider import layer_to_geodataframe, lisa_from_geodataframe
+from ..modules.utils import ADMIN_LEVELS, get_admin_layer, get_plugin_path
+
+SITREP_FREQUENCIES = {'Day': 'D', 'Week': 'W', 'Month': 'MS'}
+
+LISA_CLUSTER_COLORS = {
+    'High-High': '#d7191c', 'Low-Low': '#2c7bb6',
+    'Low-High': '#abd9e9', 'High-Low': '#fdae61',
+    'Not Significant': '#eeeeee'
+}
+
+class SitrepCache:
+    """
+    Keeps the result of each pipeline step as a pickle, named after a hash of the step inputs.
+
+    Results are evicted least recently used first: beyond max_entries per
+    step, or when the whole cache grows beyond max_bytes.
+    """
+    def __init__(self, cache_dir, max_entries=8, max_bytes=1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(step, *inputs):
+        return hashlib.sha1(json.dumps([step, inputs], default=str, sort_keys=True).encode()).hexdigest()[:16]
+
+    def path(self, step, key):
+        return os.path.join(self.cache_dir, f"{step}-{key}.pkl")
+
+    def get(self, step, key):
+        path = self.path(step, key)
+        if not os.path.exists(path):
+            return None
+        # The modification time records the last use
+        os.utime(path)
+        return pd.read_pickle(path)
+
+    def put(self, step, key, value):
+        pd.to_pickle(value, self.path(step, key))
+        self.evict(step)
+        return value
+
+    def evict(self, step):
+        """Removes the least recently used results of a step beyond max_entries, then of all steps beyond max_bytes."""
+        def by_age(pattern):
+            entries = []
+            for path in glob.glob(os.path.join(self.cache_dir, pattern)):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            return sorted(entries, reverse=True)
+
+        stale = [path for _, _, path in by_age(f"{step}-*.pkl")[self.max_entries:]]
+        total = 0
+        for position, (_, size, path) in enumerate(by_age("*.pkl")):
+            if path in stale:
+                continue
+            total += size
+            # The newest result is kept even if it alone exceeds the limit
+            if total > self.max_bytes and position > 0:
+                stale.append(path)
+                total -= size
+        for path in set(stale):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def frame_digest(df):
+    """Returns a stable hash of a DataFrame's contents."""
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=True).values.tobytes()).hexdigest()
+
+def python_date(value):
+    """A QDateTime or QDate as a Python datetime or date; other values are returned unchanged."""
+    if hasattr(value, 'toPyDateTime'):
+        return value.toPyDateTime()
+    if hasattr(value, 'toPyDate'):
+        return value.toPyDate()
+    return value
+
+def load_outbreak_records(layer, date_field='Event_Date', start_date=None, end_date=None):
+    """
+    Reads outbreak records and their EPSG:20137 coordinates into a DataFrame.
+
+    :param layer: Point QgsVectorLayer (e.g. Outbreak_Points).
+    :param date_field: Field holding the event date.
+    :param start_date: Optional first date (inclusive) of the reporting period.
+    :param end_date: Optional last date (inclusive) of the reporting period.
+
+    :returns: DataFrame with the available standard fields plus 'x' and 'y'.
+    """
+    columns = [name for name in ('Event_ID', 'Species', date_field, 'Cases', 'Pop_At_Risk')
+               if layer.fields().indexOf(name) != -1]
+    transform = QgsCoordinateTransform(layer.crs(), QgsCoordinateReferenceSystem(ANALYSIS_CRS), QgsProject.instance())
+    request = QgsFeatureRequest().setSubsetOfAttributes(columns, layer.fields())
+
+    rows = []
+    for feat in layer.getFeatures(request):
+        geom = feat.geometry()
+        if geom.isNull():
+            continue
+        geom.transform(transform)
+        point = geom.asPoint() if not geom.isMultipart() else geom.asMultiPoint()[0]
+        row = {name: (None if feat[name] == NULL else feat[name]) for name in columns}
+        row['x'], row['y'] = point.x(), point.y()
+        rows.append(row)
+
+    records = pd.DataFrame(rows, columns=columns + ['x', 'y'])
+    value = records[date_field]
+    records[date_field] = pd.to_datetime(value.map(python_date), errors='coerce')
+    # Without a Cases field every record counts as one case
+    records['Cases'] = pd.to_numeric(records['Cases'], errors='coerce').fillna(0) if 'Cases' in columns else 1
+    records['Pop_At_Risk'] = pd.to_numeric(records['Pop_At_Risk'], errors='coerce').fillna(0) if 'Pop_At_Risk' in columns else 0
+
+    records = records.dropna(subset=[date_field])
+    if start_date is not None:
+        records = records[records[date_field] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        records = records[records[date_field] < pd.Timestamp(end_date) + pd.Timedelta(days=1)]
+    return records.sort_values(date_field).reset_index(drop=True)
+
+def epi_curve(records, date_field='Event_Date', freq='W'):
+    """Counts outbreaks and cases per period, including empty periods."""
+    curve = records.set_index(date_field).resample(freq).agg(Outbreaks=('Cases', 'size'), Cases=('Cases', 'sum'))
+    curve.index.name = 'Period'
+    return curve
+
+def attack_rates(records, group_column):
+    """Cases, population at risk and attack rate (%) per group."""
+    grouped = records.groupby(group_column).agg(Outbreaks=('Cases', 'size'), Cases=('Cases', 'sum'),
+                                                Pop_At_Risk=('Pop_At_Risk', 'sum'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        grouped['Attack_Rate'] = np.where(grouped['Pop_At_Risk'] > 0,
+                                          grouped['Cases'] / grouped['Pop_At_Risk'] * 100, 0.0)
+    return grouped.sort_values('Cases', ascending=False)
+
+def assign_admin_units(records, admin_gdf):
+    """Returns the admin feature id of each record (-1 outside all units)."""
+    points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(records['x'], records['y']), crs=ANALYSIS_CRS)
+    # sjoin names the joined column after the index (e.g. 'fid'); unnamed it is 'index_right'
+    joined = gpd.sjoin(points, admin_gdf[['geometry']].rename_axis(None), how='left', predicate='within')
+    joined = joined[~joined.index.duplicated()]
+    return joined['index_right'].fillna(-1).astype(np.int64).to_numpy()
+
+class AdminAssignment:
+    """
+    Assigns records to the units of an admin level, remembering the unit of
+    every location seen, so repeated runs only join new locations.
+    """
+    def __init__(self, admin_level, extra_fields=()):
+        self.admin_level = admin_level
+        self.extra_fields = list(extra_fields)
+        self.admin_gdf = None
+        self.unit_of_location = pd.Series(dtype=np.int64)
+
+    def load(self):
+        """Returns the admin units (name, code and any extra fields) in EPSG:20137."""
+        if self.admin_gdf is None:
+            admin_layer = get_admin_layer(self.admin_level)
+            if admin_layer is None:
+                raise ValueError(f"Admin layer '{self.admin_level}' could not be loaded.")
+            _, name_field, code_field = ADMIN_LEVELS[self.admin_level]
+            self.admin_gdf = layer_to_geodataframe(admin_layer, [name_field, code_field] + self.extra_fields).to_crs(ANALYSIS_CRS)
+        return self.admin_gdf
+
+    def unit_positions(self, records):
+        """Row position in load() of the unit of every record (-1 outside all units)."""
+        admin_gdf = self.load()
+        locations = records['x'].round(0).astype(str) + ',' + records['y'].round(0).astype(str)
+        new = ~locations.isin(self.unit_of_location.index)
+        if new.any():
+            fresh = records[new].drop_duplicates(subset=['x', 'y'])
+            fids = assign_admin_units(fresh, admin_gdf)
+            positions = np.where(fids >= 0, admin_gdf.index.get_indexer(fids), -1)
+            fresh_units = pd.Series(positions, index=locations[fresh.index].to_numpy())
+            self.unit_of_location = pd.concat([self.unit_of_location, fresh_units])
+            self.unit_of_location = self.unit_of_location[~self.unit_of_location.index.duplicated()]
+        return self.unit_of_location.reindex(locations.to_numpy()).fillna(-1).astype(np.int64).to_numpy()
+
+    def unit_names(self, records):
+        """Name of the unit of every record ('Unknown' outside all units)."""
+        positions = self.unit_positions(records)
+        names = self.admin_gdf[ADMIN_LEVELS[self.admin_level][1]].to_numpy()
+        return np.where(positions >= 0, names[np.maximum(positions, 0)], 'Unknown')
+
+def unit_totals(records, positions, n_units):
+    """Outbreaks, cases and population at risk of every admin unit, by row position (see AdminAssignment)."""
+    inside = positions >= 0
+    return pd.DataFrame({
+        'Outbreaks': np.bincount(positions[inside], minlength=n_units),
+        'Cases': np.bincount(positions[inside], weights=records['Cases'].to_numpy(dtype=float)[inside], minlength=n_units),
+        'Pop': np.bincount(positions[inside], weights=records['Pop_At_Risk'].to_numpy(dtype=float)[inside], minlength=n_units),
+    })
+
+def period_counts(records, positions, date_field='Event_Date', freq='W'):
+    """
+    Outbreaks, cases and population at risk per period, species and admin
+    unit position: everything the sitrep tables are computed from.
+    """
+    groups = pd.DataFrame({
+        'period': records[date_field].dt.to_period('M' if freq == 'MS' else freq).astype(str),
+        'species': records['Species'].astype(str) if 'Species' in records else '',
+        'unit': positions,
+    })
+    values = pd.DataFrame({'Outbreaks': 1, 'Cases': records['Cases'], 'Pop': records['Pop_At_Risk']}, index=records.index)
+    return values.groupby([groups['period'], groups['species'], groups['unit']]).sum()
+
+def build_sitrep(output_dir, start_date=None, end_date=None, project_path=None,
+                 outbreak_layer='Outbreak_Points', admin_level='Woredas', date_field='Event_Date',
+                 frequency='Week', permutations=999, seed=12345, cache_dir=None, feedback=None):
+    """
+    Builds a situation report: epidemic curve, attack rates, a LISA cluster
+    map of attack rates per admin unit and the report map, in a single PDF.
+
+    :param output_dir: Folder the PDF and the CSV tables are written to.
+    :param start_date: Optional first date of the reporting period.
+    :param end_date: Optional last date of the reporting period.
+    :param project_path: Optional .qgz/.qgs project to load first.
+    :param outbreak_layer: Outbreak point layer, or its name in the project.
+    :param admin_level: One of utils.ADMIN_LEVELS ('Regions', 'Zones', 'Woredas').
+    :param date_field: Field holding the event date.
+    :param frequency: Epi curve interval ('Day', 'Week' or 'Month').
+    :param permutations: Permutations for the LISA pseudo p-values.
+    :param seed: Random seed for the LISA permutations.
+    :param cache_dir: Folder for intermediate results. Defaults to
+        '.sitrep_cache' inside output_dir.
+    :param feedback: Optional QgsProcessingFeedback for progress messages.
+
+    :returns: Dict with the 'pdf' path, the table paths and the list of
+        'recomputed' steps, or None on failure.
+    """
+    log = feedback.pushInfo if feedback else print
+    try:
+        project = QgsProject.instance()
+        if project_path and project.fileName() != project_path:
+            if not project.read(project_path):
+                print(f"Sitrep provider: could not read project '{project_path}'.")
+                return None
+
+        layer = outbreak_layer
+        if isinstance(outbreak_layer, str):
+            layers = project.mapLayersByName(outbreak_layer)
+            if not layers:
+                print(f"Sitrep provider: layer '{outbreak_layer}' not found in the project.")
+                return None
+            layer = layers[0]
+        admin_layer = get_admin_layer(admin_level)
+        if admin_layer is None:
+            print(f"Sitrep provider: admin layer '{admin_level}' could not be loaded.")
+            return None
+
+        os.makedirs(output_dir, exist_ok=True)
+        cache = SitrepCache(cache_dir or os.path.join(output_dir, '.sitrep_cache'))
+        recomputed = []
+
+        records = load_outbreak_records(layer, date_field, start_date, end_date)
+        if records.empty:
+            print("Sitrep provider: no outbreak records in the reporting period.")
+            return None
+
+        # Admin units and the unit of every location, of which only new locations are joined
+        admin_key = cache.key('admin', admin_layer.source(), admin_level)
+        assignment = cache.get('admin', admin_key) or AdminAssignment(admin_level)
+        known = len(assignment.unit_of_location)
+        positions = assignment.unit_positions(records)
+        if len(assignment.unit_of_location) != known:
+            log(f"Assigned {len(assignment.unit_of_location) - known} new locations to {admin_level.lower()}.")
+            cache.put('admin', admin_key, assignment)
+            recomputed.append('admin')
+        admin_gdf = assignment.load()
+        records['Admin_Unit'] = assignment.unit_names(records)
+
+        # Tables
+        freq = SITREP_FREQUENCIES.get(frequency, frequency)
+        tables_key = cache.key('tables', frame_digest(period_counts(records, positions, date_field, freq)), freq,
+                               admin_key)
+        tables = cache.get('tables', tables_key)
+        if tables is None:
+            log("Computing epidemic curve and attack rates...")
+            tables = cache.put('tables', tables_key, {
+                'epi_curve': epi_curve(records, date_field, freq),
+                'by_species': attack_rates(records, 'Species') if 'Species' in records else None,
+                'by_admin': attack_rates(records, 'Admin_Unit'),
+            })
+            recomputed.append('tables')
+
+        # LISA of attack rates over all admin units, including those without outbreaks
+        sums = unit_totals(records, positions, len(admin_gdf))
+        lisa_key = cache.key('lisa', frame_digest(sums[['Cases', 'Pop']]), admin_key, permutations, seed)
+        lisa = cache.get('lisa', lisa_key)
+        if lisa is None:
+            log(f"Running LISA over {len(admin_gdf)} {admin_level.lower()}...")
+            sums.index = admin_gdf.index
+            lisa_gdf = admin_gdf[[ADMIN_LEVELS[admin_level][1], 'geometry']].copy()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                lisa_gdf['attack_rate'] = np.where(sums['Pop'] > 0, sums['Cases'] / sums['Pop'] * 100, 0.0)
+            lisa_gdf = lisa_from_geodataframe(lisa_gdf, 'attack_rate', permutations=permutations, seed=seed)
+            lisa = cache.put('lisa', lisa_key, lisa_gdf)
+            recomputed.append('lisa')
+
+        # Report map, zoomed to the outbreaks in the period
+        template_path = os.path.join(get_plugin_path(), "resources", "print_layouts", "eadst_report_template.qpt")
+        map_path = os.path.join(cache.cache_dir, 'report_map.png')
+        project_file = project.fileName()
+        bounds = [round(records['x'].min() - 20000), round(records['y'].min() - 20000),
+                  round(records['x'].max() + 20000), round(records['y'].max() + 20000)]
+        map_key = cache.key('report_map', bounds,
+                            os.path.getmtime(template_path) if os.path.exists(template_path) else None,
+                            os.path.getmtime(project_file) if project_file and os.path.exists(project_file) else None)
+        if os.path.exists(template_path) and (cache.get('report_map', map_key) is None or not os.path.exists(map_path)):
+            log("Rendering report map...")
+            transform = QgsCoordinateTransform(QgsCoordinateReferenceSystem(ANALYSIS_CRS), project.crs(), project)
+            extent = transform.transformBoundingBox(QgsRectangle(*bounds))
+            cache.put('report_map', map_key, export_report_map_image(project, template_path, extent, map_path))
+            recomputed.append('report_map')
+        report_map = map_path if cache.get('report_map', map_key) else None
+
+        log("Writing situation report...")
+        result = write_sitrep_outputs(output_dir, records, tables, lisa, report_map, admin_level, date_field,
+                                      start_date, end_date)
+        result['recomputed'] = recomputed
+        return result
+
+    except Exception as e:
+        print(f"An error occurred in sitrep provider: {e}")
+        return None
+
+def write_sitrep_outputs(output_dir, records, tables, lisa, report_map, admin_level, date_field,
+                         start_date=None, end_date=None):
+    """Writes the CSV tables and assembles the sitrep PDF. Returns a dict of output paths."""
+    paths = {}
+    for name, table in tables.items():
+        if table is not None:
+            paths[name] = os.path.join(output_dir, f"sitrep_{name}.csv")
+            table.to_csv(paths[name])
+    lisa_path = os.path.join(output_dir, f"sitrep_lisa_{admin_level.lower()}.csv")
+    lisa.drop(columns='geometry').to_csv(lisa_path)
+    paths['lisa'] = lisa_path
+
+    period_start = pd.Timestamp(start_date) if start_date else records[date_field].min()
+    period_end = pd.Timestamp(end_date) if end_date else records[date_field].max()
+    period = f"{period_start:%d %b %Y} - {period_end:%d %b %Y}"
+    paths['pdf'] = os.path.join(output_dir, f"sitrep_{period_start:%Y%m%d}_{period_end:%Y%m%d}.pdf")
+
+    with PdfPages(paths['pdf']) as pdf:
+        # Page 1: summary and epidemic curve
+        fig = Figure(figsize=(11.69, 8.27))
+        fig.suptitle(f"Situation Report: {period}", fontsize=16)
+        fig.text(0.05, 0.88, f"Outbreaks: {len(records)}    Cases: {int(records['Cases'].sum())}    "
+                             f"Population at risk: {int(records['Pop_At_Risk'].sum())}    "
+                             f"Affected {admin_level.lower()}: {records.loc[records['Admin_Unit'] != 'Unknown', 'Admin_Unit'].nunique()}",
+                 fontsize=11)
+        ax = fig.add_axes([0.08, 0.15, 0.87, 0.65])
+        curve = tables['epi_curve']
+        ax.bar(curve.index, curve['Cases'], width=0.8 * (curve.index[1] - curve.index[0]) if len(curve) > 1 else 1,
+               color='skyblue', edgecolor='black')
+        ax.set_title("Epidemic Curve")
+        ax.set_ylabel("Number of Cases")
+        fig.autofmt_xdate()
+        pdf.savefig(fig)
+
+        # Page 2: attack rate tables
+        fig = Figure(figsize=(11.69, 8.27))
+        fig.suptitle("Attack Rates", fontsize=16)
+        panels = [(title, tables[name]) for title, name in (("By Species", 'by_species'), (f"By {admin_level[:-1]} (top 15)", 'by_admin'))
+                  if tables.get(name) is not None]
+        for i, (title, table) in enumerate(panels):
+            ax = fig.add_subplot(1, len(panels), i + 1)
+            ax.axis('off')
+            ax.set_title(title)
+            shown = table.head(15)
+            cells = [[f"{v:.0f}" for v in row[:3]] + [f"{row[3]:.2f}"] for row in shown.to_numpy()]
+            ax.table(cellText=cells, rowLabels=[str(i) for i in shown.index],
+                     colLabels=["Outbreaks", "Cases", "Pop. at Risk", "Attack Rate (%)"], loc='upper center')
+        pdf.savefig(fig)
+
+        # Page 3: LISA cluster map of attack rates
+        fig = Figure(figsize=(11.69, 8.27))
+        ax = fig.add_subplot(1, 1, 1)
+        ax.set_axis_off()
+        ax.set_title(f"LISA Clusters of Attack Rate by {admin_level[:-1]}", fontsize=14)
+        lisa.plot(ax=ax, color=lisa['lisa_cluster'].map(LISA_CLUSTER_COLORS).fillna('#eeeeee'),
+                  edgecolor='#999999', linewidth=0.2)
+        for label, color in LISA_CLUSTER_COLORS.items():
+            ax.scatter([], [], color=color, marker='s', label=f"{label} ({(lisa['lisa_cluster'] == label).sum()})")
+        ax.legend(loc='lower left')
+        pdf.savefig(fig)
+
+        # Page 4: report map
+        if report_map:
+            fig = Figure(figsize=(11.69, 8.27))
+            ax = fig.add_axes([0, 0, 1, 1])
+            ax.set_axis_off()
+            ax.imshow(imread(report_map))
+            pdf.savefig(fig)
+    return paths
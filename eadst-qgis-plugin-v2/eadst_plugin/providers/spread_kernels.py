@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Kernels for the stochastic spatial SEIR spread model over premises.
+
+These are free of QGIS imports, so that replicates can be executed in
+worker processes.
+"""
+
+import numpy as np
+from scipy import sparse
+
+# Replicates are simulated side by side in batches of this size, each batch with its own random stream
+REPLICATE_BATCH = 32
+
+SUSCEPTIBLE, EXPOSED, INFECTIOUS, REMOVED = 0, 1, 2, 3
+
+def neighbour_pairs(coords, max_distance):
+    """
+    All pairs of premises closer than max_distance, found by grid bucketing.
+
+    Premises are sorted into square cells of side max_distance, so candidate
+    pairs only come from the same or one of the eight adjacent cells and
+    the work grows with the number of close pairs rather than with n².
+
+    :param coords: (n, 2) array of projected coordinates in metres.
+    :param max_distance: Largest distance of a pair, in metres.
+
+    :returns: Tuple of arrays (i, j, distance) with i != j, both directions.
+    """
+    cells = np.floor(coords / max_distance).astype(np.int64)
+    cells -= cells.min(axis=0)
+    width = cells[:, 1].max() + 3
+    key = cells[:, 0] * width + cells[:, 1]
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+    cell_keys, starts, counts = np.unique(sorted_key, return_index=True, return_counts=True)
+
+    rows, cols, dists = [], [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            target = cell_keys + dx * width + dy
+            position = np.searchsorted(cell_keys, target)
+            position = np.minimum(position, cell_keys.size - 1)
+            found = cell_keys[position] == target
+            a, b = np.flatnonzero(found), position[found]
+            # Every member of cell a paired with every member of cell b
+            sizes = counts[a] * counts[b]
+            total = int(sizes.sum())
+            if total == 0:
+                continue
+            block = np.repeat(np.arange(a.size), sizes)
+            within = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            i = order[starts[a][block] + within // counts[b][block]]
+            j = order[starts[b][block] + within % counts[b][block]]
+            d = np.hypot(*(coords[i] - coords[j]).T)
+            keep = (d <= max_distance) & (i != j)
+            rows.append(i[keep])
+            cols.append(j[keep])
+            dists.append(d[keep])
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(dists)
+
+def transmission_matrix(coords, herd_sizes, kernel_scale, kernel_shape, max_distance, size_exponent=0.5):
+    """
+    Sparse matrix of daily transmission rates between premises.
+
+    Entry (i, j) is the rate at which infectious premise j infects premise i:
+    (N_i N_j)^size_exponent * K(d_ij), with the power-law kernel
+    K(d) = 1 / (1 + (d / kernel_scale)^kernel_shape), cut off at max_distance.
+
+    :returns: scipy.sparse CSC matrix (n, n), as the simulation reads it by column.
+    """
+    n = coords.shape[0]
+    i, j, d = neighbour_pairs(coords, max_distance)
+    weight = np.power(np.maximum(herd_sizes, 1.0), size_exponent)
+    rate = weight[i] * weight[j] / (1.0 + np.power(d / kernel_scale, kernel_shape))
+    return sparse.csc_matrix((rate, (i, j)), shape=(n, n))
+
+def simulate_batch(W, index_premises, beta, latent_days, infectious_days, n_days, n_reps, rng):
+    """
+    Simulates n_reps outbreaks side by side, one day per step.
+
+    The infection pressure on every premise is held as a (premise,
+    replicate) matrix and updated each day from the columns of the
+    transmission matrix of premises that became or stopped being
+    infectious, so a step costs as much as the day's transitions and all
+    replicates of a batch advance together. Latent and infectious periods
+    are exponentially distributed with the given means (in days).
+
+    :returns: Tuple of (day of infection per premise and replicate, -1 if
+        never infected, (n, n_reps) int array; new infections per day and
+        replicate, (n_days, n_reps) int array).
+    """
+    n = W.shape[0]
+    W = W.tocsc()
+    state = np.zeros((n, n_reps), dtype=np.int8)
+    state[index_premises] = INFECTIOUS
+    pressure = np.zeros((n, n_reps))
+    pressure += beta * np.asarray(W[:, index_premises].sum(axis=1))
+    infection_day = np.full((n, n_reps), -1, dtype=np.int32)
+    infection_day[index_premises] = 0
+    curve = np.zeros((n_days, n_reps), dtype=np.int64)
+    p_onset = 1.0 - np.exp(-1.0 / latent_days)
+    p_removal = 1.0 - np.exp(-1.0 / infectious_days)
+
+    for day in range(1, n_days + 1):
+        infectious = state == INFECTIOUS
+        if not infectious.any() and not (state == EXPOSED).any():
+            break
+        # Random numbers are only drawn where a transition is possible
+        infected = (state == SUSCEPTIBLE) & (pressure > 0)
+        infected[infected] = rng.random(np.count_nonzero(infected)) < -np.expm1(-pressure[infected])
+        onset = state == EXPOSED
+        onset[onset] = rng.random(np.count_nonzero(onset)) < p_onset
+        removed = infectious.copy()
+        removed[removed] = rng.random(np.count_nonzero(removed)) < p_removal
+
+        state[removed] = REMOVED
+        state[onset] = INFECTIOUS
+        state[infected] = EXPOSED
+        changed = np.flatnonzero((onset | removed).any(axis=1))
+        if changed.size:
+            delta = onset[changed].astype(np.float64) - removed[changed]
+            pressure += beta * (W[:, changed] @ delta)
+            # Guard against rounding drift once all sources have been removed
+            np.maximum(pressure, 0.0, out=pressure)
+        infection_day[infected] = day
+        curve[day - 1] = infected.sum(axis=0)
+    return infection_day, curve
+
+def simulate_replicates(W, index_premises, beta, latent_days, infectious_days, n_days, seed,
+                        batch_start, batch_stop, n_reps):
+    """
+    Runs replicate batches batch_start:batch_stop and sums their results.
+
+    :returns: Tuple of (number of replicates in which each premise was
+        infected, sum of infection days over those replicates, new infections
+        per day and replicate as a (n_days, replicates) array).
+    """
+    n = W.shape[0]
+    infected_count = np.zeros(n, dtype=np.int64)
+    day_sum = np.zeros(n, dtype=np.int64)
+    curves = []
+    for batch in range(batch_start, batch_stop):
+        size = min(REPLICATE_BATCH, n_reps - batch * REPLICATE_BATCH)
+        # One stream per batch keeps results independent of how batches are spread over workers
+        rng = np.random.default_rng([seed, batch])
+        infection_day, curve = simulate_batch(W, index_premises, beta, latent_days, infectious_days,
+                                              n_days, size, rng)
+        ever = infection_day >= 0
+        infected_count += ever.sum(axis=1)
+        day_sum += np.where(ever, infection_day, 0).sum(axis=1)
+        curves.append(curve)
+    return infected_count, day_sum, np.concatenate(curves, axis=1)
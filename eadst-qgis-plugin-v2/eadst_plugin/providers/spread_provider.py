@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+A provider for stochastic spatial SEIR simulation of spread between premises.
+
+Each premise is Susceptible, Exposed, Infectious or Removed (culled or
+recovered). Infectious premises infect others at a rate that falls off
+with distance (power-law kernel) and grows with herd size, as in the
+kernel models used for FMD contingency planning.
+"""
+
+import numpy as np
+import pandas as pd
+from qgis.core import (QgsCoordinateReferenceSystem, QgsCoordinateTransform, QgsFeatureRequest,
+                       QgsProject, NULL)
+from .parallel import map_chunks, resolve_n_jobs, split_range
+from .spread_kernels import REPLICATE_BATCH, simulate_replicates, transmission_matrix
+from .density_provider import ANALYSIS_CRS
+
+def simulate_spread(coords, herd_sizes, index_premises, beta=0.0002, kernel_scale=1000.0, kernel_shape=3.0,
+                    max_distance=10000.0, size_exponent=0.5, latent_days=5.0, infectious_days=7.0,
+                    n_days=180, replicates=256, seed=None, n_jobs=1):
+    """
+    Runs stochastic replicates of an outbreak starting from the index premises.
+
+    :param coords: (n, 2) array of projected premise coordinates (metres).
+    :param herd_sizes: (n,) number of animals per premise.
+    :param index_premises: Positions of the initially infectious premises.
+    :param beta: Transmission rate scale (per day).
+    :param kernel_scale: Distance (m) at which the kernel is halved.
+    :param kernel_shape: Power of the kernel decline with distance.
+    :param max_distance: Distance (m) beyond which no transmission occurs.
+    :param size_exponent: Exponent of herd size in susceptibility and infectivity.
+    :param latent_days: Mean latent period in days.
+    :param infectious_days: Mean time from infectiousness to removal in days.
+    :param n_days: Number of days simulated.
+    :param replicates: Number of stochastic replicates.
+    :param seed: Random seed, so that a run can be reproduced exactly.
+    :param n_jobs: Number of worker processes (-1 uses all cores).
+
+    :returns: Tuple of (DataFrame per premise with p_infected and
+        mean_day_infected, DataFrame per day with the mean, median, 5% and
+        95% quantiles of new and cumulative infections).
+    """
+    coords = np.asarray(coords, dtype=float)
+    index_premises = np.asarray(index_premises, dtype=np.int64)
+    W = transmission_matrix(coords, np.asarray(herd_sizes, dtype=float), kernel_scale, kernel_shape,
+                            max_distance, size_exponent)
+
+    seed = seed if seed is not None else int(np.random.default_rng().integers(2**31))
+    n_batches = -(-replicates // REPLICATE_BATCH)
+    tasks = [(W, index_premises, beta, latent_days, infectious_days, n_days, seed, batch_start, batch_stop, replicates)
+             for batch_start, batch_stop in split_range(n_batches, resolve_n_jobs(n_jobs))]
+    results = map_chunks(simulate_replicates, tasks, n_jobs)
+
+    infected_count = sum(result[0] for result in results)
+    day_sum = sum(result[1] for result in results)
+    curves = np.concatenate([result[2] for result in results], axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_day = np.where(infected_count > 0, day_sum / infected_count, np.nan)
+    premises = pd.DataFrame({'p_infected': infected_count / replicates, 'mean_day_infected': mean_day})
+
+    cumulative = np.cumsum(curves, axis=0) + index_premises.size
+    envelope = pd.DataFrame({'day': np.arange(1, n_days + 1)})
+    for name, values in (('new', curves), ('cumulative', cumulative)):
+        envelope[f'{name}_mean'] = values.mean(axis=1)
+        envelope[f'{name}_p05'], envelope[f'{name}_median'], envelope[f'{name}_p95'] = \
+            np.percentile(values, [5, 50, 95], axis=1)
+    return premises, envelope
+
+def run_spread_on_layer(layer, index_fids, herd_field='Pop_At_Risk', id_field='Event_ID', **kwargs):
+    """
+    Simulates spread over the premises of a point layer.
+
+    Premises are reprojected to EPSG:20137 so that kernel distances are in
+    metres regardless of the layer CRS.
+
+    :param layer: Point QgsVectorLayer of premises (e.g. Outbreak_Points).
+    :param index_fids: Feature ids of the index (initially infectious) premises.
+    :param herd_field: Field holding the number of animals per premise.
+        Premises without a value count as one animal.
+    :param id_field: Field identifying premises in the output.
+
+    Remaining keyword arguments are passed to simulate_spread.
+
+    :returns: Tuple of (DataFrame per premise with id, x, y, p_infected and
+        mean_day_infected, DataFrame of the epidemic curve envelope), or
+        (None, None) on failure.
+    """
+    try:
+        transform = QgsCoordinateTransform(layer.crs(), QgsCoordinateReferenceSystem(ANALYSIS_CRS),
+                                           QgsProject.instance())
+        attributes = [name for name in (herd_field, id_field) if layer.fields().indexOf(name) != -1]
+        request = QgsFeatureRequest().setSubsetOfAttributes(attributes, layer.fields())
+
+        fids, ids, xs, ys, herds = [], [], [], [], []
+        for feat in layer.getFeatures(request):
+            geom = feat.geometry()
+            if geom.isNull():
+                continue
+            geom.transform(transform)
+            point = geom.asPoint() if not geom.isMultipart() else geom.asMultiPoint()[0]
+            herd = feat[herd_field] if herd_field in attributes else NULL
+            premise_id = feat[id_field] if id_field in attributes else NULL
+            fids.append(feat.id())
+            ids.append(str(feat.id()) if premise_id == NULL else str(premise_id))
+            xs.append(point.x())
+            ys.append(point.y())
+            herds.append(1 if herd == NULL else max(int(herd), 1))
+
+        index_premises = pd.Index(fids).get_indexer(list(index_fids))
+        index_premises = index_premises[index_premises >= 0]
+        if index_premises.size == 0:
+            print("Spread provider: none of the index premises has a geometry.")
+            return None, None
+
+        premises, envelope = simulate_spread(np.column_stack([xs, ys]), herds, index_premises, **kwargs)
+        premises.insert(0, 'premise_id', ids)
+        premises['x'], premises['y'] = xs, ys
+        premises['herd_size'] = herds
+        return premises, envelope
+
+    except Exception as e:
+        print(f"An error occurred in spread provider: {e}")
+        return None, None
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+A provider for SURVCosT, the costing of surveillance schemes.
+
+A scheme (.eadss.json, see SurveillanceDesigner) is turned into quantities
+(units sampled, samples per unit, sampling rounds and laboratory tests)
+and the cost of each component is computed from the economic parameters.
+Every uncertain parameter is drawn from a PERT distribution over its
+range, and all draws are evaluated at once as arrays, so that a 100,000
+draw Monte Carlo of a scheme takes a fraction of a second. The module is
+free of QGIS imports, so the cost model can also run in worker processes
+(see sensitivity_provider).
+"""
+
+import re
+import json
+import numpy as np
+import pandas as pd
+
+COST_COMPONENTS = ['Personnel', 'Logistics', 'Sampling', 'Laboratory', 'Overhead', 'Total']
+
+# Keywords in the measurement tools of a scheme -> economic parameter of the test
+TEST_KEYWORDS = {
+    'cost_elisa_test': r'elisa',
+    'cost_pcr_test': r'pcr',
+    'cost_rapid_test': r'rapid|pen.?side|lateral flow|\blfd\b',
+    'cost_culture_test': r'culture|isolation',
+    'cost_microscopy_test': r'microscop|smear',
+}
+
+ROUNDS_PER_YEAR = [
+    (r'\bweekly\b', 52.0), (r'\bmonthly\b', 12.0), (r'\bquarterly\b', 4.0),
+    (r'bi-?annual|semi-?annual|twice (?:a|per) year|every six months', 2.0),
+    (r'\bannual|\byearly\b|once (?:a|per) year', 1.0),
+]
+
+UNIT_WORDS = r'herds?|flocks?|villages?|kebeles?|units?|farms?|households?|premises|sites?|markets?|woredas?|holdings?'
+ANIMAL_WORDS = r'animals?|samples?|heads?|birds?|cattle|sheep|goats?|camels?|specimens?'
+
+# --- Scheme quantities ---
+
+def _number(text):
+    return float(text.replace(',', ''))
+
+def parse_number_units(text):
+    """
+    Reads the units and samples per unit from the 'Number of Units' element,
+    e.g. "150 villages, 20 animals per village", "150 herds with 20 animals
+    each", "10 sheep from each of 50 flocks" or "3000 samples from 150 herds".
+    A number of animals without a per-unit phrase is a total shared over the
+    units if it is at least the number of units, and a count per unit otherwise.
+
+    :returns: Tuple of (units, samples per unit).
+    """
+    text = (text or '').lower()
+    per_unit = re.search(rf'(\d[\d,]*)\s*(?:{ANIMAL_WORDS})\s*(?:sampled\s*|tested\s*|collected\s*)?'
+                         rf'(?:(?:per|/)\s*(?:each\s*(?:of\s*)?)?(?:the\s*)?(?:\d[\d,]*\s*)?(?:{UNIT_WORDS})'
+                         rf'|(?:from|in|at|for)\s*(?:each|every)\s*(?:of\s*)?(?:the\s*)?(?:\d[\d,]*\s*)?(?:{UNIT_WORDS})'
+                         rf'|(?:each|apiece)\b)', text)
+    units = re.search(rf'(\d[\d,]*)\s*(?:{UNIT_WORDS})', text)
+    total = re.search(rf'(\d[\d,]*)\s*(?:{ANIMAL_WORDS})', text)
+    if units:
+        n_units = _number(units.group(1))
+        if per_unit:
+            return n_units, _number(per_unit.group(1))
+        if total and n_units > 0:
+            n_animals = _number(total.group(1))
+            return n_units, float(np.ceil(n_animals / n_units)) if n_animals >= n_units else n_animals
+        return n_units, 1.0
+    if total:
+        # Samples without a unit count as one sample per unit
+        return _number(total.group(1)), 1.0
+    number = re.search(r'(\d[\d,]*)', text)
+    return (_number(number.group(1)) if number else 0.0), 1.0
+
+def parse_rounds(text):
+    """
+    Total sampling rounds from the 'Frequency & Duration' element, e.g.
+    "quarterly for 2 years" (8), "every 6 months" (2 a year) or "once" (1).
+    """
+    text = (text or '').lower()
+    if re.search(r'\bonce\b(?! (?:a|per) year)|one-off|single|cross-sectional', text):
+        return 1.0
+    times = re.search(r'(\d+)\s*times\s*(?:a|per)\s*year', text)
+    every = re.search(r'every\s*(\d+)\s*months?', text)
+    if times:
+        per_year = float(times.group(1))
+    elif every:
+        per_year = 12.0 / max(float(every.group(1)), 1.0)
+    else:
+        per_year = next((rounds for pattern, rounds in ROUNDS_PER_YEAR if re.search(pattern, text)), 1.0)
+    years = re.search(r'(\d+(?:\.\d+)?)\s*years?', text)
+    months = re.search(r'(\d+)\s*months?(?!\s*(?:interval|apart))', text)
+    if years:
+        duration = float(years.group(1))
+    elif months and not every:
+        duration = float(months.group(1)) / 12.0
+    else:
+        duration = 1.0
+    return max(float(round(per_year * duration)), 1.0)
+
+def parse_tests(text):
+    """Economic parameters of the laboratory tests named in the text."""
+    text = (text or '').lower()
+    return [name for name, pattern in TEST_KEYWORDS.items() if re.search(pattern, text)]
+
+def scheme_quantities(scheme):
+    """
+    Quantities of a scheme.
+
+    Structured values under the scheme's 'quantities' key (written by the
+    sample-size calculator) take precedence over those read from the free
+    text of the elements.
+
+    :returns: Dict with 'units', 'samples_per_unit', 'rounds' and 'tests'.
+    """
+    units, samples_per_unit = parse_number_units(scheme.get('number_units'))
+    quantities = {
+        'units': units,
+        'samples_per_unit': samples_per_unit,
+        'rounds': parse_rounds(scheme.get('frequency')),
+        'tests': parse_tests(f"{scheme.get('tools', '')} {scheme.get('measurements', '')}"),
+    }
+    quantities.update(scheme.get('quantities', {}))
+    return quantities
+
+def load_scheme(path):
+    """Reads a .eadss.json scheme file."""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+# --- Cost model ---
+
+def sample_parameters(ranges, n_draws, rng):
+    """
+    Draws every parameter from a PERT distribution over its range.
+
+    :param ranges: Dict of name -> (most likely, minimum, maximum).
+
+    :returns: Dict of name -> (n_draws,) array, or the value itself for
+        fixed parameters (minimum == maximum).
+    """
+    draws = {}
+    for name, (mode, low, high) in ranges.items():
+        if high <= low:
+            draws[name] = float(mode)
+            continue
+        alpha = 1.0 + 4.0 * (mode - low) / (high - low)
+        beta = 1.0 + 4.0 * (high - mode) / (high - low)
+        draws[name] = low + (high - low) * rng.beta(alpha, beta, n_draws)
+    return draws
+
+def cost_components(quantities, params):
+    """
+    Cost of each component of a scheme.
+
+    Works on point values as well as on arrays of parameter draws or
+    sweeps, which are broadcast against each other.
+
+    Unit visits are units x rounds. Field teams visit units_per_team_day
+    units a day with staff_per_team staff, travel km_per_unit per visit
+    (or km_per_round from a route plan) and collect samples_per_unit
+    samples per visit, each tested with every test of the scheme.
+
+    :param quantities: Dict from scheme_quantities.
+    :param params: Dict of economic parameter values or arrays.
+
+    :returns: Dict of component (COST_COMPONENTS) -> cost in USD.
+    """
+    visits = quantities['units'] * quantities['rounds']
+    samples = visits * quantities['samples_per_unit']
+    team_days = quantities.get('team_days_per_round')
+    team_days = team_days * quantities['rounds'] if team_days is not None else visits / params['units_per_team_day']
+    km = quantities.get('km_per_round')
+    km = km * quantities['rounds'] if km is not None else visits * params['km_per_unit']
+
+    costs = {
+        'Personnel': team_days * params['staff_per_team'] * (params['staff_daily_rate'] + params['per_diem']),
+        'Logistics': km * params['cost_per_km'],
+        'Sampling': samples * (params['cost_sample_kit'] + params['cost_sample_shipping']),
+        'Laboratory': samples * sum((params[test] for test in quantities['tests']), 0.0),
+    }
+    direct = costs['Personnel'] + costs['Logistics'] + costs['Sampling'] + costs['Laboratory']
+    costs['Overhead'] = direct * params['overhead_rate']
+    costs['Total'] = direct + costs['Overhead']
+    return costs
+
+def summarise_costs(costs, n_draws, percentiles=(5, 50, 95), components=COST_COMPONENTS):
+    """Mean, SD and percentiles of each component over the draws, as a DataFrame indexed by component."""
+    values = np.vstack([np.broadcast_to(np.asarray(costs[name], dtype=float), (n_draws,)) for name in components])
+    summary = pd.DataFrame({'Mean': values.mean(axis=1), 'SD': values.std(axis=1)}, index=components)
+    for q, column in zip(percentiles, np.percentile(values, percentiles, axis=1)):
+        summary[f'P{q}'] = column
+    summary.index.name = 'Component'
+    return summary
+
+def cost_scheme(scheme, ranges, quantities=None, n_draws=100000, seed=None):
+    """
+    Monte Carlo costing of a surveillance scheme.
+
+    :param scheme: Scheme dict (see load_scheme).
+    :param ranges: Economic parameter ranges, name -> (most likely, minimum,
+        maximum), e.g. from utils.get_economic_parameters(with_ranges=True).
+    :param quantities: Optional quantities overriding those of the scheme.
+    :param n_draws: Number of Monte Carlo draws.
+    :param seed: Random seed, so that a run can be reproduced exactly.
+
+    :returns: Tuple of (quantities, DataFrame of Mean, SD, P5, P50 and P95
+        per component), or (None, None) on failure.
+    """
+    try:
+        quantities = quantities or scheme_quantities(scheme)
+        params = sample_parameters(ranges, n_draws, np.random.default_rng(seed))
+        return quantities, summarise_costs(cost_components(quantities, params), n_draws)
+
+    except Exception as e:
+        print(f"An error occurred in SURVCosT provider: {e}")
+        return None, None
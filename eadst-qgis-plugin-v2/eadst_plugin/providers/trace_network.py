@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+A contact-tracing network engine over the Trace_Links layer.
+
+Links are held as adjacency sets keyed by Event_ID, so adding or removing
+a link is O(1) and reachability queries only touch the part of the
+network they reach. Whole-network analytics (components, centrality) run
+on a sparse matrix that is rebuilt only after the network has changed.
+"""
+
+from collections import deque
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from qgis.core import NULL, QgsFeatureRequest
+
+# Sources are processed in batches by the algebraic Brandes algorithm
+BETWEENNESS_BATCH_SIZE = 256
+
+class TraceNetwork:
+    """Directed trace network: an edge runs from Source_ID (infection source) to Dest_ID."""
+    def __init__(self):
+        self.successors = {}
+        self.predecessors = {}
+        # Number of links per (source, destination) pair, as links may be recorded twice
+        self.multiplicity = {}
+        self.version = 0
+        self._matrix_cache = None
+        self._analytics_cache = {}
+
+    def __len__(self):
+        return len(self.successors)
+
+    def add_node(self, event_id):
+        self.successors.setdefault(event_id, set())
+        self.predecessors.setdefault(event_id, set())
+
+    def add_link(self, source_id, dest_id):
+        if source_id == dest_id:
+            return
+        self.add_node(source_id)
+        self.add_node(dest_id)
+        key = (source_id, dest_id)
+        self.multiplicity[key] = self.multiplicity.get(key, 0) + 1
+        self.successors[source_id].add(dest_id)
+        self.predecessors[dest_id].add(source_id)
+        self.changed()
+
+    def remove_link(self, source_id, dest_id):
+        key = (source_id, dest_id)
+        count = self.multiplicity.get(key, 0)
+        if count == 0:
+            return
+        if count > 1:
+            self.multiplicity[key] = count - 1
+            return
+        del self.multiplicity[key]
+        self.successors[source_id].discard(dest_id)
+        self.predecessors[dest_id].discard(source_id)
+        self.changed()
+
+    def changed(self):
+        self.version += 1
+        self._matrix_cache = None
+        self._analytics_cache.clear()
+
+    def reachable(self, event_id, direction='forward', max_depth=None):
+        """
+        Premises reachable from event_id, with their generation depth.
+
+        :param event_id: Event_ID to start from.
+        :param direction: 'forward' follows links to the premises infected
+            from event_id, 'backward' to its possible sources.
+        :param max_depth: Optional maximum number of generations.
+
+        :returns: Dict of Event_ID -> generation (1 for direct contacts),
+            ordered by generation.
+        """
+        adjacency = self.successors if direction == 'forward' else self.predecessors
+        if event_id not in adjacency:
+            return {}
+        depths = {event_id: 0}
+        queue = deque([event_id])
+        while queue:
+            node = queue.popleft()
+            depth = depths[node] + 1
+            if max_depth is not None and depth > max_depth:
+                continue
+            for neighbour in adjacency[node]:
+                if neighbour not in depths:
+                    depths[neighbour] = depth
+                    queue.append(neighbour)
+        del depths[event_id]
+        return depths
+
+    def generation_depths(self):
+        """
+        Generation of every premise: the number of links from the nearest
+        root (a premise without a known source). Premises only reachable
+        through a cycle have no generation (-1).
+        """
+        depths = {node: 0 for node, sources in self.predecessors.items() if not sources}
+        queue = deque(depths)
+        while queue:
+            node = queue.popleft()
+            for neighbour in self.successors[node]:
+                if neighbour not in depths:
+                    depths[neighbour] = depths[node] + 1
+                    queue.append(neighbour)
+        return {node: depths.get(node, -1) for node in self.successors}
+
+    def matrix(self):
+        """Returns (sparse adjacency matrix, list of Event_IDs), rebuilt only after changes."""
+        if self._matrix_cache is None:
+            ids = list(self.successors)
+            position = {event_id: i for i, event_id in enumerate(ids)}
+            rows = [position[source] for source, _ in self.multiplicity]
+            cols = [position[dest] for _, dest in self.multiplicity]
+            matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(ids), len(ids)))
+            self._matrix_cache = (matrix, ids)
+        return self._matrix_cache
+
+    def components(self):
+        """Weakly connected components: Series of component id per Event_ID, largest component first."""
+        if 'components' not in self._analytics_cache:
+            matrix, ids = self.matrix()
+            _, labels = connected_components(matrix, directed=True, connection='weak')
+            # Renumber so that component 1 is the largest
+            order = np.argsort(-np.bincount(labels), kind='stable')
+            rank = np.empty_like(order)
+            rank[order] = np.arange(1, order.size + 1)
+            self._analytics_cache['components'] = pd.Series(rank[labels], index=ids, name='component')
+        return self._analytics_cache['components']
+
+    def degree_centrality(self):
+        """In-, out- and total degree centrality, normalised by n - 1."""
+        if 'degree' not in self._analytics_cache:
+            matrix, ids = self.matrix()
+            scale = 1.0 / max(len(ids) - 1, 1)
+            binary = (matrix > 0).astype(float)
+            in_degree = np.asarray(binary.sum(axis=0)).ravel()
+            out_degree = np.asarray(binary.sum(axis=1)).ravel()
+            self._analytics_cache['degree'] = pd.DataFrame({
+                'in_degree': in_degree * scale,
+                'out_degree': out_degree * scale,
+                'degree': (in_degree + out_degree) * scale,
+            }, index=ids)
+        return self._analytics_cache['degree']
+
+    def betweenness_centrality(self, sample_size=None, seed=None):
+        """
+        Betweenness centrality of every premise (directed, normalised).
+
+        Brandes' algorithm is run for a batch of sources at a time as sparse
+        matrix products, one per BFS level, so its cost grows with the number
+        of links times the network depth rather than with Python loops.
+
+        :param sample_size: Optional number of randomly chosen source premises
+            for an approximation on very large networks (None = exact).
+        :param seed: Random seed for the source sample.
+
+        :returns: Series of betweenness per Event_ID.
+        """
+        cache_key = ('betweenness', sample_size, seed)
+        if cache_key not in self._analytics_cache:
+            matrix, ids = self.matrix()
+            n = len(ids)
+            A = (matrix > 0).astype(float).tocsr()
+            AT = A.T.tocsr()
+            sources = np.arange(n)
+            if sample_size and sample_size < n:
+                sources = np.sort(np.random.default_rng(seed).choice(n, sample_size, replace=False))
+
+            betweenness = np.zeros(n)
+            for start in range(0, sources.size, BETWEENNESS_BATCH_SIZE):
+                batch = sources[start:start + BETWEENNESS_BATCH_SIZE]
+                betweenness += _brandes_batch(A, AT, batch)
+
+            if sources.size < n:
+                betweenness *= n / sources.size
+            if n > 2:
+                betweenness /= (n - 1) * (n - 2)
+            self._analytics_cache[cache_key] = pd.Series(betweenness, index=ids, name='betweenness')
+        return self._analytics_cache[cache_key]
+
+    def summary(self, betweenness_sample=None, seed=None):
+        """Per-premise table of component, generation, degree and betweenness centrality."""
+        table = self.degree_centrality().copy()
+        table['component'] = self.components()
+        table['generation'] = pd.Series(self.generation_depths())
+        table['betweenness'] = self.betweenness_centrality(betweenness_sample, seed)
+        table.index.name = 'Event_ID'
+        return table
+
+def _brandes_batch(A, AT, batch):
+    """
+    Dependency of every node, summed over the source nodes in batch.
+
+    Each BFS level is kept as a sparse (node, source) matrix of path counts,
+    so the work per level is proportional to the links actually followed.
+    """
+    n, b = A.shape[0], batch.size
+    frontier = sparse.csr_matrix((np.ones(b), (batch, np.arange(b))), shape=(n, b))
+    visited = frontier.copy()
+    levels = []
+
+    # Forward phase: count shortest paths level by level
+    while frontier.nnz:
+        reached = (AT @ frontier).tocsr()
+        reached = (reached - reached.multiply(visited)).tocsr()
+        reached.eliminate_zeros()
+        if not reached.nnz:
+            break
+        levels.append(reached)
+        visited = visited + (reached > 0)
+        frontier = reached
+
+    # Backward phase: accumulate dependencies from the deepest level up
+    dependency = np.zeros(n)
+    delta = None
+    for d in range(len(levels) - 1, -1, -1):
+        sigma = levels[d]
+        inverse = sigma.power(-1)
+        weight = inverse if delta is None else inverse + delta.multiply(inverse)
+        if d == 0:
+            break
+        delta = levels[d - 1].multiply(A @ weight).tocsr()
+        dependency += np.asarray(delta.sum(axis=1)).ravel()
+    return dependency
+
+class LayerTraceNetwork(TraceNetwork):
+    """A TraceNetwork bound to a Trace_Links layer and kept in sync with its edits."""
+    def __init__(self, layer, source_field='Source_ID', dest_field='Dest_ID'):
+        super(LayerTraceNetwork, self).__init__()
+        self.layer = layer
+        self.source_field = source_field
+        self.dest_field = dest_field
+        self.links = {}
+        self.load()
+
+        layer.featureAdded.connect(self.on_feature_added)
+        layer.featureDeleted.connect(self.on_feature_deleted)
+        layer.attributeValueChanged.connect(self.on_attribute_changed)
+        layer.afterCommitChanges.connect(self.load)
+        layer.afterRollBack.connect(self.load)
+        layer.willBeDeleted.connect(lambda layer_id=layer.id(): _NETWORKS.pop(layer_id, None))
+
+    def load(self):
+        """(Re)reads all links from the layer."""
+        self.successors, self.predecessors, self.multiplicity, self.links = {}, {}, {}, {}
+        request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes([self.source_field, self.dest_field], self.layer.fields())
+        for feat in self.layer.getFeatures(request):
+            self.add_feature(feat)
+        self.changed()
+
+    def ensure_current(self):
+        # Links written straight to the data provider do not emit edit signals
+        if len(self.links) != self.layer.featureCount():
+            self.load()
+
+    def add_feature(self, feat):
+        source, dest = feat[self.source_field], feat[self.dest_field]
+        if source == NULL or dest == NULL or not source or not dest:
+            # Kept so that the link count still matches the layer feature count
+            self.links[feat.id()] = None
+            return
+        self.links[feat.id()] = (source, dest)
+        self.add_link(source, dest)
+
+    def on_feature_added(self, fid):
+        self.add_feature(self.layer.getFeature(fid))
+
+    def on_provider_features_added(self, features):
+        """
+        Adds links written straight to the data provider (which emits no edit
+        signals). Links already read, e.g. by a load() since the write, are skipped.
+        """
+        for feat in features:
+            if feat.id() not in self.links:
+                self.add_feature(feat)
+
+    def on_feature_deleted(self, fid):
+        link = self.links.pop(fid, None)
+        if link:
+            self.remove_link(*link)
+
+    def on_attribute_changed(self, fid, index, value):
+        if self.layer.fields().at(index).name() in (self.source_field, self.dest_field):
+            self.on_feature_deleted(fid)
+            self.on_feature_added(fid)
+
+    def matrix(self):
+        self.ensure_current()
+        return super(LayerTraceNetwork, self).matrix()
+
+    def reachable(self, event_id, direction='forward', max_depth=None):
+        self.ensure_current()
+        return super(LayerTraceNetwork, self).reachable(event_id, direction, max_depth)
+
+    def generation_depths(self):
+        self.ensure_current()
+        return super(LayerTraceNetwork, self).generation_depths()
+
+# One network per Trace_Links layer id
+_NETWORKS = {}
+
+def trace_network(layer):
+    """Returns the cached trace network of a Trace_Links layer, building it on first use."""
+    network = _NETWORKS.get(layer.id())
+    if network is None:
+        network = _NETWORKS[layer.id()] = LayerTraceNetwork(layer)
+    return network
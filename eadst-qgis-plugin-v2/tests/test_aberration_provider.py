@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("qgis.core")
+
+from eadst_plugin.providers.aberration_provider import (alert_flags, cusum, ears, first_changed_period,
+                                                        run_detectors)
+
+
+def counts(n_units=3, n_periods=80, seed=0):
+    return np.random.default_rng(seed).poisson(3.0, (n_units, n_periods)).astype(float)
+
+
+def baseline_z(x, t, window, lag, min_sd):
+    baseline = x[t - lag - window + 1:t - lag + 1]
+    return (x[t] - baseline.mean()) / max(baseline.std(ddof=1), min_sd)
+
+
+def test_ears_matches_direct_calculation():
+    X = counts()
+    statistics = ears(X, window=7, min_sd=0.2)
+    x = X[1]
+    for t in (7, 20, 79):
+        np.testing.assert_allclose(statistics['C1'][1, t], baseline_z(x, t, 7, 1, 0.2))
+    for t in (9, 40):
+        np.testing.assert_allclose(statistics['C2'][1, t], baseline_z(x, t, 7, 3, 0.2))
+    t = 40
+    expected_c3 = sum(max(baseline_z(x, s, 7, 3, 0.2) - 1.0, 0.0) for s in (t - 2, t - 1, t))
+    np.testing.assert_allclose(statistics['C3'][1, t], expected_c3)
+    # No full baseline yet
+    assert np.isnan(statistics['C1'][1, 6]) and np.isnan(statistics['C2'][1, 8])
+
+
+def test_cusum_matches_direct_calculation():
+    X = counts()
+    result = cusum(X, window=28, lag=3, k=0.5, min_sd=0.2)
+    x, s, expected = X[2], 0.0, []
+    for t in range(X.shape[1]):
+        z = baseline_z(x, t, 28, 3, 0.2) if t >= 30 else 0.0
+        s = max(0.0, s + z - 0.5)
+        expected.append(s)
+    np.testing.assert_allclose(result[2], expected)
+
+
+def test_incremental_run_matches_full_run():
+    X = counts(n_periods=200)
+    full = run_detectors(X, 'W')
+    previous = run_detectors(X[:, :150], 'W')
+    incremental = run_detectors(X, 'W', start=120, previous=previous)
+    for name, values in full.items():
+        np.testing.assert_allclose(incremental[name], values, err_msg=name)
+
+
+def test_alert_on_a_spike():
+    X = counts(n_periods=100)
+    X[0, 90] = 40.0
+    flags = alert_flags(X, run_detectors(X, 'W'))
+    for method in ('C1', 'C2', 'CUSUM', 'Farrington'):
+        assert flags[method][0, 90], method
+
+
+def test_first_changed_period():
+    X = counts()
+    cached = {'counts': X[:, :60].copy(), 'periods': list(range(60))}
+    periods = list(range(80))
+    assert first_changed_period(X, periods, cached) == 60
+    changed = X.copy()
+    changed[1, 42] += 1
+    assert first_changed_period(changed, periods, cached) == 42
+    assert first_changed_period(X, periods, None) == 0
+    assert first_changed_period(X[:2], periods, cached) == 0
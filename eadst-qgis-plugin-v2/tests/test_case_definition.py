@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("qgis.core")
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import QgsField, QgsFields
+
+from eadst_plugin.providers.case_definition import classify_frame, classify_layer, criterion_expression
+
+DEFINITION = {"disease_code": "01", "disease": "Anthrax", "criteria": [
+    {"level": "Confirmed", "field": "Lab_Result", "op": "=", "value": "Positive"},
+    {"level": "Probable", "op": "epi_link", "value": "Confirmed", "depth": 1},
+    {"level": "Suspect", "field": "Notes", "op": "contains", "value": "50%"},
+]}
+
+
+class Record:
+    def __init__(self, fid, values):
+        self.fid, self.values = fid, values
+
+    def id(self):
+        return self.fid
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+
+class Provider:
+    def __init__(self):
+        self.changes = None
+
+    def addAttributes(self, fields):
+        pass
+
+    def changeAttributeValues(self, changes):
+        self.changes = changes
+        return True
+
+
+class ShufflingLayer:
+    """A layer whose provider returns its features in a different order on every request."""
+    def __init__(self, records):
+        self.records = records
+        self.calls = 0
+        self.provider = Provider()
+
+    def fields(self):
+        fields = QgsFields()
+        for name in ("Lab_Result", "Notes", "Event_ID", "Case_Class"):
+            fields.append(QgsField(name, QVariant.String))
+        return fields
+
+    def dataProvider(self):
+        return self.provider
+
+    def getFeatures(self, request=None):
+        self.calls += 1
+        return list(np.random.default_rng(self.calls).permutation(self.records))
+
+    def updateFields(self):
+        pass
+
+    def triggerRepaint(self):
+        pass
+
+    def name(self):
+        return "Outbreak_Points"
+
+
+def test_classify_layer_keeps_ids_with_their_values():
+    records = [Record(fid, {"Lab_Result": result, "Notes": "", "Event_ID": f"E{fid}"})
+               for fid, result in [(1, "Positive"), (2, "Negative"), (3, "Positive"), (4, "Negative")]]
+    layer = ShufflingLayer(records)
+    assert classify_layer(layer, DEFINITION) == {"Confirmed": 2, "Not a case": 2}
+    levels = {fid: next(iter(change.values())) for fid, change in layer.provider.changes.items()}
+    assert levels == {1: "Confirmed", 2: "Not a case", 3: "Confirmed", 4: "Not a case"}
+
+
+def test_contains_does_not_treat_percent_as_a_wildcard():
+    expression = criterion_expression({"field": "Notes", "op": "contains", "value": "50%"})
+    assert "strpos(" in expression and "LIKE" not in expression
+    assert "LIKE" in criterion_expression({"field": "Notes", "op": "contains", "value": "bleeding"})
+
+    df = pd.DataFrame({"Lab_Result": [None, None], "Notes": ["mortality 50% in herd", "mortality 500 head"],
+                       "Event_ID": ["E1", "E2"]})
+    assert list(classify_frame(df, DEFINITION)) == ["Suspect", "Not a case"]
@@ -0,0 +1,82 @@
+import numpy as np
+from scipy import sparse
+
+from eadst_plugin.providers.crand import (_global_chunk, _local_chunk, conditional_randomization, fold_counts,
+                                          local_moran_pvalues, permuted_neighbour_ids)
+
+
+def ring_weights(n):
+    # Each unit neighbours the two next to it, row-standardised
+    rows = np.repeat(np.arange(n), 2)
+    cols = np.column_stack([(np.arange(n) - 1) % n, (np.arange(n) + 1) % n]).ravel()
+    return sparse.csr_matrix((np.full(2 * n, 0.5), (rows, cols)), shape=(n, n))
+
+
+def test_permuted_neighbour_ids_are_distinct():
+    table = permuted_neighbour_ids(10, 4, 50, seed=1)
+    assert table.shape == (50, 4)
+    assert table.min() >= 0 and table.max() <= 8
+    assert all(len(set(row)) == 4 for row in table)
+
+
+def test_fold_counts_is_two_sided():
+    np.testing.assert_allclose(fold_counts(np.array([0, 99, 50]), 99), [0.01, 0.01, 0.5])
+
+
+def test_local_counts_match_direct_simulation():
+    rng = np.random.default_rng(0)
+    Z = rng.standard_normal((12, 2))
+    W = ring_weights(12)
+    ids = permuted_neighbour_ids(12, 2, 99, seed=3)
+    larger_moran, larger_lag = _local_chunk(Z, W.indptr, W.indices, W.data, ids, 0, 12)
+
+    i = 5
+    neighbours = ids.copy()
+    neighbours[neighbours >= i] += 1
+    lag_sim = 0.5 * Z[neighbours[:, 0]] + 0.5 * Z[neighbours[:, 1]]
+    lag_obs = 0.5 * (Z[4] + Z[6])
+    np.testing.assert_array_equal(larger_lag[i], (lag_sim >= lag_obs).sum(axis=0))
+    np.testing.assert_array_equal(larger_moran[i], (Z[i] * lag_sim >= Z[i] * lag_obs).sum(axis=0))
+
+
+def test_chunks_give_the_same_counts():
+    rng = np.random.default_rng(1)
+    Z = rng.standard_normal((20, 3))
+    W = ring_weights(20)
+    ids = permuted_neighbour_ids(20, 2, 49, seed=2)
+    whole = _local_chunk(Z, W.indptr, W.indices, W.data, ids, 0, 20)
+    parts = [_local_chunk(Z, W.indptr, W.indices, W.data, ids, start, stop) for start, stop in ((0, 7), (7, 20))]
+    for counts, split in zip(whole, zip(*parts)):
+        np.testing.assert_array_equal(counts, np.vstack(split))
+
+
+
+def test_local_moran_finds_a_cluster():
+    z = np.zeros(30)
+    z[:5] = 3.0
+    z[5:] = -0.5
+    Z = ((z - z.mean()) / z.std())[:, None]
+    p = local_moran_pvalues(Z, ring_weights(30), permutations=199, seed=0)
+    assert p.shape == (30, 1)
+    assert (p > 0).all() and (p <= 1).all()
+    assert p[2, 0] < 0.05
+
+
+def test_global_simulations_match_direct_permutations():
+    rng = np.random.default_rng(2)
+    Z = rng.standard_normal((15, 2))
+    W = ring_weights(15)
+    scale = rng.random((15, 2))
+    sims = _global_chunk(Z, W, scale, 7, 0, 20)
+    order = np.random.default_rng([7, 4]).permutation(15)
+    np.testing.assert_allclose(sims[4], (scale * Z[order] * (W @ Z[order])).sum(axis=0))
+    np.testing.assert_array_equal(sims, np.vstack([_global_chunk(Z, W, scale, 7, 0, 9), _global_chunk(Z, W, scale, 7, 9, 20)]))
+
+
+def test_conditional_randomization_runs_global_statistics_alongside():
+    rng = np.random.default_rng(3)
+    Z = rng.standard_normal((15, 2))
+    counts = conditional_randomization(Z, ring_weights(15), permutations=49, seed=1, row_scale=np.ones_like(Z))
+    assert counts['larger_moran'].shape == counts['larger_lag'].shape == (15, 2)
+    assert counts['global_sims'].shape == (49, 2)
+    assert conditional_randomization(Z, ring_weights(15), permutations=49, seed=1)['global_sims'] is None
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pytest.importorskip("qgis.core")
+from shapely.geometry import Point
+
+from eadst_plugin.providers.merge_provider import geometry_from_wkb, plan_merge, prepare_frame, shared_schema
+
+SCHEMA = {"Event_ID": "string", "Species": "string", "Cases": "int", "Case_Class": "string", "lisa_p": "float"}
+
+
+def hashes(**values):
+    return pd.Series({key: np.uint64(value) for key, value in values.items()}, dtype="uint64")
+
+
+def actions(plan):
+    return {(row.key, row.team): (row.action, row.reason) for row in plan.itertuples()}
+
+
+def test_plan_merge_without_base():
+    master = hashes(a=1, b=2)
+    plan = plan_merge(master, {"t1": hashes(a=1, b=5, c=7), "t2": hashes(c=7, d=8)})
+    assert actions(plan) == {
+        ("b", "t1"): ("update", ""),
+        ("c", "t1"): ("insert", ""),
+        ("c", "t2"): ("skip", "Same edit as another team"),
+        ("d", "t2"): ("insert", ""),
+    }
+
+
+def test_plan_merge_with_base():
+    base = hashes(a=1, b=2, c=3, d=4)
+    master = hashes(a=1, b=9, c=3)
+    teams = {"t1": hashes(a=5, b=6, c=3, d=7), "t2": hashes(a=6, c=3, e=9)}
+    assert actions(plan_merge(master, teams, base)) == {
+        ("a", "t1"): ("conflict", "Edited differently by several teams"),
+        ("a", "t2"): ("conflict", "Edited differently by several teams"),
+        ("b", "t1"): ("conflict", "Edited in master and by team"),
+        ("d", "t1"): ("conflict", "Deleted in master"),
+        ("e", "t2"): ("insert", ""),
+    }
+
+
+def test_plan_merge_skips_versions_already_in_master():
+    base = hashes(a=1)
+    master = hashes(a=2)
+    assert actions(plan_merge(master, {"t1": hashes(a=2)}, base)) == {("a", "t1"): ("skip", "Already in master")}
+
+
+def test_plan_merge_without_teams():
+    assert plan_merge(hashes(a=1), {"t1": hashes()}).empty
+
+
+def test_shared_schema_keeps_fields_of_every_team_and_keys():
+    team = pd.DataFrame(columns=["Event_ID", "Species", "Cases"])
+    other = pd.DataFrame(columns=["Species", "Cases", "Notes"])
+    assert list(shared_schema(SCHEMA, [team, other], ["Event_ID"])) == ["Event_ID", "Species", "Cases"]
+    assert list(shared_schema(SCHEMA, [team], ["Event_ID"])) == ["Event_ID", "Species", "Cases"]
+
+
+def frames():
+    geometry = [Point(1, 2), Point(3, 4)]
+    master = gpd.GeoDataFrame({"Event_ID": ["a", "b"], "Species": ["Cattle", "Goat"], "Cases": [3, 1],
+                               "Case_Class": ["Confirmed", "Suspected"], "lisa_p": [0.01, 0.4]},
+                              geometry=geometry, crs="EPSG:4326")
+    # Team files never carry the fields kept in the master alone
+    team = gpd.GeoDataFrame({"Event_ID": ["a", "b"], "Species": ["Cattle", "Goat"], "Cases": ["3", 1.0]},
+                            geometry=geometry, crs="EPSG:4326")
+    return master, team
+
+
+@pytest.mark.parametrize("with_base", [False, True])
+def test_master_only_fields_are_not_edits(with_base):
+    master, team = frames()
+    schema = shared_schema(SCHEMA, [team], ["Event_ID"])
+    master_hashes = prepare_frame(master, schema, ["Event_ID"])["hash"]
+    team_hashes = prepare_frame(team, schema, ["Event_ID"])["hash"]
+    base = master_hashes.copy() if with_base else None
+    assert plan_merge(master_hashes, {"team": team_hashes}, base).empty
+
+    team.loc[1, "Cases"] = 4
+    plan = plan_merge(master_hashes, {"team": prepare_frame(team, schema, ["Event_ID"])["hash"]}, base)
+    assert actions(plan) == {("b", "team"): ("update", "")}
+
+
+def test_prepare_frame_indexes_by_key():
+    master, _ = frames()
+    prepared = prepare_frame(pd.concat([master, master.iloc[[0]]]), SCHEMA, ["Event_ID", "Species"])
+    assert list(prepared.index) == ["a\x1fCattle", "b\x1fGoat"]
+    assert str(prepared["Cases"].dtype) == "Int64"
+
+
+def test_geometry_from_wkb():
+    geom = geometry_from_wkb(Point(1, 2).wkb)
+    assert not geom.isNull()
+    assert geom.asWkt() == "Point (1 2)"
@@ -0,0 +1,22 @@
+import multiprocessing.spawn
+
+from eadst_plugin.providers import parallel
+from eadst_plugin.providers.parallel import map_chunks, resolve_n_jobs, split_range
+
+
+def test_split_range_covers_range():
+    assert split_range(10, 3) == [(0, 3), (3, 7), (7, 10)]
+    assert split_range(2, 8) == [(0, 1), (1, 2)]
+
+
+def test_resolve_n_jobs():
+    assert resolve_n_jobs(None) == resolve_n_jobs(0) == resolve_n_jobs(1) == 1
+    assert resolve_n_jobs(-1) >= 1
+
+
+def test_map_chunks_keeps_order_and_restores_executable(monkeypatch):
+    # Worker processes even on a single-core machine
+    monkeypatch.setattr(parallel, "resolve_n_jobs", lambda n_jobs: 2)
+    executable = multiprocessing.spawn.get_executable()
+    assert map_chunks(pow, [(2, 3), (3, 2), (5, 1)], n_jobs=2) == [8, 9, 5]
+    assert multiprocessing.spawn.get_executable() == executable
@@ -0,0 +1,76 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from eadst_plugin.providers.portfolio_provider import budget_frontier, candidates, optimise, portfolio_summary
+
+
+def curve(costs, sensitivities):
+    return pd.DataFrame({'Level': [0.0, 0.5, 1.0, 2.0][:len(costs)], 'Units': 0,
+                         'Cost_Mean': costs, 'Cost_P95': [1.2 * c for c in costs], 'Sensitivity': sensitivities})
+
+
+def small_table(objective='System sensitivity', values=None):
+    curves = {
+        'Abattoir': curve([0, 300, 550, 1000], [0.0, 0.30, 0.50, 0.70]),
+        'Village': curve([0, 400, 700, 1300], [0.0, 0.40, 0.60, 0.80]),
+        'Market': curve([0, 200, 380], [0.0, 0.15, 0.25]),
+    }
+    return candidates(curves, objective, values)
+
+
+def brute_force(table, budget, cost_column='Cost_Mean'):
+    """Best total weight over every combination of one level per scheme."""
+    levels = [group for _, group in table.groupby('Scheme')]
+    best = -np.inf
+    for rows in itertools.product(*(group.itertuples() for group in levels)):
+        if sum(getattr(row, cost_column) for row in rows) <= budget:
+            best = max(best, sum(row.Weight for row in rows))
+    return best
+
+
+def test_candidates_weights():
+    table = small_table()
+    np.testing.assert_allclose(table['Weight'], -np.log(1 - table['Sensitivity']))
+    valued = small_table('Value', {'Village': 2.0})
+    village = valued['Scheme'] == 'Village'
+    np.testing.assert_allclose(valued.loc[village, 'Weight'], 2.0 * valued.loc[village, 'Sensitivity'])
+    np.testing.assert_allclose(valued.loc[~village, 'Weight'], valued.loc[~village, 'Sensitivity'])
+
+
+def test_optimise_matches_brute_force():
+    table = small_table()
+    for budget in (0, 250, 700, 1000, 1500, 3000):
+        selected = optimise(table, budget)
+        assert sorted(selected.index) == ['Abattoir', 'Market', 'Village']
+        assert selected['Cost_Mean'].sum() <= budget
+        np.testing.assert_allclose(selected['Weight'].sum(), brute_force(table, budget))
+
+
+def test_optimise_with_cost_percentile():
+    table = small_table()
+    selected = optimise(table, 1000, cost_column='Cost_P95')
+    assert selected['Cost_P95'].sum() <= 1000
+    np.testing.assert_allclose(selected['Weight'].sum(), brute_force(table, 1000, 'Cost_P95'))
+
+
+def test_portfolio_summary():
+    table = small_table()
+    summary = portfolio_summary(table.iloc[[2, 5, 8]].set_index('Scheme'))
+    assert summary['cost_mean'] == 550 + 400 + 0
+    np.testing.assert_allclose(summary['system_sensitivity'], 1 - 0.5 * 0.6)
+    assert summary['components'] == 2
+
+
+def test_budget_frontier_is_within_a_grid_step_of_the_optimum():
+    table = small_table()
+    budgets = [0, 500, 1000, 2000]
+    frontier = budget_frontier(table, budgets, steps=2000)
+    assert list(frontier.index) == budgets
+    assert (frontier['cost_mean'] <= frontier.index.to_numpy()).all()
+    assert frontier['objective'].is_monotonic_increasing
+    for budget in budgets:
+        optimum = brute_force(table, budget)
+        assert frontier.loc[budget, 'objective'] <= optimum + 1e-9
+        np.testing.assert_allclose(frontier.loc[budget, 'objective'], optimum, atol=0.05)
@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("qgis.core")
+pytest.importorskip("esda")
+
+from eadst_plugin.providers.pysal_provider import build_space_time_matrix
+
+
+def records():
+    return pd.DataFrame({
+        "unit": ["a", "a", "b", "b"],
+        "date": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-20", "2024-02-01"]),
+        "cases": [1, 2, 5, 4],
+    })
+
+
+def test_space_time_matrix_has_every_calendar_window():
+    matrix = build_space_time_matrix(records(), "unit", "date", ["cases"], freq="W", units=["a", "b", "c"])
+    windows = matrix["cases"].columns
+    # Weeks without any record are kept as zero columns
+    assert list(windows) == list(pd.period_range("2024-01-01", "2024-02-01", freq="W"))
+    assert matrix.loc["a"].sum() == 3 and matrix.loc["b"].sum() == 9
+    assert (matrix.loc["c"] == 0).all()
+    assert (matrix["cases"].iloc[:, [1, 3]] == 0).all().all()
+
+
+def test_space_time_matrix_keeps_recent_windows():
+    matrix = build_space_time_matrix(records(), "unit", "date", ["cases"], freq="W", periods=3)
+    assert list(matrix["cases"].columns) == list(pd.period_range("2024-01-15", "2024-02-01", freq="W"))
+    assert matrix.loc["b"].sum() == 9
+    assert "a" not in matrix.index
@@ -0,0 +1,54 @@
+import numpy as np
+from scipy import stats
+
+from eadst_plugin.providers.sample_size_provider import (freedom_sample_size, population_sensitivity,
+                                                         population_specificity, prevalence_sample_size,
+                                                         two_stage_sample_size)
+
+
+def test_population_sensitivity_matches_scipy():
+    # Finite population, perfect test: at least one of the 5 diseased units sampled
+    n = np.arange(1, 60)
+    np.testing.assert_allclose(population_sensitivity(n, 100, 0.05), 1.0 - stats.hypergeom.pmf(0, 100, 5, n))
+    # Infinite population with an imperfect test and a cut-point of two reactors
+    apparent = 0.1 * 0.9 + 0.9 * 0.02
+    np.testing.assert_allclose(population_sensitivity(n, None, 0.1, 0.9, 0.98, 2), stats.binom.sf(2, n, apparent))
+    np.testing.assert_allclose(population_specificity(n, 0.98, 2), stats.binom.cdf(2, n, 0.02))
+
+
+def test_population_sensitivity_with_imperfect_test_finite():
+    n, population, diseased, se, sp = 30, 80, 4, 0.8, 0.95
+    y = np.arange(diseased + 1)
+    p_y = stats.hypergeom.pmf(y, population, diseased, n)
+    # No reactor among the diseased or the healthy sampled
+    expected = 1.0 - (p_y * (1 - se) ** y * sp ** (n - y)).sum()
+    np.testing.assert_allclose(population_sensitivity(n, population, diseased / population, se, sp), expected)
+
+
+def test_freedom_sample_size():
+    # Classic values: 59 from an infinite population and 45 of 100 at 5% design prevalence
+    assert freedom_sample_size(None, 0.05)['n'] == 59
+    assert freedom_sample_size(100, 0.05)['n'] == 45
+    design = freedom_sample_size(None, 0.05, 0.9, 0.98)
+    assert design['cutpoint'] > 0
+    assert design['sensitivity'] >= 0.95 and design['specificity'] >= 0.95
+    assert population_sensitivity(design['n'] - 1, None, 0.05, 0.9, 0.98, design['cutpoint']) < 0.95
+
+
+def test_freedom_sample_size_unreachable():
+    assert freedom_sample_size(None, 0.01, 0.5, 0.5, max_n=100) is None
+
+
+def test_two_stage_sample_size_reaches_both_stages():
+    design = two_stage_sample_size(None, 50, 0.05, 0.2, 0.9)
+    assert design['herd_sensitivity'] >= 0.95
+    assert design['sensitivity'] >= 0.95
+    assert design['total_animals'] == design['herds'] * design['animals_per_herd']
+
+
+def test_prevalence_sample_size():
+    assert prevalence_sample_size(0.5, 0.05)['n'] == 385
+    assert prevalence_sample_size(0.5, 0.05, population=1000)['n'] == 278
+    clustered = prevalence_sample_size(0.2, 0.05, cluster_size=10, icc=0.1)
+    assert clustered['design_effect'] == 1.9 and clustered['clusters'] == int(np.ceil(clustered['n'] / 10))
+    assert prevalence_sample_size(0.2, 0.05, se=0.5, sp=0.5) is None
@@ -0,0 +1,62 @@
+import numpy as np
+
+from eadst_plugin.providers import scan_kernels
+from eadst_plugin.providers.scan_kernels import permuted_counts, poisson_llr, scan_cylinders, scan_max_llr
+
+
+def cylinders(n_locations, k):
+    # Locations on a line; neighbours sorted by distance, the centre first
+    positions = np.arange(n_locations, dtype=float)
+    neighbours = np.argsort(np.abs(positions[:, None] - positions[None, :]), axis=1, kind='stable')[:, :k]
+    return neighbours, np.ones(neighbours.shape, dtype=bool)
+
+
+def test_poisson_llr():
+    # C log(C/E) + (N - C) log((N - C)/(N - E))
+    np.testing.assert_allclose(poisson_llr(np.array([10.0]), np.array([4.0]), 100.0),
+                               [10 * np.log(10 / 4) + 90 * np.log(90 / 96)])
+    np.testing.assert_array_equal(poisson_llr(np.array([3.0, 0.0]), np.array([4.0, 1.0]), 100.0), [0.0, 0.0])
+
+
+def scan_inputs(X, k=3):
+    neighbours, valid = cylinders(X.shape[0], k)
+    cylinder_totals = np.cumsum(X.sum(axis=1)[neighbours], axis=1)
+    return X, neighbours, valid, cylinder_totals, X.sum(axis=0), X.sum()
+
+
+def test_scan_finds_planted_cluster():
+    X = np.ones((10, 8))
+    X[6, 3:5] = 20.0
+    X, neighbours, valid, cylinder_totals, time_totals, total = scan_inputs(X)
+    llr, k, start, length, observed, _ = scan_cylinders(X, neighbours, valid, cylinder_totals, time_totals, total, 4)
+    centre = llr.argmax()
+    assert centre == 6 and k[centre] == 0 and start[centre] == 3 and length[centre] == 2
+    assert observed[centre] == 40.0
+    assert scan_max_llr(X, neighbours, valid, cylinder_totals, time_totals, total, 4) == llr.max()
+
+
+def test_scan_is_the_same_in_small_blocks(monkeypatch):
+    X = np.random.default_rng(0).poisson(2.0, (15, 6)).astype(float)
+    inputs = scan_inputs(X, k=4)
+    expected = scan_cylinders(*inputs, 3)
+    monkeypatch.setattr(scan_kernels, 'MAX_BLOCK_ELEMENTS', 1)
+    for values, blocked in zip(expected, scan_cylinders(*inputs, 3)):
+        np.testing.assert_array_equal(values, blocked)
+
+
+def test_permuted_counts_keep_margins():
+    rng = np.random.default_rng(0)
+    location_index = rng.integers(0, 5, 200)
+    time_index = rng.integers(0, 7, 200)
+    X = permuted_counts(location_index, time_index, 5, 7, rng)
+    np.testing.assert_array_equal(X.sum(axis=1), np.bincount(location_index, minlength=5))
+    np.testing.assert_array_equal(X.sum(axis=0), np.bincount(time_index, minlength=7))
+
+
+def test_pruned_maximum_matches_every_cylinder():
+    rng = np.random.default_rng(4)
+    for _ in range(5):
+        X = rng.poisson(rng.random((25, 12)) * 4.0).astype(float)
+        inputs = scan_inputs(X, k=6)
+        llr = scan_cylinders(*inputs, 5)[0]
+        assert scan_max_llr(*inputs, 5) == llr.max()
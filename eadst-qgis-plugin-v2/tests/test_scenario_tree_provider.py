@@ -0,0 +1,71 @@
+import numpy as np
+
+from eadst_plugin.providers.scenario_tree_provider import (cached_component_sensitivity, component_sensitivity,
+                                                           default_tree, evaluate_system, periods_to_confidence,
+                                                           probability_of_freedom, system_sensitivity)
+
+
+def fixed_tree(groups):
+    # Point values only, so every iteration gives the hand-calculated result
+    return {'unit_prevalence': 0.1, 'animal_prevalence': 0.5, 'animals_per_unit': 2, 'test_se': 0.8,
+            'test_sp': 0.99, 'follow_up_sp': 0.5, 'steps': {'Presented': 0.5}, 'groups': groups, 'interval': 1}
+
+
+def test_component_sensitivity_one_group():
+    tree = fixed_tree([{'name': 'All', 'relative_risk': 1.0, 'proportion': 1.0, 'sampled': 10, 'population': 0}])
+    se, sp = component_sensitivity(tree, n_iter=5, rng=np.random.default_rng(0))
+    se_unit = 1 - (1 - 0.5 * 0.8 * 0.5) ** 2
+    np.testing.assert_allclose(se, 1 - (1 - 0.1 * se_unit) ** 10)
+    # 20 animals tested, each reactor cleared on follow-up with probability 0.5
+    np.testing.assert_allclose(sp, (1 - 0.01 * 0.5) ** 20)
+
+
+def test_component_sensitivity_risk_groups():
+    tree = fixed_tree([
+        {'name': 'High', 'relative_risk': 3.0, 'proportion': 0.25, 'sampled': 10, 'population': 50},
+        {'name': 'Low', 'relative_risk': 1.0, 'proportion': 0.75, 'sampled': 5, 'population': 0},
+    ])
+    se, _ = component_sensitivity(tree, n_iter=3, rng=np.random.default_rng(0))
+    se_unit = 0.36
+    # Adjusted risks 3 / 1.5 and 1 / 1.5; the high-risk group is finite
+    missed_high = (1 - se_unit * 10 / 50) ** (0.1 * 2.0 * 50)
+    missed_low = (1 - 0.1 * (2.0 / 3.0) * se_unit) ** 5
+    np.testing.assert_allclose(se, 1 - missed_high * missed_low)
+
+
+def test_component_sensitivity_over_scales():
+    tree = fixed_tree([{'name': 'All', 'relative_risk': 1.0, 'proportion': 1.0, 'sampled': 10, 'population': 0}])
+    se, sp = component_sensitivity(tree, n_iter=4, rng=np.random.default_rng(0), scale=[0.0, 1.0, 2.0])
+    assert se.shape == sp.shape == (3, 4)
+    np.testing.assert_allclose(se[:, 0], 1 - (1 - 0.1 * 0.36) ** np.array([0, 10, 20]))
+
+
+def test_cached_component_sensitivity_is_reproducible():
+    tree = default_tree({'units': 20, 'samples_per_unit': 5, 'tests': ['cost_elisa_test']})
+    first, _ = cached_component_sensitivity(tree, 200, seed=1)
+    again, _ = cached_component_sensitivity(dict(reversed(list(tree.items()))), 200, seed=1)
+    np.testing.assert_array_equal(first, again)
+
+
+def test_system_sensitivity():
+    sse = system_sensitivity(np.array([[0.5], [0.2]]), [1, 2], 3)
+    np.testing.assert_allclose(sse[:, 0], [1 - 0.5 * 0.8, 0.5, 1 - 0.5 * 0.8])
+
+
+def test_probability_of_freedom():
+    freedom = probability_of_freedom(np.full((2, 1), 0.6), 0.5, 0.01)
+    first = 0.5 / (1 - 0.6 * 0.5)
+    prior = first * 0.99
+    np.testing.assert_allclose(freedom[:, 0], [first, prior / (1 - 0.6 * (1 - prior))])
+
+
+def test_evaluate_system():
+    components = {'Active': default_tree({'units': 30, 'samples_per_unit': 10, 'tests': ['cost_elisa_test']}),
+                  'Passive': {**default_tree({'units': 5}), 'interval': 3}}
+    result = evaluate_system(components, prior=(0.5, 0.3, 0.7), periods=6, n_iter=500, seed=2)
+    assert list(result['components'].index) == ['Active', 'Passive']
+    assert result['freedom'].shape == (6, 500)
+    assert len(result['periods']) == 6
+    period = periods_to_confidence(result['periods'], target=0.9, column='P50')
+    assert period is None or 1 <= period <= 6
+    assert periods_to_confidence(result['periods'], target=1.01) is None
@@ -0,0 +1,97 @@
+import os
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pytest.importorskip("qgis.core")
+from shapely.geometry import box
+
+from eadst_plugin.providers.sitrep_provider import (SitrepCache, assign_admin_units, frame_digest, period_counts,
+                                                    python_date, unit_totals)
+
+
+def admin_units():
+    # layer_to_geodataframe indexes admin units by feature id, with the index named 'fid'
+    return gpd.GeoDataFrame({"Name": ["A", "B"]}, geometry=[box(0, 0, 10, 10), box(10, 0, 20, 10)],
+                            crs="EPSG:20137", index=pd.Index([7, 9], name="fid"))
+
+
+def test_assign_admin_units_with_named_index():
+    records = pd.DataFrame({"x": [5.0, 15.0, 30.0], "y": [5.0, 5.0, 5.0]})
+    np.testing.assert_array_equal(assign_admin_units(records, admin_units()), [7, 9, -1])
+
+
+def test_assign_admin_units_with_unnamed_index():
+    records = pd.DataFrame({"x": [15.0, 5.0], "y": [5.0, 5.0]})
+    np.testing.assert_array_equal(assign_admin_units(records, admin_units().rename_axis(None)), [9, 7])
+
+
+def test_cache_keeps_recent_results_of_a_step(tmp_path):
+    cache = SitrepCache(str(tmp_path), max_entries=2)
+    for key in "abc":
+        cache.put("step", key, key)
+        time.sleep(0.01)
+    assert cache.get("step", "a") is None
+    assert cache.get("step", "b") == "b"
+    time.sleep(0.01)
+    cache.put("step", "d", "d")
+    # 'b' was used more recently than 'c'
+    assert sorted(os.listdir(tmp_path)) == ["step-b.pkl", "step-d.pkl"]
+
+
+def test_cache_evicts_oldest_beyond_size_limit(tmp_path):
+    cache = SitrepCache(str(tmp_path), max_bytes=12000)
+    cache.put("one", "k", np.zeros(1000))
+    time.sleep(0.01)
+    cache.put("two", "k", np.zeros(1000))
+    assert cache.get("one", "k") is None
+    assert cache.get("two", "k") is not None
+
+
+class FakeQDate:
+    def toPyDate(self):
+        return date(2024, 3, 1)
+
+
+class FakeQDateTime:
+    def toPyDateTime(self):
+        return datetime(2024, 3, 1, 12, 30)
+
+
+def test_python_date_reads_qdate_and_qdatetime():
+    # Date fields of e.g. imported GeoPackages come as QDate, not QDateTime
+    assert python_date(FakeQDate()) == date(2024, 3, 1)
+    assert python_date(FakeQDateTime()) == datetime(2024, 3, 1, 12, 30)
+    assert python_date("2024-03-01") == "2024-03-01"
+
+
+def outbreak_records():
+    return pd.DataFrame({
+        "Event_ID": ["e1", "e2", "e3"],
+        "Species": ["Cattle", "Goat", "Cattle"],
+        "Event_Date": pd.to_datetime(["2024-01-01", "2024-01-03", "2024-01-10"]),
+        "Cases": [2.0, 1.0, 4.0], "Pop_At_Risk": [20.0, 10.0, 40.0],
+    })
+
+
+def test_period_counts_ignore_changes_the_tables_do_not_see():
+    records, positions = outbreak_records(), np.array([0, 1, 0])
+    digest = frame_digest(period_counts(records, positions))
+    # Another ID and a date in the same week leave every table unchanged
+    edited = records.assign(Event_ID=["x1", "x2", "x3"])
+    edited.loc[1, "Event_Date"] = pd.Timestamp("2024-01-04")
+    assert frame_digest(period_counts(edited, positions)) == digest
+    edited.loc[1, "Cases"] = 3.0
+    assert frame_digest(period_counts(edited, positions)) != digest
+    assert frame_digest(period_counts(records, np.array([0, 1, 1]))) != digest
+
+
+def test_unit_totals():
+    totals = unit_totals(outbreak_records(), np.array([0, -1, 2]), 3)
+    assert totals["Outbreaks"].tolist() == [1, 0, 1]
+    assert totals["Cases"].tolist() == [2.0, 0.0, 4.0]
+    assert totals["Pop"].tolist() == [20.0, 0.0, 40.0]
@@ -0,0 +1,18 @@
+import pytest
+
+from eadst_plugin.providers.survcost_provider import parse_number_units
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("150 villages, 20 animals per village", (150, 20)),
+    ("150 herds with 20 animals each", (150, 20)),
+    ("Sample 10 sheep from each of 50 flocks", (50, 10)),
+    ("30 samples / herd in 40 herds", (40, 30)),
+    ("3000 samples from 150 herds", (150, 20)),
+    ("20 animals from 150 herds", (150, 20)),
+    ("120 kebeles", (120, 1)),
+    ("500 samples", (500, 1)),
+    ("", (0, 1)),
+])
+def test_parse_number_units(text, expected):
+    assert parse_number_units(text) == expected
@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip("qgis.core")
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import QgsField, QgsFields
+
+from eadst_plugin.providers import trace_network as trace_network_module
+from eadst_plugin.providers.trace_network import TraceNetwork, trace_network
+
+
+class Signal:
+    def connect(self, slot):
+        pass
+
+
+class Link:
+    def __init__(self, fid, source, dest):
+        self.fid, self.values = fid, {"Source_ID": source, "Dest_ID": dest}
+
+    def id(self):
+        return self.fid
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+
+class LinkLayer:
+    """Stands in for a Trace_Links layer whose links are written straight to its provider."""
+    def __init__(self):
+        self.features = {}
+        self.featureAdded = self.featureDeleted = self.attributeValueChanged = Signal()
+        self.afterCommitChanges = self.afterRollBack = self.willBeDeleted = Signal()
+
+    def id(self):
+        return "Trace_Links"
+
+    def fields(self):
+        fields = QgsFields()
+        for name in ("Source_ID", "Dest_ID"):
+            fields.append(QgsField(name, QVariant.String))
+        return fields
+
+    def getFeatures(self, request=None):
+        return list(self.features.values())
+
+    def featureCount(self):
+        return len(self.features)
+
+    def write(self, source, dest):
+        feat = Link(len(self.features) + 1, source, dest)
+        self.features[feat.id()] = feat
+        return [feat]
+
+
+@pytest.fixture(autouse=True)
+def no_cached_networks(monkeypatch):
+    monkeypatch.setattr(trace_network_module, "_NETWORKS", {})
+
+
+def test_first_link_written_before_the_network_is_built_counts_once():
+    layer = LinkLayer()
+    layer.write("A", "B")
+    added = layer.write("B", "C")
+    # The network is built (and reads both links) only after the write
+    network = trace_network(layer)
+    network.on_provider_features_added(added)
+    assert network.multiplicity == {("A", "B"): 1, ("B", "C"): 1}
+
+    del layer.features[added[0].id()]
+    network.on_feature_deleted(added[0].id())
+    assert network.successors["B"] == set()
+    assert network.reachable("A") == {"B": 1}
+
+
+def test_links_added_to_a_built_network():
+    layer = LinkLayer()
+    network = trace_network(layer)
+    network.on_provider_features_added(layer.write("A", "B"))
+    network.on_provider_features_added(layer.write("A", "B"))
+    assert network.multiplicity == {("A", "B"): 2}
+    assert trace_network(layer) is network
+
+
+def test_remove_link_keeps_repeated_links():
+    network = TraceNetwork()
+    network.add_link("A", "B")
+    network.add_link("A", "B")
+    network.remove_link("A", "B")
+    assert network.successors["A"] == {"B"}
+    network.remove_link("A", "B")
+    assert network.successors["A"] == set()